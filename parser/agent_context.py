@@ -0,0 +1,391 @@
+"""
+Context for agents: what one function needs, ranked and packed into a
+size budget, as plain JSON.
+
+For a target function the candidates are its source, its dataflow
+summary, an optional slice from one of its statements, a skeleton of its
+class (attributes and method signatures) and of its module (imports and
+top-level names), and the functions reachable in up to `hops` calls in
+either direction. Each candidate gets a score from its kind, and callers
+and callees lose half of it per hop away from the target.
+
+Packing is greedy in score order: a candidate goes in whole if it still
+fits, else as its one-line signature, else it is listed as omitted. The
+top item (the target's source, or the slice) is cut to the budget rather
+than dropped. Budgets are in characters or in tokens, estimated as
+CHARS_PER_TOKEN characters each.
+
+Candidates for a function are cached per (function, content hash, hops)
+and packed contexts per request as well, so an edited function gets a
+fresh context and an unchanged one is served from memory. Sources of
+candidates are pluggable (ContextSource); DatabaseContextSource reads a
+snapshot database and its search index.
+"""
+
+import hashlib
+import math
+import os
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from graph_db import IMPORTS, INHERITS
+from slicing import BACKWARD, LRU, slicer_for_database
+from telemetry import count, span
+
+UNITS = ("tokens", "chars")
+
+CHARS_PER_TOKEN = 4
+
+DEFAULT_BUDGET = 4000
+DEFAULT_HOPS = 2
+MAX_HOPS = 4
+
+# Callers or callees followed per function and hop
+MAX_NEIGHBOURS = 32
+
+DEFAULT_MAX_NEIGHBOURHOODS = 1024
+DEFAULT_MAX_CONTEXTS = 1024
+
+# Base score per kind of item; callers and callees decay by HOP_DECAY per extra
+# hop. A slice and the source swap scores when a slice is asked for.
+WEIGHTS = {"source": 1.0, "slice": 0.95, "summary": 0.8, "class": 0.6,
+           "callee": 0.5, "caller": 0.45, "module": 0.3}
+HOP_DECAY = 0.5
+
+TRUNCATION_MARK = "\n..."
+
+
+def content_digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf8", errors="replace"), digest_size=16).hexdigest()
+
+
+def cost(text: str, unit: str = "tokens") -> int:
+    """Size of `text` in budget units."""
+    return len(text) if unit == "chars" else math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def signature(func: Dict[str, Any]) -> str:
+    """`qualname(params) -> return type` of a function record."""
+    params = ", ".join(p for p in func.get("parameters") or [] if p)
+    returns = f" -> {func['return_type']}" if func.get("return_type") else ""
+    return f"{func.get('qualname') or func['name']}({params}){returns}"
+
+
+def _lines(start: Optional[int], end: Optional[int]) -> str:
+    if not start:
+        return ""
+    return f"{start}-{end}" if end and end != start else str(start)
+
+
+class ContextSource:
+    """
+    Where a ContextPacker gets its facts. Functions are dicts with key,
+    name, qualname, kind, file, start_line, end_line, complexity,
+    parameters, return_type and parent (the enclosing class key or None);
+    classes also have attributes, docstring, bases and methods (function
+    dicts). Anything a source cannot tell is None or empty.
+    """
+
+    def function(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def source(self, key: str) -> Optional[str]:
+        """Source text of a function."""
+        return None
+
+    def callers(self, key: str) -> List[str]:
+        return []
+
+    def callees(self, key: str) -> List[str]:
+        """Keys of the functions `key` calls that resolve inside the repo."""
+        return []
+
+    def class_info(self, key: str) -> Optional[Dict[str, Any]]:
+        return None
+
+    def module_info(self, file: str) -> Optional[Dict[str, Any]]:
+        """Imports and top-level (kind, name) symbols of a file."""
+        return None
+
+    def summary(self, key: str) -> Optional[Dict[str, Any]]:
+        """Interprocedural summary: parameters, reads, writes, returns, calls."""
+        return None
+
+    def slice(self, key: str, line: int, variable: Optional[str], direction: str) -> Dict[str, Any]:
+        """A slicing.Slicer.slice result; ValueError if there is none."""
+        raise ValueError(f"No dependence graph for {key}")
+
+    def lines(self, file: str, start: int, end: int) -> Optional[List[str]]:
+        """Source lines start..end of a file, if the text is available."""
+        return None
+
+
+def render_class(cls: Dict[str, Any]) -> str:
+    bases = f"({', '.join(cls['bases'])})" if cls.get("bases") else ""
+    out = [f"class {cls['name']}{bases}  # {cls.get('file')}:{_lines(cls.get('start_line'), cls.get('end_line'))}"]
+    if cls.get("docstring"):
+        out.append(f"    \"\"\"{cls['docstring'].strip().splitlines()[0]}\"\"\"")
+    if cls.get("attributes"):
+        out.append(f"    attributes: {', '.join(cls['attributes'])}")
+    out.extend(f"    {signature(method)}" for method in cls.get("methods") or [])
+    return "\n".join(out)
+
+
+def render_module(module: Dict[str, Any]) -> str:
+    out = [f"module {module['file']}"]
+    if module.get("imports"):
+        out.append(f"imports: {', '.join(module['imports'])}")
+    for kind in ("class", "function", "variable"):
+        names = [name for k, name in module.get("symbols") or [] if k == kind]
+        if names:
+            out.append(f"{kind}s: {', '.join(names)}")
+    return "\n".join(out)
+
+
+def render_summary(summary: Dict[str, Any]) -> str:
+    out = []
+    for field in ("parameters", "reads", "writes", "returns", "calls"):
+        value = summary.get(field)
+        if isinstance(value, dict):
+            value = [f"{k}<-{','.join(v) if isinstance(v, list) else v}" for k, v in value.items()]
+        if value:
+            out.append(f"{field}: {', '.join(map(str, value))}")
+    return "\n".join(out)
+
+
+class ContextPacker:
+    """Ranked, budgeted context of functions from one ContextSource."""
+
+    def __init__(self, source: ContextSource, max_neighbourhoods: int = DEFAULT_MAX_NEIGHBOURHOODS,
+                 max_contexts: int = DEFAULT_MAX_CONTEXTS):
+        self.source = source
+        self._neighbourhoods = LRU(max_neighbourhoods)
+        self._contexts = LRU(max_contexts)
+        self._lock = threading.RLock()
+
+    def _item(self, kind: str, func: Dict[str, Any], text: Optional[str], score: float,
+              hops: int = 0, brief: Optional[str] = None) -> Dict[str, Any]:
+        return {"kind": kind, "key": func["key"], "file": func.get("file"),
+                "start_line": func.get("start_line"), "end_line": func.get("end_line"),
+                "hops": hops, "score": round(score, 4), "text": text or brief or "", "brief": brief}
+
+    def _reachable(self, key: str, hops: int, step) -> List[Tuple[str, int]]:
+        """(function, distance) within `hops` steps of `key` along `step`, nearest first."""
+        seen = {key}
+        found, frontier = [], [key]
+        for hop in range(1, hops + 1):
+            following = []
+            for current in frontier:
+                for neighbour in step(current)[:MAX_NEIGHBOURS]:
+                    if neighbour not in seen:
+                        seen.add(neighbour)
+                        following.append(neighbour)
+                        found.append((neighbour, hop))
+            frontier = following
+        return found
+
+    def candidates(self, key: str, hops: int = DEFAULT_HOPS) -> Tuple[str, List[Dict[str, Any]]]:
+        """(content hash, unranked candidate items) of a function, cached per content hash."""
+        source = self.source
+        func = source.function(key)
+        if func is None:
+            raise KeyError(key)
+        text = source.source(key)
+        digest = content_digest(text if text is not None else signature(func))
+        cache_key = (key, digest, hops)
+        with self._lock:
+            found = self._neighbourhoods.lookup(cache_key)
+        if found is not self._neighbourhoods:
+            count("agent_context_cache_total", part="neighbourhood", result="hit")
+            return digest, found
+
+        count("agent_context_cache_total", part="neighbourhood", result="miss")
+        with span("agent_context", part="neighbourhood"):
+            items = [self._item("source", func, text, WEIGHTS["source"], brief=signature(func))]
+            summary = source.summary(key)
+            if summary:
+                items.append(self._item("summary", func, render_summary(summary), WEIGHTS["summary"]))
+            cls = source.class_info(func["parent"]) if func.get("parent") else None
+            if cls:
+                items.append(self._item("class", cls, render_class(cls), WEIGHTS["class"]))
+            module = source.module_info(func["file"]) if func.get("file") else None
+            if module:
+                items.append(self._item("module", {"key": module["file"], "file": module["file"]},
+                                        render_module(module), WEIGHTS["module"]))
+            nearest = {}
+            for kind, step in (("callee", source.callees), ("caller", source.callers)):
+                for neighbour, hop in self._reachable(key, hops, step):
+                    if hop < nearest.get(neighbour, (hops + 1,))[0]:
+                        nearest[neighbour] = (hop, kind)
+            for neighbour, (hop, kind) in nearest.items():
+                other = source.function(neighbour)
+                if other is not None:
+                    items.append(self._item(kind, other, source.source(neighbour),
+                                            WEIGHTS[kind] * HOP_DECAY ** (hop - 1), hop,
+                                            signature(other)))
+        with self._lock:
+            self._neighbourhoods.store(cache_key, items)
+        return digest, items
+
+    def _slice_item(self, func: Dict[str, Any], line: int, variable: Optional[str],
+                    direction: str) -> Dict[str, Any]:
+        result = self.source.slice(func["key"], line, variable, direction)
+        out = []
+        for entry in result["functions"]:
+            statements = [s for s in entry["statements"] if s.get("line")]
+            wanted = sorted({n for s in statements
+                             for n in range(s["line"], (s.get("end_line") or s["line"]) + 1)})
+            text = None
+            if wanted and func.get("file") and entry["function"] == func["key"]:
+                text = self.source.lines(func["file"], wanted[0], wanted[-1])
+            if text is not None:
+                out.extend(f"{n}| {text[n - wanted[0]]}" for n in wanted if n - wanted[0] < len(text))
+            else:
+                out.extend(f"{s['line']}| {s.get('label') or ''}" for s in statements)
+        criterion = f"{direction} slice from line {line}" + (f" on {variable}" if variable else "")
+        return self._item("slice", func, "\n".join([f"# {criterion}"] + out), WEIGHTS["slice"])
+
+    def context(self, key: str, budget: int = DEFAULT_BUDGET, unit: str = "tokens",
+                hops: int = DEFAULT_HOPS, line: Optional[int] = None,
+                variable: Optional[str] = None, direction: str = BACKWARD) -> Dict[str, Any]:
+        """
+        The highest-scoring context of function `key` that fits `budget`
+        units, with a slice from `line` if given. KeyError for an unknown
+        function, ValueError for a bad unit or slice criterion.
+        """
+        if unit not in UNITS:
+            raise ValueError(f"Unknown budget unit: {unit}")
+        digest, candidates = self.candidates(key, hops)
+        cache_key = (key, digest, budget, unit, hops, line, variable, direction)
+        with self._lock:
+            found = self._contexts.lookup(cache_key)
+        if found is not self._contexts:
+            count("agent_context_cache_total", part="context", result="hit")
+            return found
+
+        count("agent_context_cache_total", part="context", result="miss")
+        if line is not None:
+            # The slice is what was asked about, so it ranks above the whole source
+            sliced = self._slice_item(self.source.function(key), line, variable, direction)
+            candidates = [dict(candidates[0], score=WEIGHTS["slice"]),
+                          dict(sliced, score=WEIGHTS["source"])] + candidates[1:]
+        with span("agent_context", part="pack"):
+            result = self.pack(candidates, budget, unit)
+        result = dict(function=key, hash=digest, **result)
+        with self._lock:
+            self._contexts.store(cache_key, result)
+        return result
+
+    @staticmethod
+    def pack(candidates: Sequence[Dict[str, Any]], budget: int, unit: str = "tokens") -> Dict[str, Any]:
+        """Greedy packing of candidate items by descending score; see the module docstring."""
+        used = 0
+        items, omitted = [], []
+        for candidate in sorted(candidates, key=lambda c: -c["score"]):
+            item = {k: v for k, v in candidate.items() if k != "brief"}
+            text, brief = candidate["text"], candidate.get("brief")
+            remaining = budget - used
+            if cost(text, unit) <= remaining:
+                item["form"] = "full"
+            elif brief and brief != text and cost(brief, unit) <= remaining:
+                item["text"], item["form"] = brief, "signature"
+            elif not items and remaining > cost(TRUNCATION_MARK, unit):
+                chars = remaining if unit == "chars" else remaining * CHARS_PER_TOKEN
+                item["text"] = text[:chars - len(TRUNCATION_MARK)] + TRUNCATION_MARK
+                item["form"] = "truncated"
+            else:
+                omitted.append({"kind": candidate["kind"], "key": candidate["key"]})
+                continue
+            used += cost(item["text"], unit)
+            items.append(item)
+        return {"budget": {"limit": budget, "unit": unit, "used": used},
+                "items": items, "omitted": omitted}
+
+
+class DatabaseContextSource(ContextSource):
+    """Facts from a snapshot database, with source text from its search index if given."""
+
+    def __init__(self, db, index=None, snapshot: Optional[str] = None, max_files: int = 64):
+        self.db = db
+        self.index = index
+        self.snapshot = snapshot
+        self.slicer = slicer_for_database(db.path)
+        self._files = LRU(max_files)
+        self._lock = threading.Lock()
+
+    def _function(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        return {field: row.get(field) for field in (
+            "key", "name", "qualname", "kind", "file", "start_line", "end_line", "complexity",
+            "parameters", "return_type", "parent")}
+
+    def function(self, key):
+        with self._lock:
+            row = self.db.symbol_details(key)
+        if row is None or row["kind"] not in ("function", "method"):
+            return None
+        return self._function(row)
+
+    def lines(self, file, start, end):
+        if self.index is None:
+            return None
+        with self._lock:
+            lines = self._files.lookup(file)
+            if lines is self._files:
+                text = self.index.file_text(self.snapshot, file)
+                lines = text.split("\n") if text is not None else None
+                self._files.store(file, lines)
+        return lines[start - 1:end] if lines is not None else None
+
+    def source(self, key):
+        func = self.function(key)
+        if func is None or not func["start_line"]:
+            return None
+        lines = self.lines(func["file"], func["start_line"], func["end_line"] or func["start_line"])
+        return "\n".join(lines) if lines is not None else None
+
+    def callers(self, key):
+        with self._lock:
+            return [row["key"] for row in self.db.callers(key)]
+
+    def callees(self, key):
+        with self._lock:
+            return list(dict.fromkeys(row["key"] for row in self.db.callees(key) if row["key"]))
+
+    def class_info(self, key):
+        with self._lock:
+            row = self.db.symbol_details(key)
+            if row is None or row["kind"] != "class":
+                return None
+            methods = self.db.members(key)
+            bases = self.db.edge_names(key, INHERITS)
+        return dict(row, bases=bases,
+                    methods=[self._function(m) for m in methods if m["kind"] == "method"])
+
+    def module_info(self, file):
+        with self._lock:
+            symbols = self.db.members(file)
+            imports = self.db.edge_names(file, IMPORTS)
+        return {"file": file, "imports": imports,
+                "symbols": [(row["kind"], row["name"]) for row in symbols]}
+
+    def summary(self, key):
+        with self._lock:
+            return self.db.function_summary(key)
+
+    def slice(self, key, line, variable, direction):
+        return self.slicer.slice(key, line=line, variable=variable, direction=direction)
+
+
+@lru_cache(maxsize=8)
+def _cached_packer(path: str, mtime_ns: int, index_path: Optional[str], snapshot: Optional[str]) -> ContextPacker:
+    from graph_db import GraphDatabase
+    from search_index import SearchIndex
+    index = SearchIndex(index_path, readonly=True) if index_path and os.path.exists(index_path) else None
+    return ContextPacker(DatabaseContextSource(GraphDatabase(path), index, snapshot))
+
+
+def packer_for_database(path: str, index_path: Optional[str] = None,
+                        snapshot: Optional[str] = None) -> ContextPacker:
+    """Context packer over a snapshot database (and its text in the search index at `index_path`)."""
+    return _cached_packer(path, os.stat(path).st_mtime_ns, index_path, snapshot)
@@ -1,12 +1,222 @@
-from tree_sitter import Language
-
-Language.build_library(
-    'build/my-languages.so',
-    [
-        'tree_sitter_grammars/tree-sitter-python',
-        'tree_sitter_grammars/tree-sitter-java',
-        'tree_sitter_grammars/tree-sitter-javascript',
-        'tree_sitter_grammars/tree-sitter-c',
-        'tree_sitter_grammars/tree-sitter-typescript/typescript'
+"""
+Grammar build manager.
+
+Each tree-sitter grammar is compiled into its own shared library under
+build/grammars/, named after a hash of the grammar sources and the compiler
+configuration. A grammar is only recompiled when that hash changes, changed
+grammars are compiled in parallel, and every library and the manifest are
+written to a temporary file and renamed into place, so concurrent workers
+never see a half-written library.
+
+Run `python build_languages.py` at deploy / container start; it is a no-op
+when nothing changed.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import sysconfig
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GRAMMAR_ROOT = os.path.join(BASE_DIR, "tree_sitter_grammars")
+BUILD_DIR = os.path.join(BASE_DIR, "build")
+GRAMMAR_BUILD_DIR = os.path.join(BUILD_DIR, "grammars")
+MANIFEST_PATH = os.path.join(GRAMMAR_BUILD_DIR, "manifest.json")
+
+# Language name -> grammar folder (relative to GRAMMAR_ROOT)
+GRAMMARS = {
+    'python': 'tree-sitter-python',
+    'java': 'tree-sitter-java',
+    'javascript': 'tree-sitter-javascript',
+    'c': 'tree-sitter-c',
+    'typescript': os.path.join('tree-sitter-typescript', 'typescript'),
+}
+
+# Environment variables that change what the C/C++ compiler produces
+COMPILER_ENV = ('CC', 'CXX', 'CFLAGS', 'CXXFLAGS', 'CPPFLAGS', 'LDFLAGS', 'LDSHARED')
+
+_manifest_lock = threading.Lock()
+
+
+def grammar_dir(name: str) -> str:
+    return os.path.join(GRAMMAR_ROOT, GRAMMARS[name])
+
+
+def _source_files(name: str) -> List[str]:
+    """Every file that ends up in the grammar's library (sources and headers)."""
+    root = grammar_dir(name)
+    # tree-sitter-typescript shares a scanner header between its two grammars
+    dirs = [os.path.join(root, "src"), os.path.join(os.path.dirname(root), "common")]
+    files = []
+    for d in dirs:
+        for dirpath, _, filenames in os.walk(d):
+            files.extend(os.path.join(dirpath, f) for f in filenames
+                         if f.endswith(('.c', '.cc', '.h')))
+    if not files:
+        raise FileNotFoundError(f"No grammar sources for {name} in {root}")
+    return sorted(files)
+
+
+def compiler_signature() -> str:
+    """Describe the compiler configuration so a change of flags forces a rebuild."""
+    import tree_sitter
+
+    parts = [
+        getattr(tree_sitter, "__version__", "") or _package_version("tree_sitter"),
+        sys.platform,
+        sysconfig.get_config_var("CC") or "",
+        sysconfig.get_config_var("CFLAGS") or "",
     ]
-)
+    parts.extend(f"{key}={os.environ.get(key, '')}" for key in COMPILER_ENV)
+    return "\n".join(parts)
+
+
+def _package_version(name: str) -> str:
+    try:
+        from importlib.metadata import version
+        return version(name)
+    except Exception:
+        return ""
+
+
+def _fingerprint(files: Iterable[str], signature: str) -> str:
+    """Cheap stat-based fingerprint used to skip re-hashing unchanged sources."""
+    h = hashlib.sha256(signature.encode())
+    for f in files:
+        st = os.stat(f)
+        h.update(f"{f}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+def grammar_hash(name: str, signature: Optional[str] = None) -> str:
+    """Content hash of a grammar's sources plus the compiler configuration."""
+    signature = signature if signature is not None else compiler_signature()
+    root = grammar_dir(name)
+    h = hashlib.sha256(signature.encode())
+    for f in _source_files(name):
+        h.update(os.path.relpath(f, root).replace(os.sep, "/").encode() + b"\0")
+        with open(f, "rb") as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def library_path(name: str, digest: str) -> str:
+    return os.path.join(GRAMMAR_BUILD_DIR, f"{name}-{digest[:16]}.so")
+
+
+def load_manifest() -> Dict:
+    """Return the manifest of built grammars ({} if nothing was built yet)."""
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build_hash(languages: Dict[str, Dict]) -> str:
+    """Single hash identifying a set of built grammars (used in cache keys)."""
+    h = hashlib.sha256()
+    for name in sorted(languages):
+        h.update(f"{name}:{languages[name]['hash']}\n".encode())
+    return h.hexdigest()
+
+
+def _compile(name: str, digest: str) -> str:
+    from tree_sitter import Language
+
+    output = library_path(name, digest)
+    if os.path.exists(output):
+        # Another worker built the same sources already
+        return output
+    tmp = f"{output}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        Language.build_library(tmp, [grammar_dir(name)])
+        os.replace(tmp, output)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    print(f"🔧 Built {name} grammar -> {output}")
+    return output
+
+
+def build_all(languages: Optional[Iterable[str]] = None, jobs: Optional[int] = None,
+              force: bool = False) -> Dict:
+    """
+    Build every grammar whose sources or compiler flags changed.
+
+    Returns the manifest: {"build_hash": ..., "languages": {name: {"hash", "library", "fingerprint"}}}.
+    """
+    names = list(languages) if languages is not None else list(GRAMMARS)
+    os.makedirs(GRAMMAR_BUILD_DIR, exist_ok=True)
+
+    signature = compiler_signature()
+    previous = load_manifest().get("languages", {})
+    entries = {}
+    to_build = []
+
+    for name in names:
+        fingerprint = _fingerprint(_source_files(name), signature)
+        old = previous.get(name)
+        if old and old.get("fingerprint") == fingerprint:
+            digest = old["hash"]
+        else:
+            digest = grammar_hash(name, signature)
+        entries[name] = {
+            "hash": digest,
+            "fingerprint": fingerprint,
+            "library": os.path.basename(library_path(name, digest)),
+        }
+        if force or not os.path.exists(library_path(name, digest)):
+            if force and os.path.exists(library_path(name, digest)):
+                os.remove(library_path(name, digest))
+            to_build.append(name)
+
+    if to_build:
+        with ThreadPoolExecutor(max_workers=jobs or min(len(to_build), os.cpu_count() or 1)) as pool:
+            list(pool.map(lambda n: _compile(n, entries[n]["hash"]), to_build))
+    else:
+        print("✅ Grammars up to date")
+
+    with _manifest_lock:
+        merged = dict(previous)
+        merged.update(entries)
+        manifest = {"build_hash": build_hash(merged), "languages": merged}
+        _write_atomic(MANIFEST_PATH, json.dumps(manifest, indent=2).encode("utf-8"))
+    _prune_stale(names, {entry["library"] for entry in merged.values()})
+    return manifest
+
+
+def _prune_stale(names: List[str], keep: set):
+    """Remove libraries of older builds of `names` (already-loaded copies stay valid)."""
+    for f in os.listdir(GRAMMAR_BUILD_DIR):
+        if f in keep or not f.endswith(".so"):
+            continue
+        if f.rsplit("-", 1)[0] in names:
+            try:
+                os.remove(os.path.join(GRAMMAR_BUILD_DIR, f))
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Build tree-sitter grammar libraries")
+    ap.add_argument("languages", nargs="*", help="languages to build (default: all)")
+    ap.add_argument("-j", "--jobs", type=int, default=None, help="parallel compile jobs")
+    ap.add_argument("--force", action="store_true", help="rebuild even if up to date")
+    args = ap.parse_args()
+    result = build_all(args.languages or None, jobs=args.jobs, force=args.force)
+    print(f"🧩 Grammar build {result['build_hash'][:16]}")
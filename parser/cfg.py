@@ -1,38 +1,40 @@
 import json
-import networkx as nx
-import matplotlib.pyplot as plt
-from tree_sitter import Language, Parser
+from tree_sitter import Parser
+from control_flow import build_cfg
+from languages import (
+    ALL_CLASS_NODE_TYPES, CLASS_NODE_TYPES, FUNCTION_NODE_TYPES, get_language, language_for_extension
+)
+from lazy_imports import lazy_import
+from telemetry import ProgressLog, count, timed
+
+nx = lazy_import("networkx")
+plt = lazy_import("matplotlib.pyplot")
 
 class MultiLanguageCFGGenerator:
     def __init__(self):
         self.parser = Parser()
-        # Load your existing language
-        MY_LANG = 'build/my-languages.so'
-        self.LANGUAGES = {
-            'py': Language(MY_LANG, 'python'),
-            'java': Language(MY_LANG, 'java'),
-            'js': Language(MY_LANG, 'javascript'),
-            'c': Language(MY_LANG, 'c'),
-        }
         
     def get_node_text(self, node, code):
         return code[node.start_byte:node.end_byte].decode('utf-8')
     
     def set_language(self, file_extension):
         """Set parser language based on file extension"""
-        lang = self.LANGUAGES.get(file_extension)
-        if lang:
-            self.parser.set_language(lang)
+        lang_name = language_for_extension(file_extension)
+        if not lang_name:
+            return None
+        lang = get_language(lang_name)
+        self.parser.set_language(lang)
         return lang
 
     def find_function_nodes(self, root_node, code, language):
         """Find all function/method nodes based on language"""
         functions = []
-        
+        lang_name = language_for_extension(language) or language
+
         def traverse(node):
             # Language-specific function detection
-            if language == 'py':
-                if node.type == 'function_definition':
+            if lang_name == 'python':
+                if node.type in FUNCTION_NODE_TYPES['python']:
                     name_node = node.child_by_field_name('name')
                     if name_node:
                         func_name = self.get_node_text(name_node, code)
@@ -52,8 +54,8 @@ class MultiLanguageCFGGenerator:
                                     method_name = self.get_node_text(method_name_node, code)
                                     functions.append(('method', f"{class_name}.{method_name}", child))
             
-            elif language == 'java':
-                if node.type in ['method_declaration', 'constructor_declaration']:
+            elif lang_name == 'java':
+                if node.type in FUNCTION_NODE_TYPES['java']:
                     name_node = node.child_by_field_name('name')
                     if name_node:
                         method_name = self.get_node_text(name_node, code)
@@ -71,31 +73,8 @@ class MultiLanguageCFGGenerator:
                     class_name = self.get_node_text(name_node, code) if name_node else 'anonymous'
                     functions.append(('class', class_name, node))
             
-            elif language == 'js':
-                if node.type in ['function_declaration', 'function']:
-                    name_node = node.child_by_field_name('name')
-                    if name_node:
-                        func_name = self.get_node_text(name_node, code)
-                        functions.append(('function', func_name, node))
-                
-                elif node.type == 'method_definition':
-                    name_node = node.child_by_field_name('name')
-                    if name_node:
-                        method_name = self.get_node_text(name_node, code)
-                        # Find containing class
-                        class_node = self._find_parent_class(node)
-                        if class_node:
-                            class_name_node = class_node.child_by_field_name('name')
-                            class_name = self.get_node_text(class_name_node, code) if class_name_node else 'anonymous'
-                            functions.append(('method', f"{class_name}.{method_name}", node))
-                
-                elif node.type == 'class_declaration':
-                    name_node = node.child_by_field_name('name')
-                    class_name = self.get_node_text(name_node, code) if name_node else 'anonymous'
-                    functions.append(('class', class_name, node))
-            
-            elif language == 'c':
-                if node.type == 'function_definition':
+            elif lang_name == 'c':
+                if node.type in FUNCTION_NODE_TYPES['c']:
                     declarator = node.child_by_field_name('declarator')
                     if declarator:
                         name_node = declarator.child_by_field_name('name') or declarator.child_by_field_name('declarator')
@@ -112,6 +91,27 @@ class MultiLanguageCFGGenerator:
                                 func_name = self.get_node_text(name_node, code)
                                 functions.append(('function', func_name, node))
             
+            elif lang_name in FUNCTION_NODE_TYPES:
+                # JavaScript and TypeScript: definitions from the registry's node-type tables
+                if node.type in FUNCTION_NODE_TYPES[lang_name] or node.type == 'function':
+                    name_node = node.child_by_field_name('name')
+                    if name_node:
+                        func_name = self.get_node_text(name_node, code)
+                        if node.type != 'method_definition':
+                            functions.append(('function', func_name, node))
+                        else:
+                            # Find containing class
+                            class_node = self._find_parent_class(node)
+                            if class_node:
+                                class_name_node = class_node.child_by_field_name('name')
+                                class_name = self.get_node_text(class_name_node, code) if class_name_node else 'anonymous'
+                                functions.append(('method', f"{class_name}.{func_name}", node))
+
+                elif node.type in CLASS_NODE_TYPES[lang_name]:
+                    name_node = node.child_by_field_name('name')
+                    class_name = self.get_node_text(name_node, code) if name_node else 'anonymous'
+                    functions.append(('class', class_name, node))
+            
             for child in node.children:
                 traverse(child)
         
@@ -122,128 +122,30 @@ class MultiLanguageCFGGenerator:
         """Find the parent class node"""
         current = node.parent
         while current:
-            if current.type in ['class_declaration', 'class_definition']:
+            if current.type in ALL_CLASS_NODE_TYPES:
                 return current
             current = current.parent
         return None
 
-    def build_cfg_for_function(self, function_node, code, function_name, language):
-        """Build CFG for a single function with language-specific handling"""
-        cfg = nx.DiGraph()
-        
-        # Get function body based on language
-        body_node = None
-        if language == 'py':
-            body_node = function_node.child_by_field_name('body')
-        elif language in ['java', 'js', 'c']:
-            body_node = function_node.child_by_field_name('body')
-            if not body_node:
-                # For some languages, body might be called 'compound_statement' or similar
-                for child in function_node.children:
-                    if child.type in ['block', 'compound_statement']:
-                        body_node = child
-                        break
-        
-        if not body_node:
-            print(f"    ⚠️  No body found for {function_name}")
-            return cfg
-        
-        basic_blocks = self._extract_basic_blocks(body_node, code, language)
-        self._create_cfg_from_blocks(cfg, basic_blocks, code, function_name)
-        
-        return cfg
-
-    def _extract_basic_blocks(self, body_node, code, language):
-        """Extract basic blocks from function body"""
-        basic_blocks = []
-        current_block = []
-        
-        def traverse_blocks(node):
-            nonlocal current_block
-            
-            # Statements that typically start new basic blocks
-            block_starters = [
-                'if_statement', 'while_statement', 'for_statement', 
-                'return_statement', 'break_statement', 'continue_statement'
-            ]
-            
-            # Language-specific additions
-            if language == 'java':
-                block_starters.extend(['switch_statement', 'try_statement'])
-            elif language == 'c':
-                block_starters.extend(['switch_statement', 'case_statement', 'goto_statement'])
-            
-            if node.type in block_starters:
-                if current_block:
-                    basic_blocks.append(current_block)
-                    current_block = []
-            
-            # Add executable statements to current block
-            executable_types = [
-                'expression_statement', 'assignment', 'return_statement',
-                'augmented_assignment', 'break_statement', 'continue_statement'
-            ]
-            
-            if language == 'java':
-                executable_types.extend(['local_variable_declaration', 'method_invocation'])
-            elif language == 'c':
-                executable_types.extend(['declaration', 'expression_statement'])
-            
-            if node.type in executable_types:
-                current_block.append(node)
-            
-            # Recursively process children
-            for child in node.children:
-                traverse_blocks(child)
-        
-        traverse_blocks(body_node)
-        
-        # Add the last block
-        if current_block:
-            basic_blocks.append(current_block)
-        
-        return basic_blocks
+    @timed("cfg")
+    def build_flow_graph(self, function_node, code, function_name, language):
+        """
+        Build the statement-level CFG of one function: branch, loop-back and
+        exception edges per language (see control_flow.py)
+        """
+        lang_name = language_for_extension(language) or language
+        return build_cfg(function_node, code, lang_name, function_name)
 
-    def _create_cfg_from_blocks(self, cfg, basic_blocks, code, function_name):
-        """Create CFG nodes from basic blocks"""
-        if not basic_blocks:
-            return
-        
-        # Add entry node
-        cfg.add_node("entry", label=f"Entry\n{function_name}", type="entry")
-        
-        # Add basic block nodes
-        for i, block in enumerate(basic_blocks):
-            if block:
-                block_id = f"block_{i}"
-                block_label = self._create_block_label(block, code)
-                cfg.add_node(block_id, label=block_label, type="basic_block")
-        
-        # Connect blocks sequentially (simplified - you can enhance with proper control flow)
-        if basic_blocks:
-            first_block = "block_0"
-            cfg.add_edge("entry", first_block)
-            
-            for i in range(len(basic_blocks) - 1):
-                if basic_blocks[i]:
-                    cfg.add_edge(f"block_{i}", f"block_{i+1}")
-        
-        # Add exit node
-        cfg.add_node("exit", label="Exit", type="exit")
-        if basic_blocks:
-            last_block = f"block_{len(basic_blocks)-1}"
-            cfg.add_edge(last_block, "exit")
+    def flow_to_networkx(self, flow):
+        """networkx form of a ControlFlowGraph, with the function name on the entry"""
+        cfg = flow.to_networkx()
+        cfg.nodes["entry"]["label"] = f"Entry\n{flow.name}"
+        return cfg
 
-    def _create_block_label(self, block, code):
-        """Create label for a basic block"""
-        lines = []
-        for node in block:
-            if node:
-                text = self.get_node_text(node, code)
-                # Clean and truncate
-                text = ' '.join(text.split())[:30] + "..." if len(text) > 30 else text
-                lines.append(text)
-        return "\n".join(lines) if lines else "Empty Block"
+    def build_cfg_for_function(self, function_node, code, function_name, language):
+        """Statement-level CFG of one function as a networkx graph"""
+        return self.flow_to_networkx(
+            self.build_flow_graph(function_node, code, function_name, language))
 
     def visualize_cfg(self, cfg, function_name, output_file=None):
         """Visualize a single CFG"""
@@ -307,6 +209,7 @@ def generate_cfgs_from_ir_fixed(ir_file='ir_output.json', output_dir='cfgs'):
     all_cfgs = {}
     
     print("🔧 Generating Control Flow Graphs...")
+    progress = ProgressLog()
     
     for file_ir in ir_data:
         filename = file_ir['file_name']
@@ -336,7 +239,8 @@ def generate_cfgs_from_ir_fixed(ir_file='ir_output.json', output_dir='cfgs'):
         
         # Generate CFG for each function
         for func_type, func_name, func_node in functions:
-            print(f"    🔹 Generating CFG for {func_type}: {func_name}")
+            if progress.ready():
+                print(f"    🔹 Generating CFG for {func_type}: {func_name}")
             
             try:
                 cfg = cfg_generator.build_cfg_for_function(
@@ -356,6 +260,7 @@ def generate_cfgs_from_ir_fixed(ir_file='ir_output.json', output_dir='cfgs'):
                     print(f"    ⚠️  Empty CFG for {func_name}")
                     
             except Exception as e:
+                count("errors_total", stage="cfg")
                 print(f"    ❌ Error generating CFG for {func_name}: {str(e)}")
     
     print(f"\n✅ Generated {len(all_cfgs)} CFGs in '{output_dir}' directory")
@@ -368,15 +273,6 @@ def generate_cfgs_from_ir_fixed(ir_file='ir_output.json', output_dir='cfgs'):
 def debug_ast_structure(ir_file='ir_output.json'):
     """Debug AST structure to understand node types"""
     import os
-    from tree_sitter import Parser, Language
-    
-    MY_LANG = 'build/my-languages.so'
-    LANGUAGES = {
-        'java': Language(MY_LANG, 'java'),
-        'js': Language(MY_LANG, 'javascript'),
-        'c': Language(MY_LANG, 'c'),
-        'py': Language(MY_LANG, 'python'),
-    }
     
     parser = Parser()
     
@@ -390,11 +286,12 @@ def debug_ast_structure(ir_file='ir_output.json'):
         
         print(f"\n🔍 Debugging {filename} ({file_ext}):")
         
-        if file_ext not in LANGUAGES:
+        lang_name = language_for_extension(file_ext)
+        if not lang_name:
             print("    ❌ Unsupported language")
             continue
         
-        parser.set_language(LANGUAGES[file_ext])
+        parser.set_language(get_language(lang_name))
         
         try:
             with open(file_path, 'rb') as f:
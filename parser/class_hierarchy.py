@@ -0,0 +1,246 @@
+"""
+Class-hierarchy index over file summaries, for method-call resolution.
+
+Every class gets its superclasses and interfaces (resolved to class ids,
+preferring a class of that name in the same file), its subclasses and a
+method table. Building the index is one pass over the classes plus one
+dictionary lookup per base name.
+
+Calls resolve with class-hierarchy-analysis precision from the call site's
+receiver (see symbols.py):
+
+- self/this/cls: the method the enclosing class inherits or defines,
+  plus the overrides in its subclasses
+- super: the method inherited from the superclasses, without overrides
+- a class name: that class's method (a static or class method call)
+- a parameter whose type names a class: as for self, from that class
+- a plain call: a function of that name (same file first), then a method
+  of the enclosing class, then a class's constructor; in Java, where
+  such calls have an implicit this, the enclosing class comes first
+- anything else: every method and function with that name
+
+Method lookup and dispatch sets are memoized per (class, name), so after
+the first call site on a class, resolving a call is a few dictionary
+lookups. Method lookup goes depth-first, left to right through the bases,
+which agrees with Python's C3 order except in diamond hierarchies.
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Receivers that refer to the enclosing class's instance or the class itself
+SELF_RECEIVERS = frozenset({"self", "this", "cls"})
+SUPER = "super"
+
+# Receiver of a call made on an expression of unknown type
+UNKNOWN = ""
+
+CONSTRUCTOR_NAMES = ("__init__", "constructor")
+
+# Languages whose plain calls inside a method call methods of `this`
+IMPLICIT_THIS_LANGUAGES = frozenset({"java"})
+
+EXTENDS = "extends"
+IMPLEMENTS = "implements"
+
+_IDENTIFIER = re.compile(r"[A-Za-z_$][\w$]*")
+
+
+def call_sites(func: Dict[str, Any]) -> List[Dict[str, Optional[str]]]:
+    """A function's call sites; summaries without them get receivers of unknown type."""
+    sites = func.get("call_sites")
+    if sites is None:
+        sites = [{"name": name, "receiver": UNKNOWN} for name in func.get("calls", [])]
+    return sites
+
+
+class ClassHierarchy:
+    """Superclasses, subclasses and method tables of the classes in `summaries`."""
+
+    def __init__(self, summaries: Iterable[Dict[str, Any]]):
+        self.names: Dict[str, str] = {}                    # class id -> name
+        self.files: Dict[str, str] = {}                    # class or function id -> file
+        self.methods: Dict[str, Dict[str, str]] = {}       # class id -> {name: method id}
+        self.bases: Dict[str, List[Tuple[str, str]]] = {}  # class id -> [(base name, kind)]
+        self.owner: Dict[str, str] = {}                    # method id -> class id
+        self.parameter_types: Dict[str, Dict[str, str]] = {}   # function id -> {param: type}
+        self.classes_by_name: Dict[str, List[str]] = {}
+        self.functions_by_name: Dict[str, List[str]] = {}
+        self.declarers: Dict[str, List[str]] = {}          # method name -> method ids
+        self.implicit_this = set()                         # files of IMPLICIT_THIS_LANGUAGES
+
+        for summary in summaries:
+            path = summary.get("file_path") or summary.get("file_name")
+            if summary.get("language") in IMPLICIT_THIS_LANGUAGES:
+                self.implicit_this.add(path)
+            for func in summary.get("functions", []):
+                self._add_function(func, path)
+                self.functions_by_name.setdefault(func["name"], []).append(func["id"])
+            for cls in summary.get("classes", []):
+                cid = cls["id"]
+                self.names[cid] = cls["name"]
+                self.files[cid] = path
+                self.classes_by_name.setdefault(cls["name"], []).append(cid)
+                superclasses = cls.get("superclasses")
+                if superclasses is None:
+                    superclasses = [cls["superclass"]] if cls.get("superclass") else []
+                self.bases[cid] = [(name, EXTENDS) for name in superclasses] + \
+                                  [(name, IMPLEMENTS) for name in cls.get("interfaces", [])]
+                table = self.methods[cid] = {}
+                for method in cls.get("methods", []):
+                    self._add_function(method, path)
+                    self.owner[method["id"]] = cid
+                    # Overloads share a name; the first one stands for all of them
+                    table.setdefault(method["name"], method["id"])
+                    self.declarers.setdefault(method["name"], []).append(method["id"])
+
+        self.parents: Dict[str, List[str]] = {}
+        self.children: Dict[str, List[str]] = {cid: [] for cid in self.names}
+        self.external_children: Dict[str, List[str]] = {}   # unresolved base name -> class ids
+        for cid, bases in self.bases.items():
+            parents = self.parents[cid] = []
+            for name, _ in bases:
+                resolved = self._classes_named(name, self.files[cid])
+                if not resolved:
+                    self.external_children.setdefault(name, []).append(cid)
+                for parent in resolved:
+                    if parent != cid and parent not in parents:
+                        parents.append(parent)
+                        self.children[parent].append(cid)
+
+        self._mros: Dict[str, Tuple[str, ...]] = {}
+        self._lookups: Dict[Tuple[str, str], Optional[str]] = {}
+        self._dispatch: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+        self._subclasses: Dict[str, Tuple[str, ...]] = {}
+
+    def _add_function(self, func: Dict[str, Any], path: str) -> None:
+        self.files[func["id"]] = path
+        types = {p["name"]: p["type"] for p in func.get("parameters", [])
+                 if p.get("name") and p.get("type")}
+        if types:
+            self.parameter_types[func["id"]] = types
+
+    def _classes_named(self, name: str, path: Optional[str]) -> List[str]:
+        candidates = self.classes_by_name.get(name, [])
+        local = [cid for cid in candidates if self.files[cid] == path]
+        return local or candidates
+
+    def bases_of(self, cid: str) -> List[Tuple[Optional[str], str, str]]:
+        """(base class id or None if outside the index, base name, extends/implements)."""
+        found = []
+        for name, kind in self.bases.get(cid, ()):
+            resolved = [p for p in self._classes_named(name, self.files[cid]) if p != cid]
+            found.extend((parent, name, kind) for parent in resolved or [None])
+        return found
+
+    def inheritance(self) -> List[Tuple[str, Optional[str], str, str]]:
+        """(class id, base class id or None, base name, kind) for every class."""
+        return [(cid, *base) for cid in self.bases for base in self.bases_of(cid)]
+
+    def mro(self, cid: str) -> Tuple[str, ...]:
+        """The class and its ancestors in method lookup order."""
+        found = self._mros.get(cid)
+        if found is None:
+            order, seen = [], set()
+            stack = [cid]
+            while stack:
+                current = stack.pop()
+                if current in seen:
+                    continue
+                seen.add(current)
+                order.append(current)
+                stack.extend(reversed(self.parents.get(current, ())))
+            found = self._mros[cid] = tuple(order)
+        return found
+
+    def lookup(self, cid: str, name: str) -> Optional[str]:
+        """The method `name` an instance of `cid` runs: its own or the nearest inherited one."""
+        key = (cid, name)
+        if key not in self._lookups:
+            self._lookups[key] = next((self.methods[c][name] for c in self.mro(cid)
+                                       if name in self.methods.get(c, {})), None)
+        return self._lookups[key]
+
+    def subclasses(self, cid: str) -> Tuple[str, ...]:
+        """Transitive subclasses of `cid`."""
+        found = self._subclasses.get(cid)
+        if found is None:
+            seen = {cid}
+            stack = list(self.children.get(cid, ()))
+            order = []
+            while stack:
+                current = stack.pop()
+                if current in seen:
+                    continue
+                seen.add(current)
+                order.append(current)
+                stack.extend(self.children.get(current, ()))
+            found = self._subclasses[cid] = tuple(order)
+        return found
+
+    def dispatch(self, cid: str, name: str) -> Tuple[str, ...]:
+        """Methods a virtual call of `name` on a `cid`-typed receiver can reach."""
+        key = (cid, name)
+        found = self._dispatch.get(key)
+        if found is None:
+            targets = []
+            inherited = self.lookup(cid, name)
+            if inherited is not None:
+                targets.append(inherited)
+            for sub in self.subclasses(cid):
+                method = self.methods[sub].get(name)
+                if method is not None and method not in targets:
+                    targets.append(method)
+            found = self._dispatch[key] = tuple(targets)
+        return found
+
+    def _dispatch_type(self, type_name: str, name: str, path: Optional[str]) -> List[str]:
+        """Targets of `name` on a receiver typed `type_name` (a class or an interface outside the index)."""
+        targets: List[str] = []
+        for cid in self._classes_named(type_name, path):
+            targets.extend(self.dispatch(cid, name))
+        for cid in self.external_children.get(type_name, ()):
+            targets.extend(self.dispatch(cid, name))
+        return list(dict.fromkeys(targets))
+
+    def resolve(self, function: str, name: str, receiver: Optional[str] = None) -> List[str]:
+        """
+        Ids of the functions and methods a call of `name` on `receiver`
+        (None for a plain call, see symbols._receiver) made in `function`
+        can reach; empty when it leaves the index.
+        """
+        path = self.files.get(function)
+        owner = self.owner.get(function)
+        if receiver is None:
+            if owner is not None and path in self.implicit_this and self.dispatch(owner, name):
+                return list(self.dispatch(owner, name))
+            functions = self.functions_by_name.get(name, [])
+            local = [f for f in functions if self.files[f] == path]
+            if local or functions:
+                return local or list(functions)
+            if owner is not None and self.dispatch(owner, name):
+                return list(self.dispatch(owner, name))
+            constructors = [self.lookup(cid, constructor) for cid in self._classes_named(name, path)
+                            for constructor in CONSTRUCTOR_NAMES]
+            return [c for c in constructors if c is not None]
+        if receiver in SELF_RECEIVERS and owner is not None:
+            return list(self.dispatch(owner, name))
+        if receiver == SUPER and owner is not None:
+            inherited = (self.lookup(parent, name) for parent in self.parents.get(owner, ()))
+            return list(dict.fromkeys(m for m in inherited if m is not None))
+        if receiver in self.classes_by_name:
+            found = (self.lookup(cid, name) for cid in self._classes_named(receiver, path))
+            return list(dict.fromkeys(m for m in found if m is not None))
+        declared = self.parameter_types.get(function, {}).get(receiver)
+        if declared:
+            targets = []
+            for type_name in _IDENTIFIER.findall(declared):
+                targets.extend(self._dispatch_type(type_name, name, path))
+            if targets:
+                return list(dict.fromkeys(targets))
+        return self.declarers.get(name, []) + self.functions_by_name.get(name, [])
+
+    def resolve_calls(self, func: Dict[str, Any]) -> List[Tuple[str, List[str]]]:
+        """(called name, target ids) for each call site of a summarised function."""
+        return [(site["name"], self.resolve(func["id"], site["name"], site.get("receiver")))
+                for site in call_sites(func)]
@@ -0,0 +1,200 @@
+"""
+Clone detection over function syntax trees.
+
+symbols.py walks each function's tree once and passes its nodes in
+pre-order to `fingerprint`, each as a token id (see `shape`). Identifiers
+become ID and literals LIT, so functions that only differ in names and
+constants get the same sequence. Other nodes are their type and child
+count, which makes the pre-order sequence determine the tree. The
+fingerprint is:
+
+- a hash of the whole sequence, equal for exact (renamed) clones
+- a MinHash signature of its SHINGLE_SIZE-grams, whose agreement between
+  two functions estimates the Jaccard similarity of their n-gram sets
+
+`find_clones` groups exact clones by hash and finds near-miss clones
+among one representative per hash with locality-sensitive hashing. The
+signature is cut into BANDS bands, and functions sharing any band land in
+a bucket together. Each bucket member is checked against the bucket's
+first member and its neighbour in the bucket, so the work stays linear in
+the number of functions even for large buckets. Pairs that agree on at
+least MIN_SIMILARITY of the signature are linked, and connected
+components become clone groups.
+
+The groups are linked into the HPG (hpg.py) and stored in the snapshot
+database (graph_db.py).
+"""
+
+import base64
+import binascii
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from lazy_imports import lazy_import
+from telemetry import count, span
+
+np = lazy_import("numpy")
+sparse = lazy_import("scipy.sparse")
+csgraph = lazy_import("scipy.sparse.csgraph")
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 4
+
+# Functions with fewer normalized nodes are too small to report as clones
+MIN_NODES = 60
+
+# Least estimated Jaccard similarity of a near-miss clone pair
+MIN_SIMILARITY = 0.8
+
+IDENTIFIER = "ID"
+LITERAL = "LIT"
+
+# Literal nodes are one LIT token; their children (quotes, escapes...) are skipped
+LITERAL_NODE_TYPES = frozenset({
+    "string", "string_literal", "raw_string_literal", "char_literal", "concatenated_string",
+    "template_string", "integer", "float", "number", "number_literal", "decimal_integer_literal",
+    "hex_integer_literal", "decimal_floating_point_literal", "true", "false", "none", "null",
+    "undefined", "character_literal", "regex",
+})
+
+_MASK32 = 0xFFFFFFFF
+_perms: Optional[Tuple[Any, Any]] = None
+_shapes: Dict[Tuple[str, int], Tuple[int, bool]] = {}
+
+
+def shape(node_type: str, children: int) -> Tuple[int, bool]:
+    """
+    (token id, whether its subtree collapses into it) of a node with
+    `children` children: ID for identifiers, LIT for literals, else the
+    type and child count.
+    """
+    key = (node_type, children)
+    found = _shapes.get(key)
+    if found is None:
+        if node_type.endswith("identifier"):
+            token, collapsed = IDENTIFIER, True
+        elif node_type in LITERAL_NODE_TYPES:
+            token, collapsed = LITERAL, True
+        else:
+            token, collapsed = f"{node_type}/{children}", False
+        digest = hashlib.blake2b(token.encode(), digest_size=4).digest()
+        found = _shapes[key] = (int.from_bytes(digest, "little"), collapsed)
+    return found
+
+
+def _permutations() -> Tuple[Any, Any]:
+    """
+    (a, b) of the NUM_PERM multiply-shift hash functions (a * x + b) mod
+    2^64 >> 32, fixed across runs.
+    """
+    global _perms
+    if _perms is None:
+        rng = np.random.default_rng(0x5EED)
+        _perms = (rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64)[:, None] * np.uint64(2) + np.uint64(1),
+                  rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64)[:, None])
+    return _perms
+
+
+def fingerprint(tokens: Sequence[int]) -> Optional[Dict[str, Any]]:
+    """
+    Exact hash and MinHash signature (base64 of NUM_PERM uint32) of a
+    function's pre-order token ids (see `shape`); None below MIN_NODES.
+    """
+    if len(tokens) < MIN_NODES:
+        return None
+    ids = np.array(tokens, dtype=np.uint64)
+    digest = hashlib.blake2b(ids.tobytes(), digest_size=16).hexdigest()
+    n = len(ids) - SHINGLE_SIZE + 1
+    shingles = np.zeros(n, dtype=np.uint64)
+    for offset in range(SHINGLE_SIZE):
+        shingles = (shingles * np.uint64(0x9E3779B1) + ids[offset:offset + n]) & np.uint64(_MASK32)
+    a, b = _permutations()
+    values = (a * np.unique(shingles)[None, :] + b) >> np.uint64(32)
+    signature = values.min(axis=1).astype("<u4")
+    return {"hash": digest, "minhash": base64.b64encode(signature.tobytes()).decode("ascii"),
+            "nodes": len(tokens)}
+
+
+def function_fingerprints(summaries: Iterable[Dict[str, Any]]) -> Iterable[Tuple[str, Dict[str, Any]]]:
+    """(function id, fingerprint) of every fingerprinted function and method in file summaries."""
+    for summary in summaries:
+        functions = summary.get("functions", []) + [m for c in summary.get("classes", [])
+                                                    for m in c.get("methods", [])]
+        for func in functions:
+            if func.get("fingerprint"):
+                yield func["id"], func["fingerprint"]
+
+
+def find_clones(fingerprints: Iterable[Tuple[str, Dict[str, Any]]],
+                min_similarity: float = MIN_SIMILARITY) -> List[Dict[str, Any]]:
+    """
+    Clone groups among (function key, fingerprint) pairs, largest first:
+    {kind: "exact" or "near", similarity, functions}. `similarity` is the
+    least estimated similarity of the pairs that link a near group.
+    """
+    by_hash: Dict[str, List[str]] = {}
+    signatures = []
+    for key, fp in fingerprints:
+        members = by_hash.get(fp["hash"])
+        if members is None:
+            members = by_hash[fp["hash"]] = []
+            signatures.append(binascii.a2b_base64(fp["minhash"]))
+        members.append(key)
+    exact = list(by_hash.values())
+    n = len(exact)
+    if n == 0:
+        return []
+
+    with span("clones", part="lsh"):
+        matrix = np.frombuffer(b"".join(signatures), dtype="<u4").reshape(n, NUM_PERM).astype(np.uint64)
+        weights = np.random.default_rng(0).integers(1, 1 << 62, ROWS, dtype=np.uint64)
+        pairs = []
+        for band in range(BANDS):
+            keys = matrix[:, band * ROWS:(band + 1) * ROWS] @ weights   # wraps mod 2^64
+            order = np.argsort(keys, kind="stable")
+            sorted_keys = keys[order]
+            same = sorted_keys[1:] == sorted_keys[:-1]
+            if not same.any():
+                continue
+            # Start index of each member's bucket, in sorted order
+            starts = np.maximum.accumulate(np.where(np.r_[True, ~same], np.arange(n), 0))
+            members = np.flatnonzero(np.r_[False, same])
+            pairs.append(np.stack([order[members], order[starts[members]]], axis=1))
+            pairs.append(np.stack([order[members], order[members - 1]], axis=1))
+        if pairs:
+            candidates = np.unique(np.sort(np.vstack(pairs), axis=1), axis=0)
+            similarity = (matrix[candidates[:, 0]] == matrix[candidates[:, 1]]).mean(axis=1)
+            similar = similarity >= min_similarity
+            linked, similarity = candidates[similar], similarity[similar]
+            count("clone_candidates_total", len(candidates))
+        else:
+            linked, similarity = np.zeros((0, 2), dtype=np.int64), np.zeros(0)
+
+    graph = sparse.coo_matrix((np.ones(len(linked)), (linked[:, 0], linked[:, 1])), shape=(n, n))
+    _, labels = csgraph.connected_components(graph, directed=False)
+    least = np.ones(n)
+    np.minimum.at(least, labels[linked[:, 0]], similarity)
+    # Only components of several hashes, or of one hash shared by several functions, are groups
+    sizes = np.bincount(labels)
+    components: Dict[int, List[int]] = {}
+    for i in np.flatnonzero(sizes[labels] > 1).tolist() + [i for i, keys in enumerate(exact) if len(keys) > 1]:
+        components.setdefault(int(labels[i]), []).append(i)
+
+    groups = []
+    for label, reps in components.items():
+        reps = sorted(set(reps))
+        functions = sorted(key for i in reps for key in exact[i])
+        near = len(reps) > 1
+        groups.append({"kind": "near" if near else "exact",
+                       "similarity": round(float(least[label]), 3) if near else 1.0,
+                       "functions": functions})
+    groups.sort(key=lambda g: (-len(g["functions"]), g["functions"][0]))
+    count("clone_groups_total", len(groups))
+    return groups
+
+
+def clone_groups(summaries: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Clone groups of the functions in file summaries (see find_clones)."""
+    return find_clones(function_fingerprints(summaries))
@@ -0,0 +1,536 @@
+"""
+Statement-level control flow graphs built from tree-sitter syntax trees.
+
+Every simple statement is one node; if/elif/else, loops (including
+do-while and loop-else), switch/match, try/catch/finally, with blocks,
+break/continue (labelled too), return/throw and C goto become branch and
+jump edges. Node 0 is the entry and node 1 the exit. Edges carry the
+types the graph builders already use: sequential, conditional_true,
+conditional_false, loop_back, and exception (from a try to its handlers;
+any statement of the try body may raise, so the handlers hang off the try
+itself).
+
+return, raise, break and continue inside a try with a finally block run the
+finally block before they reach their destination. Every path goes through
+the one finally block, which ends in a FINALLY node that branches to each
+destination (conditional_false for normal flow, conditional_true for the
+others). The abrupt exits define the node's pseudo-variable "<finally:N>",
+which the node uses, so what runs after the try depends on the jumps.
+
+Statement sequences and else-if chains are walked iteratively, so only
+block nesting depth costs Python stack.
+"""
+
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from dominators import control_dependences, immediate_dominators, immediate_post_dominators
+from languages import FUNCTION_NODE_TYPES, get_parser
+from lazy_imports import lazy_import
+
+nx = lazy_import("networkx")
+
+ENTRY, EXIT = 0, 1
+
+# Node types
+ENTRY_NODE = "entry"
+EXIT_NODE = "exit"
+STATEMENT = "statement"
+CONDITION = "condition"
+LOOP = "loop"
+FINALLY = "finally"
+
+# Edge types
+SEQUENTIAL = "sequential"
+CONDITIONAL_TRUE = "conditional_true"
+CONDITIONAL_FALSE = "conditional_false"
+LOOP_BACK = "loop_back"
+EXCEPTION = "exception"
+
+LABEL_CHARS = 60
+
+BLOCK_TYPES = frozenset({"block", "statement_block", "compound_statement"})
+LOOP_TYPES = frozenset({"while_statement", "for_statement", "for_in_statement",
+                        "enhanced_for_statement"})
+SWITCH_TYPES = frozenset({"switch_statement", "switch_expression", "match_statement"})
+TRY_TYPES = frozenset({"try_statement", "try_with_resources_statement"})
+RETURN_TYPES = frozenset({"return_statement", "throw_statement", "raise_statement"})
+HANDLER_TYPES = frozenset({"except_clause", "catch_clause"})
+SKIPPED_TYPES = frozenset({"comment", "line_comment", "block_comment", "empty_statement"})
+CASE_LABEL_TYPES = frozenset({"switch_label", "case_pattern"})
+ALWAYS_TRUE = frozenset({"true", "True", "1"})
+
+Frontier = List[Tuple[int, str]]   # (node, type of the edge to whatever comes next)
+
+
+class ControlFlowGraph:
+    """Statement-level CFG of one function."""
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.types: List[str] = [ENTRY_NODE, EXIT_NODE]
+        self.labels: List[str] = ["ENTRY", "EXIT"]
+        self.lines = array("l", [0, 0])
+        self.end_lines = array("l", [0, 0])
+        self.syntax: List[Any] = [None, None]    # tree-sitter node of each statement
+        self.edges: List[Tuple[int, int, str]] = []
+        self.code = b""                           # source the syntax nodes point into
+        self.function = None                      # syntax node of the function
+        self.implicit: Dict[int, Tuple[Set[str], Set[str]]] = {}   # node -> pseudo-variable (defs, uses)
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def add_node(self, node_type: str, label: str, syntax=None,
+                 line: int = 0, end_line: int = 0) -> int:
+        self.types.append(node_type)
+        self.labels.append(label)
+        self.lines.append(line)
+        self.end_lines.append(end_line)
+        self.syntax.append(syntax)
+        return len(self.types) - 1
+
+    def add_edge(self, u: int, v: int, edge_type: str = SEQUENTIAL) -> None:
+        self.edges.append((u, v, edge_type))
+
+    def _pairs(self) -> List[Tuple[int, int]]:
+        return [(u, v) for u, v, _ in self.edges]
+
+    def immediate_dominators(self) -> array:
+        return immediate_dominators(len(self), self._pairs(), ENTRY)
+
+    def immediate_post_dominators(self) -> array:
+        return immediate_post_dominators(len(self), self._pairs(), EXIT)
+
+    def control_dependences(self) -> List[Tuple[int, int, str]]:
+        """(controller, dependent, branch edge type); top-level statements depend on the entry."""
+        return [(a, b, self.edges[k][2])
+                for a, b, k in control_dependences(len(self), self._pairs(), ENTRY, EXIT)]
+
+    def node_id(self, i: int, prefix: str = "") -> str:
+        if i == ENTRY:
+            return f"{prefix}entry"
+        if i == EXIT:
+            return f"{prefix}exit"
+        return f"{prefix}stmt_{i - 2}"
+
+    def to_networkx(self, prefix: str = "") -> "nx.DiGraph":
+        """DiGraph with nodes '<prefix>entry', '<prefix>exit' and '<prefix>stmt_<i>'."""
+        graph = nx.DiGraph()
+        for i, node_type in enumerate(self.types):
+            attrs = {"type": node_type, "label": self.labels[i]}
+            if self.syntax[i] is not None:
+                attrs.update(line=self.lines[i], end_line=self.end_lines[i],
+                             ast=self.syntax[i].type)
+            graph.add_node(self.node_id(i, prefix), **attrs)
+        for u, v, edge_type in self.edges:
+            graph.add_edge(self.node_id(u, prefix), self.node_id(v, prefix), type=edge_type)
+        return graph
+
+
+class _Target:
+    """An enclosing statement that break (and, for loops, continue) can jump to."""
+    __slots__ = ("labels", "is_loop", "breaks", "continues")
+
+    def __init__(self, labels: Sequence[str], is_loop: bool):
+        self.labels = labels
+        self.is_loop = is_loop
+        self.breaks: Frontier = []
+        self.continues: Frontier = []
+
+
+class _Finally:
+    """An enclosing try with a finally block, which abrupt exits pass through."""
+    __slots__ = ("pending",)
+
+    def __init__(self):
+        # (target or None for return/raise, is break) -> exits headed there
+        self.pending: Dict[Tuple[Optional[_Target], bool], Frontier] = {}
+
+
+def _named(node) -> List[Any]:
+    return [c for c in node.named_children if c.type not in SKIPPED_TYPES]
+
+
+def _clause_body(node):
+    """Body of a clause: its 'body' field, else its last block child."""
+    body = node.child_by_field_name("body")
+    if body is not None:
+        return body
+    blocks = [c for c in node.named_children if c.type in BLOCK_TYPES]
+    return blocks[-1] if blocks else None
+
+
+def _else_body(node):
+    if node.type != "else_clause":
+        return node
+    body = node.child_by_field_name("body")
+    if body is not None:
+        return body
+    children = _named(node)
+    return children[0] if children else None
+
+
+class _Builder:
+    def __init__(self, code: bytes, language: str, name: str, line_offset: int):
+        self.code = code
+        self.language = language
+        self.line_offset = line_offset
+        self.graph = ControlFlowGraph(name)
+        self.targets: List[Any] = []             # enclosing _Target and _Finally scopes
+        self.labels: Dict[str, int] = {}          # C labels -> node
+        self.gotos: List[Tuple[int, str]] = []
+
+    def text(self, node) -> str:
+        return self.code[node.start_byte:node.end_byte].decode("utf8", errors="replace")
+
+    def label(self, node) -> str:
+        """First line of a node's source, truncated (decodes only a prefix of big nodes)."""
+        start = node.start_byte
+        head = self.code[start:min(node.end_byte, start + 4 * LABEL_CHARS)]
+        line = head.split(b"\n", 1)[0].decode("utf8", errors="replace").strip()
+        return line if len(line) <= LABEL_CHARS else line[:LABEL_CHARS - 3] + "..."
+
+    def add(self, node, node_type: str = STATEMENT, label: Optional[str] = None) -> int:
+        return self.graph.add_node(node_type, label if label is not None else self.label(node), node,
+                                   node.start_point[0] + 1 + self.line_offset,
+                                   node.end_point[0] + 1 + self.line_offset)
+
+    def connect(self, frontier: Frontier, target: int, edge_type: Optional[str] = None) -> None:
+        for node, pending in frontier:
+            self.graph.add_edge(node, target, edge_type or pending)
+
+    def always_true(self, node) -> bool:
+        if node.type == "for_statement" and node.child_by_field_name("right") is None:
+            cond = node.child_by_field_name("condition")
+            return cond is None or cond.type == "empty_statement"
+        if node.type in ("while_statement", "do_statement"):
+            cond = node.child_by_field_name("condition")
+            return cond is not None and self.text(cond).strip("() \t;") in ALWAYS_TRUE
+        return False
+
+    def sequence(self, statements, frontier: Frontier) -> Frontier:
+        for statement in statements:
+            frontier = self.statement(statement, frontier)
+        return frontier
+
+    def statement(self, node, frontier: Frontier, labels: Sequence[str] = ()) -> Frontier:
+        if node is None or not node.is_named or node.type in SKIPPED_TYPES:
+            return frontier
+        kind = node.type
+        if kind in BLOCK_TYPES:
+            return self.sequence(_named(node), frontier)
+        if kind == "if_statement":
+            return self.if_statement(node, frontier)
+        if kind in LOOP_TYPES:
+            return self.loop(node, frontier, labels)
+        if kind == "do_statement":
+            return self.do_loop(node, frontier, labels)
+        if kind in SWITCH_TYPES:
+            return self.switch(node, frontier, labels)
+        if kind in TRY_TYPES:
+            return self.try_statement(node, frontier)
+        if kind == "labeled_statement":
+            return self.labeled(node, frontier)
+        if kind in ("with_statement", "synchronized_statement"):
+            header = self.add(node)
+            self.connect(frontier, header)
+            return self.statement(node.child_by_field_name("body"), [(header, SEQUENTIAL)])
+
+        current = self.add(node)
+        self.connect(frontier, current)
+        if kind in RETURN_TYPES:
+            self.leave([(current, SEQUENTIAL)])
+            return []
+        if kind in ("break_statement", "continue_statement"):
+            return self.jump(node, current)
+        if kind == "goto_statement":
+            label = node.child_by_field_name("label")
+            self.gotos.append((current, self.text(label) if label is not None else ""))
+            return []
+        return [(current, SEQUENTIAL)]
+
+    def if_statement(self, node, frontier: Frontier) -> Frontier:
+        # Flatten elif clauses and else-if chains so they cost no recursion
+        clauses = []
+        else_body = None
+        current = node
+        while current is not None:
+            clauses.append(current)
+            following = None
+            for alternative in current.children_by_field_name("alternative"):
+                if alternative.type == "elif_clause":
+                    clauses.append(alternative)
+                    continue
+                body = _else_body(alternative)
+                if body is not None and body.type == "if_statement":
+                    following = body
+                else:
+                    else_body = body
+            current = following
+        out: Frontier = []
+        for clause in clauses:
+            cond = self.add(clause, CONDITION)
+            self.connect(frontier, cond)
+            out.extend(self.statement(clause.child_by_field_name("consequence"),
+                                      [(cond, CONDITIONAL_TRUE)]))
+            frontier = [(cond, CONDITIONAL_FALSE)]
+        return out + self.statement(else_body, frontier)
+
+    def loop(self, node, frontier: Frontier, labels: Sequence[str]) -> Frontier:
+        head = self.add(node, LOOP)
+        self.connect(frontier, head)
+        target = _Target(labels, True)
+        self.targets.append(target)
+        end = self.statement(node.child_by_field_name("body"), [(head, CONDITIONAL_TRUE)])
+        self.targets.pop()
+        self.connect([(n, LOOP_BACK if t == SEQUENTIAL else t) for n, t in end], head)
+        self.connect([(n, LOOP_BACK if t == SEQUENTIAL else t) for n, t in target.continues], head)
+        out: Frontier = [] if self.always_true(node) else [(head, CONDITIONAL_FALSE)]
+        alternative = node.child_by_field_name("alternative")    # Python loop-else
+        if alternative is not None:
+            out = self.statement(_else_body(alternative), out)
+        return out + target.breaks
+
+    def do_loop(self, node, frontier: Frontier, labels: Sequence[str]) -> Frontier:
+        first = len(self.graph)
+        target = _Target(labels, True)
+        self.targets.append(target)
+        end = self.statement(node.child_by_field_name("body"), frontier)
+        self.targets.pop()
+        condition = node.child_by_field_name("condition")
+        cond = self.add(node, LOOP, "do ... while " + self.label(condition)
+                        if condition is not None else None)
+        self.connect(end, cond)
+        self.connect(target.continues, cond)
+        self.graph.add_edge(cond, first, LOOP_BACK)
+        out: Frontier = [] if self.always_true(node) else [(cond, CONDITIONAL_FALSE)]
+        return out + target.breaks
+
+    def cases(self, node):
+        """(case node, is default, statements, falls through) of each case of a switch/match."""
+        body = node.child_by_field_name("body")
+        for case in _named(body) if body is not None else ():
+            value = case.child_by_field_name("value")
+            case_labels = [c for c in case.named_children if c.type in CASE_LABEL_TYPES]
+            if case.type == "switch_default":
+                is_default = True
+            elif case.type == "case_statement":
+                is_default = value is None
+            elif case_labels:
+                is_default = self.text(case_labels[0]).strip() in ("default", "_")
+            else:
+                is_default = False
+            statements = case.children_by_field_name("body")
+            consequence = case.child_by_field_name("consequence")
+            if consequence is not None:
+                statements = [consequence]
+            elif not statements:
+                # Node comparison with None is always False, so test identity first
+                statements = [c for c in _named(case) if c.type not in CASE_LABEL_TYPES
+                              and (value is None or c != value)]
+            yield case, is_default, statements, case.type not in ("switch_rule", "case_clause")
+
+    def switch(self, node, frontier: Frontier, labels: Sequence[str]) -> Frontier:
+        head = self.add(node, CONDITION)
+        self.connect(frontier, head)
+        target = _Target(labels, False)
+        self.targets.append(target)
+        out: Frontier = []
+        fall: Frontier = []
+        has_default = False
+        for case, is_default, statements, falls_through in self.cases(node):
+            entry = self.add(case, STATEMENT)
+            has_default = has_default or is_default
+            self.graph.add_edge(head, entry, CONDITIONAL_FALSE if is_default else CONDITIONAL_TRUE)
+            self.connect(fall, entry)
+            end = self.sequence(statements, [(entry, SEQUENTIAL)])
+            if falls_through:
+                fall = end
+            else:
+                out.extend(end)
+        self.targets.pop()
+        if not has_default:
+            out.append((head, CONDITIONAL_FALSE))
+        return out + fall + target.breaks
+
+    def try_statement(self, node, frontier: Frontier) -> Frontier:
+        head = self.add(node, CONDITION)
+        self.connect(frontier, head)
+        handlers = [c for c in node.named_children if c.type in HANDLER_TYPES]
+        handler = node.child_by_field_name("handler")
+        if handler is not None and handler not in handlers:
+            handlers.append(handler)
+        finalizer = node.child_by_field_name("finalizer")
+        for child in node.named_children:
+            if child.type == "finally_clause":
+                finalizer = child
+        guard = _Finally() if finalizer is not None else None
+        if guard is not None:
+            self.targets.append(guard)
+        out = self.statement(node.child_by_field_name("body"), [(head, SEQUENTIAL)])
+        for child in node.named_children:
+            if child.type == "else_clause":         # Python try-else runs after a clean body
+                out = self.statement(_else_body(child), out)
+        for handler in handlers:
+            entry = self.add(handler, STATEMENT)
+            self.graph.add_edge(head, entry, EXCEPTION)
+            out.extend(self.statement(_clause_body(handler), [(entry, SEQUENTIAL)]))
+        if guard is None:
+            return out
+        self.targets.pop()
+        if not guard.pending:
+            return self.statement(_clause_body(finalizer), out)
+
+        flag = f"<finally:{head}>"
+        implicit = self.graph.implicit
+        implicit.setdefault(head, (set(), set()))[0].add(flag)
+        exits = []
+        for pending in guard.pending.values():
+            for n, _ in pending:
+                implicit.setdefault(n, (set(), set()))[0].add(flag)
+            exits.extend(pending)
+        end = self.statement(_clause_body(finalizer), out + exits)
+        if not end:
+            return []
+        dispatch = self.graph.add_node(FINALLY, "end of finally")
+        implicit.setdefault(dispatch, (set(), set()))[1].add(flag)
+        self.connect(end, dispatch)
+        for target, is_break in guard.pending:
+            self.leave([(dispatch, CONDITIONAL_TRUE)], target, is_break)
+        return [(dispatch, CONDITIONAL_FALSE)] if out else []
+
+    def labeled(self, node, frontier: Frontier) -> Frontier:
+        label = node.child_by_field_name("label")
+        children = _named(node)
+        if label is None and children:
+            label = children[0]
+        name = self.text(label) if label is not None else ""
+        body = node.child_by_field_name("body")
+        if body is None:
+            rest = [c for c in children if label is None or c != label]
+            body = rest[0] if rest else None
+        if self.language == "c":
+            # A goto target: keep a node for the label itself
+            current = self.add(node, STATEMENT, f"{name}:")
+            self.labels[name] = current
+            self.connect(frontier, current)
+            return self.statement(body, [(current, SEQUENTIAL)])
+        if body is not None and (body.type in LOOP_TYPES or body.type in SWITCH_TYPES
+                                 or body.type == "do_statement"):
+            return self.statement(body, frontier, (name,))
+        target = _Target((name,), False)
+        self.targets.append(target)
+        out = self.statement(body, frontier)
+        self.targets.pop()
+        return out + target.breaks
+
+    def jump(self, node, current: int) -> Frontier:
+        is_break = node.type == "break_statement"
+        label = node.child_by_field_name("label")
+        if label is None:
+            label = next((c for c in node.named_children if c.type == "identifier"), None)
+        name = self.text(label) if label is not None else None
+        for target in reversed(self.targets):
+            if isinstance(target, _Finally):
+                continue
+            if name is not None and name not in target.labels:
+                continue
+            if not is_break and not target.is_loop:
+                continue
+            self.leave([(current, SEQUENTIAL)], target, is_break)
+            return []
+        return [(current, SEQUENTIAL)]    # stray jump: keep the flow going
+
+    def leave(self, exits: Frontier, target: Optional[_Target] = None, is_break: bool = True) -> None:
+        """
+        Send abrupt exits to `target` (break or continue), or to the exit
+        for return/raise, or to the innermost finally block on the way.
+        """
+        for scope in reversed(self.targets):
+            if scope is target:
+                break
+            if isinstance(scope, _Finally):
+                scope.pending.setdefault((target, is_break), []).extend(exits)
+                return
+        if target is None:
+            self.connect(exits, EXIT)
+        elif is_break:
+            target.breaks.extend(exits)
+        else:
+            target.continues.extend(exits)
+
+    def build(self, function_node) -> ControlFlowGraph:
+        body = _clause_body(function_node)
+        graph = self.graph
+        graph.code = self.code
+        graph.function = function_node
+        if body is None:
+            frontier: Frontier = [(ENTRY, SEQUENTIAL)]
+        elif body.type in BLOCK_TYPES:
+            frontier = self.sequence(_named(body), [(ENTRY, SEQUENTIAL)])
+        else:
+            # Expression-bodied functions (arrow functions, lambdas)
+            frontier = [(self.add(body), SEQUENTIAL)]
+            graph.add_edge(ENTRY, frontier[0][0])
+        self.connect(frontier, EXIT)
+        for node, name in self.gotos:
+            graph.add_edge(node, self.labels.get(name, EXIT))
+        return graph
+
+
+def build_cfg(function_node, code: bytes, language: str, name: str = "",
+              line_offset: int = 0) -> ControlFlowGraph:
+    """CFG of the function whose tree-sitter node is `function_node` in `code`."""
+    return _Builder(code, language, name, line_offset).build(function_node)
+
+
+def _python_function_source(body: str) -> str:
+    """Re-indent a Python body whose first line lost its indentation under a stub def."""
+    lines = body.split("\n")
+    rest = [line for line in lines[1:] if line.strip()]
+    if not rest:
+        return "def _():\n    " + body
+    depth = min(len(line) - len(line.lstrip()) for line in rest)
+    # A compound first statement whose block is the least indented text
+    # sits one column left of it; otherwise it aligns with its siblings
+    header_first = lines[0].rstrip().endswith(":") and len(rest[0]) - len(rest[0].lstrip()) == depth
+    indent = depth + 1 if header_first else depth + 2
+    shifted = ["  " + line if line.strip() else line for line in lines[1:]]
+    return "\n".join(["def _():", " " * indent + lines[0]] + shifted)
+
+
+_STUBS = {
+    "javascript": ("function _() ", ""),
+    "typescript": ("function _() ", ""),
+    "java": ("class Stub { void stub() ", " }"),
+    "c": ("void _() ", ""),
+}
+
+
+def build_cfg_from_body(body: str, language: str, name: str = "",
+                        first_line: int = 1) -> ControlFlowGraph:
+    """
+    CFG of a function given only its body text (as stored in file
+    summaries); `first_line` is the line the body starts on.
+    """
+    if language == "python":
+        source = _python_function_source(body)
+        line_offset = first_line - 2
+    elif language in _STUBS:
+        prefix, suffix = _STUBS[language]
+        source = prefix + body + suffix
+        line_offset = first_line - 1
+    else:
+        raise ValueError(f"Unsupported language: {language}")
+    code = source.encode("utf8")
+    function_types = frozenset(FUNCTION_NODE_TYPES.get(language, ()))
+    stack = [get_parser(language).parse(code).root_node]
+    while stack:
+        node = stack.pop()
+        if node.type in function_types:
+            return build_cfg(node, code, language, name, line_offset)
+        stack.extend(reversed(node.children))
+    graph = ControlFlowGraph(name)
+    graph.add_edge(ENTRY, EXIT)
+    return graph
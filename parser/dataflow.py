@@ -0,0 +1,504 @@
+"""
+Reaching definitions and def -> use data dependences over control flow graphs.
+
+Definitions and uses of each CFG statement come from its syntax tree:
+assignments (chained, destructuring, augmented), declarations, walrus and
+update expressions, loop targets, with/except/catch bindings, imports,
+nested definitions, and the function's parameters (defined at the entry).
+Stores through an attribute, subscript or pointer (`o.f = v`, `a[i] = v`,
+`*p = v`) are weak definitions of the base variable: they reach later
+uses but kill nothing. Compound statements only count their header (the
+condition, loop target and iterable, case labels), since their bodies are
+statements of their own.
+
+Reaching definitions are solved by a worklist over Python int bitsets, one
+bit per definition, ordered by reverse postorder. Every use is then resolved
+against its statement's IN set in a single pass: a use of `x` depends on
+each definition in IN & defs_of[x].
+
+The names a statement calls, and the variables passed to each call, are
+collected on the same walk, so dependence graphs can link call sites to
+callees for interprocedural slicing and summaries.
+"""
+
+from heapq import heappop, heappush
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from languages import ALL_CALL_NODE_TYPES
+from reachability import csr
+from symbols import callee_name
+
+IDENTIFIER_TYPES = frozenset({"identifier", "shorthand_property_identifier",
+                              "shorthand_property_identifier_pattern"})
+
+# Nested scopes: their name is defined, their body is not this function's flow
+SCOPE_TYPES = frozenset({
+    "function_definition", "class_definition", "lambda", "function_declaration",
+    "generator_function_declaration", "function", "function_expression", "arrow_function",
+    "class_declaration", "class", "method_definition", "lambda_expression",
+    "local_class_declaration", "interface_declaration", "enum_declaration",
+})
+
+# Statements that read no variables (labels are names of their own)
+NO_USE_TYPES = frozenset({
+    "break_statement", "continue_statement", "goto_statement", "labeled_statement",
+    "global_statement", "nonlocal_statement", "pass_statement", "try_statement",
+    "switch_default",
+})
+
+# type -> (target field, value field)
+ASSIGNMENT_FIELDS = {
+    "assignment": ("left", "right"),
+    "augmented_assignment": ("left", "right"),
+    "assignment_expression": ("left", "right"),
+    "augmented_assignment_expression": ("left", "right"),
+    "named_expression": ("name", "value"),
+    "variable_declarator": ("name", "value"),
+    "init_declarator": ("declarator", "value"),
+    "resource": ("name", "value"),
+    "catch_formal_parameter": ("name", None),
+}
+
+# Fields that hold names rather than variable reads
+SKIP_FIELDS = {
+    "attribute": ("attribute",),
+    "field_access": ("field",),
+    "method_invocation": ("name",),
+    "keyword_argument": ("name",),
+    "for_in_clause": ("left",),
+    "local_variable_declaration": ("type",),
+    "cast_expression": ("type",),
+    "object_creation_expression": ("type",),
+}
+
+# Stores through these write into the base variable's value
+STORE_TYPES = frozenset({
+    "attribute", "subscript", "member_expression", "subscript_expression",
+    "field_access", "array_access", "field_expression", "pointer_expression",
+})
+BASE_FIELDS = ("object", "value", "argument", "array")
+
+# Pattern containers whose identifiers are all targets
+PATTERN_TYPES = frozenset({
+    "pattern_list", "tuple_pattern", "list_pattern", "tuple", "list", "expression_list",
+    "parenthesized_expression", "list_splat_pattern", "dictionary_splat_pattern",
+    "array_pattern", "object_pattern", "rest_pattern", "as_pattern_target",
+    "typed_parameter", "typed_default_parameter", "default_parameter",
+    "required_parameter", "optional_parameter", "formal_parameter", "spread_parameter",
+    "parameter_declaration", "variable_declarator", "pointer_declarator",
+    "array_declarator", "parenthesized_declarator", "reference_declarator",
+})
+TARGET_FIELDS = ("pattern", "name", "left", "declarator")
+
+# Compound statements: which fields form the statement's own header
+HEADER_FIELDS = {
+    "if_statement": ("condition",),
+    "elif_clause": ("condition",),
+    "while_statement": ("condition",),
+    "do_statement": ("condition",),
+    "switch_statement": ("value", "condition"),
+    "switch_expression": ("condition", "value"),
+    "match_statement": ("subject",),
+    "for_statement": ("initializer", "init", "condition", "update", "increment", "right"),
+    "for_in_statement": ("right",),
+    "enhanced_for_statement": ("value",),
+    "try_with_resources_statement": ("resources",),
+    "switch_case": ("value",),
+    "case_statement": ("value",),
+}
+LOOP_TARGET_FIELDS = {"for_statement": "left", "for_in_statement": "left",
+                      "enhanced_for_statement": "name"}
+CLAUSE_TYPES = frozenset({"with_statement", "synchronized_statement", "except_clause",
+                          "catch_clause"})
+CASE_TYPES = frozenset({"switch_block_statement_group", "switch_rule", "case_clause"})
+CASE_LABEL_TYPES = frozenset({"switch_label", "case_pattern"})
+BLOCK_TYPES = frozenset({"block", "statement_block", "compound_statement"})
+
+
+class _DefUse:
+    """Collects the definitions, weak definitions, uses and calls of one statement."""
+
+    def __init__(self, code: bytes):
+        self.code = code
+        self.defs: Set[str] = set()
+        self.weak: Set[str] = set()
+        self.uses: Set[str] = set()
+        self.calls: Set[str] = set()
+        self.arguments: List[Dict[str, Any]] = []
+
+    def text(self, node) -> str:
+        return self.code[node.start_byte:node.end_byte].decode("utf8", errors="replace")
+
+    def base(self, node):
+        while node is not None and node.type not in IDENTIFIER_TYPES:
+            node = next((node.child_by_field_name(f) for f in BASE_FIELDS
+                         if node.child_by_field_name(f) is not None), None)
+        return node
+
+    def target(self, node) -> None:
+        """Record `node` as an assignment target."""
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            kind = node.type
+            if kind in IDENTIFIER_TYPES:
+                self.defs.add(self.text(node))
+            elif kind in STORE_TYPES:
+                base = self.base(node)
+                if base is not None:
+                    self.weak.add(self.text(base))
+                self.scan(node)
+            elif kind == "pair_pattern":
+                value = node.child_by_field_name("value")
+                if value is not None:
+                    stack.append(value)
+            elif kind in ("assignment_pattern", "object_assignment_pattern"):
+                left = node.child_by_field_name("left")
+                right = node.child_by_field_name("right")
+                if left is not None:
+                    stack.append(left)
+                if right is not None:
+                    self.scan(right)
+            elif kind in PATTERN_TYPES:
+                field = next((node.child_by_field_name(f) for f in TARGET_FIELDS
+                              if node.child_by_field_name(f) is not None), None)
+                if field is not None:
+                    stack.append(field)
+                    value = node.child_by_field_name("value")
+                    if value is not None:
+                        self.scan(value)
+                else:
+                    stack.extend(c for c in node.named_children
+                                 if c.type in IDENTIFIER_TYPES or c.type in PATTERN_TYPES
+                                 or c.type in STORE_TYPES or c.type in (
+                                     "pair_pattern", "assignment_pattern",
+                                     "object_assignment_pattern"))
+            else:
+                self.scan(node)
+
+    def scan(self, node) -> None:
+        """Record the uses (and nested definitions) of an expression or statement."""
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            kind = node.type
+            if kind in IDENTIFIER_TYPES:
+                self.uses.add(self.text(node))
+                continue
+            if kind in SCOPE_TYPES:
+                name = node.child_by_field_name("name")
+                if name is not None and name.type in IDENTIFIER_TYPES:
+                    self.defs.add(self.text(name))
+                continue
+            if kind in NO_USE_TYPES:
+                continue
+            if kind in ALL_CALL_NODE_TYPES:
+                callee = callee_name(node, self.code)
+                if callee:
+                    self.calls.add(callee)
+                    self.arguments.append(self.call_arguments(node, callee))
+            fields = ASSIGNMENT_FIELDS.get(kind)
+            if fields is not None:
+                target = node.child_by_field_name(fields[0])
+                value = node.child_by_field_name(fields[1]) if fields[1] else None
+                # A bare annotation (`x: int`) declares nothing at run time
+                if target is not None and not (kind == "assignment" and value is None):
+                    operator = next((c.type for c in node.children
+                                     if not c.is_named and c.type.endswith("=")), "=")
+                    if "augmented" in kind or operator not in ("=", ":="):
+                        self.scan(target)
+                    self.target(target)
+                if value is not None:
+                    stack.append(value)
+                continue
+            if kind == "update_expression":
+                argument = node.child_by_field_name("argument") or \
+                    next(iter(node.named_children), None)
+                if argument is not None:
+                    self.scan(argument)
+                    self.target(argument)
+                continue
+            if kind == "as_pattern":
+                alias = node.child_by_field_name("alias")
+                if alias is not None:
+                    self.target(alias)
+                stack.extend(c for c in node.named_children if alias is None or c != alias)
+                continue
+            if kind == "declaration":
+                # C: bare declarators (`int x;`) define too
+                for declarator in node.children_by_field_name("declarator"):
+                    if declarator.type == "init_declarator":
+                        stack.append(declarator)
+                    else:
+                        self.target(declarator)
+                continue
+            if kind in ("import_statement", "import_from_statement"):
+                self.imports(node)
+                continue
+            skipped = SKIP_FIELDS.get(kind)
+            if skipped:
+                excluded = [node.child_by_field_name(f) for f in skipped]
+                excluded = [e for e in excluded if e is not None]
+                stack.extend(c for c in node.named_children if not any(c == e for e in excluded))
+            else:
+                stack.extend(node.named_children)
+
+    def variable(self, node) -> Optional[str]:
+        """The variable an argument passes (the base of `o.f` or `a[i]`), if any."""
+        base = self.base(node) if node is not None else None
+        return self.text(base) if base is not None else None
+
+    def call_arguments(self, node, callee: str) -> Dict[str, Any]:
+        """
+        {callee, receiver, args, keywords} with the variable each argument
+        passes; only method calls (`o.m()`) have a receiver.
+        """
+        target = node.child_by_field_name("function")
+        receiver = node.child_by_field_name("object")
+        if receiver is None and target is not None and target.type in STORE_TYPES:
+            receiver = next((target.child_by_field_name(f) for f in BASE_FIELDS
+                             if target.child_by_field_name(f) is not None), None)
+        args: List[Optional[str]] = []
+        keywords: Dict[str, Optional[str]] = {}
+        arguments = node.child_by_field_name("arguments")
+        for arg in arguments.named_children if arguments is not None else ():
+            if arg.type in ("comment", "line_comment", "block_comment"):
+                continue
+            if arg.type == "keyword_argument":
+                name = arg.child_by_field_name("name")
+                if name is not None:
+                    keywords[self.text(name)] = self.variable(arg.child_by_field_name("value"))
+            else:
+                args.append(self.variable(arg))
+        call: Dict[str, Any] = {"callee": callee, "args": args}
+        if receiver is not None:
+            call["receiver"] = self.variable(receiver)
+        if keywords:
+            call["keywords"] = keywords
+        return call
+
+    def imports(self, node) -> None:
+        """Python imports bind their alias, or the first component of the module path."""
+        for name in node.children_by_field_name("name"):
+            alias = name.child_by_field_name("alias") if name.type == "aliased_import" else None
+            if alias is not None:
+                self.defs.add(self.text(alias))
+            else:
+                if name.type == "aliased_import":
+                    name = name.child_by_field_name("name")
+                text = self.text(name)
+                self.defs.add(text if node.type == "import_from_statement" else text.split(".")[0])
+
+    def header(self, node) -> None:
+        """Record only the parts of a compound statement that its CFG node executes."""
+        kind = node.type
+        if kind in HEADER_FIELDS:
+            for field in HEADER_FIELDS[kind]:
+                child = node.child_by_field_name(field)
+                if child is not None:
+                    self.scan(child)
+            if kind in LOOP_TARGET_FIELDS:
+                loop_target = node.child_by_field_name(LOOP_TARGET_FIELDS[kind])
+                if loop_target is not None:
+                    self.target(loop_target)
+        elif kind in CLAUSE_TYPES:
+            body = node.child_by_field_name("body")
+            parameter = node.child_by_field_name("parameter")
+            for child in node.named_children:
+                if child.type in BLOCK_TYPES or (body is not None and child == body):
+                    continue
+                if parameter is not None and child == parameter:
+                    self.target(child)
+                else:
+                    self.scan(child)
+        elif kind in CASE_TYPES:
+            for child in node.named_children:
+                if child.type in CASE_LABEL_TYPES:
+                    self.scan(child)
+            guard = node.child_by_field_name("guard")
+            if guard is not None:
+                self.scan(guard)
+        else:
+            self.scan(node)
+
+    def parameters(self, function_node) -> None:
+        params = function_node.child_by_field_name("parameters") \
+            or function_node.child_by_field_name("parameter")
+        declarator = function_node.child_by_field_name("declarator")
+        while params is None and declarator is not None:
+            params = declarator.child_by_field_name("parameters")
+            declarator = declarator.child_by_field_name("declarator")
+        if params is None:
+            return
+        if params.type in IDENTIFIER_TYPES:       # single arrow-function parameter
+            self.target(params)
+            return
+        for param in params.named_children:
+            if param.type not in ("comment", "line_comment", "block_comment"):
+                self.target(param)
+
+
+def statement_def_use(node, code: bytes) -> Tuple[Set[str], Set[str], Set[str]]:
+    """(definitions, weak definitions, uses) of the statement whose CFG node is `node`."""
+    collector = _DefUse(code)
+    collector.header(node)
+    return collector.defs, collector.weak, collector.uses
+
+
+def parameter_names(function_node, code: bytes) -> Set[str]:
+    collector = _DefUse(code)
+    collector.parameters(function_node)
+    return collector.defs
+
+
+def def_use_sets(graph, calls: Optional[List[Set[str]]] = None,
+                 arguments: Optional[List[List[Dict[str, Any]]]] = None
+                 ) -> Tuple[List[Set[str]], List[Set[str]], List[Set[str]]]:
+    """
+    Per-node (definitions, weak definitions, uses) of a
+    control_flow.ControlFlowGraph, including its pseudo-variables (see
+    ControlFlowGraph.implicit). When a `calls` list is given, the names
+    each node calls are appended to it, and to an `arguments` list the
+    arguments of each call (see _DefUse.call_arguments).
+    """
+    n = len(graph)
+    defs: List[Set[str]] = [set() for _ in range(n)]
+    weak: List[Set[str]] = [set() for _ in range(n)]
+    uses: List[Set[str]] = [set() for _ in range(n)]
+    if calls is not None:
+        calls.extend(set() for _ in range(n))
+    if arguments is not None:
+        arguments.extend([] for _ in range(n))
+    if graph.function is not None:
+        defs[0] = parameter_names(graph.function, graph.code)
+    for i, node in enumerate(graph.syntax):
+        if node is not None:
+            collector = _DefUse(graph.code)
+            collector.header(node)
+            defs[i], weak[i], uses[i] = collector.defs, collector.weak, collector.uses
+            if calls is not None:
+                calls[i] = collector.calls
+            if arguments is not None:
+                arguments[i] = collector.arguments
+    for i, (pseudo_defs, pseudo_uses) in graph.implicit.items():
+        defs[i] |= pseudo_defs
+        uses[i] |= pseudo_uses
+    return defs, weak, uses
+
+
+def _reverse_postorder(n: int, offsets: Sequence[int], targets: Sequence[int],
+                       entry: int) -> List[int]:
+    """
+    Reverse postorder from `entry`, then of anything unreachable. Successors
+    are explored last edge first: loop exits and else branches are added
+    after the body, so loop bodies directly follow their header.
+    """
+    seen = bytearray(n)
+    order = []
+    for root in [entry] + list(range(n)):
+        if seen[root]:
+            continue
+        seen[root] = 1
+        stack = [(root, offsets[root + 1])]
+        while stack:
+            v, i = stack[-1]
+            if i > offsets[v]:
+                stack[-1] = (v, i - 1)
+                w = targets[i - 1]
+                if not seen[w]:
+                    seen[w] = 1
+                    stack.append((w, offsets[w + 1]))
+            else:
+                stack.pop()
+                order.append(v)
+    order.reverse()
+    return order
+
+
+def data_dependences(n: int, edges: Sequence[Tuple[int, int]],
+                     defs: Sequence[Iterable[str]], weak_defs: Sequence[Iterable[str]],
+                     uses: Sequence[Iterable[str]], entry: int = 0) -> List[Tuple[int, int, str]]:
+    """
+    (definition node, use node, variable) for every definition that reaches
+    a use of its variable.
+    """
+    def_node: List[int] = []
+    var_mask: Dict[str, int] = {}
+    gen = [0] * n
+    for v in range(n):
+        # A strong definition already covers a weak one of the same name
+        for names in (defs[v], set(weak_defs[v]).difference(defs[v])):
+            for name in names:
+                bit = 1 << len(def_node)
+                def_node.append(v)
+                gen[v] |= bit
+                var_mask[name] = var_mask.get(name, 0) | bit
+    kill = [0] * n
+    for v in range(n):
+        for name in defs[v]:
+            kill[v] |= var_mask[name]
+
+    offsets, targets = csr(n, edges)
+    pred_offsets, pred_targets = csr(n, [(v, u) for u, v in edges])
+    out = list(gen)
+    reach_in = [0] * n
+    # Always revisit the earliest pending node in reverse postorder, so a
+    # loop settles before the change flows on past its exit
+    order = _reverse_postorder(n, offsets, targets, entry)
+    rank = [0] * n
+    for i, v in enumerate(order):
+        rank[v] = i
+    queue = list(range(n))
+    queued = bytearray(b"\x01") * n
+    while queue:
+        v = order[heappop(queue)]
+        queued[v] = 0
+        incoming = 0
+        for j in range(pred_offsets[v], pred_offsets[v + 1]):
+            incoming |= out[pred_targets[j]]
+        reach_in[v] = incoming
+        result = gen[v] | (incoming & ~kill[v])
+        if result != out[v]:
+            out[v] = result
+            for j in range(offsets[v], offsets[v + 1]):
+                w = targets[j]
+                if not queued[w]:
+                    queued[w] = 1
+                    heappush(queue, rank[w])
+
+    dependences = []
+    for v in range(n):
+        incoming = reach_in[v]
+        if not incoming:
+            continue
+        for name in uses[v]:
+            reaching = incoming & var_mask.get(name, 0)
+            while reaching:
+                low = reaching & -reaching
+                dependences.append((def_node[low.bit_length() - 1], v, name))
+                reaching ^= low
+    return dependences
+
+
+def flow_data_dependences(graph) -> List[Tuple[int, int, str]]:
+    """Data dependences of a control_flow.ControlFlowGraph, by node index."""
+    defs, weak, uses = def_use_sets(graph)
+    return data_dependences(len(graph), [(u, v) for u, v, _ in graph.edges],
+                            defs, weak, uses)
+
+
+def graph_data_dependences(graph: Any) -> List[Tuple[Any, Any, str]]:
+    """
+    Data dependences of a networkx CFG whose nodes carry 'defs', 'may_defs'
+    and 'uses' lists, with the graph's own node ids. The entry is the node
+    typed 'entry'.
+    """
+    keys = list(graph.nodes())
+    ids = {key: i for i, key in enumerate(keys)}
+    attrs = [graph.nodes[key] for key in keys]
+    entry = next((i for i, a in enumerate(attrs) if a.get("type") == "entry"), 0)
+    found = data_dependences(len(keys), [(ids[u], ids[v]) for u, v in graph.edges()],
+                             [a.get("defs", ()) for a in attrs],
+                             [a.get("may_defs", ()) for a in attrs],
+                             [a.get("uses", ()) for a in attrs], entry)
+    return [(keys[d], keys[u], name) for d, u, name in found]
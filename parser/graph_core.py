@@ -0,0 +1,694 @@
+"""
+Compact integer-indexed graph core.
+
+Nodes are interned to dense integer ids, node and edge type strings are
+interned strings stored in typed arrays, other attributes live in
+per-attribute columns, and adjacency is kept as CSR arrays (built on first
+query and rebuilt after further edits). A whole-repo graph costs a few
+dozen bytes per node and edge instead of the dicts-of-dicts networkx keeps,
+and traversals run over flat integer arrays.
+
+`to_networkx()` returns a networkx DiGraph view over the same arrays for
+callers (layouts, drawing, node_link_data) that still need one. Its
+structure is frozen, but writes to its node and edge attribute dicts go
+through to the CompactGraph.
+
+The whole-repo builders (HPGGenerator, HybridGraphBuilder and its
+HPGBuilder, dag_builder) build on this core. The per-function CFG and PDG
+builders keep plain nx.DiGraphs: they hold tens of nodes each, are
+converted by DependenceIndex and the flow graph tools anyway, and
+from_networkx turns one into a CompactGraph when needed.
+"""
+
+from array import array
+from collections import deque
+from collections.abc import MutableMapping
+from enum import IntEnum
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class EdgeKind(IntEnum):
+    """Typed edge kinds shared by every graph built on the core."""
+    CONTAINS = 0
+    CALLS = 1
+    DATA_DEP = 2
+    CONTROL_DEP = 3
+    HAS_CFG = 4
+    CONTROL_FLOW = 5
+    IMPORTS = 6
+    INHERITS = 7
+    OTHER = 8
+    CLONE = 9
+
+
+# Edge type / relationship strings used by the existing builders -> kind
+EDGE_KIND_ALIASES = {
+    "contains": EdgeKind.CONTAINS,
+    "defines": EdgeKind.CONTAINS,
+    "has_method": EdgeKind.CONTAINS,
+    "has_attribute": EdgeKind.CONTAINS,
+    "calls": EdgeKind.CALLS,
+    "call": EdgeKind.CALLS,
+    "data_dep": EdgeKind.DATA_DEP,
+    "data_dependency": EdgeKind.DATA_DEP,
+    "control_dep": EdgeKind.CONTROL_DEP,
+    "control_dependency": EdgeKind.CONTROL_DEP,
+    "parameter_in": EdgeKind.DATA_DEP,
+    "parameter_out": EdgeKind.DATA_DEP,
+    "return": EdgeKind.DATA_DEP,
+    "has_cfg": EdgeKind.HAS_CFG,
+    "sequential": EdgeKind.CONTROL_FLOW,
+    "conditional_true": EdgeKind.CONTROL_FLOW,
+    "conditional_false": EdgeKind.CONTROL_FLOW,
+    "loop_back": EdgeKind.CONTROL_FLOW,
+    "exception": EdgeKind.CONTROL_FLOW,
+    "flow": EdgeKind.CONTROL_FLOW,
+    "import": EdgeKind.IMPORTS,
+    "imports": EdgeKind.IMPORTS,
+    "inherits": EdgeKind.INHERITS,
+    "clone": EdgeKind.CLONE,
+}
+
+ALL_KINDS = (1 << len(EdgeKind)) - 1
+
+
+def edge_kind(value) -> EdgeKind:
+    """Map an EdgeKind, its name or a legacy edge type string to an EdgeKind."""
+    if isinstance(value, EdgeKind):
+        return value
+    if isinstance(value, int):
+        return EdgeKind(value)
+    kind = EDGE_KIND_ALIASES.get(str(value).lower())
+    if kind is None:
+        try:
+            kind = EdgeKind[str(value).upper()]
+        except KeyError:
+            raise ValueError(f"Unknown edge kind: {value!r}")
+    return kind
+
+
+def edge_kind_or_other(value, default=EdgeKind.OTHER) -> EdgeKind:
+    """Like edge_kind, but `default` for None and OTHER for unknown strings."""
+    if value is None:
+        return default
+    try:
+        return edge_kind(value)
+    except ValueError:
+        return EdgeKind.OTHER
+
+
+def kind_mask(*kinds) -> int:
+    """Bit mask selecting the given edge kinds (no kinds = all kinds)."""
+    if not kinds:
+        return ALL_KINDS
+    mask = 0
+    for kind in kinds:
+        mask |= 1 << edge_kind(kind)
+    return mask
+
+
+class StringTable:
+    """Interns strings to small integer codes."""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def intern(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.strings)
+            self.strings.append(value)
+        return code
+
+    def __getitem__(self, code: int) -> str:
+        return self.strings[code]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+class CompactGraph:
+    """
+    Directed graph with interned integer node ids and CSR adjacency.
+
+    Nodes are addressed by key (str) in the mutating API and by integer id
+    in the traversal API; `index(key)` and `name(id)` convert between them.
+    Parallel edges of different kinds between the same nodes are allowed.
+    """
+
+    NO_TYPE = -1
+
+    def __init__(self):
+        self._index: Dict[str, int] = {}
+        self._names: List[str] = []
+        self.node_types = StringTable()
+        self._node_type = array("i")
+        self._node_columns: Dict[str, List[Any]] = {}
+
+        self.edge_types = StringTable()
+        self._src = array("i")
+        self._dst = array("i")
+        self._kind = array("B")
+        self._edge_type = array("i")
+        self._edge_attrs: Dict[int, Dict[str, Any]] = {}
+
+        self._csr = None
+        self._rcsr = None
+
+    # ---------- building ----------
+
+    def add_node(self, key: str, /, type: Optional[str] = None, **attrs) -> int:
+        """Add node `key` (or update its attributes) and return its id."""
+        i = self._index.get(key)
+        if i is None:
+            i = self._index[key] = len(self._names)
+            self._names.append(key)
+            self._node_type.append(self.NO_TYPE)
+            for column in self._node_columns.values():
+                column.append(None)
+        if type is not None:
+            self._node_type[i] = self.node_types.intern(type)
+        for attr, value in attrs.items():
+            self.set_node_attr(i, attr, value)
+        return i
+
+    def set_node_attr(self, i: int, key: str, value: Any):
+        """Set (or with None, remove) attribute `key` of node `i`."""
+        if key == "type":
+            self._node_type[i] = self.node_types.intern(value) if value is not None else self.NO_TYPE
+            return
+        column = self._node_columns.get(key)
+        if column is None:
+            column = self._node_columns[key] = [None] * len(self._names)
+        column[i] = value
+
+    def add_edge(self, u: str, v: str, kind, /, type: Optional[str] = None, **attrs) -> int:
+        """
+        Add an edge between two node keys (created if missing); returns the edge id.
+
+        `type` is the edge's own type string (default: the kind string or name).
+        """
+        return self.add_edge_ids(self.add_node(u), self.add_node(v), kind, type, **attrs)
+
+    def add_edge_ids(self, u: int, v: int, kind, /, type: Optional[str] = None, **attrs) -> int:
+        if type is None and isinstance(kind, str):
+            type = kind
+        kind = edge_kind(kind)
+        e = len(self._src)
+        self._src.append(u)
+        self._dst.append(v)
+        self._kind.append(kind)
+        self._edge_type.append(self.edge_types.intern(type if type is not None else kind.name.lower()))
+        if attrs:
+            self._edge_attrs[e] = attrs
+        self._csr = self._rcsr = None
+        return e
+
+    def set_edge_attr(self, e: int, key: str, value: Any):
+        """Set attribute `key` of edge `e`; "type" replaces the edge's type string."""
+        if key == "type":
+            self._edge_type[e] = self.edge_types.intern(value)
+            return
+        self._edge_attrs.setdefault(e, {})[key] = value
+
+    # ---------- nodes ----------
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name) -> bool:
+        return name in self._index
+
+    def number_of_nodes(self) -> int:
+        return len(self._names)
+
+    def number_of_edges(self) -> int:
+        return len(self._src)
+
+    def index(self, name: str) -> int:
+        return self._index[name]
+
+    def get_index(self, name: str) -> Optional[int]:
+        return self._index.get(name)
+
+    def name(self, i: int) -> str:
+        return self._names[i]
+
+    def names(self, ids: Iterable[int]) -> List[str]:
+        return [self._names[i] for i in ids]
+
+    def node_type(self, i: int) -> Optional[str]:
+        code = self._node_type[i]
+        return self.node_types[code] if code != self.NO_TYPE else None
+
+    def node_attr(self, i: int, key: str, default: Any = None) -> Any:
+        if key == "type":
+            return self.node_type(i)
+        column = self._node_columns.get(key)
+        if column is None:
+            return default
+        value = column[i]
+        return default if value is None else value
+
+    def node_attrs(self, i: int) -> Dict[str, Any]:
+        """Attributes of node `i` as a fresh dict."""
+        attrs = {key: column[i] for key, column in self._node_columns.items()
+                 if column[i] is not None}
+        node_type = self.node_type(i)
+        if node_type is not None:
+            attrs["type"] = node_type
+        return attrs
+
+    def nodes_of_type(self, node_type: str) -> List[int]:
+        code = self.node_types.codes.get(node_type)
+        if code is None:
+            return []
+        return [i for i, t in enumerate(self._node_type) if t == code]
+
+    # ---------- edges ----------
+
+    def edge(self, e: int) -> Tuple[int, int, EdgeKind]:
+        return self._src[e], self._dst[e], EdgeKind(self._kind[e])
+
+    def edge_attrs(self, e: int) -> Dict[str, Any]:
+        """Attributes of edge `e` (type, kind and extras) as a fresh dict."""
+        attrs = {"type": self.edge_types[self._edge_type[e]], "kind": EdgeKind(self._kind[e]).name.lower()}
+        extra = self._edge_attrs.get(e)
+        if extra:
+            attrs.update(extra)
+        return attrs
+
+    def edges(self, kinds: int = ALL_KINDS) -> Iterator[Tuple[int, int, EdgeKind]]:
+        src, dst, kind = self._src, self._dst, self._kind
+        for e in range(len(src)):
+            if (kinds >> kind[e]) & 1:
+                yield src[e], dst[e], EdgeKind(kind[e])
+
+    def find_edge(self, u: int, v: int, kinds: int = ALL_KINDS) -> Optional[int]:
+        """Id of the first edge u -> v of one of `kinds`, or None."""
+        offsets, targets, edge_ids = self._forward()
+        kind = self._kind
+        for k in range(offsets[u], offsets[u + 1]):
+            if targets[k] == v and (kinds >> kind[edge_ids[k]]) & 1:
+                return edge_ids[k]
+        return None
+
+    # ---------- CSR ----------
+
+    def _build_csr(self, src, dst):
+        n = len(self._names)
+        offsets = array("i", bytes(4 * (n + 1)))
+        for u in src:
+            offsets[u + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+        fill = array("i", offsets[:-1]) if n else array("i")
+        targets = array("i", bytes(4 * len(src)))
+        edge_ids = array("i", bytes(4 * len(src)))
+        for e in range(len(src)):
+            u = src[e]
+            k = fill[u]
+            targets[k] = dst[e]
+            edge_ids[k] = e
+            fill[u] = k + 1
+        return offsets, targets, edge_ids
+
+    def _forward(self):
+        if self._csr is None:
+            self._csr = self._build_csr(self._src, self._dst)
+        return self._csr
+
+    def _reverse(self):
+        if self._rcsr is None:
+            self._rcsr = self._build_csr(self._dst, self._src)
+        return self._rcsr
+
+    # ---------- traversal ----------
+
+    def successors(self, i: int, kinds: int = ALL_KINDS) -> List[int]:
+        offsets, targets, edge_ids = self._forward()
+        if kinds == ALL_KINDS:
+            return list(targets[offsets[i]:offsets[i + 1]])
+        kind = self._kind
+        return [targets[k] for k in range(offsets[i], offsets[i + 1])
+                if (kinds >> kind[edge_ids[k]]) & 1]
+
+    def predecessors(self, i: int, kinds: int = ALL_KINDS) -> List[int]:
+        offsets, sources, edge_ids = self._reverse()
+        if kinds == ALL_KINDS:
+            return list(sources[offsets[i]:offsets[i + 1]])
+        kind = self._kind
+        return [sources[k] for k in range(offsets[i], offsets[i + 1])
+                if (kinds >> kind[edge_ids[k]]) & 1]
+
+    def out_degree(self, i: int) -> int:
+        offsets = self._forward()[0]
+        return offsets[i + 1] - offsets[i]
+
+    def in_degree(self, i: int) -> int:
+        offsets = self._reverse()[0]
+        return offsets[i + 1] - offsets[i]
+
+    def bfs(self, sources: Iterable[int], kinds: int = ALL_KINDS, reverse: bool = False,
+            max_depth: Optional[int] = None) -> List[int]:
+        """Node ids reachable from `sources` (included), in BFS order."""
+        offsets, targets, edge_ids = self._reverse() if reverse else self._forward()
+        kind = self._kind
+        filtered = kinds != ALL_KINDS
+        seen = bytearray(len(self._names))
+        order = []
+        queue = deque()
+        for s in sources:
+            if not seen[s]:
+                seen[s] = 1
+                order.append(s)
+                queue.append((s, 0))
+        while queue:
+            u, depth = queue.popleft()
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for k in range(offsets[u], offsets[u + 1]):
+                v = targets[k]
+                if seen[v] or (filtered and not (kinds >> kind[edge_ids[k]]) & 1):
+                    continue
+                seen[v] = 1
+                order.append(v)
+                queue.append((v, depth + 1))
+        return order
+
+    def descendants(self, i: int, kinds: int = ALL_KINDS) -> List[int]:
+        return self.bfs([i], kinds)[1:]
+
+    def ancestors(self, i: int, kinds: int = ALL_KINDS) -> List[int]:
+        return self.bfs([i], kinds, reverse=True)[1:]
+
+    def has_path(self, u: int, v: int, kinds: int = ALL_KINDS) -> bool:
+        if u == v:
+            return True
+        offsets, targets, edge_ids = self._forward()
+        kind = self._kind
+        filtered = kinds != ALL_KINDS
+        seen = bytearray(len(self._names))
+        seen[u] = 1
+        stack = [u]
+        while stack:
+            x = stack.pop()
+            for k in range(offsets[x], offsets[x + 1]):
+                y = targets[k]
+                if seen[y] or (filtered and not (kinds >> kind[edge_ids[k]]) & 1):
+                    continue
+                if y == v:
+                    return True
+                seen[y] = 1
+                stack.append(y)
+        return False
+
+    def nbytes(self) -> int:
+        """Approximate size of the array storage (names and attribute values excluded)."""
+        arrays = [self._node_type, self._src, self._dst, self._kind, self._edge_type]
+        for csr in (self._csr, self._rcsr):
+            if csr is not None:
+                arrays.extend(csr)
+        return sum(a.itemsize * len(a) for a in arrays)
+
+    # ---------- networkx interop ----------
+
+    def to_networkx(self, copy: bool = False):
+        """
+        networkx view of the graph.
+
+        The default is a DiGraph backed by this graph's arrays (no copy) with
+        a frozen structure; attribute writes through it update this graph.
+        `copy=True` builds a regular mutable nx.DiGraph instead.
+        Parallel edges collapse to the first one, as in a DiGraph.
+        """
+        if not copy:
+            return _view_class()(self)
+        import networkx as nx
+
+        g = nx.DiGraph()
+        for i, name in enumerate(self._names):
+            g.add_node(name, **self.node_attrs(i))
+        for e in range(len(self._src)):
+            u, v = self._names[self._src[e]], self._names[self._dst[e]]
+            if not g.has_edge(u, v):
+                g.add_edge(u, v, **self.edge_attrs(e))
+        return g
+
+    @classmethod
+    def from_networkx(cls, graph, kind_attrs=("type", "relationship"),
+                      default_kind=EdgeKind.CONTAINS) -> "CompactGraph":
+        """
+        Convert an nx graph; the edge type comes from the first of `kind_attrs`
+        present (`default_kind` if none, OTHER if it is not a known kind).
+        """
+        core = cls()
+        for name, data in graph.nodes(data=True):
+            data = dict(data)
+            core.add_node(str(name), type=data.pop("type", None), **data)
+        for u, v, data in graph.edges(data=True):
+            data = dict(data)
+            edge_type = next((data.pop(a) for a in kind_attrs if a in data), None)
+            data.pop("kind", None)
+            core.add_edge(str(u), str(v), edge_kind_or_other(edge_type, default_kind), edge_type, **data)
+        return core
+
+
+# ---------- networkx view ----------
+
+class _NodeAttrs(MutableMapping):
+    """Attribute dict of one node; reads and writes go to the CompactGraph's columns."""
+
+    __slots__ = ("_core", "_i")
+
+    def __init__(self, core: CompactGraph, i: int):
+        self._core = core
+        self._i = i
+
+    def __getitem__(self, key):
+        value = self._core.node_attr(self._i, key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._core.set_node_attr(self._i, key, value)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._core.set_node_attr(self._i, key, None)
+
+    def __iter__(self):
+        return iter(self._core.node_attrs(self._i))
+
+    def __len__(self):
+        return len(self._core.node_attrs(self._i))
+
+    def copy(self) -> Dict[str, Any]:
+        return self._core.node_attrs(self._i)
+
+    def __repr__(self):
+        return repr(self.copy())
+
+
+class _EdgeAttrs(MutableMapping):
+    """Attribute dict of one edge; "type" and "kind" are always present and cannot be removed."""
+
+    __slots__ = ("_core", "_e")
+
+    def __init__(self, core: CompactGraph, e: int):
+        self._core = core
+        self._e = e
+
+    def __getitem__(self, key):
+        return self._core.edge_attrs(self._e)[key]
+
+    def __setitem__(self, key, value):
+        self._core.set_edge_attr(self._e, key, value)
+
+    def __delitem__(self, key):
+        extra = self._core._edge_attrs.get(self._e, {})
+        if key in extra:
+            del extra[key]
+        elif key in ("type", "kind"):
+            raise TypeError(f"The {key} of a CompactGraph edge cannot be removed")
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._core.edge_attrs(self._e))
+
+    def __len__(self):
+        return len(self._core.edge_attrs(self._e))
+
+    def copy(self) -> Dict[str, Any]:
+        return self._core.edge_attrs(self._e)
+
+    def __repr__(self):
+        return repr(self.copy())
+
+
+class _NodeMap:
+    """name -> attribute dict, over a CompactGraph."""
+
+    def __init__(self, core: CompactGraph):
+        self._core = core
+
+    def __getitem__(self, name):
+        return _NodeAttrs(self._core, self._core._index[name])
+
+    def get(self, name, default=None):
+        i = self._core._index.get(name)
+        return default if i is None else _NodeAttrs(self._core, i)
+
+    def __contains__(self, name):
+        return name in self._core._index
+
+    def __iter__(self):
+        return iter(self._core._names)
+
+    def __len__(self):
+        return len(self._core._names)
+
+    def keys(self):
+        return list(self._core._names)
+
+    def items(self):
+        return [(name, _NodeAttrs(self._core, i)) for i, name in enumerate(self._core._names)]
+
+    def values(self):
+        return [_NodeAttrs(self._core, i) for i in range(len(self._core._names))]
+
+
+class _NeighborMap:
+    """neighbor name -> edge attribute dict for one node."""
+
+    def __init__(self, core: CompactGraph, i: int, reverse: bool):
+        self._core = core
+        self._i = i
+        self._reverse = reverse
+
+    def _slots(self):
+        offsets, targets, edge_ids = self._core._reverse() if self._reverse else self._core._forward()
+        return targets, edge_ids, range(offsets[self._i], offsets[self._i + 1])
+
+    def _first_edges(self) -> Dict[int, int]:
+        targets, edge_ids, slots = self._slots()
+        first: Dict[int, int] = {}
+        for k in slots:
+            first.setdefault(targets[k], edge_ids[k])
+        return first
+
+    def __getitem__(self, name):
+        j = self._core._index.get(name)
+        if j is not None:
+            targets, edge_ids, slots = self._slots()
+            for k in slots:
+                if targets[k] == j:
+                    return _EdgeAttrs(self._core, edge_ids[k])
+        raise KeyError(name)
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def __contains__(self, name):
+        j = self._core._index.get(name)
+        if j is None:
+            return False
+        targets, _, slots = self._slots()
+        return any(targets[k] == j for k in slots)
+
+    def __iter__(self):
+        names = self._core._names
+        return (names[j] for j in self._first_edges())
+
+    def __len__(self):
+        return len(self._first_edges())
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        names = self._core._names
+        return [(names[j], _EdgeAttrs(self._core, e)) for j, e in self._first_edges().items()]
+
+    def values(self):
+        return [_EdgeAttrs(self._core, e) for e in self._first_edges().values()]
+
+
+class _AdjMap:
+    """name -> _NeighborMap (successors, or predecessors when `reverse`)."""
+
+    def __init__(self, core: CompactGraph, reverse: bool):
+        self._core = core
+        self._reverse = reverse
+
+    def __getitem__(self, name):
+        return _NeighborMap(self._core, self._core._index[name], self._reverse)
+
+    def get(self, name, default=None):
+        i = self._core._index.get(name)
+        return default if i is None else _NeighborMap(self._core, i, self._reverse)
+
+    def __contains__(self, name):
+        return name in self._core._index
+
+    def __iter__(self):
+        return iter(self._core._names)
+
+    def __len__(self):
+        return len(self._core._names)
+
+    def keys(self):
+        return list(self._core._names)
+
+    def items(self):
+        return [(name, _NeighborMap(self._core, i, self._reverse))
+                for i, name in enumerate(self._core._names)]
+
+    def values(self):
+        return [_NeighborMap(self._core, i, self._reverse) for i in range(len(self._core._names))]
+
+
+_VIEW_CLASS = None
+
+
+def _view_class():
+    """Build the DiGraph subclass on first use so networkx is only imported when needed."""
+    global _VIEW_CLASS
+    if _VIEW_CLASS is None:
+        import networkx as nx
+
+        class CompactDiGraphView(nx.DiGraph):
+            """
+            nx.DiGraph backed by a CompactGraph: frozen structure, attributes
+            written through. Without a core (networkx builds copies, reversed
+            graphs and subgraph views with `G.__class__()`) it is an ordinary
+            DiGraph.
+            """
+
+            def __init__(self, core: Optional[CompactGraph] = None, **attr):
+                if core is None:
+                    super().__init__(**attr)
+                    self.core = None
+                    return
+                self.core = core
+                self.graph = {}
+                self._node = _NodeMap(core)
+                self._adj = self._succ = _AdjMap(core, reverse=False)
+                self._pred = _AdjMap(core, reverse=True)
+                self.__networkx_cache__ = {}
+                nx.freeze(self)
+
+            def number_of_edges(self, u=None, v=None):
+                if u is None and self.core is not None:
+                    return sum(len(nbrs) for nbrs in self._succ.values())
+                return super().number_of_edges(u, v)
+
+        _VIEW_CLASS = CompactDiGraphView
+    return _VIEW_CLASS
@@ -0,0 +1,628 @@
+"""
+SQLite database of analysis results, one file per repository snapshot.
+
+Symbols (modules, classes, functions, methods, variables) and the edges
+between them (HPG containment, inheritance, imports and the call graph)
+go into indexed tables, and per-function CFGs and PDGs into flow tables,
+so questions like "who calls X" or "which classes extend Y" are index
+lookups instead of graph rebuilds. Interprocedural function summaries and
+the PDG edges derived from them (see summaries.py) get tables of their own,
+and so do groups of cloned functions (see clones.py).
+
+Call and inheritance edges keep the target name next to the resolved
+symbol id: a call to a function defined outside the repository still
+answers "who calls X". Calls and base classes resolve through the class
+hierarchy (see class_hierarchy.py).
+
+The database is written to a temporary file with bulk inserts in a single
+transaction, indexed afterwards and renamed into place, so readers never
+see a half-built snapshot.
+
+Each snapshot gets a complete database; nothing in it is shared with other
+snapshots. For a snapshot in the IR store it is a cache: it can be deleted
+to save space and is rebuilt from the stored objects (see
+ir_processor.rebuild_snapshot_db) the next time it is queried.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from class_hierarchy import ClassHierarchy
+from clones import clone_groups
+from graph_store import attrs_json, graph_items
+from telemetry import count, span
+
+DB_EXTENSION = ".sqlite"
+SCHEMA_VERSION = 3
+
+# Snapshot ids end up in file names and URLs
+SNAPSHOT_ID_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,127}$")
+
+# Edge kinds
+CONTAINS = "contains"
+CALLS = "calls"
+INHERITS = "inherits"
+IMPORTS = "imports"
+
+# Flow graph kinds
+FLOW_GRAPHS = ("cfg", "pdg")
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    language TEXT,
+    total_lines INTEGER
+);
+CREATE TABLE symbols (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,          -- module, class, function, method, variable
+    name TEXT NOT NULL,
+    qualname TEXT NOT NULL,
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    parent_id INTEGER REFERENCES symbols(id),
+    start_line INTEGER,
+    end_line INTEGER,
+    complexity INTEGER,
+    attrs TEXT
+);
+CREATE TABLE edges (
+    kind TEXT NOT NULL,          -- contains, calls, inherits, imports
+    src INTEGER NOT NULL REFERENCES symbols(id),
+    dst INTEGER REFERENCES symbols(id),   -- NULL when the target is not in the repo
+    dst_name TEXT NOT NULL
+);
+CREATE TABLE flow_nodes (
+    id INTEGER PRIMARY KEY,
+    graph TEXT NOT NULL,         -- cfg, pdg
+    function_id INTEGER NOT NULL REFERENCES symbols(id),
+    key TEXT NOT NULL,
+    type TEXT,
+    label TEXT,
+    attrs TEXT
+);
+CREATE TABLE flow_edges (
+    graph TEXT NOT NULL,
+    function_id INTEGER NOT NULL REFERENCES symbols(id),
+    src INTEGER NOT NULL REFERENCES flow_nodes(id),
+    dst INTEGER NOT NULL REFERENCES flow_nodes(id),
+    type TEXT,
+    label TEXT,
+    attrs TEXT
+);
+CREATE TABLE function_summaries (
+    function_id INTEGER PRIMARY KEY REFERENCES symbols(id),
+    hash TEXT NOT NULL,
+    summary TEXT NOT NULL        -- JSON: parameters, reads, writes, returns, calls
+);
+CREATE TABLE interprocedural_edges (
+    kind TEXT NOT NULL,          -- parameter_in, parameter_out, return
+    src_function INTEGER NOT NULL REFERENCES symbols(id),
+    src INTEGER NOT NULL REFERENCES flow_nodes(id),
+    dst_function INTEGER NOT NULL REFERENCES symbols(id),
+    dst INTEGER NOT NULL REFERENCES flow_nodes(id),
+    variable TEXT
+);
+CREATE TABLE clones (
+    group_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,          -- exact, near
+    similarity REAL NOT NULL,    -- least estimated similarity of the pairs linking the group
+    function_id INTEGER NOT NULL REFERENCES symbols(id)
+);
+"""
+
+# Created after the bulk load, which is much faster than maintaining them per row
+INDEXES = """
+CREATE INDEX symbols_name ON symbols (name, kind);
+CREATE INDEX symbols_file ON symbols (file_id, kind);
+CREATE INDEX symbols_complexity ON symbols (complexity DESC) WHERE complexity IS NOT NULL;
+CREATE INDEX edges_src ON edges (src, kind, dst);
+CREATE INDEX edges_dst ON edges (dst, kind, src);
+CREATE INDEX edges_dst_name ON edges (dst_name, kind, src);
+CREATE INDEX flow_nodes_function ON flow_nodes (function_id, graph);
+CREATE INDEX flow_edges_function ON flow_edges (function_id, graph);
+CREATE INDEX interprocedural_src ON interprocedural_edges (src_function, kind);
+CREATE INDEX interprocedural_dst ON interprocedural_edges (dst_function, kind);
+CREATE INDEX clones_group ON clones (group_id);
+CREATE INDEX clones_function ON clones (function_id);
+"""
+
+_SYMBOL_COLUMNS = ("s.key, s.kind, s.name, s.qualname, f.path AS file, "
+                   "s.start_line, s.end_line, s.complexity")
+
+
+def valid_snapshot_id(snapshot: str) -> bool:
+    return bool(SNAPSHOT_ID_PATTERN.match(snapshot or ""))
+
+
+def snapshot_path(directory: str, snapshot: str) -> str:
+    """Database file of `snapshot` inside `directory`."""
+    if not valid_snapshot_id(snapshot):
+        raise ValueError(f"Invalid snapshot id: {snapshot!r}")
+    return os.path.join(directory, snapshot + DB_EXTENSION)
+
+
+def list_snapshots(directory: str) -> List[str]:
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name[:-len(DB_EXTENSION)] for name in os.listdir(directory)
+                  if name.endswith(DB_EXTENSION) and valid_snapshot_id(name[:-len(DB_EXTENSION)]))
+
+
+def flow_rows(graph) -> Tuple[List[Tuple[str, Dict[str, Any]]], List[Tuple[str, str, Dict[str, Any]]]]:
+    """(key, attrs) nodes and (source, target, attrs) edges of a CFG or PDG; JSON-serializable."""
+    nodes, edges = graph_items(graph)
+    return nodes, [(u, v, attrs) for u, v, _, attrs in edges]
+
+
+class GraphDatabaseWriter:
+    """
+    Builds one snapshot database.
+
+    Add summaries first (they define the symbols), then flow graphs, then
+    call close() to index and publish the file.
+    """
+
+    def __init__(self, path: str, meta: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        self.conn = sqlite3.connect(self.tmp_path)
+        # Nothing reads the file until it is renamed into place, so
+        # durability during the build only costs time
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.executescript(SCHEMA)
+        self.conn.execute("BEGIN")
+        meta = dict(meta or {})
+        meta.setdefault("schema_version", SCHEMA_VERSION)
+        meta.setdefault("created", time.time())
+        self.conn.executemany("INSERT INTO meta VALUES (?, ?)",
+                              [(k, str(v)) for k, v in meta.items()])
+        self.symbol_ids: Dict[str, int] = {}
+        self._next_file = 1
+        self._next_symbol = 1
+        self._next_flow_node = 1
+        self.pdg_node_ids: Dict[Tuple[int, str], int] = {}   # (function id, key) -> flow node id
+
+    def _symbol(self, rows: List[tuple], key: str, kind: str, name: str, qualname: str,
+                file_id: int, parent_id: Optional[int], start=None, end=None,
+                complexity=None, attrs=None) -> int:
+        sid = self._next_symbol
+        self._next_symbol += 1
+        if key in self.symbol_ids:
+            # e.g. a module-level name assigned twice
+            key = f"{key}#{sid}"
+        self.symbol_ids[key] = sid
+        rows.append((sid, key, kind, name, qualname, file_id, parent_id,
+                     start, end, complexity, attrs_json(attrs)))
+        return sid
+
+    @staticmethod
+    def _function_attrs(func: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "parameters": [p.get("name") for p in func.get("parameters", [])],
+            "return_type": func.get("return_type"),
+            "is_async": func.get("is_async") or None,
+            "metrics": func.get("metrics"),
+        }
+
+    def add_summaries(self, summaries: Iterable[Dict[str, Any]]):
+        """Symbols, HPG/call-graph edges and clone groups of all file summaries."""
+        with span("graph_db", part="symbols"):
+            file_rows, symbol_rows, edge_rows = [], [], []
+            summaries = list(summaries)
+            hierarchy = ClassHierarchy(summaries)
+            functions = []   # (symbol id, summary), calls resolved below
+
+            for summary in summaries:
+                file_id = self._next_file
+                self._next_file += 1
+                path = summary.get("file_path") or summary["file_name"]
+                file_rows.append((file_id, path, summary.get("language"),
+                                  summary.get("total_lines")))
+                module = self._symbol(symbol_rows, path, "module", summary["file_name"], path,
+                                      file_id, None, 1, summary.get("total_lines"))
+                for imp in summary.get("imports", []):
+                    edge_rows.append((IMPORTS, module, None, imp))
+                for var in summary.get("variables", []):
+                    sid = self._symbol(symbol_rows, f"{path}::{var['name']}", "variable",
+                                       var["name"], var["name"], file_id, module,
+                                       attrs={"value": var.get("value")})
+                    edge_rows.append((CONTAINS, module, sid, var["name"]))
+
+                def add_function(func, kind, parent, qualname):
+                    sid = self._symbol(symbol_rows, func["id"], kind, func["name"], qualname,
+                                       file_id, parent, func.get("start_line"),
+                                       func.get("end_line"), func.get("complexity"),
+                                       self._function_attrs(func))
+                    edge_rows.append((CONTAINS, parent, sid, func["name"]))
+                    functions.append((sid, func))
+
+                for func in summary.get("functions", []):
+                    add_function(func, "function", module, func["name"])
+                for cls in summary.get("classes", []):
+                    cid = self._symbol(symbol_rows, cls["id"], "class", cls["name"], cls["name"],
+                                       file_id, module, cls.get("start_line"),
+                                       cls.get("end_line"),
+                                       attrs={"attributes": cls.get("attributes") or None,
+                                              "docstring": cls.get("docstring")})
+                    edge_rows.append((CONTAINS, module, cid, cls["name"]))
+                    for method in cls.get("methods", []):
+                        add_function(method, "method", cid, f"{cls['name']}.{method['name']}")
+
+            symbol_ids = self.symbol_ids
+            for src, func in functions:
+                seen = set()
+                for callee, targets in hierarchy.resolve_calls(func):
+                    for dst in [symbol_ids[t] for t in targets] or [None]:
+                        if (dst, callee) not in seen:
+                            seen.add((dst, callee))
+                            edge_rows.append((CALLS, src, dst, callee))
+            for cid, parent, base, _ in hierarchy.inheritance():
+                dst = symbol_ids[parent] if parent is not None else None
+                edge_rows.append((INHERITS, symbol_ids[cid], dst, base))
+
+            self.conn.executemany("INSERT INTO files VALUES (?, ?, ?, ?)", file_rows)
+            self.conn.executemany("INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                  symbol_rows)
+            self.conn.executemany("INSERT INTO edges VALUES (?, ?, ?, ?)", edge_rows)
+        count("db_rows_total", len(symbol_rows), table="symbols")
+        count("db_rows_total", len(edge_rows), table="edges")
+        with span("graph_db", part="clones"):
+            clone_rows = [(group_id, group["kind"], group["similarity"], symbol_ids[key])
+                          for group_id, group in enumerate(clone_groups(summaries), 1)
+                          for key in group["functions"] if key in symbol_ids]
+            self.conn.executemany("INSERT INTO clones VALUES (?, ?, ?, ?)", clone_rows)
+        count("db_rows_total", len(clone_rows), table="clones")
+
+    def add_flow_graph(self, graph_kind: str, function_key: str, graph) -> bool:
+        """Store the CFG or PDG of a function added via add_summaries."""
+        return self.add_flow_rows(graph_kind, function_key, *flow_rows(graph))
+
+    def add_flow_rows(self, graph_kind: str, function_key: str,
+                      nodes: Iterable[Tuple[str, Dict[str, Any]]],
+                      edges: Iterable[Tuple[str, str, Dict[str, Any]]]) -> bool:
+        """add_flow_graph from the graph's flow_rows(), e.g. as stored in the IR store."""
+        if graph_kind not in FLOW_GRAPHS:
+            raise ValueError(f"Unknown flow graph kind: {graph_kind}")
+        function_id = self.symbol_ids.get(function_key)
+        if function_id is None:
+            return False
+        ids = {}
+        node_rows = []
+        for key, attrs in nodes:
+            nid = ids[key] = self._next_flow_node
+            self._next_flow_node += 1
+            if graph_kind == "pdg":
+                self.pdg_node_ids[function_id, key] = nid
+            attrs = dict(attrs)
+            node_rows.append((nid, graph_kind, function_id, key, attrs.pop("type", None),
+                              attrs.pop("label", None), attrs_json(attrs)))
+        edge_rows = []
+        for u, v, attrs in edges:
+            attrs = dict(attrs)
+            edge_rows.append((graph_kind, function_id, ids[u], ids[v], attrs.pop("type", None),
+                              attrs.pop("label", None), attrs_json(attrs)))
+        self.conn.executemany("INSERT INTO flow_nodes VALUES (?, ?, ?, ?, ?, ?, ?)", node_rows)
+        self.conn.executemany("INSERT INTO flow_edges VALUES (?, ?, ?, ?, ?, ?, ?)", edge_rows)
+        count("db_rows_total", len(node_rows), table="flow_nodes")
+        count("db_rows_total", len(edge_rows), table="flow_edges")
+        return True
+
+    def resolved_calls(self) -> Dict[str, List[Tuple[str, str]]]:
+        """Function key -> [(called name, callee key)] for calls resolved in the repository."""
+        keys = {sid: key for key, sid in self.symbol_ids.items()}
+        calls: Dict[str, List[Tuple[str, str]]] = {}
+        for src, dst, name in self.conn.execute(
+                f"SELECT src, dst, dst_name FROM edges WHERE kind = '{CALLS}' AND dst IS NOT NULL"):
+            calls.setdefault(keys[src], []).append((name, keys[dst]))
+        return calls
+
+    def add_function_summaries(self, summaries: Iterable[Tuple[str, str, Dict[str, Any]]],
+                               edges: Iterable[Tuple[str, str, str, str, str, Optional[str]]]) -> None:
+        """
+        Store (function key, content hash, summary) rows and interprocedural
+        PDG edges (kind, source function, source node, target function,
+        target node, variable) between PDGs added via add_flow_graph.
+        """
+        summary_rows = [(self.symbol_ids[key], digest, json.dumps(summary, separators=(",", ":")))
+                        for key, digest, summary in summaries if key in self.symbol_ids]
+        edge_rows = []
+        for kind, src_function, src, dst_function, dst, variable in edges:
+            src_id, dst_id = self.symbol_ids.get(src_function), self.symbol_ids.get(dst_function)
+            src_node = self.pdg_node_ids.get((src_id, src))
+            dst_node = self.pdg_node_ids.get((dst_id, dst))
+            if src_node is not None and dst_node is not None:
+                edge_rows.append((kind, src_id, src_node, dst_id, dst_node, variable))
+        self.conn.executemany("INSERT INTO function_summaries VALUES (?, ?, ?)", summary_rows)
+        self.conn.executemany("INSERT INTO interprocedural_edges VALUES (?, ?, ?, ?, ?, ?)", edge_rows)
+        count("db_rows_total", len(summary_rows), table="function_summaries")
+        count("db_rows_total", len(edge_rows), table="interprocedural_edges")
+
+    def close(self) -> str:
+        """Index, commit and atomically move the database to its final path."""
+        with span("graph_db", part="index"):
+            self.conn.executescript(INDEXES)
+            self.conn.commit()
+            self.conn.execute("ANALYZE")
+        self.conn.close()
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+    def abort(self):
+        self.conn.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def build_database(path: str, summaries: List[Dict[str, Any]],
+                   flow_graphs: Optional[Dict[str, Dict[str, Any]]] = None,
+                   meta: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Write a snapshot database from file summaries and optional flow graphs
+    ({"cfg": {function id: graph}, "pdg": {...}}).
+    """
+    with GraphDatabaseWriter(path, meta) as writer:
+        writer.add_summaries(summaries)
+        for graph_kind, graphs in (flow_graphs or {}).items():
+            for function_key, graph in graphs.items():
+                writer.add_flow_graph(graph_kind, function_key, graph)
+    return path
+
+
+class GraphDatabase:
+    """Read-only queries over a snapshot database."""
+
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _rows(self, sql: str, params=()) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def meta(self) -> Dict[str, str]:
+        return dict(self.conn.execute("SELECT key, value FROM meta").fetchall())
+
+    def stats(self) -> Dict[str, Any]:
+        kinds = dict(self.conn.execute("SELECT kind, COUNT(*) FROM symbols GROUP BY kind").fetchall())
+        edges = dict(self.conn.execute("SELECT kind, COUNT(*) FROM edges GROUP BY kind").fetchall())
+        flow = dict(self.conn.execute("SELECT graph, COUNT(*) FROM flow_nodes GROUP BY graph").fetchall())
+        files = self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        return {"files": files, "symbols": kinds, "edges": edges, "flow_nodes": flow}
+
+    def symbol(self, key: str) -> Optional[Dict[str, Any]]:
+        rows = self._rows(f"SELECT {_SYMBOL_COLUMNS} FROM symbols s JOIN files f ON f.id = s.file_id "
+                          "WHERE s.key = ?", (key,))
+        return rows[0] if rows else None
+
+    def find(self, name: str, kind: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        sql = f"SELECT {_SYMBOL_COLUMNS} FROM symbols s JOIN files f ON f.id = s.file_id WHERE s.name = ?"
+        params: List[Any] = [name]
+        if kind:
+            sql += " AND s.kind = ?"
+            params.append(kind)
+        return self._rows(sql + " ORDER BY s.id LIMIT ?", params + [limit])
+
+    @staticmethod
+    def _target_clause(target: str, column: str) -> str:
+        """Match edge end `column` to `target`: a symbol key if it looks like one, else a name."""
+        if "::" in target:
+            return f"e.{column} = (SELECT id FROM symbols WHERE key = ?)"
+        if column == "dst":
+            return "e.dst_name = ?"
+        return "e.src IN (SELECT id FROM symbols WHERE name = ?)"
+
+    def callers(self, target: str, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Functions that call `target` (a name or a function key)."""
+        where = self._target_clause(target, "dst")
+        return self._rows(
+            f"SELECT DISTINCT {_SYMBOL_COLUMNS} FROM edges e JOIN symbols s ON s.id = e.src "
+            f"JOIN files f ON f.id = s.file_id WHERE e.kind = '{CALLS}' AND {where} "
+            "ORDER BY f.path, s.start_line LIMIT ?", (target, limit))
+
+    def callees(self, target: str, limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Names called by `target`, with the resolved definition when the
+        callee is in the repository (key is None otherwise).
+        """
+        where = self._target_clause(target, "src")
+        return self._rows(
+            "SELECT DISTINCT e.dst_name AS callee, s.key, s.kind, f.path AS file, s.start_line "
+            "FROM edges e LEFT JOIN symbols s ON s.id = e.dst LEFT JOIN files f ON f.id = s.file_id "
+            f"WHERE e.kind = '{CALLS}' AND {where} ORDER BY e.dst_name, f.path LIMIT ?",
+            (target, limit))
+
+    def subclasses(self, target: str, transitive: bool = False,
+                   limit: int = 1000) -> List[Dict[str, Any]]:
+        """Classes extending `target` (a class name), directly or transitively."""
+        if not transitive:
+            return self._rows(
+                f"SELECT {_SYMBOL_COLUMNS} FROM edges e JOIN symbols s ON s.id = e.src "
+                f"JOIN files f ON f.id = s.file_id WHERE e.kind = '{INHERITS}' AND e.dst_name = ? "
+                "ORDER BY f.path, s.start_line LIMIT ?", (target, limit))
+        return self._rows(
+            f"""WITH RECURSIVE sub(id, depth) AS (
+                    SELECT src, 1 FROM edges WHERE kind = '{INHERITS}' AND dst_name = ?
+                    UNION
+                    SELECT e.src, sub.depth + 1 FROM edges e JOIN sub ON e.dst = sub.id
+                    WHERE e.kind = '{INHERITS}'
+                )
+                SELECT {_SYMBOL_COLUMNS}, MIN(sub.depth) AS depth FROM sub
+                JOIN symbols s ON s.id = sub.id JOIN files f ON f.id = s.file_id
+                GROUP BY s.id ORDER BY depth, f.path, s.start_line LIMIT ?""",
+            (target, limit))
+
+    def most_complex(self, file: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """Functions and methods by descending cyclomatic complexity, optionally in one file."""
+        sql = (f"SELECT {_SYMBOL_COLUMNS} FROM symbols s JOIN files f ON f.id = s.file_id "
+               "WHERE s.complexity IS NOT NULL")
+        params: List[Any] = []
+        if file:
+            sql += " AND f.path = ?"
+            params.append(file)
+        return self._rows(sql + " ORDER BY s.complexity DESC, f.path, s.start_line LIMIT ?",
+                          params + [limit])
+
+    def function_metrics(self, file: Optional[str] = None) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """(key, file, {complexity, metrics}) of every function and method, optionally in one file."""
+        sql = ("SELECT s.key, f.path, s.complexity, s.attrs FROM symbols s "
+               "JOIN files f ON f.id = s.file_id WHERE s.kind IN ('function', 'method')")
+        params: List[Any] = []
+        if file:
+            sql += " AND f.path = ?"
+            params.append(file)
+        rows = []
+        for key, path, complexity, attrs in self.conn.execute(sql + " ORDER BY s.id", params):
+            metrics = json.loads(attrs).get("metrics") if attrs else None
+            rows.append((key, path, {"complexity": complexity, "metrics": metrics}))
+        return rows
+
+    def file_symbols(self, file: str) -> List[Dict[str, Any]]:
+        return self._rows(
+            f"SELECT {_SYMBOL_COLUMNS} FROM symbols s JOIN files f ON f.id = s.file_id "
+            "WHERE f.path = ? AND s.kind != 'module' ORDER BY s.start_line, s.id", (file,))
+
+    def symbol_details(self, key: str) -> Optional[Dict[str, Any]]:
+        """A symbol with its parent's key and its stored attributes (parameters, docstring...)."""
+        rows = self._rows(f"SELECT {_SYMBOL_COLUMNS}, p.key AS parent, s.attrs FROM symbols s "
+                          "JOIN files f ON f.id = s.file_id LEFT JOIN symbols p ON p.id = s.parent_id "
+                          "WHERE s.key = ?", (key,))
+        if not rows:
+            return None
+        attrs = rows[0].pop("attrs")
+        return dict(json.loads(attrs) if attrs else {}, **rows[0])
+
+    def members(self, key: str) -> List[Dict[str, Any]]:
+        """Symbols directly inside `key` (a class's methods, a module's top-level symbols), with attributes."""
+        rows = self._rows(f"SELECT {_SYMBOL_COLUMNS}, s.attrs FROM symbols s "
+                          "JOIN files f ON f.id = s.file_id "
+                          "WHERE s.parent_id = (SELECT id FROM symbols WHERE key = ?) "
+                          "ORDER BY s.start_line, s.id", (key,))
+        for row in rows:
+            attrs = row.pop("attrs")
+            row.update(json.loads(attrs) if attrs else {})
+        return rows
+
+    def edge_names(self, key: str, kind: str) -> List[str]:
+        """Target names of the `kind` edges out of a symbol, e.g. a module's imports or a class's bases."""
+        return [row[0] for row in self.conn.execute(
+            "SELECT dst_name FROM edges WHERE kind = ? AND src = (SELECT id FROM symbols WHERE key = ?) "
+            "ORDER BY rowid", (kind, key))]
+
+    def clone_groups(self, function: Optional[str] = None, kind: Optional[str] = None,
+                     limit: int = 100) -> List[Dict[str, Any]]:
+        """Clone groups, largest first, optionally only those of `function` (a key) or of one kind."""
+        sql = "SELECT group_id, kind, similarity, COUNT(*) AS size FROM clones WHERE 1"
+        params: List[Any] = []
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        if function:
+            sql += (" AND group_id IN (SELECT group_id FROM clones "
+                    "WHERE function_id = (SELECT id FROM symbols WHERE key = ?))")
+            params.append(function)
+        groups = self._rows(sql + " GROUP BY group_id ORDER BY size DESC, group_id LIMIT ?",
+                            params + [limit])
+        for group in groups:
+            group["functions"] = self._rows(
+                f"SELECT {_SYMBOL_COLUMNS} FROM clones c JOIN symbols s ON s.id = c.function_id "
+                "JOIN files f ON f.id = s.file_id WHERE c.group_id = ? ORDER BY f.path, s.start_line",
+                (group["group_id"],))
+        return groups
+
+    def function_keys(self, target: str) -> List[str]:
+        """Keys of the functions and methods `target` names (itself if it is a key)."""
+        if "::" in target:
+            return [row[0] for row in self.conn.execute(
+                "SELECT key FROM symbols WHERE key = ?", (target,))]
+        return [row[0] for row in self.conn.execute(
+            "SELECT key FROM symbols WHERE name = ? AND kind IN ('function', 'method') ORDER BY id",
+            (target,))]
+
+    def call_graph(self) -> Tuple[List[str], List[Tuple[int, int]]]:
+        """Function keys and resolved call edges between them, as dense ids."""
+        keys, ids = [], {}
+        for sid, key in self.conn.execute(
+                "SELECT id, key FROM symbols WHERE kind IN ('function', 'method') ORDER BY id"):
+            ids[sid] = len(keys)
+            keys.append(key)
+        edges = [(ids[src], ids[dst]) for src, dst in self.conn.execute(
+            f"SELECT DISTINCT src, dst FROM edges WHERE kind = '{CALLS}' AND dst IS NOT NULL")]
+        return keys, edges
+
+    def flow_graph(self, function_key: str, graph_kind: str = "cfg") -> Optional[Dict[str, Any]]:
+        """Nodes and edges of a function's CFG or PDG, or None if not stored."""
+        row = self.conn.execute("SELECT id FROM symbols WHERE key = ?", (function_key,)).fetchone()
+        if row is None:
+            return None
+        function_id = row[0]
+        nodes = self._rows("SELECT id, key, type, label, attrs FROM flow_nodes "
+                           "WHERE function_id = ? AND graph = ? ORDER BY id", (function_id, graph_kind))
+        if not nodes:
+            return None
+        keys = {n.pop("id"): n["key"] for n in nodes}
+        edges = self._rows("SELECT src, dst, type, label, attrs FROM flow_edges "
+                           "WHERE function_id = ? AND graph = ?", (function_id, graph_kind))
+        for item in nodes + edges:
+            attrs = item.pop("attrs")
+            if attrs:
+                item.update(json.loads(attrs))
+        for edge in edges:
+            edge["src"], edge["dst"] = keys[edge["src"]], keys[edge["dst"]]
+        return {"function": function_key, "graph": graph_kind, "nodes": nodes, "edges": edges}
+
+    def function_summary(self, function_key: str) -> Optional[Dict[str, Any]]:
+        """Interprocedural summary of a function, or None if not stored."""
+        row = self.conn.execute(
+            "SELECT fs.hash, fs.summary FROM function_summaries fs "
+            "JOIN symbols s ON s.id = fs.function_id WHERE s.key = ?", (function_key,)).fetchone()
+        if row is None:
+            return None
+        return dict(json.loads(row["summary"]), function=function_key, hash=row["hash"])
+
+    def interprocedural_edges(self, function_key: str,
+                              kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Interprocedural PDG edges into or out of a function's PDG."""
+        sql = ("SELECT e.kind, ss.key AS src_function, sn.key AS src, ds.key AS dst_function, "
+               "dn.key AS dst, e.variable FROM interprocedural_edges e "
+               "JOIN symbols ss ON ss.id = e.src_function JOIN flow_nodes sn ON sn.id = e.src "
+               "JOIN symbols ds ON ds.id = e.dst_function JOIN flow_nodes dn ON dn.id = e.dst "
+               "WHERE {} = (SELECT id FROM symbols WHERE key = ?)")
+        params: List[Any] = [function_key]
+        extra = ""
+        if kind:
+            extra = " AND e.kind = ?"
+            params.append(kind)
+        return (self._rows(sql.format("e.src_function") + extra, params)
+                + self._rows(sql.format("e.dst_function") + extra + " AND e.src_function != e.dst_function",
+                             params))
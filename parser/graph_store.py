@@ -0,0 +1,344 @@
+"""
+Single-file binary graph store.
+
+Many graphs (the repo HPG, the hybrid graph, one CFG/PDG per function, ...)
+are written into one `.ciqg` file as named subgraphs. The file holds a
+string table, a node table, an edge table sorted by source (with CSR
+offsets) and a name-sorted subgraph index. It is opened with mmap, and
+loading one subgraph decodes only that subgraph's rows and strings, so a
+single function's CFG can be read without touching the rest of the file.
+
+Layout (little-endian, every section 8-byte aligned; arrays are mapped in
+native byte order, so big-endian hosts are not supported):
+
+    header      magic "CIQG", version, counts, section offsets
+    strings     u64 offsets[n_strings + 1] + UTF-8 data
+    nodes       u32 key[n]  i32 type[n]  i32 attrs[n]       (string ids, -1 = none)
+    edges       u32 src[m]  u32 dst[m]  i32 attrs[m]  u8 kind[m]
+    csr         u32 offsets[n + 1]       (edges of node i: offsets[i]..offsets[i+1])
+    subgraphs   u32 (name, node_start, node_count, edge_start, edge_count)[k]
+
+Attributes are stored as compact JSON strings, interned so identical
+attribute sets are stored once. GraphML and node-link JSON remain
+available as optional export formats in the graph modules.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from graph_core import CompactGraph, EdgeKind, StringTable, edge_kind_or_other
+
+MAGIC = b"CIQG"
+VERSION = 1
+STORE_EXTENSION = ".ciqg"
+
+# magic, version, reserved, n_strings, n_nodes, n_edges, n_subgraphs,
+# then offsets of: string offsets, string data, nodes, edges, csr, subgraphs
+_HEADER = struct.Struct("<4sHHIIII6Q")
+_SUBGRAPH_FIELDS = 5
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def attrs_json(attrs: Dict[str, Any]) -> Optional[str]:
+    """Canonical JSON of an attribute dict (None when empty), as both stores keep it."""
+    if not attrs:
+        return None
+    return json.dumps(attrs, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def graph_items(graph) -> Tuple[List[Tuple[str, Dict]], List[Tuple[str, str, EdgeKind, Dict]]]:
+    """Nodes and edges of an nx graph or CompactGraph as plain tuples."""
+    if isinstance(graph, CompactGraph):
+        nodes = [(graph.name(i), graph.node_attrs(i)) for i in range(graph.number_of_nodes())]
+        edges = []
+        for e in range(graph.number_of_edges()):
+            u, v, kind = graph.edge(e)
+            attrs = graph.edge_attrs(e)
+            attrs.pop("kind", None)
+            edges.append((graph.name(u), graph.name(v), kind, attrs))
+        return nodes, edges
+
+    nodes = [(str(n), dict(d)) for n, d in graph.nodes(data=True)]
+    edges = []
+    for u, v, d in graph.edges(data=True):
+        d = dict(d)
+        kind = edge_kind_or_other(d.pop("kind", None) or d.get("type") or d.get("relationship"))
+        edges.append((str(u), str(v), kind, d))
+    return nodes, edges
+
+
+class GraphStoreWriter:
+    """Collects named graphs and writes them as one store file."""
+
+    def __init__(self):
+        self.strings = StringTable()
+        self.node_key = array("I")
+        self.node_type = array("i")
+        self.node_attrs = array("i")
+        self.edge_src = array("I")
+        self.edge_dst = array("I")
+        self.edge_attrs = array("i")
+        self.edge_kind = array("B")
+        self.subgraphs: Dict[str, Tuple[int, int, int, int]] = {}
+
+    def _string_id(self, value: Optional[str]) -> int:
+        return -1 if value is None else self.strings.intern(value)
+
+    def add(self, name: str, graph):
+        """Append `graph` (nx graph or CompactGraph) as subgraph `name`."""
+        if name in self.subgraphs:
+            raise ValueError(f"Duplicate subgraph name: {name}")
+        nodes, edges = graph_items(graph)
+        node_start = len(self.node_key)
+        edge_start = len(self.edge_src)
+
+        local = {}
+        for key, attrs in nodes:
+            local[key] = node_start + len(local)
+            node_type = attrs.pop("type", None)
+            self.node_key.append(self.strings.intern(key))
+            self.node_type.append(self._string_id(node_type if isinstance(node_type, str) else None))
+            if node_type is not None and not isinstance(node_type, str):
+                attrs["type"] = node_type
+            self.node_attrs.append(self._string_id(attrs_json(attrs)))
+
+        # Edges sorted by source so each node's out-edges are contiguous
+        for u, v, kind, attrs in sorted(edges, key=lambda edge: local[edge[0]]):
+            self.edge_src.append(local[u])
+            self.edge_dst.append(local[v])
+            self.edge_kind.append(kind)
+            self.edge_attrs.append(self._string_id(attrs_json(attrs)))
+
+        self.subgraphs[name] = (node_start, len(local), edge_start, len(edges))
+
+    def _csr(self) -> array:
+        offsets = array("I", bytes(4 * (len(self.node_key) + 1)))
+        for u in self.edge_src:
+            offsets[u + 1] += 1
+        for i in range(len(self.node_key)):
+            offsets[i + 1] += offsets[i]
+        return offsets
+
+    def write(self, path: str) -> str:
+        """Write the store atomically (temporary file + rename) and return `path`."""
+        # Sorted by UTF-8 bytes, the order GraphStore._find searches in
+        index = array("I")
+        for name in sorted(self.subgraphs, key=lambda n: n.encode("utf-8")):
+            index.append(self.strings.intern(name))
+            index.extend(self.subgraphs[name])
+
+        encoded = [s.encode("utf-8") for s in self.strings.strings]
+        string_offsets = array("Q", [0])
+        for data in encoded:
+            string_offsets.append(string_offsets[-1] + len(data))
+
+        sections = [
+            string_offsets.tobytes(),
+            b"".join(encoded),
+            self.node_key.tobytes() + self.node_type.tobytes() + self.node_attrs.tobytes(),
+            (self.edge_src.tobytes() + self.edge_dst.tobytes()
+             + self.edge_attrs.tobytes() + self.edge_kind.tobytes()),
+            self._csr().tobytes(),
+            index.tobytes(),
+        ]
+        offsets = []
+        position = _align(_HEADER.size)
+        for data in sections:
+            offsets.append(position)
+            position = _align(position + len(data))
+
+        header = _HEADER.pack(MAGIC, VERSION, 0, len(encoded), len(self.node_key),
+                              len(self.edge_src), len(self.subgraphs), *offsets)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(header)
+            for offset, data in zip(offsets, sections):
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(data)
+        os.replace(tmp, path)
+        return path
+
+
+def save_graphs(path: str, graphs: Dict[str, Any]) -> str:
+    """Write {name: graph} to a store file at `path`."""
+    writer = GraphStoreWriter()
+    for name, graph in graphs.items():
+        writer.add(name, graph)
+    return writer.write(path)
+
+
+class GraphStore:
+    """Read-only, memory-mapped view of a store file."""
+
+    def __init__(self, path: str):
+        if sys.byteorder != "little":
+            raise RuntimeError("Graph stores can only be mapped on little-endian hosts")
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buf = memoryview(self._mm)
+
+        (magic, version, _, self.n_strings, self.n_nodes, self.n_edges, self.n_subgraphs,
+         off_strings, off_data, off_nodes, off_edges, off_csr, off_index) = _HEADER.unpack_from(self._buf)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a graph store")
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"{path} has unsupported store version {version}")
+
+        n, m = self.n_nodes, self.n_edges
+        self._string_offsets = self._view(off_strings, "Q", self.n_strings + 1)
+        self._data_offset = off_data
+        self._node_key = self._view(off_nodes, "I", n)
+        self._node_type = self._view(off_nodes + 4 * n, "i", n)
+        self._node_attrs = self._view(off_nodes + 8 * n, "i", n)
+        self._edge_src = self._view(off_edges, "I", m)
+        self._edge_dst = self._view(off_edges + 4 * m, "I", m)
+        self._edge_attrs = self._view(off_edges + 8 * m, "i", m)
+        self._edge_kind = self._view(off_edges + 12 * m, "B", m)
+        self._csr = self._view(off_csr, "I", n + 1)
+        self._index = self._view(off_index, "I", self.n_subgraphs * _SUBGRAPH_FIELDS)
+        self._views = [self._string_offsets, self._node_key, self._node_type, self._node_attrs,
+                       self._edge_src, self._edge_dst, self._edge_attrs, self._edge_kind,
+                       self._csr, self._index]
+
+    def _view(self, offset: int, fmt: str, count: int) -> memoryview:
+        size = struct.calcsize(fmt)
+        return self._buf[offset:offset + size * count].cast(fmt)
+
+    def close(self):
+        for view in getattr(self, "_views", []):
+            view.release()
+        self._views = []
+        if getattr(self, "_buf", None) is not None:
+            self._buf.release()
+            self._buf = None
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- strings / index ----------
+
+    def string(self, sid: int) -> Optional[str]:
+        if sid < 0:
+            return None
+        start = self._data_offset + self._string_offsets[sid]
+        end = self._data_offset + self._string_offsets[sid + 1]
+        return bytes(self._buf[start:end]).decode("utf-8")
+
+    def _attrs(self, sid: int) -> Dict[str, Any]:
+        return json.loads(self.string(sid)) if sid >= 0 else {}
+
+    def _entry(self, k: int) -> Tuple[int, int, int, int, int]:
+        base = k * _SUBGRAPH_FIELDS
+        return tuple(self._index[base:base + _SUBGRAPH_FIELDS])
+
+    def _find(self, name: str) -> Optional[Tuple[int, int, int, int]]:
+        """Binary search of the name-sorted subgraph index."""
+        target = name.encode("utf-8")
+        lo, hi = 0, self.n_subgraphs
+        while lo < hi:
+            mid = (lo + hi) // 2
+            sid = self._index[mid * _SUBGRAPH_FIELDS]
+            start = self._data_offset + self._string_offsets[sid]
+            key = bytes(self._buf[start:self._data_offset + self._string_offsets[sid + 1]])
+            if key < target:
+                lo = mid + 1
+            elif key > target:
+                hi = mid
+            else:
+                return self._entry(mid)[1:]
+        return None
+
+    def __contains__(self, name: str) -> bool:
+        return self._find(name) is not None
+
+    def __len__(self):
+        return self.n_subgraphs
+
+    def names(self) -> Iterator[str]:
+        for k in range(self.n_subgraphs):
+            yield self.string(self._index[k * _SUBGRAPH_FIELDS])
+
+    def _range(self, name: str) -> Tuple[int, int, int, int]:
+        entry = self._find(name)
+        if entry is None:
+            raise KeyError(name)
+        return entry
+
+    def stats(self, name: str) -> Dict[str, int]:
+        _, node_count, _, edge_count = self._range(name)
+        return {"nodes": node_count, "edges": edge_count}
+
+    # ---------- loading ----------
+
+    def _rows(self, name: str):
+        node_start, node_count, edge_start, edge_count = self._range(name)
+        keys = [self.string(self._node_key[i]) for i in range(node_start, node_start + node_count)]
+        nodes = []
+        for offset, key in enumerate(keys):
+            i = node_start + offset
+            attrs = self._attrs(self._node_attrs[i])
+            node_type = self.string(self._node_type[i])
+            if node_type is not None:
+                attrs["type"] = node_type
+            nodes.append((key, attrs))
+        edges = []
+        for e in range(edge_start, edge_start + edge_count):
+            edges.append((keys[self._edge_src[e] - node_start], keys[self._edge_dst[e] - node_start],
+                          EdgeKind(self._edge_kind[e]), self._attrs(self._edge_attrs[e])))
+        return nodes, edges
+
+    def load(self, name: str):
+        """Subgraph `name` as a regular nx.DiGraph with its original attributes."""
+        import networkx as nx
+
+        nodes, edges = self._rows(name)
+        graph = nx.DiGraph()
+        graph.add_nodes_from(nodes)
+        graph.add_edges_from((u, v, attrs) for u, v, _, attrs in edges)
+        return graph
+
+    def load_compact(self, name: str) -> CompactGraph:
+        """Subgraph `name` as a CompactGraph."""
+        nodes, edges = self._rows(name)
+        core = CompactGraph()
+        for key, attrs in nodes:
+            core.add_node(key, type=attrs.pop("type", None), **attrs)
+        for u, v, kind, attrs in edges:
+            edge_type = attrs.pop("type", None)
+            core.add_edge(u, v, kind, edge_type, **attrs)
+        return core
+
+    def successors(self, name: str, key: str) -> List[str]:
+        """Successor keys of node `key` in subgraph `name`, read from the CSR arrays."""
+        node_start, node_count, _, _ = self._range(name)
+        for i in range(node_start, node_start + node_count):
+            if self.string(self._node_key[i]) == key:
+                return [self.string(self._node_key[self._edge_dst[e]])
+                        for e in range(self._csr[i], self._csr[i + 1])]
+        raise KeyError(key)
+
+
+def iter_subgraphs(path: str, prefix: str = "") -> Iterable[Tuple[str, Any]]:
+    """Yield (name, nx.DiGraph) for every subgraph whose name starts with `prefix`."""
+    with GraphStore(path) as store:
+        for name in list(store.names()):
+            if name.startswith(prefix):
+                yield name, store.load(name)
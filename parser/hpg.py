@@ -1,12 +1,21 @@
 import json
-import networkx as nx
-import matplotlib.pyplot as plt
-from collections import defaultdict
+from lazy_imports import lazy_import
+from class_hierarchy import ClassHierarchy
+from clones import clone_groups
+from graph_core import CompactGraph
+from graph_store import STORE_EXTENSION, save_graphs
+from metrics import MetricsTable, value_counts
+from telemetry import count, timed
+
+nx = lazy_import("networkx")
+plt = lazy_import("matplotlib.pyplot")
 
 class HPGGenerator:
     def __init__(self, ir_data):
         self.ir_data = ir_data
-        self.graph = nx.DiGraph()
+        # Built in a CompactGraph; `graph` is its networkx view for drawing and metrics
+        self.core = CompactGraph()
+        self.graph = self.core.to_networkx()
         
         # Color scheme for different node types
         self.colors = {
@@ -15,7 +24,8 @@ class HPGGenerator:
             'function': '#45B7D1',
             'method': '#96CEB4',
             'variable': '#FFEAA7',
-            'import': '#DDA0DD'
+            'import': '#DDA0DD',
+            'clone_group': '#F4A261'
         }
         
         # Size scheme
@@ -25,18 +35,27 @@ class HPGGenerator:
             'function': 1500,
             'method': 1200,
             'variable': 800,
-            'import': 1000
+            'import': 1000,
+            'clone_group': 1000
         }
 
     def add_node_with_metadata(self, node_id, label, node_type, **attrs):
         """Add node with consistent styling"""
-        self.graph.add_node(node_id, 
-                           label=label, 
+        self.core.add_node(node_id,
                            type=node_type,
+                           label=label,
                            color=self.colors[node_type],
                            size=self.sizes[node_type],
                            **attrs)
 
+    def add_relationship(self, u, v, relationship, **attrs):
+        """
+        Add an edge whose kind and type are `relationship`. Callers pass each
+        (u, v) pair once, as a DiGraph would keep a single edge for it.
+        """
+        self.core.add_edge(u, v, relationship, **attrs)
+
+    @timed("hpg")
     def build_hpg(self):
         """Build the Hierarchical Program Graph"""
         print("🏗️ Building HPG...")
@@ -46,10 +65,15 @@ class HPGGenerator:
             self._add_file_nodes(file_ir)
         
         # Second pass: Add relationships
+        hierarchy = ClassHierarchy(self.ir_data)
         for file_ir in self.ir_data:
-            self._add_relationships(file_ir)
+            self._add_relationships(file_ir, hierarchy)
         
-        print(f"✅ HPG built with {self.graph.number_of_nodes()} nodes and {self.graph.number_of_edges()} edges")
+        # Third pass: Link cloned functions
+        self._add_clone_groups()
+        
+        count("graph_nodes_total", self.core.number_of_nodes(), graph="hpg")
+        print(f"✅ HPG built with {self.core.number_of_nodes()} nodes and {self.core.number_of_edges()} edges")
         return self.graph
 
     def _add_file_nodes(self, file_ir):
@@ -64,14 +88,14 @@ class HPGGenerator:
         )
 
         # Add imports
-        for imp in file_ir.get('imports', []):
+        for imp in dict.fromkeys(file_ir.get('imports', [])):
             import_id = f"import_{file_ir['file_name']}_{imp}"
             self.add_node_with_metadata(
                 import_id,
                 f"📦 {imp}",
                 'import'
             )
-            self.graph.add_edge(file_id, import_id, relationship="imports")
+            self.add_relationship(file_id, import_id, "imports")
 
         # Add functions
         for func in file_ir['functions']:
@@ -84,7 +108,7 @@ class HPGGenerator:
                 complexity=func['complexity'],
                 lines=func['end_line'] - func['start_line'] + 1
             )
-            self.graph.add_edge(file_id, func_id, relationship="contains")
+            self.add_relationship(file_id, func_id, "contains")
 
         # Add classes and their methods
         for cls in file_ir['classes']:
@@ -96,7 +120,7 @@ class HPGGenerator:
                 methods=len(cls['methods']),
                 attributes=len(cls['attributes'])
             )
-            self.graph.add_edge(file_id, class_id, relationship="contains")
+            self.add_relationship(file_id, class_id, "contains")
 
             # Add methods
             for method in cls['methods']:
@@ -108,7 +132,7 @@ class HPGGenerator:
                     params=len(method['parameters']),
                     complexity=method['complexity']
                 )
-                self.graph.add_edge(class_id, method_id, relationship="contains")
+                self.add_relationship(class_id, method_id, "contains")
 
         # Add variables
         for var in file_ir['variables']:
@@ -118,54 +142,40 @@ class HPGGenerator:
                 f"📝 {var['name']}",
                 'variable'
             )
-            self.graph.add_edge(file_id, var_id, relationship="contains")
+            self.add_relationship(file_id, var_id, "contains")
 
-    def _add_relationships(self, file_ir):
-        """Add call relationships and dependencies"""
+    def _add_relationships(self, file_ir, hierarchy):
+        """Add call relationships (resolved through the class hierarchy) and inheritance"""
+        functions = list(file_ir['functions'])
+        for cls in file_ir['classes']:
+            functions.extend(cls['methods'])
+            bases = {}
+            for base_id, _, kind in hierarchy.bases_of(cls['id']):
+                if base_id is not None:
+                    bases.setdefault(base_id, kind)
+            for base_id, kind in bases.items():
+                # "kind" is the edge kind in a CompactGraph; extends/implements goes here
+                self.add_relationship(cls['id'], base_id, "inherits", inheritance=kind)
         
-        # Function calls within the same file
-        for func in file_ir['functions']:
-            for call in func['calls']:
-                # Try to find the called function in the same file
-                for target_func in file_ir['functions']:
-                    if target_func['name'] == call:
-                        self.graph.add_edge(
-                            func['id'], 
-                            target_func['id'], 
-                            relationship="calls"
-                        )
-                
-                # Try to find in class methods
-                for cls in file_ir['classes']:
-                    for method in cls['methods']:
-                        if method['name'] == call:
-                            self.graph.add_edge(
-                                func['id'],
-                                method['id'],
-                                relationship="calls"
-                            )
+        for func in functions:
+            targets = dict.fromkeys(target for _, found in hierarchy.resolve_calls(func)
+                                    for target in found)
+            for target in targets:
+                self.add_relationship(func['id'], target, "calls")
 
-        # Method calls within classes
-        for cls in file_ir['classes']:
-            for method in cls['methods']:
-                for call in method['calls']:
-                    # Check other methods in same class
-                    for target_method in cls['methods']:
-                        if target_method['name'] == call:
-                            self.graph.add_edge(
-                                method['id'],
-                                target_method['id'],
-                                relationship="calls"
-                            )
-                    
-                    # Check functions in same file
-                    for target_func in file_ir['functions']:
-                        if target_func['name'] == call:
-                            self.graph.add_edge(
-                                method['id'],
-                                target_func['id'],
-                                relationship="calls"
-                            )
+    def _add_clone_groups(self):
+        """Link each group of exact or near-miss clones (see clones.py) through a clone_group node"""
+        for i, group in enumerate(clone_groups(self.ir_data), 1):
+            group_id = f"clones_{i}"
+            self.add_node_with_metadata(
+                group_id,
+                f"🧬 {len(group['functions'])} {group['kind']} clones",
+                'clone_group',
+                kind=group['kind'],
+                similarity=group['similarity']
+            )
+            for func_id in group['functions']:
+                self.add_relationship(group_id, func_id, "clone")
 
     def visualize(self, output_file='hpg_visualization.png', layout='spring'):
         """Visualize the HPG"""
@@ -201,9 +211,11 @@ class HPGGenerator:
         # Draw edges with different styles for different relationships
         edge_colors = []
         for u, v, data in self.graph.edges(data=True):
-            rel = data.get('relationship', 'contains')
+            rel = data.get('type', 'contains')
             if rel == 'calls':
                 edge_colors.append('red')
+            elif rel == 'inherits':
+                edge_colors.append('orange')
             elif rel == 'imports':
                 edge_colors.append('purple')
             else:  # contains
@@ -248,6 +260,7 @@ class HPGGenerator:
             plt.Line2D([0], [0], color='gray', label='Contains'),
             plt.Line2D([0], [0], color='red', label='Calls'),
             plt.Line2D([0], [0], color='purple', label='Imports'),
+            plt.Line2D([0], [0], color='orange', label='Inherits'),
         ]
         
         plt.legend(handles=legend_elements, loc='upper left', bbox_to_anchor=(0, 1))
@@ -257,33 +270,38 @@ class HPGGenerator:
         nx.write_graphml(self.graph, output_file)
         print(f"✅ GraphML exported to {output_file}")
 
+    def export_store(self, output_file='hpg' + STORE_EXTENSION):
+        """Save the graph to a binary graph store (subgraph 'hpg')"""
+        save_graphs(output_file, {"hpg": self.core})
+        print(f"✅ Graph store saved to {output_file}")
+
     def analyze_metrics(self):
         """Analyze graph metrics"""
         print("\n📊 HPG Metrics:")
         print(f"   Total nodes: {self.graph.number_of_nodes()}")
         print(f"   Total edges: {self.graph.number_of_edges()}")
         
-        # Node type distribution
-        node_types = [data['type'] for _, data in self.graph.nodes(data=True)]
-        type_counts = defaultdict(int)
-        for node_type in node_types:
-            type_counts[node_type] += 1
-        
+        # Node and edge type distributions
         print("\n   Node Distribution:")
-        for node_type, count in type_counts.items():
+        for node_type, count in value_counts(t for _, t in self.graph.nodes(data='type')).items():
             print(f"     {node_type}: {count}")
         
-        # Edge type distribution
-        edge_types = [data.get('relationship', 'unknown') 
-                     for _, _, data in self.graph.edges(data=True)]
-        edge_counts = defaultdict(int)
-        for edge_type in edge_types:
-            edge_counts[edge_type] += 1
-        
         print("\n   Edge Distribution:")
-        for edge_type, count in edge_counts.items():
+        edge_types = (t for _, _, t in self.graph.edges(data='type', default='unknown'))
+        for edge_type, count in value_counts(edge_types).items():
             print(f"     {edge_type}: {count}")
         
+        # Code metrics of all functions and methods
+        table = MetricsTable.from_summaries(self.ir_data)
+        if len(table):
+            print(f"\n   Code Metrics ({len(table)} functions):")
+            for name in ("complexity", "sloc", "nesting_depth", "volume"):
+                quantiles = ", ".join(f"{p}={v}" for p, v in table.percentiles(name).items())
+                print(f"     {name}: {quantiles}")
+            print("     Most complex:")
+            for row in table.top("complexity", 5):
+                print(f"       {row['function']}: {row['complexity']:g}")
+        
         # Graph density
         density = nx.density(self.graph)
         print(f"\n   Graph density: {density:.3f}")
@@ -312,7 +330,7 @@ class HPGGenerator:
 # MAIN EXECUTION (Fixed)
 # -------------------------------
 
-def main():
+def main(export_graphml=False):
     # Load your IR data
     try:
         with open('ir_output.json', 'r', encoding='utf-8') as f:
@@ -340,8 +358,10 @@ def main():
         print(f"⚠️  Graph has {graph.number_of_nodes()} nodes - too large for clear visualization")
         print("   Consider using the interactive version or GraphML export")
     
-    # Export for external tools
-    hpg_generator.export_graphml('hpg_graph.graphml')
+    # Save the graph; GraphML only on request
+    hpg_generator.export_store('hpg' + STORE_EXTENSION)
+    if export_graphml:
+        hpg_generator.export_graphml('hpg_graph.graphml')
     
     # Print some sample nodes and edges
     print("\n🔍 Sample Nodes:")
@@ -350,7 +370,7 @@ def main():
     
     print("\n🔍 Sample Edges:")
     for i, (u, v, data) in enumerate(list(graph.edges(data=True))[:5]):
-        print(f"   {u} --[{data.get('relationship', 'unknown')}]--> {v}")
+        print(f"   {u} --[{data.get('type', 'unknown')}]--> {v}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,420 @@
+"""
+Incrementally maintained call graph: SCCs, topological order and reach sets.
+
+Edge and node changes are applied in place instead of rebuilding:
+
+- inserting an edge that agrees with the current topological order costs
+  O(1); one that contradicts it reorders only the components between its
+  endpoints (Pearce-Kelly), merging them into one component when the edge
+  closes a cycle;
+- deleting an edge between components never invalidates the order;
+  deleting one inside a component re-runs Tarjan on that component only
+  and splits it in place;
+- reach sets are computed on demand and cached per component; a change
+  drops only the caches of the components upstream (forward sets) or
+  downstream (backward sets) of it.
+
+`update_files` turns re-parsed file summaries into these edits, so after a
+change only the edited files' calls and the callers of names they define
+or drop are re-resolved.
+"""
+
+from collections import Counter
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from reachability import ReachabilityIndex, csr, strongly_connected_components
+from telemetry import count, span
+
+# Spacing of topological positions, so splits rarely need a renumbering
+ORDER_GAP = 1024
+
+
+class IncrementalCallGraph:
+    """Directed graph over string keys with live SCCs and topological order."""
+
+    def __init__(self):
+        self.succ: Dict[str, Set[str]] = {}
+        self.pred: Dict[str, Set[str]] = {}
+        self.comp_of: Dict[str, int] = {}
+        self.members: Dict[int, Set[str]] = {}
+        # Edge counts between components
+        self.csucc: Dict[int, Counter] = {}
+        self.cpred: Dict[int, Counter] = {}
+        # Position of each component; callers come before callees
+        self.order: Dict[int, int] = {}
+        self._used_positions: Set[int] = set()
+        self._next_comp = 0
+        self._next_position = 0
+        self._forward_cache: Dict[int, FrozenSet[int]] = {}
+        self._backward_cache: Dict[int, FrozenSet[int]] = {}
+        # File-level bookkeeping for update_files
+        self.file_functions: Dict[str, Set[str]] = {}
+        self.function_info: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {}  # key -> (path, name, calls)
+        self.definitions: Dict[str, Set[str]] = {}      # name -> keys
+        self.callers_of: Dict[str, Set[str]] = {}       # name -> keys of functions calling it
+
+    # -- components -----------------------------------------------------
+    def _new_component(self, members: Set[str], position: int) -> int:
+        c = self._next_comp
+        self._next_comp += 1
+        self.members[c] = members
+        for key in members:
+            self.comp_of[key] = c
+        self.csucc[c] = Counter()
+        self.cpred[c] = Counter()
+        self.order[c] = position
+        self._used_positions.add(position)
+        return c
+
+    def _drop_component(self, c: int):
+        self._used_positions.discard(self.order.pop(c))
+        del self.members[c], self.csucc[c], self.cpred[c]
+        self._forward_cache.pop(c, None)
+        self._backward_cache.pop(c, None)
+
+    def _link(self, a: int, b: int, n: int = 1):
+        self.csucc[a][b] += n
+        self.cpred[b][a] += n
+
+    def _unlink(self, a: int, b: int, n: int = 1):
+        for counts, key in ((self.csucc[a], b), (self.cpred[b], a)):
+            counts[key] -= n
+            if counts[key] <= 0:
+                del counts[key]
+
+    def _invalidate(self, c: int, forward: bool):
+        """Drop cached reach sets that may contain c's changes."""
+        cache = self._forward_cache if forward else self._backward_cache
+        neighbours = self.cpred if forward else self.csucc
+        stack = [c]
+        while stack:
+            x = stack.pop()
+            # A component without a cache has no cached component upstream of it
+            if cache.pop(x, None) is not None or x == c:
+                stack.extend(neighbours[x])
+
+    def _renumber(self, gap: int = ORDER_GAP):
+        ordered = sorted(self.order, key=self.order.get)
+        self.order = {c: i * gap for i, c in enumerate(ordered)}
+        self._used_positions = set(self.order.values())
+        self._next_position = len(ordered) * gap
+        count("incremental_renumbers_total")
+
+    # -- nodes and edges -----------------------------------------------
+    def add_node(self, key: str):
+        if key in self.succ:
+            return
+        self.succ[key] = set()
+        self.pred[key] = set()
+        self._new_component({key}, self._next_position)
+        self._next_position += ORDER_GAP
+
+    def remove_node(self, key: str):
+        if key not in self.succ:
+            return
+        for v in list(self.succ[key]):
+            self.remove_edge(key, v)
+        for u in list(self.pred[key]):
+            self.remove_edge(u, key)
+        self._drop_component(self.comp_of.pop(key))
+        del self.succ[key], self.pred[key]
+
+    def add_edge(self, u: str, v: str):
+        self.add_node(u)
+        self.add_node(v)
+        if v in self.succ[u]:
+            return
+        self.succ[u].add(v)
+        self.pred[v].add(u)
+        cu, cv = self.comp_of[u], self.comp_of[v]
+        if cu == cv:
+            return
+        new_link = cv not in self.csucc[cu]
+        self._link(cu, cv)
+        if not new_link:
+            return
+        self._invalidate(cu, forward=True)
+        self._invalidate(cv, forward=False)
+        if self.order[cu] > self.order[cv]:
+            self._reorder(cu, cv)
+
+    def _reorder(self, cu: int, cv: int):
+        """Pearce-Kelly: restore the order after inserting cu -> cv against it."""
+        lower, upper = self.order[cv], self.order[cu]
+        forward = self._bounded_search(cv, self.csucc, lambda c: self.order[c] <= upper)
+        backward = self._bounded_search(cu, self.cpred, lambda c: self.order[c] >= lower)
+        cycle = forward & backward if cu in forward else set()
+        positions = sorted(self.order[c] for c in forward | backward)
+        before = sorted(backward - cycle, key=self.order.get)
+        after = sorted(forward - cycle, key=self.order.get)
+        # Upstream components take the lowest freed positions and downstream
+        # ones the highest; a merged cycle fits anywhere in between
+        assigned = list(zip(before, positions))
+        if cycle:
+            assigned.append((self._merge(cycle, positions[len(before)]), positions[len(before)]))
+        assigned.extend(zip(after, positions[len(positions) - len(after):]))
+        for position in positions:
+            self._used_positions.discard(position)
+        for c, position in assigned:
+            self.order[c] = position
+            self._used_positions.add(position)
+        count("incremental_reorders_total")
+
+    @staticmethod
+    def _bounded_search(start: int, neighbours: Dict[int, Counter], inside) -> Set[int]:
+        seen = {start}
+        stack = [start]
+        while stack:
+            for n in neighbours[stack.pop()]:
+                if n not in seen and inside(n):
+                    seen.add(n)
+                    stack.append(n)
+        return seen
+
+    def _merge(self, comps: Set[int], position: int) -> int:
+        """Collapse `comps` (a new cycle) into one component."""
+        members: Set[str] = set()
+        outgoing, incoming = Counter(), Counter()
+        for c in comps:
+            members |= self.members[c]
+            for n, k in self.csucc[c].items():
+                if n not in comps:
+                    outgoing[n] += k
+                    self.cpred[n].pop(c, None)
+            for n, k in self.cpred[c].items():
+                if n not in comps:
+                    incoming[n] += k
+                    self.csucc[n].pop(c, None)
+        for c in comps:
+            self._drop_component(c)
+        merged = self._new_component(members, position)
+        for n, k in outgoing.items():
+            self._link(merged, n, k)
+        for n, k in incoming.items():
+            self._link(n, merged, k)
+        count("incremental_merges_total")
+        return merged
+
+    def remove_edge(self, u: str, v: str):
+        if v not in self.succ.get(u, ()):
+            return
+        self.succ[u].discard(v)
+        self.pred[v].discard(u)
+        cu, cv = self.comp_of[u], self.comp_of[v]
+        if cu != cv:
+            self._unlink(cu, cv)
+            if cv not in self.csucc[cu]:
+                self._invalidate(cu, forward=True)
+                self._invalidate(cv, forward=False)
+        elif u != v:
+            self._split(cu)
+
+    def _split(self, c: int):
+        """Re-run Tarjan inside component c after one of its edges went away."""
+        nodes = sorted(self.members[c])
+        local = {key: i for i, key in enumerate(nodes)}
+        edges = [(local[key], local[w]) for key in nodes for w in self.succ[key] if w in local]
+        offsets, targets = csr(len(nodes), edges)
+        comp, first = strongly_connected_components(len(nodes), offsets, targets)
+        if len(first) == 1:
+            return
+        self._invalidate(c, forward=True)
+        self._invalidate(c, forward=False)
+        # Tarjan numbers sinks first; callers must come first in the order
+        groups: List[Set[str]] = [set() for _ in first]
+        for key, i in local.items():
+            groups[len(first) - 1 - comp[i]].add(key)
+
+        position = self.order[c]
+        if any(position + i in self._used_positions for i in range(1, len(groups))):
+            self._renumber(max(ORDER_GAP, len(groups)))
+            position = self.order[c]
+        for n in self.csucc[c]:
+            self.cpred[n].pop(c, None)
+        for n in self.cpred[c]:
+            self.csucc[n].pop(c, None)
+        self._drop_component(c)
+        pieces = {self._new_component(group, position + i) for i, group in enumerate(groups)}
+        for key in nodes:
+            a = self.comp_of[key]
+            for w in self.succ[key]:
+                b = self.comp_of[w]
+                if a != b:
+                    self._link(a, b)
+            for u in self.pred[key]:
+                if self.comp_of[u] not in pieces:
+                    self._link(self.comp_of[u], a)
+        count("incremental_splits_total")
+
+    # -- file-level updates ---------------------------------------------
+    def _resolve(self, path: str, name: str) -> Set[str]:
+        """Same policy as graph_db: a definition in the same file wins, else every match."""
+        candidates = self.definitions.get(name, set())
+        local = {k for k in candidates if self.function_info[k][0] == path}
+        return local or candidates
+
+    def update_files(self, summaries: Iterable[Dict[str, Any]],
+                     removed_files: Iterable[str] = ()) -> Dict[str, int]:
+        """
+        Apply re-parsed file summaries (symbols.py format) and deleted files.
+
+        Only the changed functions and the callers of names whose set of
+        definitions changed are re-resolved.
+        """
+        with span("incremental_update"):
+            new_defs: Dict[str, Dict[str, Tuple[str, Tuple[str, ...]]]] = {}
+            for summary in summaries:
+                path = summary.get("file_path") or summary["file_name"]
+                functions = list(summary.get("functions", []))
+                for cls in summary.get("classes", []):
+                    functions.extend(cls.get("methods", []))
+                new_defs[path] = {f["id"]: (f["name"], tuple(dict.fromkeys(f.get("calls", []))))
+                                  for f in functions}
+            for path in removed_files:
+                new_defs.setdefault(path, {})
+
+            stats = Counter()
+            dirty_names: Set[str] = set()
+            to_resolve: Set[str] = set()
+            for path, defs in new_defs.items():
+                old_keys = self.file_functions.get(path, set())
+                for key in old_keys - defs.keys():
+                    _, name, calls = self.function_info.pop(key)
+                    self.definitions[name].discard(key)
+                    for callee in calls:
+                        self.callers_of[callee].discard(key)
+                    dirty_names.add(name)
+                    self.remove_node(key)
+                    stats["removed_functions"] += 1
+                for key, (name, calls) in defs.items():
+                    old = self.function_info.get(key)
+                    if old is None:
+                        self.add_node(key)
+                        self.definitions.setdefault(name, set()).add(key)
+                        dirty_names.add(name)
+                        stats["added_functions"] += 1
+                    elif old[2] == calls:
+                        continue
+                    else:
+                        for callee in old[2]:
+                            self.callers_of[callee].discard(key)
+                    self.function_info[key] = (path, name, calls)
+                    for callee in calls:
+                        self.callers_of.setdefault(callee, set()).add(key)
+                    to_resolve.add(key)
+                if defs:
+                    self.file_functions[path] = set(defs)
+                else:
+                    self.file_functions.pop(path, None)
+
+            for name in dirty_names:
+                to_resolve |= self.callers_of.get(name, set())
+            for key in to_resolve:
+                if key not in self.function_info:
+                    continue
+                path, _, calls = self.function_info[key]
+                wanted: Set[str] = set()
+                for callee in calls:
+                    wanted |= self._resolve(path, callee)
+                current = self.succ[key]
+                for v in current - wanted:
+                    self.remove_edge(key, v)
+                    stats["edges_removed"] += 1
+                for v in wanted - current:
+                    self.add_edge(key, v)
+                    stats["edges_added"] += 1
+            stats["resolved_functions"] = len(to_resolve)
+        return dict(stats)
+
+    @classmethod
+    def from_summaries(cls, summaries: Iterable[Dict[str, Any]]) -> "IncrementalCallGraph":
+        graph = cls()
+        graph.update_files(summaries)
+        return graph
+
+    # -- queries ----------------------------------------------------------
+    def _reach_set(self, c: int, forward: bool) -> FrozenSet[int]:
+        cache = self._forward_cache if forward else self._backward_cache
+        neighbours = self.csucc if forward else self.cpred
+        if c in cache:
+            return cache[c]
+        # Iterative post-order so every neighbour's set is ready first
+        stack: List[Tuple[int, bool]] = [(c, False)]
+        while stack:
+            x, ready = stack.pop()
+            if x in cache:
+                continue
+            if ready:
+                reach = {x}
+                for n in neighbours[x]:
+                    reach |= cache[n]
+                cache[x] = frozenset(reach)
+            else:
+                stack.append((x, True))
+                stack.extend((n, False) for n in neighbours[x] if n not in cache)
+        return cache[c]
+
+    def cyclic(self, c: int) -> bool:
+        members = self.members[c]
+        if len(members) > 1:
+            return True
+        key = next(iter(members))
+        return key in self.succ[key]
+
+    def _collect(self, key: str, forward: bool) -> List[str]:
+        c = self.comp_of[key]
+        found: Set[str] = set()
+        for x in self._reach_set(c, forward):
+            found |= self.members[x]
+        if not self.cyclic(c):
+            found.discard(key)
+        return sorted(found)
+
+    def descendants(self, key: str) -> List[str]:
+        """Everything `key` transitively calls."""
+        return self._collect(key, forward=True)
+
+    def ancestors(self, key: str) -> List[str]:
+        """Everything that transitively calls `key`."""
+        return self._collect(key, forward=False)
+
+    def reaches(self, u: str, v: str) -> bool:
+        cu, cv = self.comp_of[u], self.comp_of[v]
+        if cu == cv:
+            return u != v or self.cyclic(cu)
+        limit = self.order[cv]
+        if self.order[cu] > limit:
+            return False
+        if cu in self._forward_cache:
+            return cv in self._forward_cache[cu]
+        return cv in self._bounded_search(cu, self.csucc, lambda c: self.order[c] <= limit)
+
+    def components(self) -> int:
+        return len(self.members)
+
+    def component(self, key: str) -> List[str]:
+        return sorted(self.members[self.comp_of[key]])
+
+    def cycles(self) -> List[List[str]]:
+        return [sorted(self.members[c]) for c in self._ordered() if self.cyclic(c)]
+
+    def _ordered(self) -> List[int]:
+        return sorted(self.order, key=self.order.get)
+
+    def topological_order(self) -> List[List[str]]:
+        """Components ordered callers first."""
+        return [sorted(self.members[c]) for c in self._ordered()]
+
+    def edges(self) -> Iterable[Tuple[str, str]]:
+        for u, vs in self.succ.items():
+            for v in vs:
+                yield u, v
+
+    def to_reachability_index(self, budget: Optional[int] = None) -> ReachabilityIndex:
+        """Static index of the current graph, for bulk queries between updates."""
+        keys = list(self.succ)
+        ids = {k: i for i, k in enumerate(keys)}
+        edges = [(ids[u], ids[v]) for u, v in self.edges()]
+        if budget is None:
+            return ReachabilityIndex(keys, edges)
+        return ReachabilityIndex(keys, edges, budget)
@@ -1,65 +1,172 @@
 import os
-from tree_sitter import Language, Parser
+import sys
+from dataclasses import dataclass
+from languages import get_parser
+from telemetry import count, span
 
-# Load compiled languages (run tree-sitter build once before using)
-LIB_PATH = os.path.join(os.path.dirname(__file__), "build", "my-languages.so")
+# Per-file parse budget defaults
+MAX_FILE_BYTES = 2 * 1024 * 1024          # larger files: declarations of the first MAX_FILE_BYTES only
+MAX_DECLARATION_BYTES = 16 * 1024 * 1024  # larger files are skipped entirely
+MAX_NODES = 500_000                       # larger trees are converted declarations-only
+PARSE_TIMEOUT_MICROS = 5_000_000
+DECLARATION_DEPTH = 3
 
-LANGUAGES = {
-    "python": Language(LIB_PATH, "python"),
-    "java": Language(LIB_PATH, "java"),
-    "c": Language(LIB_PATH, "c"),
-    "javascript": Language(LIB_PATH, "javascript")
-}
+# Parse status recorded on the root IR node of every file
+STATUS_OK = "ok"
+STATUS_DECLARATIONS_ONLY = "declarations_only"
+STATUS_SKIPPED = "skipped"
 
-def parse_file(file_path: str, language: str):
+
+@dataclass
+class ParseBudget:
+    """Limits applied to a single file before falling back to a cheaper mode."""
+    max_bytes: int = MAX_FILE_BYTES
+    max_declaration_bytes: int = MAX_DECLARATION_BYTES
+    max_nodes: int = MAX_NODES
+    timeout_micros: int = PARSE_TIMEOUT_MICROS
+
+
+class ParseBudgetExceeded(RuntimeError):
+    """Raised when a file is over budget even for a declarations-only parse."""
+
+
+class _NodeLimitReached(Exception):
+    pass
+
+
+def parse_source(source: bytes, language: str, budget: ParseBudget, name: str = "<source>"):
+    """
+    Parse `source` within the budget's timeout and return the tree;
+    ParseBudgetExceeded if it runs out.
+    """
+    # The parser is shared by everything on this thread, so the timeout only
+    # applies to this parse; 0 would mean no limit, hence at least 1 us
+    parser = get_parser(language)
+    parser.set_timeout_micros(max(1, budget.timeout_micros))
+    try:
+        with span("parse", language=language):
+            return parser.parse(source)
+    except ValueError:
+        # Tree-sitter gives up once the timeout elapses
+        parser.reset()
+        raise ParseBudgetExceeded(
+            f"{name} did not parse within {budget.timeout_micros // 1000} ms"
+        )
+    finally:
+        parser.set_timeout_micros(0)
+
+
+def parse_file(file_path: str, language: str, budget: ParseBudget = None):
     """
     Parses a source file and returns an IR node (AST tree).
+
+    Files over the node budget are converted declarations-only (top levels
+    of the tree). Files over the byte budget are too, and only their first
+    `max_bytes` (up to the last line break, or the last whole character
+    if there is none) are read and parsed, so their cost stays bounded. Files over the hard size limit or the parse timeout
+    raise ParseBudgetExceeded.
     """
-    parser = Parser()
-    parser.set_language(LANGUAGES[language])
+    budget = budget or ParseBudget()
 
+    size = os.path.getsize(file_path)
+    if size > budget.max_declaration_bytes:
+        raise ParseBudgetExceeded(
+            f"{file_path} is {size} bytes (limit {budget.max_declaration_bytes})"
+        )
+
+    status = STATUS_DECLARATIONS_ONLY if size > budget.max_bytes else STATUS_OK
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            code = f.read()
+        with open(file_path, "rb") as f:
+            if status == STATUS_OK:
+                source = f.read()
+            else:
+                source = f.read(budget.max_bytes)
+                source = source[:source.rfind(b"\n") + 1] or _utf8_prefix(source)
+        source.decode("utf-8")
     except Exception as e:
         raise RuntimeError(f"Error reading file {file_path}: {e}")
 
-    tree = parser.parse(bytes(code, "utf8"))
-    root_node = tree.root_node
+    root_node = parse_source(source, language, budget, file_path).root_node
+    count("bytes_total", len(source), language=language)
+
+    with span("ir_conversion", language=language):
+        children = None
+        if status == STATUS_OK:
+            remaining = [budget.max_nodes]
+            try:
+                children = _parse_children(root_node, remaining)
+                nodes = budget.max_nodes - remaining[0]
+            except _NodeLimitReached:
+                status = STATUS_DECLARATIONS_ONLY
+        if children is None:
+            remaining = [sys.maxsize]
+            children = _parse_children(root_node, remaining, max_depth=DECLARATION_DEPTH)
+            nodes = sys.maxsize - remaining[0]
+    count("nodes_total", nodes, language=language)
 
     return IRNode(
         type=root_node.type,
         start=root_node.start_point,
         end=root_node.end_point,
-        children=_parse_children(root_node)
+        children=children,
+        status=status
     )
 
-def _parse_children(node):
-    """Recursively converts a Tree-sitter node to IRNode structure."""
+def _utf8_prefix(data: bytes) -> bytes:
+    """`data` without a UTF-8 character cut off at its end."""
+    start = len(data)
+    # Step back over at most three continuation bytes to the lead byte
+    while start > 0 and len(data) - start < 4 and data[start - 1] & 0xC0 == 0x80:
+        start -= 1
+    if start == 0:
+        return data
+    lead = data[start - 1]
+    width = 4 if lead >= 0xF0 else 3 if lead >= 0xE0 else 2 if lead >= 0xC0 else 1
+    return data if start - 1 + width <= len(data) else data[:start - 1]
+
+
+def _parse_children(node, remaining=None, max_depth=None):
+    """
+    Recursively converts a Tree-sitter node to IRNode structure.
+
+    `remaining` is a one-element list holding the node budget left for the
+    whole tree; `max_depth` cuts the conversion off below that depth.
+    """
     children = []
+    if max_depth is not None and max_depth <= 0:
+        return children
+    next_depth = max_depth - 1 if max_depth is not None else None
     for child in node.children:
+        if remaining is not None:
+            remaining[0] -= 1
+            if remaining[0] < 0:
+                raise _NodeLimitReached()
         children.append(
             IRNode(
                 type=child.type,
                 start=child.start_point,
                 end=child.end_point,
-                children=_parse_children(child)
+                children=_parse_children(child, remaining, next_depth)
             )
         )
     return children
 
 class IRNode:
     """Simple intermediate representation of syntax tree nodes."""
-    def __init__(self, type, start, end, children=None):
+    def __init__(self, type, start, end, children=None, status=None):
         self.type = type
         self.start = start
         self.end = end
         self.children = children or []
+        self.status = status
 
     def to_dict(self):
-        return {
+        data = {
             "type": self.type,
             "start": self.start,
             "end": self.end,
             "children": [child.to_dict() for child in self.children]
         }
+        if self.status is not None:
+            data["status"] = self.status
+        return data
@@ -14,9 +14,12 @@ This script:
 
 import os
 import json
-import networkx as nx
-import matplotlib.pyplot as plt
 from typing import Dict, Any, List
+from lazy_imports import lazy_import
+from telemetry import timed
+
+nx = lazy_import("networkx")
+plt = lazy_import("matplotlib.pyplot")
 
 # Paths
 BASE_DIR = os.path.dirname(__file__)
@@ -25,10 +28,6 @@ GRAPH_DIR = os.path.join(OUTPUT_DIR, "graphs")
 CFG_DIR = os.path.join(GRAPH_DIR, "cfg")
 PDG_DIR = os.path.join(GRAPH_DIR, "pdg")
 
-os.makedirs(CFG_DIR, exist_ok=True)
-os.makedirs(PDG_DIR, exist_ok=True)
-os.makedirs(GRAPH_DIR, exist_ok=True)
-
 IR_PATH = os.path.join(OUTPUT_DIR, "ir_output.json")
 
 # ---------- Utility helpers ----------
@@ -119,8 +118,10 @@ def extract_var_defs_and_uses(func_node: Dict[str, Any]):
 
 # ---------- HPG (Hierarchical Program Graph) ----------
 
+@timed("ir_graphs_hpg")
 def generate_hpg(ir_data: Dict[str, Any]):
     print("Generating HPG...")
+    os.makedirs(GRAPH_DIR, exist_ok=True)
     G = nx.DiGraph()
 
     for file_path, file_ir in ir_data.items():
@@ -172,8 +173,10 @@ def generate_hpg(ir_data: Dict[str, Any]):
 
 # ---------- CFG (Control Flow Graph) ----------
 
+@timed("ir_graphs_cfg")
 def generate_cfgs(ir_data: Dict[str, Any]):
     print("Generating CFGs...")
+    os.makedirs(CFG_DIR, exist_ok=True)
     generated = 0
     for file_path, file_ir in ir_data.items():
         basename = os.path.basename(file_path)
@@ -218,8 +221,10 @@ def generate_cfgs(ir_data: Dict[str, Any]):
 
 # ---------- PDG (Program Dependence Graph) ----------
 
+@timed("ir_graphs_pdg")
 def generate_pdgs(ir_data: Dict[str, Any]):
     print("Generating PDGs...")
+    os.makedirs(PDG_DIR, exist_ok=True)
     generated = 0
     for file_path, file_ir in ir_data.items():
         basename = os.path.basename(file_path)
@@ -1,25 +1,50 @@
 import os
+import re
 import tempfile
 import shutil
 import json
-from typing import Dict, Any
-from git import Repo
-from ir_builder import parse_file
-from run_ir import detect_language, should_skip
+import hashlib
+import time
+from dataclasses import replace
+from typing import Dict, Any, Callable, Iterable, List, Optional
+from ir_builder import (
+    parse_file, parse_source, ParseBudget, ParseBudgetExceeded, STATUS_SKIPPED
+)
+from languages import detect_language, grammar_build_hash
+from telemetry import ProgressLog, count, job, span
+from run_ir import should_skip
+from graph_db import GraphDatabaseWriter, snapshot_path
+from ir_store import IRStore, object_key
+from search_index import SearchIndex, blob_hash
+from symbols import extract_source_summary
 
 # Directories to skip
 SKIP_DIRS = {'.git', 'node_modules', 'venv', '__pycache__', 'dist', 'build'}
 
 # 🔥 Folder to store output
 OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "output")
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+# One queryable SQLite database per analysed snapshot (see graph_db.py)
+SNAPSHOT_DIR = os.path.join(OUTPUT_DIR, "snapshots")
+
+# Local function facts by content hash, reused across snapshots (see summaries.py)
+SUMMARY_CACHE_PATH = os.path.join(OUTPUT_DIR, "summary_cache.json")
+
+# Trigram text and symbol index shared by all snapshots (see search_index.py)
+SEARCH_INDEX_PATH = os.path.join(OUTPUT_DIR, "search_index.sqlite")
+
+# File IR and summaries by content, plus one manifest per snapshot (see ir_store.py)
+IR_STORE_DIR = os.path.join(OUTPUT_DIR, "ir_store")
 
 def clone_repo(repo_url: str) -> str:
     """Clone the given GitHub repository into a temporary directory."""
+    from git import Repo  # GitPython is only needed when cloning
+
     tmpdir = tempfile.mkdtemp(prefix="codeiq_repo_")
     try:
         print(f"📦 Cloning repository: {repo_url}")
-        Repo.clone_from(repo_url, tmpdir)
+        with span("clone"):
+            Repo.clone_from(repo_url, tmpdir)
         print(f"✅ Repository cloned to: {tmpdir}")
         return tmpdir
     except Exception as e:
@@ -29,72 +54,457 @@ def clone_repo(repo_url: str) -> str:
 def collect_files(root_dir: str):
     """Recursively collect source files from the given directory."""
     files = []
-    for root, dirs, filenames in os.walk(root_dir):
-        dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
-        for f in filenames:
-            full_path = os.path.join(root, f)
-            if should_skip(full_path):
-                continue
-            if detect_language(full_path):
-                files.append(full_path)
+    with span("discovery"):
+        for root, dirs, filenames in os.walk(root_dir):
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+            for f in filenames:
+                full_path = os.path.join(root, f)
+                if should_skip(full_path):
+                    continue
+                if detect_language(full_path):
+                    files.append(full_path)
     return files
 
-def build_ir_for_repo_path(path: str) -> Dict[str, Any]:
-    """Generate IR for all valid source files inside the directory."""
+# Import statements of the supported languages; a group holds the imported module or path
+IMPORT_PATTERN = re.compile(
+    rb'^\s*(?:from\s+([\w.]+)\s+import|import\s+(?:static\s+)?([\w.]+)'
+    rb'|#\s*include\s*["<]([^">]+)[">])'
+    rb'|(?:\bfrom\s*|\brequire\s*\(\s*|^\s*import\s*)["\']([^"\']+)["\']',
+    re.MULTILINE
+)
+IMPORT_SCAN_BYTES = 64 * 1024   # imports are read from the head of each file only
+
+def module_stem(path: str) -> str:
+    """Name other files import `path` by: its base name, or its package's for __init__/index."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if stem in ("__init__", "index"):
+        stem = os.path.basename(os.path.dirname(path))
+    return stem
+
+def reference_counts(files) -> Dict[str, int]:
+    """
+    For each file, how many other files import a module of its name. Names
+    are matched without packages, so this is a cheap estimate, not resolution.
+    """
+    stems = {fp: module_stem(fp) for fp in files}
+    wanted = set(stems.values())
+    importers: Dict[str, int] = {}
+    for fp in files:
+        try:
+            with open(fp, "rb") as f:
+                head = f.read(IMPORT_SCAN_BYTES)
+        except OSError:
+            continue
+        names = set()
+        for match in IMPORT_PATTERN.finditer(head):
+            dotted, path = match.group(1) or match.group(2), match.group(3) or match.group(4)
+            if dotted:
+                parts = dotted.decode().split(".")
+            else:
+                parts = os.path.splitext(path.decode("utf-8", "replace"))[0].split("/")
+            name = module_stem("/".join(p for p in parts if p not in ("", ".", "..")))
+            if name in wanted and name != stems[fp]:
+                names.add(name)
+        for name in names:
+            importers[name] = importers.get(name, 0) + 1
+    return {fp: importers.get(stem, 0) for fp, stem in stems.items()}
+
+def prioritize_files(files):
+    """
+    Order files so the most useful ones are parsed first when the run's time
+    budget is short: the smallest and most imported first, i.e. by size per
+    importing file.
+    """
+    references = reference_counts(files)
+    def cost(fp):
+        try:
+            size = os.path.getsize(fp)
+        except OSError:
+            size = 0
+        return (size / (1 + references[fp]), fp)
+    return sorted(files, key=cost)
+
+def build_ir_for_repo_path(path: str, time_budget: Optional[float] = None,
+                           parse_budget: Optional[ParseBudget] = None,
+                           store: Optional[IRStore] = None,
+                           manifest: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Generate IR for all valid source files inside the directory.
+
+    `time_budget` bounds the whole run in seconds: files are parsed in
+    priority order and the ones not reached in time are recorded as skipped,
+    so a partial IR is returned instead of stalling.
+
+    With a `store`, files whose IR is already stored are not parsed again,
+    new IR is added to it, and each file's manifest entry (see ir_store.py)
+    is recorded in `manifest` under its path relative to `path`.
+    """
     all_ir = {}
-    files = collect_files(path)
+    files = prioritize_files(collect_files(path))
     print(f"🧩 Found {len(files)} source files to analyze.")
 
-    for fp in files:
+    parse_budget = parse_budget or ParseBudget()
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+    progress = ProgressLog()
+    manifest = {} if manifest is None else manifest
+    reused = 0
+
+    for i, fp in enumerate(files):
         lang = detect_language(fp)
         if not lang:
             continue
 
-        print(f"⚙️ Parsing {fp} ({lang})")
+        key = entry = None
+        if store is not None:
+            rel_path = os.path.relpath(fp, path).replace(os.sep, "/")
+            try:
+                with open(fp, "rb") as f:
+                    blob = blob_hash(f.read())
+            except OSError as e:
+                all_ir[fp] = {"error": str(e)}
+                manifest[rel_path] = {"language": lang, "error": str(e)}
+                count("errors_total", stage="ir")
+                continue
+            entry = manifest[rel_path] = {"language": lang, "blob": blob}
+            # Timeouts only skip files, so they are not part of the key
+            key = object_key("ir", blob, lang, parse_budget.max_bytes,
+                             parse_budget.max_declaration_bytes, parse_budget.max_nodes)
+            if store.has(key):
+                all_ir[fp] = store.get(key)
+                entry["ir"] = key
+                reused += 1
+                count("files_total", language=lang, status=all_ir[fp].get("status", "error"))
+                continue
+
+        budget = parse_budget
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                for skipped in files[i:]:
+                    all_ir[skipped] = {
+                        "status": STATUS_SKIPPED,
+                        "reason": "run time budget exhausted"
+                    }
+                    if store is not None:
+                        rel_path = os.path.relpath(skipped, path).replace(os.sep, "/")
+                        manifest[rel_path] = {**manifest.get(rel_path, {"language": detect_language(skipped)}),
+                                              **all_ir[skipped]}
+                    count("files_total", language=detect_language(skipped), status=STATUS_SKIPPED)
+                print(f"⏱️ Time budget exhausted, skipped {len(files) - i} files")
+                break
+            budget = replace(
+                parse_budget,
+                timeout_micros=max(1, min(parse_budget.timeout_micros, int(remaining * 1_000_000)))
+            )
+
+        if progress.ready():
+            print(f"⚙️ Parsing {i + 1}/{len(files)}: {fp} ({lang})")
 
         try:
-            ir_node = parse_file(fp, lang)
-            all_ir[fp] = ir_node.to_dict()
+            ir_node = parse_file(fp, lang, budget)
+            with span("to_dict", language=lang):
+                all_ir[fp] = ir_node.to_dict()
+        except ParseBudgetExceeded as e:
+            all_ir[fp] = {"status": STATUS_SKIPPED, "reason": str(e)}
         except Exception as e:
             all_ir[fp] = {"error": str(e)}
+            count("errors_total", stage="ir")
+        count("files_total", language=lang, status=all_ir[fp].get("status", "error"))
+        if entry is not None:
+            if all_ir[fp].get("status") in (STATUS_SKIPPED, None):
+                entry.update(all_ir[fp])
+            else:
+                with span("ir_store", part="put"):
+                    store.put(key, all_ir[fp])
+                entry["ir"] = key
 
+    print(f"✅ Parsed {len(all_ir)} files")
+    if store is not None:
+        print(f"♻️ Reused stored IR for {reused} unchanged files")
     return all_ir
 
-def generate_ir_from_repo(repo_url: str, cleanup: bool = True) -> Dict[str, Any]:
-    """Clone remote repo → generate IR → save as JSON → return info."""
-    repo_path = clone_repo(repo_url)
+def summarize_status(ir: Dict[str, Any]) -> Dict[str, int]:
+    """Count files per parse status ('error' for files that failed)."""
+    counts: Dict[str, int] = {}
+    for file_ir in ir.values():
+        status = file_ir.get("status", "error")
+        counts[status] = counts.get(status, 0) + 1
+    return counts
+
+def save_ir(ir: Dict[str, Any]) -> str:
+    """Write the IR to OUTPUT_DIR/ir_output.json and return the path."""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    output_path = os.path.join(OUTPUT_DIR, "ir_output.json")
+    with span("serialization"), open(output_path, "w", encoding="utf-8") as f:
+        json.dump(ir, f, indent=2)
+    print(f"💾 IR output saved to {output_path}")
+    return output_path
+
+def snapshot_id(repo_path: str, repo_url: Optional[str] = None) -> str:
+    """
+    Id of the analysed state of a repository: its name plus the HEAD commit,
+    or a hash of file paths, sizes and mtimes when it is not a git checkout.
+    """
+    name = os.path.basename((repo_url or repo_path).rstrip("/"))
+    if name.endswith(".git"):
+        name = name[:-4]
+    name = "".join(c if c.isalnum() or c in "._-" else "_" for c in name).lstrip("._-") or "repo"
     try:
-        ir = build_ir_for_repo_path(repo_path)
-
-        # 🔥 Save IR output to local JSON file
-        output_path = os.path.join(OUTPUT_DIR, "ir_output.json")
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(ir, f, indent=2)
-        print(f"💾 IR output saved to {output_path}")
-
-        return {
-            "status": "success",
-            "message": "IR generated and stored successfully",
-            "files_processed": len(ir),
-            "output_path": output_path,
-            "data": ir
+        from git import Repo
+        version = Repo(repo_path).head.commit.hexsha[:12]
+    except Exception:
+        digest = hashlib.sha256()
+        for fp in sorted(collect_files(repo_path)):
+            st = os.stat(fp)
+            digest.update(f"{os.path.relpath(fp, repo_path)}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+        version = digest.hexdigest()[:12]
+    return f"{name[:64]}-{version}"
+
+def flow_fragment(cfg_generator, pdg_generator, code: bytes, language: str, ext: str,
+                  nodes: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    A file's flow graphs: {function id: {"hash", "cfg", "pdg"}} with each
+    graph as graph_db.flow_rows and the content hash summaries.py keys on.
+    """
+    from graph_db import flow_rows
+    from summaries import content_hash
+
+    functions = {}
+    for func_id, node in nodes.items():
+        flow = cfg_generator.build_flow_graph(node, code, func_id, ext)
+        functions[func_id] = {
+            "hash": content_hash(code[node.start_byte:node.end_byte], language),
+            "cfg": flow_rows(cfg_generator.flow_to_networkx(flow)),
+            "pdg": flow_rows(pdg_generator.build_statement_pdg(flow)),
         }
+    return functions
+
+def write_snapshot_db(snapshot: str, summaries: List[Dict[str, Any]],
+                      fragments: Optional[Callable[[str], Dict[str, Any]]] = None) -> str:
+    """
+    Write the graph database of `snapshot` from its files' summaries and,
+    if given, `fragments(path)`, the flow_fragment of each file. Returns
+    its path.
+    """
+    from slicing import DependenceIndex
+    from summaries import SummaryCache, compute_summaries, interprocedural_edges, local_facts
+
+    db_path = snapshot_path(SNAPSHOT_DIR, snapshot)
+    meta = {"snapshot": snapshot, "grammar_build": grammar_build_hash()}
+    with GraphDatabaseWriter(db_path, meta) as writer:
+        writer.add_summaries(summaries)
+        if fragments is not None:
+            cache = SummaryCache(SUMMARY_CACHE_PATH)
+            hashes = {}
+            pending = {}   # function id -> (PDG rows, parameters) of functions not in the cache
+            with span("graph_db", part="flow_graphs"):
+                for summary in summaries:
+                    fragment = fragments(summary["file_path"])
+                    functions = summary["functions"] + [m for c in summary["classes"]
+                                                        for m in c["methods"]]
+                    parameters = {f["id"]: [p["name"] for p in f["parameters"]] for f in functions}
+                    for func_id, graphs in fragment.items():
+                        writer.add_flow_rows("cfg", func_id, *graphs["cfg"])
+                        writer.add_flow_rows("pdg", func_id, *graphs["pdg"])
+                        digest = hashes[func_id] = graphs["hash"]
+                        if digest not in cache:
+                            pending[func_id] = (graphs["pdg"], parameters[func_id])
+
+            def analyze(func_id):
+                (nodes, edges), params = pending.pop(func_id)
+                return local_facts(DependenceIndex.from_rows(func_id, func_id, nodes, edges), params)
+
+            callees = writer.resolved_calls()
+            results = compute_summaries(hashes, callees, analyze, cache)
+            writer.add_function_summaries(
+                ((key, result.hash, result.as_dict()) for key, result in results.items()),
+                interprocedural_edges(results, callees))
+            cache.save()
+    print(f"🗄️ Graph database for snapshot {snapshot} saved to {db_path}")
+    return db_path
+
+def rebuild_snapshot_db(snapshot: str, store: IRStore) -> str:
+    """
+    Write the graph database of a stored snapshot again from the objects
+    its manifest names (KeyError if it was never stored), without the
+    repository. Files stored without flow graphs get none.
+    """
+    files = store.manifest(snapshot)["files"]
+    with span("ir_store", part="load_summaries"):
+        summaries = [store.get(entry["summary"]) for entry in files.values() if entry.get("summary")]
+    flows = {path: entry["flow"] for path, entry in files.items() if entry.get("flow")}
+    return write_snapshot_db(snapshot, summaries,
+                             lambda path: store.get(flows[path]) if path in flows else {})
+
+def build_snapshot_db(repo_path: str, snapshot: str, flow_graphs: bool = True,
+                      store: Optional[IRStore] = None,
+                      manifest: Optional[Dict[str, Dict[str, Any]]] = None,
+                      time_budget: Optional[float] = None,
+                      parse_budget: Optional[ParseBudget] = None,
+                      skip: Iterable[str] = ()) -> str:
+    """
+    Extract symbols from every source file and write the snapshot's graph
+    database (HPG, call graph and, with `flow_graphs`, per-function CFGs
+    and statement-level PDGs, which the slicing endpoints walk, plus
+    interprocedural summaries and the PDG edges between functions), then
+    add the snapshot's files to the shared search index. Returns the
+    database path.
+
+    With a `store`, each file's symbol summary (its HPG fragment) and flow
+    graphs are stored by content and recorded in `manifest` (see
+    build_ir_for_repo_path), and files whose objects are already stored
+    are not parsed again. The database is then only a cache of those
+    objects, which rebuild_snapshot_db can write again.
+
+    Files are parsed under `parse_budget`'s size limit and timeout, files
+    not reached within `time_budget` seconds are left out like the paths
+    (relative to `repo_path`) in `skip`, e.g. those the IR pass skipped.
+    """
+    from cfg import MultiLanguageCFGGenerator
+    from pdg import PDGGenerator
+
+    manifest = {} if manifest is None else manifest
+    parse_budget = parse_budget or ParseBudget()
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+    skip = set(skip)
+    files = sorted(collect_files(repo_path))
+    summaries = []
+    flows = {}   # path -> flow fragment, or its store key when there is a store
+    cfg_generator = MultiLanguageCFGGenerator() if flow_graphs else None
+    pdg_generator = PDGGenerator() if flow_graphs else None
+    progress = ProgressLog()
+    for i, fp in enumerate(files):
+        lang = detect_language(fp)
+        rel_path = os.path.relpath(fp, repo_path).replace(os.sep, "/")
+        if rel_path in skip:
+            continue
+        budget = parse_budget
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"⏱️ Time budget exhausted, {len(files) - i} files left out of the database")
+                break
+            budget = replace(parse_budget, timeout_micros=max(
+                1, min(parse_budget.timeout_micros, int(remaining * 1_000_000))))
+        if progress.ready():
+            print(f"🔎 Extracting symbols {i + 1}/{len(files)}: {fp}")
+        try:
+            if os.path.getsize(fp) > budget.max_declaration_bytes:
+                raise ParseBudgetExceeded(f"{fp} is over {budget.max_declaration_bytes} bytes")
+            with open(fp, "rb") as f:
+                code = f.read()
+            key = flow_key = None
+            if store is not None:
+                blob = blob_hash(code)
+                entry = manifest.setdefault(rel_path, {"language": lang, "blob": blob})
+                key = object_key("summary", blob, lang, rel_path)
+                flow_key = object_key("flow", blob, lang, rel_path) if flow_graphs else None
+                if store.has(key) and (flow_key is None or store.has(flow_key)):
+                    summaries.append(store.get(key))
+                    entry["summary"] = key
+                    if flow_key is not None:
+                        entry["flow"] = flows[rel_path] = flow_key
+                    continue
+            nodes = {} if flow_graphs else None
+            tree = parse_source(code, lang, budget, fp)
+            with span("symbols", language=lang):
+                summary = extract_source_summary(code, lang, rel_path, tree, nodes)
+            if flow_graphs:
+                with span("graph_db", part="flow_graphs"):
+                    fragment = flow_fragment(cfg_generator, pdg_generator, code, lang,
+                                             os.path.splitext(fp)[1][1:], nodes)
+            summaries.append(summary)
+            if store is not None:
+                with span("ir_store", part="put"):
+                    store.put(key, summary)
+                    entry["summary"] = key
+                    if flow_graphs:
+                        store.put(flow_key, fragment)
+                        entry["flow"] = flows[rel_path] = flow_key
+            elif flow_graphs:
+                flows[rel_path] = fragment
+        except Exception as e:
+            print(f"⚠️ Could not extract symbols from {fp}: {e}")
+            count("errors_total", stage="symbols")
+
+    def fragments(path):
+        fragment = flows.pop(path)
+        return fragment if store is None else store.get(fragment)
+    db_path = write_snapshot_db(snapshot, summaries, fragments if flow_graphs else None)
+
+    def indexed_files():
+        # Read again rather than kept from above, so one file's text is in memory at a time
+        for summary in summaries:
+            with open(os.path.join(repo_path, summary["file_path"]), "rb") as f:
+                code = f.read()
+            yield summary["file_path"], code, summary["language"], summary
+    with SearchIndex(SEARCH_INDEX_PATH) as index:
+        stats = index.add_snapshot(snapshot, indexed_files())
+    print(f"🔤 Search index: {stats['indexed']} of {stats['files']} files (re)indexed")
+    return db_path
+
+def generate_ir_from_repo(repo_url: str, cleanup: bool = True,
+                          time_budget: Optional[float] = None,
+                          memory_profile: Optional[bool] = None,
+                          build_db: bool = True) -> Dict[str, Any]:
+    """
+    Clone remote repo → generate IR → save as JSON → return info.
+
+    Every run stores the snapshot in the IR store (see ir_store.py), which
+    only parses files it has not seen before; its id is returned as
+    "snapshot". With `build_db` the snapshot's graph database, which the
+    /query endpoints take, is written too.
+    `memory_profile` adds per-stage peak/retained memory and the top
+    allocation sites to the returned metrics (slower; see telemetry.py).
+    """
+    store = IRStore(IR_STORE_DIR)
+    manifest: Dict[str, Dict[str, Any]] = {}
+    with job(memory=memory_profile) as metrics:
+        repo_path = clone_repo(repo_url)
+        try:
+            snapshot = snapshot_id(repo_path, repo_url)
+            started = time.monotonic()
+            ir = build_ir_for_repo_path(repo_path, time_budget=time_budget,
+                                        store=store, manifest=manifest)
 
-    finally:
-        if cleanup:
-            shutil.rmtree(repo_path, ignore_errors=True)
-            print(f"🧹 Cleaned up cloned repository at {repo_path}")
+            # 🔥 Save IR output to local JSON file (the latest run only)
+            output_path = save_ir(ir)
 
-def generate_ir_from_local(path: str) -> Dict[str, Any]:
+            if build_db:
+                # The database shares the run's time budget and leaves out what the IR pass skipped
+                remaining = (time_budget - (time.monotonic() - started)
+                             if time_budget is not None else None)
+                skipped = [os.path.relpath(fp, repo_path).replace(os.sep, "/")
+                           for fp, file_ir in ir.items()
+                           if file_ir.get("status", "error") in (STATUS_SKIPPED, "error")]
+                build_snapshot_db(repo_path, snapshot, store=store, manifest=manifest,
+                                  time_budget=remaining, skip=skipped)
+            with span("ir_store", part="manifest"):
+                store.save_manifest(snapshot, manifest, {"repo": repo_url})
+            print(f"📚 Snapshot {snapshot} stored in {IR_STORE_DIR}")
+        finally:
+            if cleanup:
+                shutil.rmtree(repo_path, ignore_errors=True)
+                print(f"🧹 Cleaned up cloned repository at {repo_path}")
+
+    return {
+        "status": "success",
+        "message": "IR generated and stored successfully",
+        "files_processed": len(ir),
+        "file_status": summarize_status(ir),
+        "grammar_build": grammar_build_hash(),
+        "snapshot": snapshot,
+        "metrics": metrics.as_dict(),
+        "output_path": output_path,
+        "data": ir
+    }
+
+def generate_ir_from_local(path: str, time_budget: Optional[float] = None) -> Dict[str, Any]:
     """Generate IR for a local repository path."""
-    ir = build_ir_for_repo_path(path)
+    ir = build_ir_for_repo_path(path, time_budget=time_budget)
 
     # 🔥 Also save locally when analyzing local repo
-    output_path = os.path.join(OUTPUT_DIR, "ir_output.json")
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(ir, f, indent=2)
-
-    print(f"💾 IR output saved to {output_path}")
+    save_ir(ir)
     return ir
 
 if __name__ == "__main__":
@@ -0,0 +1,216 @@
+"""
+Versioned IR snapshots with structural sharing.
+
+Every analysed snapshot (see ir_processor.snapshot_id) is a small manifest
+mapping each source file's relative path to its content hash and to the
+objects derived from it:
+
+    objects/<ab>/<cdef...>      zlib-compressed JSON, written once
+    manifests/<snapshot>.json   {"snapshot", "meta", "files": {path: entry}}
+
+An entry is {"language", "blob", "ir", "summary", "flow"} where "blob"
+is the sha256 of the file (the same hash the search index uses), "ir"
+the key of its IR tree, "summary" the key of its symbol summary, the
+file's HPG fragment, and "flow" the key of its functions' CFGs and PDGs
+(see ir_processor.flow_fragment). Files without an IR object keep their
+"status" and "reason" or "error" in the entry instead.
+
+Object keys hash everything the object depends on: the kind, FORMAT, the
+grammar build, the language, the parse limits or path, and the file
+contents. A file that is unchanged between commits maps to existing
+objects, so it is not parsed again and storing one more commit costs the
+changed files plus a manifest. Loading any snapshot, old or new, reads its
+manifest and the objects it names.
+
+The queryable graph database of a snapshot (see graph_db.py) is not part
+of this: each one holds the whole snapshot and costs about as much as the
+first. Databases can be deleted freely, since they are rebuilt from the
+manifest when next queried; the manifests and objects are what to keep.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from graph_db import valid_snapshot_id
+from languages import grammar_build_hash
+from telemetry import count, span
+
+# Bump when the IR or summary layout changes so stale objects are not reused
+FORMAT = 1
+
+# Manifest entry fields that name objects
+OBJECT_KINDS = ("ir", "summary", "flow")
+
+MANIFEST_EXTENSION = ".json"
+COMPRESSION_LEVEL = 6
+
+
+def object_key(kind: str, blob: str, *parts: Any) -> str:
+    """Key of the `kind` object derived from contents `blob` under `parts`."""
+    text = "\0".join([kind, str(FORMAT), grammar_build_hash(), *map(str, parts), blob])
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _write_atomic(path: str, data: bytes):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class IRStore:
+    """Content-addressed IR and summary objects plus one manifest per snapshot."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.manifests_dir = os.path.join(root, "manifests")
+
+    # Objects
+
+    def _object_path(self, key: str) -> str:
+        return os.path.join(self.objects_dir, key[:2], key[2:])
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(self._object_path(key))
+
+    def get(self, key: str) -> Any:
+        """Decoded object `key`; KeyError if it is not stored."""
+        try:
+            with open(self._object_path(key), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            raise KeyError(key)
+        return json.loads(zlib.decompress(data))
+
+    def put(self, key: str, value: Any) -> bool:
+        """Store `value` under `key` unless it is already there; True if written."""
+        path = self._object_path(key)
+        if os.path.exists(path):
+            count("ir_store_objects_total", outcome="shared")
+            return False
+        data = json.dumps(value, separators=(",", ":")).encode()
+        _write_atomic(path, zlib.compress(data, COMPRESSION_LEVEL))
+        count("ir_store_objects_total", outcome="written")
+        count("ir_store_bytes_total", len(data))
+        return True
+
+    def objects(self) -> Iterator[str]:
+        if not os.path.isdir(self.objects_dir):
+            return
+        for prefix in sorted(os.listdir(self.objects_dir)):
+            directory = os.path.join(self.objects_dir, prefix)
+            for name in sorted(os.listdir(directory)):
+                if not name.startswith("."):
+                    yield prefix + name
+
+    # Manifests
+
+    def _manifest_path(self, snapshot: str) -> str:
+        if not valid_snapshot_id(snapshot):
+            raise ValueError(f"Invalid snapshot id: {snapshot!r}")
+        return os.path.join(self.manifests_dir, snapshot + MANIFEST_EXTENSION)
+
+    def save_manifest(self, snapshot: str, files: Dict[str, Dict[str, Any]],
+                      meta: Optional[Dict[str, Any]] = None) -> str:
+        """Write the manifest of `snapshot` (replacing any earlier one) and return its path."""
+        path = self._manifest_path(snapshot)
+        manifest = {"snapshot": snapshot,
+                    "meta": {"format": FORMAT, "grammar_build": grammar_build_hash(), **(meta or {})},
+                    "files": dict(sorted(files.items()))}
+        _write_atomic(path, json.dumps(manifest, separators=(",", ":")).encode())
+        return path
+
+    def manifest(self, snapshot: str) -> Dict[str, Any]:
+        """Manifest of `snapshot`; KeyError if it was never stored."""
+        try:
+            with open(self._manifest_path(snapshot), "rb") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(snapshot)
+
+    def snapshots(self) -> List[str]:
+        if not os.path.isdir(self.manifests_dir):
+            return []
+        names = (name[:-len(MANIFEST_EXTENSION)] for name in os.listdir(self.manifests_dir)
+                 if name.endswith(MANIFEST_EXTENSION))
+        return sorted(name for name in names if valid_snapshot_id(name))
+
+    def remove(self, snapshot: str):
+        """Drop the manifest of `snapshot`; its objects go at the next `gc`."""
+        try:
+            os.unlink(self._manifest_path(snapshot))
+        except FileNotFoundError:
+            raise KeyError(snapshot)
+
+    def gc(self) -> int:
+        """Delete objects no manifest refers to; returns how many."""
+        live = set()
+        for snapshot in self.snapshots():
+            for entry in self.manifest(snapshot)["files"].values():
+                live.update(entry[kind] for kind in OBJECT_KINDS if entry.get(kind))
+        removed = 0
+        for key in list(self.objects()):
+            if key not in live:
+                os.unlink(self._object_path(key))
+                removed += 1
+        return removed
+
+    # Snapshots
+
+    def load_ir(self, snapshot: str, paths: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        {relative path: file IR} of `snapshot` (or of `paths` only), in the
+        shape build_ir_for_repo_path returns.
+        """
+        files = self.manifest(snapshot)["files"]
+        selected = files if paths is None else {p: files[p] for p in paths if p in files}
+        ir = {}
+        with span("ir_store", part="load_ir"):
+            for path, entry in selected.items():
+                if entry.get("ir"):
+                    ir[path] = self.get(entry["ir"])
+                elif "error" in entry:
+                    ir[path] = {"error": entry["error"]}
+                else:
+                    ir[path] = {k: entry[k] for k in ("status", "reason") if k in entry}
+        return ir
+
+    def load_summaries(self, snapshot: str) -> List[Dict[str, Any]]:
+        """Symbol summaries (see symbols.py) of the files of `snapshot` that have one."""
+        with span("ir_store", part="load_summaries"):
+            return [self.get(entry["summary"])
+                    for entry in self.manifest(snapshot)["files"].values() if entry.get("summary")]
+
+    def diff(self, old: str, new: str) -> Dict[str, List[str]]:
+        """Paths added, removed and changed (different contents) from `old` to `new`."""
+        before, after = self.manifest(old)["files"], self.manifest(new)["files"]
+        return {"added": sorted(after.keys() - before.keys()),
+                "removed": sorted(before.keys() - after.keys()),
+                "changed": sorted(p for p in after.keys() & before.keys()
+                                  if after[p].get("blob") != before[p].get("blob"))}
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot and object counts, and how many file entries share each object."""
+        sizes: List[Tuple[str, int]] = []
+        for key in self.objects():
+            sizes.append((key, os.path.getsize(self._object_path(key))))
+        references = sum(sum(1 for kind in OBJECT_KINDS if entry.get(kind))
+                         for snapshot in self.snapshots()
+                         for entry in self.manifest(snapshot)["files"].values())
+        return {"snapshots": len(self.snapshots()), "objects": len(sizes),
+                "object_bytes": sum(size for _, size in sizes), "references": references,
+                "sharing": round(references / len(sizes), 2) if sizes else 0.0}
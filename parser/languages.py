@@ -0,0 +1,140 @@
+"""
+Shared tree-sitter language registry.
+
+Every module that needs a grammar goes through this registry instead of
+loading `build/my-languages.so` itself. Grammars are loaded lazily on first
+use and at most once per process, and the registry owns the
+extension -> language mapping and the per-language node-type tables.
+"""
+
+import hashlib
+import os
+import threading
+from typing import Dict, Optional, Tuple
+from tree_sitter import Language, Parser
+from build_languages import GRAMMAR_BUILD_DIR, load_manifest
+
+# Legacy combined grammar library, used when build_languages.py has not
+# produced per-grammar libraries
+LIB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "build", "my-languages.so")
+
+# Supported extensions -> tree-sitter language name
+EXT_LANG = {
+    '.c': 'c',
+    '.java': 'java',
+    '.py': 'python',
+    '.js': 'javascript',
+    '.ts': 'typescript',
+}
+
+SUPPORTED_LANGUAGES = tuple(sorted(set(EXT_LANG.values())))
+
+# Node types for definitions and calls per language
+FUNCTION_NODE_TYPES: Dict[str, Tuple[str, ...]] = {
+    "python": ("function_definition",),
+    "java": ("method_declaration", "constructor_declaration"),
+    "javascript": ("function_declaration", "method_definition"),
+    "c": ("function_definition",),
+    "typescript": ("function_declaration", "method_definition"),
+}
+
+CLASS_NODE_TYPES: Dict[str, Tuple[str, ...]] = {
+    "python": ("class_definition",),
+    "java": ("class_declaration", "interface_declaration"),
+    "javascript": ("class_declaration",),
+    "c": tuple(),   # C doesn't have class defs in this sense
+    "typescript": ("class_declaration", "interface_declaration"),
+}
+
+CALL_NODE_TYPES: Dict[str, Tuple[str, ...]] = {
+    "python": ("call",),
+    "java": ("method_invocation",),
+    "javascript": ("call_expression",),
+    "c": ("call_expression",),
+    "typescript": ("call_expression",),
+}
+
+ALL_CLASS_NODE_TYPES = frozenset(t for types in CLASS_NODE_TYPES.values() for t in types)
+ALL_CALL_NODE_TYPES = frozenset(t for types in CALL_NODE_TYPES.values() for t in types)
+
+_languages: Dict[str, Language] = {}
+_lock = threading.Lock()
+_local = threading.local()
+_manifest = None
+
+
+def language_for_extension(ext: str) -> Optional[str]:
+    """Return the language name for an extension ('.py' or 'py'), or None."""
+    if not ext:
+        return None
+    if not ext.startswith('.'):
+        ext = '.' + ext
+    return EXT_LANG.get(ext.lower())
+
+
+def detect_language(file_path: str) -> Optional[str]:
+    """Detect programming language based on extension."""
+    return language_for_extension(os.path.splitext(file_path)[1])
+
+
+def _grammar_manifest() -> Dict:
+    global _manifest
+    if _manifest is None:
+        _manifest = load_manifest()
+    return _manifest
+
+
+def grammar_library_path(name: str) -> str:
+    """Shared library holding grammar `name`."""
+    entry = _grammar_manifest().get("languages", {}).get(name)
+    if entry:
+        path = os.path.join(GRAMMAR_BUILD_DIR, entry["library"])
+        if os.path.exists(path):
+            return path
+    return LIB_PATH
+
+
+def grammar_build_hash() -> str:
+    """
+    Identify the grammar build in use, so cached IR is invalidated when
+    grammars change.
+    """
+    build_hash = _grammar_manifest().get("build_hash")
+    if build_hash:
+        return build_hash
+    try:
+        st = os.stat(LIB_PATH)
+    except OSError:
+        return "unbuilt"
+    return hashlib.sha256(f"{LIB_PATH}:{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()
+
+
+def get_language(name: str) -> Language:
+    """Return the tree-sitter Language for `name`, loading it on first use."""
+    lang = _languages.get(name)
+    if lang is None:
+        if name not in SUPPORTED_LANGUAGES:
+            raise KeyError(f"Unsupported language: {name}")
+        with _lock:
+            lang = _languages.get(name)
+            if lang is None:
+                lang = Language(grammar_library_path(name), name)
+                _languages[name] = lang
+    return lang
+
+
+def get_parser(name: str) -> Parser:
+    """
+    Return a Parser set to `name`.
+
+    Parsers are not thread-safe, so each thread gets its own, reused across calls.
+    """
+    parsers = getattr(_local, "parsers", None)
+    if parsers is None:
+        parsers = _local.parsers = {}
+    parser = parsers.get(name)
+    if parser is None:
+        parser = Parser()
+        parser.set_language(get_language(name))
+        parsers[name] = parser
+    return parser
@@ -1,6 +1,31 @@
-from fastapi import FastAPI, Query
+import json
+import os
+import secrets
+import shutil
+import threading
+from typing import List, Optional
+from fastapi import FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from ir_processor import generate_ir_from_repo
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from agent_context import DEFAULT_BUDGET, DEFAULT_HOPS, MAX_HOPS, packer_for_database
+from graph_db import GraphDatabase, list_snapshots, snapshot_path, valid_snapshot_id
+from ir_processor import (IR_STORE_DIR, SEARCH_INDEX_PATH, SNAPSHOT_DIR, clone_repo, generate_ir_from_repo,
+                          rebuild_snapshot_db)
+from ir_store import IRStore
+from metrics import COLUMNS, HALSTEAD_COLUMNS, MetricsTable
+from ranking import DEFAULT_SAMPLES, SCORES, ranking_for_database
+from reachability import index_for_database
+from sampler import DEFAULT_INTERVAL, MAX_DURATION, ProfilerBusy, profile
+from search_index import DEFAULT_LIMIT, MIN_QUERY_CHARS, SearchIndex
+from slicing import DEFAULT_MAX_FUNCTIONS, slicer_for_database
+from structural_search import compile_query, search_repo
+from telemetry import PROMETHEUS_CONTENT_TYPE, MemoryProfilerBusy, render_prometheus
+
+# One snapshot database is rebuilt at a time (see open_snapshot)
+_rebuild_lock = threading.Lock()
+
+# Admin endpoints are disabled unless this token is configured
+ADMIN_TOKEN_ENV = "CODEIQ_ADMIN_TOKEN"
 
 app = FastAPI(title="CodeIQ - Intelligent Repo Analyzer")
 
@@ -18,16 +43,386 @@ def home():
     return {"message": "Welcome to CodeIQ backend!"}
 
 @app.post("/generate_ir")
-def generate_ir(repo_url: str = Query(..., description="GitHub repository URL")):
+def generate_ir(
+    repo_url: str = Query(..., description="GitHub repository URL"),
+    time_budget: Optional[float] = Query(None, description="Max seconds to spend parsing; returns partial IR"),
+    memory_profile: bool = Query(False, description="Record per-stage memory with tracemalloc (slower; one run at a time, else 409)"),
+    build_db: bool = Query(True, description="Also write the snapshot's queryable graph database")
+):
     """
     API endpoint to generate Intermediate Representation (IR) 
     of all source code files in a GitHub repository.
     """
-    result = generate_ir_from_repo(repo_url)
+    try:
+        result = generate_ir_from_repo(repo_url, time_budget=time_budget,
+                                       memory_profile=memory_profile or None,
+                                       build_db=build_db)
+    except MemoryProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
     return {
         "message": "IR generated successfully",
         "files_processed": len(result),
+        "snapshot": result["snapshot"],
+        "timings": result["metrics"]["timings"],
+        "memory": result["metrics"].get("memory"),
         "data": result
     }
 
+@app.post("/search")
+def structural_search(
+    repo_url: str = Query(..., description="GitHub repository URL"),
+    language: str = Query(..., description="Language of the files to search"),
+    pattern: str = Query(..., description="tree-sitter query, e.g. (call function: (identifier) @fn) @call"),
+    limit: int = Query(1000, ge=1, le=100000, description="Stop after this many matches")
+):
+    """
+    Stream the matches of a tree-sitter query over a repository as NDJSON,
+    one match per line with its file, line and byte range and captures.
+    """
+    try:
+        compile_query(language, pattern)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    repo_path = clone_repo(repo_url)
+
+    def lines():
+        try:
+            for match in search_repo(repo_path, language, pattern, limit):
+                yield json.dumps(match) + "\n"
+        finally:
+            shutil.rmtree(repo_path, ignore_errors=True)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Stage timings and counters since startup, in Prometheus text format."""
+    return PlainTextResponse(render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+def open_snapshot(snapshot: str) -> GraphDatabase:
+    """
+    Graph database of `snapshot`. It is a cache of the IR store: a deleted
+    one is written again from the snapshot's manifest.
+    """
+    try:
+        path = snapshot_path(SNAPSHOT_DIR, snapshot)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not os.path.exists(path):
+        with _rebuild_lock:
+            if not os.path.exists(path):
+                try:
+                    rebuild_snapshot_db(snapshot, IRStore(IR_STORE_DIR))
+                except KeyError:
+                    raise HTTPException(status_code=404, detail=f"Unknown snapshot: {snapshot}")
+    return GraphDatabase(path)
+
+@app.get("/snapshots")
+def snapshots():
+    """Snapshots the /query endpoints take, as returned by /generate_ir."""
+    stored = IRStore(IR_STORE_DIR).snapshots()
+    return {"snapshots": sorted(set(list_snapshots(SNAPSHOT_DIR)).union(stored))}
+
+def open_ir_manifest(snapshot: str) -> dict:
+    try:
+        return IRStore(IR_STORE_DIR).manifest(snapshot)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown snapshot: {snapshot}")
+
+@app.get("/ir")
+def ir_snapshots():
+    """Snapshots in the IR store and how many files share each stored object."""
+    store = IRStore(IR_STORE_DIR)
+    return {**store.stats(), "snapshots": store.snapshots()}
+
+@app.get("/ir/{snapshot}")
+def ir_snapshot(snapshot: str, path: Optional[List[str]] = Query(None, description="Only the IR of these files")):
+    """Manifest of a stored snapshot, or with `path` the IR of those files."""
+    manifest = open_ir_manifest(snapshot)
+    if not path:
+        return manifest
+    missing = [p for p in path if p not in manifest["files"]]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Not in snapshot: {', '.join(missing)}")
+    return {"snapshot": snapshot, "data": IRStore(IR_STORE_DIR).load_ir(snapshot, path)}
+
+@app.get("/ir/{snapshot}/diff")
+def ir_diff(snapshot: str, base: str = Query(..., description="Snapshot to compare against")):
+    """Files added, removed and changed since the `base` snapshot."""
+    open_ir_manifest(base)
+    open_ir_manifest(snapshot)
+    return {"base": base, "snapshot": snapshot, **IRStore(IR_STORE_DIR).diff(base, snapshot)}
+
+@app.get("/query/{snapshot}/stats")
+def query_stats(snapshot: str):
+    with open_snapshot(snapshot) as db:
+        return {"meta": db.meta(), **db.stats()}
+
+@app.get("/query/{snapshot}/symbols")
+def query_symbols(snapshot: str, name: str, kind: Optional[str] = None,
+                  limit: int = Query(100, ge=1, le=10000)):
+    """Definitions named `name` (optionally of one kind: function, method, class, ...)."""
+    with open_snapshot(snapshot) as db:
+        return {"results": db.find(name, kind, limit)}
+
+@app.get("/query/{snapshot}/callers")
+def query_callers(snapshot: str, name: str = Query(..., description="Function name or key"),
+                  limit: int = Query(1000, ge=1, le=10000)):
+    """Functions that call `name`."""
+    with open_snapshot(snapshot) as db:
+        return {"results": db.callers(name, limit)}
+
+@app.get("/query/{snapshot}/callees")
+def query_callees(snapshot: str, name: str = Query(..., description="Function name or key"),
+                  limit: int = Query(1000, ge=1, le=10000)):
+    """Names called by `name`, with their definitions when they are in the repo."""
+    with open_snapshot(snapshot) as db:
+        return {"results": db.callees(name, limit)}
+
+@app.get("/query/{snapshot}/subclasses")
+def query_subclasses(snapshot: str, name: str, transitive: bool = False,
+                     limit: int = Query(1000, ge=1, le=10000)):
+    """Classes extending `name`; `transitive` follows the whole hierarchy."""
+    with open_snapshot(snapshot) as db:
+        return {"results": db.subclasses(name, transitive, limit)}
+
+@app.get("/query/{snapshot}/complex_functions")
+def query_complex_functions(snapshot: str, file: Optional[str] = None,
+                            limit: int = Query(10, ge=1, le=1000)):
+    """Most complex functions, repo-wide or in one file (path relative to the repo root)."""
+    with open_snapshot(snapshot) as db:
+        return {"results": db.most_complex(file, limit)}
+
+@app.get("/query/{snapshot}/clones")
+def query_clones(snapshot: str, function: Optional[str] = Query(None, description="Only groups of this function (name or key)"),
+                 kind: Optional[str] = Query(None, pattern="^(exact|near)$"),
+                 limit: int = Query(100, ge=1, le=10000)):
+    """Groups of exact (renamed) and near-miss cloned functions, largest first."""
+    with open_snapshot(snapshot) as db:
+        if function is None:
+            return {"results": db.clone_groups(None, kind, limit)}
+        groups = {}
+        for key in db.function_keys(function):
+            for group in db.clone_groups(key, kind, limit):
+                groups.setdefault(group["group_id"], group)
+        return {"results": list(groups.values())[:limit]}
+
+@app.get("/query/{snapshot}/code_metrics")
+def query_code_metrics(snapshot: str, file: Optional[str] = None,
+                       metric: Optional[str] = Query(None, description="Only this metric"),
+                       top: int = Query(10, ge=1, le=1000),
+                       bins: int = Query(10, ge=1, le=100)):
+    """Totals, percentiles, histograms and top functions of each code metric."""
+    if metric is not None and metric not in COLUMNS + HALSTEAD_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric: {metric}")
+    with open_snapshot(snapshot) as db:
+        table = MetricsTable.from_rows(db.function_metrics(file))
+    return table.report(top, bins, [metric] if metric else None)
+
+@app.get("/query/{snapshot}/file")
+def query_file(snapshot: str, path: str):
+    """Symbols defined in one file."""
+    with open_snapshot(snapshot) as db:
+        return {"results": db.file_symbols(path)}
+
+@app.get("/query/{snapshot}/reachable")
+def query_reachable(snapshot: str, name: str = Query(..., description="Function name or key"),
+                    direction: str = Query("forward", pattern="^(forward|backward)$"),
+                    limit: int = Query(1000, ge=1, le=100000)):
+    """
+    Functions `name` transitively calls (forward) or that transitively call
+    it, i.e. are impacted when it changes (backward).
+    """
+    with open_snapshot(snapshot) as db:
+        sources = db.function_keys(name)
+        path = db.path
+    if not sources:
+        raise HTTPException(status_code=404, detail=f"No function named {name}")
+    index = index_for_database(path)
+    found = index.descendants(*sources) if direction == "forward" else index.ancestors(*sources)
+    return {"sources": sources, "direction": direction, "count": len(found), "results": found[:limit]}
+
+@app.get("/query/{snapshot}/reaches")
+def query_reaches(snapshot: str, source: str, target: str):
+    """Whether any function named `source` can transitively call one named `target`."""
+    with open_snapshot(snapshot) as db:
+        sources, targets, path = db.function_keys(source), db.function_keys(target), db.path
+    if not sources or not targets:
+        raise HTTPException(status_code=404, detail="Unknown source or target function")
+    index = index_for_database(path)
+    paths = [(s, t) for s in sources for t in targets if index.reaches(s, t)]
+    return {"reachable": bool(paths), "pairs": [{"source": s, "target": t} for s, t in paths]}
+
+@app.get("/query/{snapshot}/cycles")
+def query_cycles(snapshot: str, limit: int = Query(100, ge=1, le=10000)):
+    """Groups of mutually recursive functions (strongly connected components)."""
+    with open_snapshot(snapshot) as db:
+        path = db.path
+    index = index_for_database(path)
+    cycles = sorted(index.cycles(), key=len, reverse=True)
+    return {"stats": index.stats(), "count": len(cycles), "results": cycles[:limit]}
+
+@app.get("/query/{snapshot}/hotspots")
+def query_hotspots(snapshot: str, by: str = Query("hotspot", description="Score to rank functions by"),
+                   limit: int = Query(20, ge=1, le=10000),
+                   samples: int = Query(DEFAULT_SAMPLES, ge=0, le=1024,
+                                        description="BFS sources for approximate betweenness")):
+    """
+    Top functions by PageRank, degree or betweenness in the call graph, or
+    by hotspot score: central and complex at once.
+    """
+    if by not in SCORES:
+        raise HTTPException(status_code=400, detail=f"Unknown score: {by}")
+    with open_snapshot(snapshot) as db:
+        path = db.path
+    ranking = ranking_for_database(path)
+    return {"functions": len(ranking), "by": by, "results": ranking.top(limit, by, samples=samples)}
+
+def open_search_index(snapshot: str) -> SearchIndex:
+    if not valid_snapshot_id(snapshot):
+        raise HTTPException(status_code=400, detail=f"Invalid snapshot id: {snapshot!r}")
+    if not os.path.exists(SEARCH_INDEX_PATH):
+        raise HTTPException(status_code=404, detail=f"Snapshot not indexed: {snapshot}")
+    index = SearchIndex(SEARCH_INDEX_PATH, readonly=True)
+    if not index.has_snapshot(snapshot):
+        index.close()
+        raise HTTPException(status_code=404, detail=f"Snapshot not indexed: {snapshot}")
+    return index
+
+@app.get("/query/{snapshot}/search/text")
+def query_search_text(snapshot: str, q: str = Query(..., min_length=MIN_QUERY_CHARS, description="Text to find"),
+                      limit: int = Query(DEFAULT_LIMIT, ge=1, le=1000)):
+    """Files containing `q` (case-insensitive substring), best match first, with matching lines."""
+    with open_search_index(snapshot) as index:
+        return {"results": index.text_search(snapshot, q, limit)}
+
+@app.get("/query/{snapshot}/search/symbols")
+def query_search_symbols(snapshot: str, q: str = Query(..., min_length=1, description="Name, prefix or approximate name"),
+                         kind: Optional[str] = Query(None, pattern="^(function|method|class)$"),
+                         limit: int = Query(DEFAULT_LIMIT, ge=1, le=1000)):
+    """Functions, methods and classes by exact, prefix or fuzzy name, best match first."""
+    with open_search_index(snapshot) as index:
+        return {"results": index.symbol_search(snapshot, q, kind, limit)}
+
+@app.get("/query/{snapshot}/flow_graph")
+def query_flow_graph(snapshot: str, function: str = Query(..., description="Function key"),
+                     graph: str = Query("cfg", pattern="^(cfg|pdg)$")):
+    """The CFG or PDG of one function."""
+    with open_snapshot(snapshot) as db:
+        result = db.flow_graph(function, graph)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No {graph} stored for {function}")
+    return result
+
+@app.get("/query/{snapshot}/slice")
+def query_slice(snapshot: str, function: str = Query(..., description="Function name or key"),
+                line: Optional[int] = Query(None, description="Statement line (or give node)"),
+                node: Optional[str] = Query(None, description="PDG node key, e.g. stmt_3"),
+                variable: Optional[str] = None,
+                direction: str = Query("backward", pattern="^(forward|backward)$"),
+                interprocedural: bool = False,
+                max_functions: int = Query(DEFAULT_MAX_FUNCTIONS, ge=1, le=1000)):
+    """
+    Statements a statement depends on (backward) or that depend on it
+    (forward), optionally only through `variable`; with `interprocedural`
+    the slice follows call edges into callees and back to callers.
+    """
+    if line is None and node is None:
+        raise HTTPException(status_code=400, detail="Give a line or a node")
+    with open_snapshot(snapshot) as db:
+        keys = db.function_keys(function)
+        path = db.path
+    if not keys:
+        raise HTTPException(status_code=404, detail=f"No function named {function}")
+    if len(keys) > 1:
+        raise HTTPException(status_code=400,
+                            detail={"message": f"{function} is ambiguous, pass a key",
+                                    "candidates": keys})
+    try:
+        return slicer_for_database(path).slice(keys[0], line, node, variable, direction,
+                                               interprocedural, max_functions)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/query/{snapshot}/context")
+def query_context(snapshot: str, function: str = Query(..., description="Function name or key"),
+                  budget: int = Query(DEFAULT_BUDGET, ge=16, le=1_000_000),
+                  unit: str = Query("tokens", pattern="^(tokens|chars)$"),
+                  hops: int = Query(DEFAULT_HOPS, ge=0, le=MAX_HOPS),
+                  line: Optional[int] = Query(None, description="Also slice from the statement on this line"),
+                  variable: Optional[str] = None,
+                  direction: str = Query("backward", pattern="^(forward|backward)$")):
+    """
+    Context of a function for an agent: its source, summary, slice, class
+    and module, and callers and callees up to `hops` calls away, ranked
+    and packed into `budget` tokens or characters.
+    """
+    with open_snapshot(snapshot) as db:
+        keys = db.function_keys(function)
+        path = db.path
+    if not keys:
+        raise HTTPException(status_code=404, detail=f"No function named {function}")
+    if len(keys) > 1:
+        raise HTTPException(status_code=400,
+                            detail={"message": f"{function} is ambiguous, pass a key",
+                                    "candidates": keys})
+    packer = packer_for_database(path, SEARCH_INDEX_PATH, snapshot)
+    try:
+        return packer.context(keys[0], budget, unit, hops, line, variable, direction)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Not a function: {function}")
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/query/{snapshot}/summary")
+def query_summary(snapshot: str, function: str = Query(..., description="Function name or key"),
+                  edges: bool = Query(True, description="Include interprocedural PDG edges")):
+    """
+    Interprocedural summary of each function named `function`: parameters
+    read, modified and returned, and resolved callees.
+    """
+    with open_snapshot(snapshot) as db:
+        results = []
+        for key in db.function_keys(function):
+            summary = db.function_summary(key)
+            if summary is None:
+                continue
+            if edges:
+                summary["edges"] = db.interprocedural_edges(key)
+            results.append(summary)
+    if not results:
+        raise HTTPException(status_code=404, detail=f"No summary stored for {function}")
+    return {"results": results}
+
+def require_admin(token: Optional[str]):
+    expected = os.environ.get(ADMIN_TOKEN_ENV)
+    if not expected:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+    if not token or not secrets.compare_digest(token, expected):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/admin/profile", response_class=PlainTextResponse)
+def admin_profile(
+    seconds: float = Query(10.0, gt=0, le=MAX_DURATION, description="How long to sample"),
+    interval_ms: float = Query(DEFAULT_INTERVAL * 1000, ge=1, le=1000, description="Sampling interval"),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Sample the stacks of all running threads, and of the search pool's
+    workers, for `seconds` and return a collapsed-stack profile (load it in
+    speedscope or flamegraph.pl).
+    """
+    require_admin(x_admin_token)
+    try:
+        sampler = profile(seconds, interval_ms / 1000)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(
+        sampler.collapsed(),
+        headers={"X-Profile-Samples": str(sampler.samples),
+                 "X-Profile-Workers": str(sampler.workers)}
+    )
+
 # Run using: uvicorn main:app --reload
@@ -0,0 +1,158 @@
+"""
+Repo-wide code metrics over columnar NumPy arrays.
+
+symbols.py records each function's cyclomatic complexity and size metrics
+(LOC, SLOC, nesting depth, parameter count and Halstead operator/operand
+counts) in the same walk over its syntax tree that finds its calls, so
+they cost next to nothing on top of parsing. This module turns them into
+one int64 array per metric, a row per function. Histograms, percentiles,
+top-N and per-file totals are then single vectorized NumPy operations.
+
+Halstead measures derive from the counts: vocabulary n = n1 + n2, length
+N = N1 + N2, volume V = N log2 n, difficulty D = n1/2 * N2/n2 and effort
+E = D * V (n1/n2 distinct operators/operands, N1/N2 their totals).
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+# Per-function metrics, in column order
+COLUMNS = (
+    "complexity", "loc", "sloc", "nesting_depth", "parameters",
+    "operators", "operands", "unique_operators", "unique_operands",
+)
+HALSTEAD_COLUMNS = ("vocabulary", "length", "volume", "difficulty", "effort")
+
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+DEFAULT_TOP = 10
+DEFAULT_BINS = 10
+
+
+def _metrics_row(func: Dict[str, Any]) -> Tuple[int, ...]:
+    metrics = func.get("metrics") or {}
+    if not metrics:
+        # Summaries from before metrics were recorded
+        metrics = {"loc": func.get("end_line", 0) - func.get("start_line", 0) + 1,
+                   "parameters": len(func.get("parameters", []))}
+    return (func.get("complexity") or 0,) + tuple(metrics.get(name, 0) for name in COLUMNS[1:])
+
+
+def value_counts(values: Iterable[Any]) -> Dict[Any, int]:
+    """How often each value occurs, most frequent first."""
+    values = np.asarray(list(values), dtype=object).astype(str)
+    if not len(values):
+        return {}
+    unique, counts = np.unique(values, return_counts=True)
+    order = np.argsort(-counts, kind="stable")
+    return {str(unique[i]): int(counts[i]) for i in order}
+
+
+class MetricsTable:
+    """Per-function metrics as NumPy columns, one row per function."""
+
+    def __init__(self, functions: Sequence[str], files: Sequence[str], rows: Sequence[Tuple[int, ...]]):
+        self.functions = list(functions)
+        self.files = list(files)
+        table = np.array(rows, dtype=np.int64).reshape(len(self.functions), len(COLUMNS))
+        self.columns: Dict[str, Any] = {name: table[:, i] for i, name in enumerate(COLUMNS)}
+        self.columns.update(self._halstead())
+
+    @classmethod
+    def from_summaries(cls, summaries: Iterable[Dict[str, Any]]) -> "MetricsTable":
+        """From file summaries (symbols.py): their functions and methods."""
+        functions, files, rows = [], [], []
+        for summary in summaries:
+            path = summary.get("file_path") or summary.get("file_name")
+            for func in summary.get("functions", []) + [m for c in summary.get("classes", [])
+                                                        for m in c.get("methods", [])]:
+                functions.append(func["id"])
+                files.append(path)
+                rows.append(_metrics_row(func))
+        return cls(functions, files, rows)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[str, str, Dict[str, Any]]]) -> "MetricsTable":
+        """From (function key, file, {complexity, metrics}) rows, as the graph database stores them."""
+        functions, files, values = [], [], []
+        for key, path, func in rows:
+            functions.append(key)
+            files.append(path)
+            values.append(_metrics_row(func))
+        return cls(functions, files, values)
+
+    def __len__(self) -> int:
+        return len(self.functions)
+
+    def _halstead(self) -> Dict[str, Any]:
+        c = self.columns
+        vocabulary = c["unique_operators"] + c["unique_operands"]
+        length = c["operators"] + c["operands"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            volume = np.where(vocabulary > 0, length * np.log2(np.maximum(vocabulary, 1)), 0.0)
+            difficulty = np.where(c["unique_operands"] > 0,
+                                  c["unique_operators"] / 2.0 * c["operands"]
+                                  / np.maximum(c["unique_operands"], 1), 0.0)
+        return {"vocabulary": vocabulary, "length": length, "volume": volume,
+                "difficulty": difficulty, "effort": difficulty * volume}
+
+    def column(self, name: str):
+        if name not in self.columns:
+            raise ValueError(f"Unknown metric: {name}")
+        return self.columns[name]
+
+    def percentiles(self, name: str, percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, float]:
+        values = self.column(name)
+        if not len(values):
+            return {}
+        found = np.percentile(values, percentiles)
+        return {f"p{p:g}": round(float(v), 2) for p, v in zip(percentiles, found)}
+
+    def histogram(self, name: str, bins: int = DEFAULT_BINS) -> Dict[str, List]:
+        """Counts per bin; integer metrics with few distinct values get one bin per value."""
+        values = self.column(name)
+        if not len(values):
+            return {"edges": [], "counts": []}
+        low, high = values.min(), values.max()
+        if values.dtype.kind == "i" and high - low < bins:
+            bins = np.arange(low, high + 2)
+        counts, edges = np.histogram(values, bins=bins)
+        return {"edges": [round(float(e), 2) for e in edges], "counts": counts.tolist()}
+
+    def top(self, name: str, n: int = DEFAULT_TOP) -> List[Dict[str, Any]]:
+        """The `n` functions with the highest value of metric `name`, highest first."""
+        values = self.column(name)
+        n = min(n, len(values))
+        if n <= 0:
+            return []
+        best = np.argpartition(-values, n - 1)[:n]
+        best = best[np.argsort(-values[best], kind="stable")]
+        return [{"function": self.functions[i], "file": self.files[i],
+                 name: round(float(values[i]), 2)} for i in best]
+
+    def by_file(self, name: str) -> Dict[str, float]:
+        """Sum of metric `name` per file."""
+        if not len(self):
+            return {}
+        paths, inverse = np.unique(np.asarray(self.files, dtype=str), return_inverse=True)
+        totals = np.bincount(inverse, weights=self.column(name), minlength=len(paths))
+        return {str(p): round(float(t), 2) for p, t in zip(paths, totals)}
+
+    def report(self, top: int = DEFAULT_TOP, bins: int = DEFAULT_BINS,
+               columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Totals, means, percentiles, histograms and top-N of every metric."""
+        columns = columns or COLUMNS + HALSTEAD_COLUMNS
+        report: Dict[str, Any] = {"functions": len(self), "metrics": {}}
+        for name in columns:
+            values = self.column(name)
+            report["metrics"][name] = {
+                "total": round(float(values.sum()), 2),
+                "mean": round(float(values.mean()), 2) if len(values) else 0.0,
+                "max": round(float(values.max()), 2) if len(values) else 0.0,
+                "percentiles": self.percentiles(name),
+                "histogram": self.histogram(name, bins),
+                "top": self.top(name, top),
+            }
+        return report
@@ -1,8 +1,14 @@
 import json
-import networkx as nx
-import matplotlib.pyplot as plt
 import os
 from collections import defaultdict
+from lazy_imports import lazy_import
+from dataflow import data_dependences, def_use_sets
+from graph_store import STORE_EXTENSION, save_graphs
+from metrics import value_counts
+from telemetry import ProgressLog, count, timed
+
+nx = lazy_import("networkx")
+plt = lazy_import("matplotlib.pyplot")
 
 class PDGGenerator:
     def __init__(self):
@@ -24,15 +30,18 @@ class PDGGenerator:
             'unknown': '#CCCCCC'     # Light gray
         }
     
+    @timed("pdg")
     def build_pdg_from_ir(self, ir_data):
         """Build PDG for entire codebase from IR data"""
         all_pdgs = {}
         
         print("🏗️ Building Program Dependence Graphs...")
+        progress = ProgressLog()
         
-        for file_ir in ir_data:
+        for i, file_ir in enumerate(ir_data):
             filename = file_ir['file_name']
-            print(f"\n📁 Processing {filename}")
+            if progress.ready():
+                print(f"📁 Processing {i + 1}/{len(ir_data)}: {filename}")
             
             # Build PDG for this file
             file_pdg = self._build_file_pdg(file_ir)
@@ -52,9 +61,63 @@ class PDGGenerator:
                     method_pdg = self._build_function_pdg(method, filename, cls['name'])
                     all_pdgs[f"{filename}_{cls['name']}_{method['name']}"] = method_pdg
         
+        count("graph_nodes_total", sum(g.number_of_nodes() for g in all_pdgs.values()), graph="pdg")
         print(f"✅ Built {len(all_pdgs)} PDGs")
         return all_pdgs
-    
+
+    def build_function_pdgs(self, file_ir):
+        """PDGs of every function and method in one file, keyed by function id"""
+        filename = file_ir['file_name']
+        pdgs = {func['id']: self._build_function_pdg(func, filename) for func in file_ir['functions']}
+        for cls in file_ir['classes']:
+            for method in cls['methods']:
+                pdgs[method['id']] = self._build_function_pdg(method, filename, cls['name'])
+        return pdgs
+
+    def build_statement_pdg(self, flow):
+        """
+        Statement-level PDG of a control_flow.ControlFlowGraph: the CFG's
+        nodes (without the exit) with their defs, uses, called names and
+        call arguments, 'control_dep' edges labelled with the branch taken
+        and 'data_dep' edges listing the variables that flow along them. A
+        pair that is both keeps type 'control_dep' and gains 'variables';
+        slicing follows both kinds alike.
+        """
+        calls, arguments = [], []
+        defs, weak, uses = def_use_sets(flow, calls, arguments)
+        pdg = nx.DiGraph()
+        for i, node_type in enumerate(flow.types):
+            if node_type == 'exit':
+                continue
+            attrs = {'type': node_type, 'label': flow.labels[i]}
+            if flow.syntax[i] is not None:
+                attrs.update(line=flow.lines[i], end_line=flow.end_lines[i],
+                             ast=flow.syntax[i].type)
+            for name, values in (('defs', defs[i]), ('may_defs', weak[i]),
+                                 ('uses', uses[i]), ('calls', calls[i])):
+                if values:
+                    attrs[name] = sorted(values)
+            if arguments[i]:
+                attrs['arguments'] = arguments[i]
+            pdg.add_node(flow.node_id(i), **attrs)
+
+        for a, b, branch in flow.control_dependences():
+            if flow.types[b] != 'exit':
+                pdg.add_edge(flow.node_id(a), flow.node_id(b), type='control_dep',
+                             label=branch, branch=branch)
+        variables = defaultdict(list)
+        for a, b, name in data_dependences(len(flow), [(u, v) for u, v, _ in flow.edges],
+                                           defs, weak, uses):
+            variables[a, b].append(name)
+        for (a, b), names in variables.items():
+            u, v = flow.node_id(a), flow.node_id(b)
+            names.sort()
+            if pdg.has_edge(u, v):
+                pdg.edges[u, v]['variables'] = names
+            else:
+                pdg.add_edge(u, v, type='data_dep', label=', '.join(names), variables=names)
+        return pdg
+
     def _build_file_pdg(self, file_ir):
         """Build PDG for entire file"""
         pdg = nx.DiGraph()
@@ -345,24 +408,12 @@ class PDGGenerator:
         """Analyze PDG metrics"""
         print("\n📊 PDG Metrics Analysis:")
         
-        total_nodes = 0
-        total_edges = 0
-        dependency_types = defaultdict(int)
-        node_types = defaultdict(int)
-        
-        for name, pdg in all_pdgs.items():
-            total_nodes += pdg.number_of_nodes()
-            total_edges += pdg.number_of_edges()
-            
-            # Count node types
-            for node in pdg.nodes():
-                node_type = pdg.nodes[node].get('type', 'unknown')
-                node_types[node_type] += 1
-            
-            # Count edge types
-            for u, v, data in pdg.edges(data=True):
-                dep_type = data.get('type', 'unknown')
-                dependency_types[dep_type] += 1
+        total_nodes = sum(pdg.number_of_nodes() for pdg in all_pdgs.values())
+        total_edges = sum(pdg.number_of_edges() for pdg in all_pdgs.values())
+        node_types = value_counts(t for pdg in all_pdgs.values()
+                                  for _, t in pdg.nodes(data='type', default='unknown'))
+        dependency_types = value_counts(t for pdg in all_pdgs.values()
+                                        for _, _, t in pdg.edges(data='type', default='unknown'))
         
         print(f"   Total PDGs: {len(all_pdgs)}")
         print(f"   Total nodes: {total_nodes}")
@@ -380,8 +431,13 @@ class PDGGenerator:
 # MAIN EXECUTION
 # -------------------------------
 
-def generate_pdgs_from_ir(ir_file='ir_output.json', output_dir='pdgs'):
-    """Generate PDGs for entire codebase from IR"""
+def generate_pdgs_from_ir(ir_file='ir_output.json', output_dir='pdgs', export_graphml=False):
+    """
+    Generate PDGs for entire codebase from IR.
+
+    All PDGs are saved to one graph store (pdgs.ciqg, one subgraph per PDG);
+    per-PDG GraphML files are only written with `export_graphml`.
+    """
     import os
     os.makedirs(output_dir, exist_ok=True)
     
@@ -417,19 +473,25 @@ def generate_pdgs_from_ir(ir_file='ir_output.json', output_dir='pdgs'):
     # Analyze metrics
     pdg_generator.analyze_pdg_metrics(all_pdgs)
     
-    # Export GraphML for external tools
-    print("\n💾 Exporting GraphML files...")
-    exported_count = 0
-    for name, pdg in all_pdgs.items():
-        if pdg.number_of_nodes() > 0:
-            graphml_file = os.path.join(output_dir, f"pdg_{name.replace('/', '_').replace('.', '_')}.graphml")
-            try:
-                nx.write_graphml(pdg, graphml_file)
-                exported_count += 1
-            except Exception as e:
-                print(f"    ❌ Error exporting {graphml_file}: {e}")
+    # Save every PDG into a single graph store
+    store_file = os.path.join(output_dir, "pdgs" + STORE_EXTENSION)
+    save_graphs(store_file, {name: pdg for name, pdg in all_pdgs.items() if pdg.number_of_nodes() > 0})
+    print(f"\n💾 PDGs saved to {store_file}")
     
-    print(f"✅ Exported {exported_count} GraphML files")
+    # Export GraphML for external tools
+    if export_graphml:
+        print("\n💾 Exporting GraphML files...")
+        exported_count = 0
+        for name, pdg in all_pdgs.items():
+            if pdg.number_of_nodes() > 0:
+                graphml_file = os.path.join(output_dir, f"pdg_{name.replace('/', '_').replace('.', '_')}.graphml")
+                try:
+                    nx.write_graphml(pdg, graphml_file)
+                    exported_count += 1
+                except Exception as e:
+                    print(f"    ❌ Error exporting {graphml_file}: {e}")
+        
+        print(f"✅ Exported {exported_count} GraphML files")
     print(f"\n🎉 Completed! Generated {len(all_pdgs)} PDGs")
     
     # Print sample dependencies from first few PDGs
@@ -0,0 +1,386 @@
+"""
+Reachability index over the call graph.
+
+The call graph is condensed into strongly connected components (iterative
+Tarjan), and every component of the resulting DAG is labelled with the
+sorted, merged intervals of component numbers it can reach (compressed
+transitive closure). Tarjan completes components in a DFS post-order, so
+everything a component reaches through its DFS subtree is one contiguous
+interval.
+
+Labels are capped at `budget` intervals per component: past that the
+closest intervals are merged into approximate ones (FERRARI-style), which
+bounds memory and build time on graphs with huge, fragmented reach sets.
+"Does X reach Y" is a binary search in X's labels plus a height check;
+only a hit in an approximate interval falls back to a search that every
+successor's label prunes. "Everything X transitively calls" costs time
+proportional to the answer. Backward queries ("what is impacted if Y
+changes") use the same index over the reversed graph, built on first use.
+"""
+
+import os
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from graph_core import CompactGraph, EdgeKind, edge_kind_or_other, kind_mask
+from telemetry import count, span
+
+Edge = Tuple[int, int]
+
+# Intervals kept per component; beyond this the closest ones are merged
+# into approximate intervals that queries refine with a pruned search
+DEFAULT_INTERVAL_BUDGET = 16
+
+
+def csr(n: int, edges: Sequence[Edge]) -> Tuple[array, array]:
+    """(offsets, targets) adjacency of `n` nodes; successors of i are targets[offsets[i]:offsets[i+1]]."""
+    offsets = array("l", [0]) * (n + 1)
+    for u, _ in edges:
+        offsets[u + 1] += 1
+    for i in range(n):
+        offsets[i + 1] += offsets[i]
+    fill = array("l", offsets[:n])
+    targets = array("l", [0]) * len(edges)
+    for u, v in edges:
+        targets[fill[u]] = v
+        fill[u] += 1
+    return offsets, targets
+
+
+def strongly_connected_components(n: int, offsets: Sequence[int],
+                                  targets: Sequence[int]) -> Tuple[array, array]:
+    """
+    Iterative Tarjan. Returns (component of each node, first) where
+    components are numbered in completion order, so every edge between two
+    components goes from a higher to a lower number (reverse topological
+    order), and first[c] is the number of components completed before the
+    root of c was discovered: components first[c]..c are exactly those
+    completed inside the DFS subtree of c's root, all reachable from c.
+    """
+    index = array("l", [-1]) * n
+    low = array("l", [0]) * n
+    comp = array("l", [-1]) * n
+    discovered_at = array("l", [0]) * n
+    first = array("l")
+    stack: List[int] = []
+    counter = 0
+
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        discovered_at[root] = len(first)
+        stack.append(root)
+        work = [(root, offsets[root])]
+        while work:
+            v, i = work[-1]
+            end = offsets[v + 1]
+            while i < end:
+                w = targets[i]
+                i += 1
+                if index[w] == -1:
+                    work[-1] = (v, i)
+                    index[w] = low[w] = counter
+                    counter += 1
+                    discovered_at[w] = len(first)
+                    stack.append(w)
+                    work.append((w, offsets[w]))
+                    break
+                if comp[w] == -1 and index[w] < low[v]:
+                    # w is still on the Tarjan stack
+                    low[v] = index[w]
+            else:
+                work.pop()
+                if low[v] == index[v]:
+                    c = len(first)
+                    while True:
+                        w = stack.pop()
+                        comp[w] = c
+                        if w == v:
+                            break
+                    first.append(discovered_at[v])
+                if work:
+                    u = work[-1][0]
+                    if low[v] < low[u]:
+                        low[u] = low[v]
+    return comp, first
+
+
+def _merge(intervals: List[Tuple[int, int, int]], budget: int) -> Tuple[array, array, bytearray]:
+    """
+    Merge (start, end, exact) intervals, then close the smallest gaps until
+    at most `budget` remain. An interval that absorbed a gap is marked
+    approximate: it may contain components that are not reachable.
+    """
+    intervals.sort()
+    starts, ends, exact = array("l"), array("l"), bytearray()
+    for s, e, x in intervals:
+        if ends and s <= ends[-1] + 1:
+            if e > ends[-1]:
+                ends[-1] = e
+            exact[-1] &= x
+        else:
+            starts.append(s)
+            ends.append(e)
+            exact.append(x)
+    excess = len(starts) - budget
+    if excess > 0:
+        gaps = sorted(range(len(starts) - 1), key=lambda i: starts[i + 1] - ends[i])
+        join = bytearray(len(starts))
+        for i in gaps[:excess]:
+            join[i] = 1
+        merged_starts, merged_ends, merged_exact = array("l"), array("l"), bytearray()
+        i = 0
+        while i < len(starts):
+            s, e, x = starts[i], ends[i], exact[i]
+            while join[i]:
+                i += 1
+                e, x = ends[i], 0
+            merged_starts.append(s)
+            merged_ends.append(e)
+            merged_exact.append(x)
+            i += 1
+        starts, ends, exact = merged_starts, merged_ends, merged_exact
+    return starts, ends, exact
+
+
+class _IntervalIndex:
+    """Interval labels of one direction of the graph."""
+
+    def __init__(self, n: int, edges: Sequence[Edge], budget: int):
+        offsets, targets = csr(n, edges)
+        self.comp, first = strongly_connected_components(n, offsets, targets)
+        n_comp = len(first)
+
+        sizes = array("l", [0]) * n_comp
+        for c in self.comp:
+            sizes[c] += 1
+        self.cyclic = bytearray(1 if s > 1 else 0 for s in sizes)
+        comp_edges = set()
+        for u, v in edges:
+            cu, cv = self.comp[u], self.comp[v]
+            if cu != cv:
+                comp_edges.add((cu, cv))
+            else:
+                self.cyclic[cu] = 1
+        self.succ_offsets, self.succ = csr(n_comp, sorted(comp_edges))
+
+        # Successors have lower numbers, so their labels are final first
+        self.starts: List[array] = []
+        self.ends: List[array] = []
+        self.exact: List[bytearray] = []
+        self.fully_exact = bytearray(n_comp)
+        # Longest path to a sink: a component never reaches one at its own height or above
+        self.height = array("l", [0]) * n_comp
+        for c in range(n_comp):
+            intervals = [(first[c], c, 1)]
+            for s in self.successors(c):
+                intervals.extend(zip(self.starts[s], self.ends[s], self.exact[s]))
+                if self.height[s] >= self.height[c]:
+                    self.height[c] = self.height[s] + 1
+            starts, ends, exact = _merge(intervals, budget)
+            self.starts.append(starts)
+            self.ends.append(ends)
+            self.exact.append(exact)
+            self.fully_exact[c] = all(exact)
+
+        # Nodes grouped by component
+        self.comp_offsets = array("l", [0]) * (n_comp + 1)
+        for c in self.comp:
+            self.comp_offsets[c + 1] += 1
+        for c in range(n_comp):
+            self.comp_offsets[c + 1] += self.comp_offsets[c]
+        fill = array("l", self.comp_offsets[:n_comp])
+        self.comp_nodes = array("l", [0]) * n
+        for node, c in enumerate(self.comp):
+            self.comp_nodes[fill[c]] = node
+            fill[c] += 1
+
+    def components(self) -> int:
+        return len(self.starts)
+
+    def intervals(self) -> int:
+        return sum(len(s) for s in self.starts)
+
+    def successors(self, c: int) -> array:
+        return self.succ[self.succ_offsets[c]:self.succ_offsets[c + 1]]
+
+    def _label(self, c: int, target: int) -> int:
+        """1 if c surely reaches target, 0 if surely not, -1 if the label cannot tell."""
+        if self.height[c] <= self.height[target] and c != target:
+            return 0
+        i = bisect_right(self.starts[c], target) - 1
+        if i < 0 or self.ends[c][i] < target:
+            return 0
+        return 1 if self.exact[c][i] else -1
+
+    def comp_reaches(self, cu: int, cv: int) -> bool:
+        """Component reachability (reflexive)."""
+        answer = self._label(cu, cv)
+        if answer >= 0:
+            return bool(answer)
+        # Approximate hit: search, pruned by every successor's label
+        seen = {cu}
+        stack = [cu]
+        while stack:
+            for s in self.successors(stack.pop()):
+                if s == cv:
+                    return True
+                if s in seen:
+                    continue
+                seen.add(s)
+                answer = self._label(s, cv)
+                if answer == 1:
+                    return True
+                if answer == -1:
+                    stack.append(s)
+        return False
+
+    def reaches(self, u: int, v: int) -> bool:
+        cu, cv = self.comp[u], self.comp[v]
+        if cu == cv:
+            return u != v or bool(self.cyclic[cu])
+        return self.comp_reaches(cu, cv)
+
+    def reachable_components(self, cu: int) -> Iterator[int]:
+        """Components reachable from cu, including cu itself."""
+        ranges = []
+        seen = {cu}
+        stack = [cu]
+        while stack:
+            c = stack.pop()
+            if self.fully_exact[c]:
+                ranges.extend(zip(self.starts[c], self.ends[c], self.exact[c]))
+                continue
+            ranges.append((c, c, 1))
+            for s in self.successors(c):
+                if s not in seen:
+                    seen.add(s)
+                    stack.append(s)
+        starts, ends, _ = _merge(ranges, len(ranges) + 1)
+        for s, e in zip(starts, ends):
+            yield from range(s, e + 1)
+
+    def reachable(self, u: int) -> Iterator[int]:
+        """Nodes reachable from u by a non-empty path."""
+        cu = self.comp[u]
+        comp_offsets, comp_nodes = self.comp_offsets, self.comp_nodes
+        for c in self.reachable_components(cu):
+            if c == cu and not self.cyclic[cu]:
+                continue
+            yield from comp_nodes[comp_offsets[c]:comp_offsets[c + 1]]
+
+    def members(self, c: int) -> array:
+        return self.comp_nodes[self.comp_offsets[c]:self.comp_offsets[c + 1]]
+
+
+class ReachabilityIndex:
+    """Forward and backward reachability between the nodes of one graph."""
+
+    def __init__(self, keys: Sequence[str], edges: Iterable[Edge],
+                 budget: int = DEFAULT_INTERVAL_BUDGET):
+        self.budget = budget
+        self.keys = list(keys)
+        self.ids: Dict[str, int] = {k: i for i, k in enumerate(self.keys)}
+        self.edges = [(u, v) for u, v in edges]
+        with span("reachability_index"):
+            self._forward = _IntervalIndex(len(self.keys), self.edges, budget)
+        self._backward: Optional[_IntervalIndex] = None
+        count("graph_nodes_total", len(self.keys), graph="reachability")
+
+    @property
+    def backward(self) -> _IntervalIndex:
+        if self._backward is None:
+            with span("reachability_index", direction="backward"):
+                self._backward = _IntervalIndex(len(self.keys), [(v, u) for u, v in self.edges],
+                                                self.budget)
+        return self._backward
+
+    # -- construction -------------------------------------------------
+    @classmethod
+    def from_compact(cls, graph: CompactGraph,
+                     kinds: int = kind_mask(EdgeKind.CALLS)) -> "ReachabilityIndex":
+        return cls(graph.names(range(graph.number_of_nodes())),
+                   ((u, v) for u, v, _ in graph.edges(kinds)))
+
+    @classmethod
+    def from_networkx(cls, graph, kind: EdgeKind = EdgeKind.CALLS,
+                      kind_attrs=("type", "relationship")) -> "ReachabilityIndex":
+        """Index the edges of an nx graph whose type attribute maps to `kind`."""
+        keys = [str(n) for n in graph.nodes]
+        ids = {n: i for i, n in enumerate(graph.nodes)}
+        edges = []
+        for u, v, data in graph.edges(data=True):
+            edge_type = next((data[a] for a in kind_attrs if a in data), None)
+            if edge_kind_or_other(edge_type) == kind:
+                edges.append((ids[u], ids[v]))
+        return cls(keys, edges)
+
+    @classmethod
+    def from_database(cls, db) -> "ReachabilityIndex":
+        """Call graph of a graph_db.GraphDatabase snapshot."""
+        keys, edges = db.call_graph()
+        return cls(keys, edges)
+
+    # -- queries ------------------------------------------------------
+    def _id(self, key: str) -> int:
+        try:
+            return self.ids[key]
+        except KeyError:
+            raise KeyError(f"Unknown node: {key}") from None
+
+    def reaches(self, source: str, target: str) -> bool:
+        """True if there is a non-empty path from `source` to `target`."""
+        return self._forward.reaches(self._id(source), self._id(target))
+
+    def _collect(self, index: _IntervalIndex, sources: Iterable[str]) -> List[str]:
+        seen = set()
+        for key in sources:
+            seen.update(index.reachable(self._id(key)))
+        keys = self.keys
+        return [keys[i] for i in sorted(seen)]
+
+    def descendants(self, *sources: str) -> List[str]:
+        """Everything the sources transitively call."""
+        return self._collect(self._forward, sources)
+
+    def ancestors(self, *targets: str) -> List[str]:
+        """Everything that transitively calls the targets (impact set)."""
+        return self._collect(self.backward, targets)
+
+    def cycles(self) -> List[List[str]]:
+        """Recursive groups: components with more than one node or a self-call."""
+        index = self._forward
+        return [[self.keys[i] for i in index.members(c)]
+                for c in range(index.components()) if index.cyclic[c]]
+
+    def topological_order(self) -> List[List[str]]:
+        """Components ordered callers first (each component lists its members)."""
+        index = self._forward
+        return [[self.keys[i] for i in index.members(c)]
+                for c in reversed(range(index.components()))]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "nodes": len(self.keys),
+            "edges": len(self.edges),
+            "components": self._forward.components(),
+            "cyclic_components": sum(self._forward.cyclic),
+            "intervals": self._forward.intervals(),
+            "approximate_components": len(self._forward.fully_exact) - sum(self._forward.fully_exact),
+        }
+
+
+@lru_cache(maxsize=8)
+def _cached_index(path: str, mtime_ns: int) -> ReachabilityIndex:
+    from graph_db import GraphDatabase
+    with GraphDatabase(path) as db:
+        return ReachabilityIndex.from_database(db)
+
+
+def index_for_database(path: str) -> ReachabilityIndex:
+    """Reachability index of a snapshot database, built once per database file."""
+    return _cached_index(path, os.stat(path).st_mtime_ns)
@@ -1,14 +1,4 @@
 import os
-from typing import Optional
-
-# Supported languages
-EXT_LANG = {
-    '.c': 'c',
-    '.java': 'java',
-    '.py': 'python',
-    '.js': 'javascript',
-    '.ts': 'typescript',
-}
 
 # Files/extensions to skip
 SKIP_EXT = {
@@ -22,11 +12,6 @@ SKIP_FILES = {
     'requirements.txt'
 }
 
-def detect_language(file_path: str) -> Optional[str]:
-    """Detect programming language based on extension."""
-    _, ext = os.path.splitext(file_path)
-    return EXT_LANG.get(ext.lower())
-
 def should_skip(file_path: str) -> bool:
     """Return True if file should be ignored."""
     _, ext = os.path.splitext(file_path)
@@ -0,0 +1,205 @@
+"""
+In-process stack sampler for diagnosing a live backend.
+
+A background thread snapshots the stack of every other thread at a fixed
+interval (sys._current_frames) and counts identical stacks. The result is
+in collapsed-stack format ("thread;outer;...;inner count" per line), which
+flamegraph.pl, speedscope and inferno read directly. Nothing is installed
+in the sampled threads, so the overhead is one frame walk per thread per
+sample, paid only while a profile runs.
+
+sys._current_frames only sees this process. Process pools (the structural
+search pool) pass a WorkerChannel to `start_worker_sampler` as their
+initializer: each worker then samples its own threads while a profile
+runs and sends the stacks back, labelled "worker-<pid>", to be merged.
+"""
+
+import os
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+DEFAULT_INTERVAL = 0.005   # seconds between samples
+MAX_DURATION = 60.0        # longest profile a single request may ask for
+MAX_STACK_DEPTH = 128
+
+# Longest wait for the workers' stacks once a profile stops
+WORKER_REPLY_TIMEOUT = 2.0
+
+_profile_lock = threading.Lock()
+_channels: List["WorkerChannel"] = []
+_channels_lock = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a profile is requested while another one is running."""
+
+
+def _frame_label(code) -> str:
+    name = getattr(code, "co_qualname", code.co_name)
+    # ';' separates frames in the collapsed format
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+class StackSampler:
+    """Samples every thread's stack (except `exclude`) until stopped."""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, exclude=(), prefix: str = ""):
+        self.interval = interval
+        self.exclude = set(exclude)
+        self.prefix = prefix
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.workers = 0            # worker processes whose stacks were merged in
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._labels: Dict[object, str] = {}
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = _frame_label(code)
+        return label
+
+    def sample_once(self):
+        skip = self.exclude | {threading.get_ident()}
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident in skip:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(self.prefix + names.get(ident, f"thread-{ident}").replace(";", ":"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        next_sample = time.perf_counter()
+        while not self._stop.is_set():
+            self.sample_once()
+            next_sample += self.interval
+            delay = next_sample - time.perf_counter()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                # Fell behind; don't try to catch up with a burst of samples
+                next_sample = time.perf_counter()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="codeiq-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        """Profile in collapsed-stack format, hottest stacks first."""
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+class WorkerChannel:
+    """
+    Shared state between this process and the workers of one pool: while
+    `active` is set each worker samples itself, then puts (generation,
+    stacks, samples) on `replies`. `context` must be the pool's
+    multiprocessing context (the default one if None).
+    """
+
+    def __init__(self, context=None):
+        import multiprocessing
+        context = context or multiprocessing.get_context()
+        self.active = context.Event()
+        self.replies = context.Queue()
+        self.interval = context.Value("d", DEFAULT_INTERVAL, lock=False)
+        self.generation = context.Value("l", 0, lock=False)
+        self.workers = context.Value("i", 0)
+
+
+def worker_channel(context=None) -> WorkerChannel:
+    """A channel for a new process pool; profiles sample its workers until it is released."""
+    channel = WorkerChannel(context)
+    with _channels_lock:
+        _channels.append(channel)
+    return channel
+
+
+def release_channel(channel: WorkerChannel) -> None:
+    """Stop waiting for the workers of `channel` (the pool was shut down)."""
+    with _channels_lock:
+        if channel in _channels:
+            _channels.remove(channel)
+
+
+def start_worker_sampler(channel: WorkerChannel) -> None:
+    """Pool initializer: sample this worker whenever the parent profiles."""
+    with channel.workers.get_lock():
+        channel.workers.value += 1
+    threading.Thread(target=_serve_profiles, args=(channel,), name="codeiq-sampler",
+                     daemon=True).start()
+
+
+def _serve_profiles(channel: WorkerChannel) -> None:
+    prefix = f"worker-{os.getpid()}:"
+    while True:
+        channel.active.wait()
+        generation = channel.generation.value
+        sampler = StackSampler(channel.interval.value, prefix=prefix)
+        while channel.active.is_set():
+            sampler.sample_once()
+            time.sleep(sampler.interval)
+        channel.replies.put((generation, dict(sampler.stacks), sampler.samples))
+
+
+def _collect_workers(sampler: StackSampler, channels: List[WorkerChannel]) -> None:
+    deadline = time.monotonic() + WORKER_REPLY_TIMEOUT
+    for channel in channels:
+        expected = channel.workers.value
+        received = 0
+        while received < expected:
+            try:
+                generation, stacks, _ = channel.replies.get(
+                    timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if generation == channel.generation.value:   # not a late reply to an earlier profile
+                sampler.stacks.update(stacks)
+                received += 1
+        sampler.workers += received
+
+
+def profile(duration: float, interval: float = DEFAULT_INTERVAL) -> StackSampler:
+    """
+    Sample all other threads, and the workers of every pool with a
+    WorkerChannel, for `duration` seconds and return the sampler.
+
+    Only one profile runs at a time; a concurrent request raises ProfilerBusy.
+    """
+    duration = max(0.0, min(duration, MAX_DURATION))
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+    try:
+        with _channels_lock:
+            channels = list(_channels)
+        sampler = StackSampler(interval, exclude=(threading.get_ident(),))
+        for channel in channels:
+            channel.interval.value = interval
+            channel.generation.value += 1
+            channel.active.set()
+        sampler.start()
+        try:
+            time.sleep(duration)
+        finally:
+            sampler.stop()
+            for channel in channels:
+                channel.active.clear()
+        _collect_workers(sampler, channels)
+        return sampler
+    finally:
+        _profile_lock.release()
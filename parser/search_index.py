@@ -0,0 +1,310 @@
+"""
+Persistent trigram index over source text and symbol names.
+
+One SQLite database holds every analysed snapshot. File contents are
+stored once per content hash (a blob) in an FTS5 table with the trigram
+tokenizer, so any substring of three or more characters is an index
+lookup, ranked by BM25. A snapshot is a list of (path, blob) pairs.
+Indexing a new commit therefore only tokenizes the files whose content
+changed, and a blob no snapshot refers to any more is dropped.
+
+Symbols (functions, methods and classes from symbols.py) are stored per
+blob, with their names case-folded in a B-tree for prefix lookups and in
+a second trigram table for fuzzy ones. Names are stored padded with a
+space on each side, so a misspelt query still shares its first and last
+trigrams with the intended name. Those candidates are scored by edit
+similarity. Exact and prefix matches rank above substring matches, which
+rank above fuzzy ones.
+"""
+
+import hashlib
+import os
+import sqlite3
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from telemetry import count, span
+
+MIN_QUERY_CHARS = 3
+
+DEFAULT_LIMIT = 20
+
+# Matching lines returned per file
+MAX_LINES_PER_FILE = 20
+
+# Longest line text returned
+MAX_LINE_CHARS = 500
+
+# Fuzzy symbol candidates scored per query
+FUZZY_CANDIDATES = 500
+
+# Least edit similarity of a fuzzy symbol match
+MIN_FUZZY_SCORE = 0.6
+
+SYMBOL_KINDS = ("function", "method", "class")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL UNIQUE,
+    language TEXT,
+    lines INTEGER
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS blob_text USING fts5(content, tokenize='trigram');
+CREATE TABLE IF NOT EXISTS symbols (
+    id INTEGER PRIMARY KEY,
+    blob_id INTEGER NOT NULL REFERENCES blobs(id),
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    folded TEXT NOT NULL,        -- name.lower(), for prefix lookups
+    suffix TEXT NOT NULL,        -- symbol key without its "<path>::" prefix
+    line INTEGER
+);
+CREATE INDEX IF NOT EXISTS symbols_folded ON symbols (folded);
+CREATE INDEX IF NOT EXISTS symbols_blob ON symbols (blob_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS symbol_names USING fts5(name, tokenize='trigram');
+CREATE TABLE IF NOT EXISTS snapshot_files (
+    snapshot TEXT NOT NULL,
+    path TEXT NOT NULL,
+    blob_id INTEGER NOT NULL REFERENCES blobs(id),
+    PRIMARY KEY (snapshot, path)
+);
+CREATE INDEX IF NOT EXISTS snapshot_files_blob ON snapshot_files (blob_id, snapshot);
+"""
+
+
+def blob_hash(code: bytes) -> str:
+    return hashlib.sha256(code).hexdigest()
+
+
+def _phrase(text: str) -> str:
+    """An FTS5 query matching `text` as a substring."""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _symbol_rows(summary: Dict[str, Any], path: str) -> List[Tuple[str, str, str, int]]:
+    """(kind, name, key suffix, line) of the functions, methods and classes in a file summary."""
+    prefix = len(path) + 2
+    rows = [("function", f["name"], f["id"][prefix:], f.get("start_line"))
+            for f in summary.get("functions", [])]
+    for cls in summary.get("classes", []):
+        rows.append(("class", cls["name"], cls["id"][prefix:], cls.get("start_line")))
+        rows.extend(("method", m["name"], m["id"][prefix:], m.get("start_line"))
+                    for m in cls.get("methods", []))
+    return rows
+
+
+def _symbol_score(query: str, folded: str) -> float:
+    """3 for the exact name, then prefix, substring and similar-name matches."""
+    if folded == query:
+        return 3.0
+    if folded.startswith(query):
+        return 2.0 + len(query) / len(folded)
+    if query in folded:
+        return 1.0 + len(query) / len(folded)
+    return SequenceMatcher(None, query, folded).ratio()
+
+
+class SearchIndex:
+    """Text and symbol search over the snapshots added to one index database."""
+
+    def __init__(self, path: str, readonly: bool = False):
+        self.path = path
+        if readonly:
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.conn = sqlite3.connect(path)
+            # Readers keep answering queries while a snapshot is being added
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -- Updates
+
+    def _blob(self, code: bytes, language: Optional[str], path: str,
+              summary: Optional[Dict[str, Any]]) -> Tuple[int, bool]:
+        """
+        Id of the blob holding `code`, adding it if new; also whether it was
+        new. A known blob without symbols (e.g. first indexed without a
+        summary) gets those of `summary`.
+        """
+        digest = blob_hash(code)
+        row = self.conn.execute("SELECT id FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        if row is not None:
+            blob_id = row[0]
+            if summary and self.conn.execute("SELECT 1 FROM symbols WHERE blob_id = ? LIMIT 1",
+                                             (blob_id,)).fetchone() is None:
+                self._add_symbols(blob_id, summary, path)
+            return blob_id, False
+        text = code.decode("utf8", errors="replace")
+        cur = self.conn.execute("INSERT INTO blobs (hash, language, lines) VALUES (?, ?, ?)",
+                                (digest, language, text.count("\n") + 1))
+        blob_id = cur.lastrowid
+        self.conn.execute("INSERT INTO blob_text (rowid, content) VALUES (?, ?)", (blob_id, text))
+        if summary:
+            self._add_symbols(blob_id, summary, path)
+        return blob_id, True
+
+    def _add_symbols(self, blob_id: int, summary: Dict[str, Any], path: str) -> None:
+        for kind, name, suffix, line in _symbol_rows(summary, path):
+            cur = self.conn.execute(
+                "INSERT INTO symbols (blob_id, kind, name, folded, suffix, line) VALUES (?, ?, ?, ?, ?, ?)",
+                (blob_id, kind, name, name.lower(), suffix, line))
+            self.conn.execute("INSERT INTO symbol_names (rowid, name) VALUES (?, ?)",
+                              (cur.lastrowid, f" {name} "))
+
+    def update_files(self, snapshot: str,
+                     files: Iterable[Tuple[str, bytes, Optional[str], Optional[Dict[str, Any]]]],
+                     removed: Sequence[str] = (), replace: bool = False) -> Dict[str, int]:
+        """
+        Add or replace (path, code, language, summary) files of a snapshot and
+        drop the `removed` paths, or with `replace` every other path. Only
+        content not already indexed is tokenized. Readers see the snapshot
+        change in one transaction.
+        """
+        stats = {"files": 0, "indexed": 0, "removed": 0}
+        with span("search_index", part="update"), self.conn:
+            if replace:
+                self.conn.execute("DELETE FROM snapshot_files WHERE snapshot = ?", (snapshot,))
+            for path, code, language, summary in files:
+                blob_id, new = self._blob(code, language, path, summary)
+                self.conn.execute("INSERT OR REPLACE INTO snapshot_files VALUES (?, ?, ?)",
+                                  (snapshot, path, blob_id))
+                stats["files"] += 1
+                stats["indexed"] += new
+            for path in removed:
+                stats["removed"] += self.conn.execute(
+                    "DELETE FROM snapshot_files WHERE snapshot = ? AND path = ?", (snapshot, path)).rowcount
+            self._prune()
+        count("search_index_files_total", stats["indexed"], result="indexed")
+        count("search_index_files_total", stats["files"] - stats["indexed"], result="reused")
+        return stats
+
+    def add_snapshot(self, snapshot: str,
+                     files: Iterable[Tuple[str, bytes, Optional[str], Optional[Dict[str, Any]]]]) -> Dict[str, int]:
+        """Index `snapshot` as exactly these files, replacing any earlier version of it."""
+        return self.update_files(snapshot, files, replace=True)
+
+    def remove_snapshot(self, snapshot: str) -> None:
+        with self.conn:
+            self.conn.execute("DELETE FROM snapshot_files WHERE snapshot = ?", (snapshot,))
+            self._prune()
+
+    def _prune(self) -> None:
+        """Drop blobs no snapshot refers to, with their text and symbols."""
+        orphans = [row[0] for row in self.conn.execute(
+            "SELECT id FROM blobs WHERE id NOT IN (SELECT blob_id FROM snapshot_files)")]
+        for blob_id in orphans:
+            self.conn.execute("DELETE FROM blob_text WHERE rowid = ?", (blob_id,))
+            self.conn.execute("DELETE FROM symbol_names WHERE rowid IN "
+                              "(SELECT id FROM symbols WHERE blob_id = ?)", (blob_id,))
+            self.conn.execute("DELETE FROM symbols WHERE blob_id = ?", (blob_id,))
+            self.conn.execute("DELETE FROM blobs WHERE id = ?", (blob_id,))
+
+    # -- Queries
+
+    def snapshots(self) -> List[str]:
+        return [row[0] for row in self.conn.execute("SELECT DISTINCT snapshot FROM snapshot_files ORDER BY 1")]
+
+    def has_snapshot(self, snapshot: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM snapshot_files WHERE snapshot = ? LIMIT 1",
+                                 (snapshot,)).fetchone() is not None
+
+    def file_text(self, snapshot: str, path: str) -> Optional[str]:
+        """Full text of a file of `snapshot`, or None if it is not indexed."""
+        row = self.conn.execute(
+            "SELECT t.content FROM snapshot_files sf JOIN blob_text t ON t.rowid = sf.blob_id "
+            "WHERE sf.snapshot = ? AND sf.path = ?", (snapshot, path)).fetchone()
+        return row[0] if row else None
+
+    def text_search(self, snapshot: str, query: str, limit: int = DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+        """
+        Files of `snapshot` containing `query` (case-insensitive, may span
+        lines), best BM25 rank first, with the lines where it occurs.
+        """
+        if len(query) < MIN_QUERY_CHARS:
+            raise ValueError(f"Text queries need at least {MIN_QUERY_CHARS} characters")
+        needle = query.lower()
+        results = []
+        with span("search_index", part="text"):
+            rows = self.conn.execute(
+                "SELECT sf.path, t.content, t.rank FROM blob_text t "
+                "JOIN snapshot_files sf ON sf.blob_id = t.rowid "
+                "WHERE blob_text MATCH ? AND sf.snapshot = ? ORDER BY t.rank",
+                (_phrase(query), snapshot))
+            for path, content, rank in rows:
+                folded = content.lower()
+                lines = content.split("\n")
+                matches = []
+                pos = folded.find(needle)
+                line, scanned = 1, 0
+                while pos >= 0 and len(matches) < MAX_LINES_PER_FILE:
+                    line += folded.count("\n", scanned, pos)
+                    scanned = pos
+                    if not matches or matches[-1]["line"] != line:
+                        matches.append({"line": line, "text": lines[line - 1][:MAX_LINE_CHARS]})
+                    pos = folded.find(needle, pos + 1)
+                if not matches:
+                    continue
+                results.append({"file": path, "score": round(-rank, 4), "matches": matches})
+                if len(results) >= limit:
+                    break
+        return results
+
+    def symbol_search(self, snapshot: str, query: str, kind: Optional[str] = None,
+                      limit: int = DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+        """Functions, methods and classes of `snapshot` whose name matches `query` exactly, by prefix or fuzzily."""
+        if kind is not None and kind not in SYMBOL_KINDS:
+            raise ValueError(f"Unknown symbol kind: {kind}")
+        folded = query.lower()
+        if not folded:
+            return []
+        columns = "s.id, s.kind, s.name, s.folded, s.suffix, s.line, sf.path"
+        kind_filter = " AND s.kind = ?" if kind else ""
+        kind_params = [kind] if kind else []
+        names = (f"SELECT {columns} FROM symbol_names n JOIN symbols s ON s.id = n.rowid "
+                 f"JOIN snapshot_files sf ON sf.blob_id = s.blob_id "
+                 f"WHERE symbol_names MATCH ? AND sf.snapshot = ?{kind_filter} ")
+        candidates = {}
+
+        def collect(sql: str, params: List[Any]) -> int:
+            rows = self.conn.execute(sql, params + [FUZZY_CANDIDATES]).fetchall()
+            for row in rows:
+                candidates[(row[0], row[6])] = row
+            return len(rows)
+
+        with span("search_index", part="symbols"):
+            # Exact and prefix matches straight from the B-tree on folded names
+            found = collect(f"SELECT {columns} FROM symbols s JOIN snapshot_files sf ON sf.blob_id = s.blob_id "
+                            f"WHERE s.folded >= ? AND s.folded < ? AND sf.snapshot = ?{kind_filter} "
+                            f"ORDER BY length(s.folded), s.folded LIMIT ?",
+                            [folded, folded + "\uffff", snapshot] + kind_params)
+            if len(folded) >= MIN_QUERY_CHARS:
+                found += collect(names + "LIMIT ?", [_phrase(folded), snapshot] + kind_params)
+            # Names that only share trigrams with the query rank below all of those
+            if found < limit:
+                grams = sorted(_trigrams(f" {folded} "))
+                if grams:
+                    collect(names + "ORDER BY n.rank LIMIT ?",
+                            [" OR ".join(_phrase(g) for g in grams), snapshot] + kind_params)
+            scored = sorted(((_symbol_score(folded, row[3]), row) for row in candidates.values()),
+                            key=lambda item: (-item[0], len(item[1][2]), item[1][6], item[1][5] or 0))
+        return [{"key": f"{path}::{suffix}", "kind": kind_, "name": name, "file": path, "line": line,
+                 "score": round(score, 4)}
+                for score, (_, kind_, name, _, suffix, line, path) in scored if score >= MIN_FUZZY_SCORE][:limit]
@@ -0,0 +1,341 @@
+"""
+Program slices over statement-level PDGs (see PDGGenerator.build_statement_pdg).
+
+A backward slice from a statement is everything it transitively depends
+on through data and control dependences; a forward slice is everything
+that transitively depends on it. A criterion is a statement, given as a
+PDG node key or a line of the function (the innermost statements on that
+line), with an optional variable: then the first step only follows the
+data dependences that carry that variable (backward, the statement's
+control dependences are kept too, since they decide whether it runs).
+
+Each function's PDG is loaded once into CSR adjacency arrays, so a slice
+is one indexed walk over a visited bytearray. Slices are memoized per
+(function, criterion, direction) and loaded PDGs kept in LRU caches.
+
+Interprocedural slices cross call edges in two phases, as in Horwitz,
+Reps and Binkley, so they only follow call/return paths that can happen.
+Backward, a call site pulls in the callee's return statements, and a
+slice that reaches the parameters continues at the call sites in every
+caller. Forward, a call site continues at the callee's parameters, and a
+slice that reaches a return statement continues at the call sites in
+every caller. A slice entered by descending into a callee never climbs
+back out to the callers (its call site is already in the slice), and a
+call site reached by climbing out of a callee does not descend into that
+callee again. Calls are matched by name like the call graph, so dynamic
+dispatch and same-name callees over-approximate.
+"""
+
+import os
+import threading
+from collections import OrderedDict, deque
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Set, Tuple
+
+from reachability import csr
+from telemetry import count, span
+
+BACKWARD = "backward"
+FORWARD = "forward"
+DIRECTIONS = (BACKWARD, FORWARD)
+
+RETURN_AST_TYPES = frozenset({"return_statement"})
+
+DEFAULT_MAX_SLICES = 4096
+DEFAULT_MAX_INDEXES = 512
+DEFAULT_MAX_FUNCTIONS = 64
+
+Criterion = Tuple[Hashable, ...]
+
+
+class DependenceIndex:
+    """One function's PDG as forward and backward CSR adjacency."""
+
+    def __init__(self, function: str, name: str, nodes: Sequence[Dict[str, Any]],
+                 edges: Sequence[Dict[str, Any]]):
+        self.function = function
+        self.name = name
+        self.keys = [node["key"] for node in nodes]
+        self.attrs = nodes
+        self.ids = ids = {key: i for i, key in enumerate(self.keys)}
+        n = len(self.keys)
+        pairs = []
+        self.variables: Dict[Tuple[int, int], Tuple[str, ...]] = {}
+        self.control: Set[Tuple[int, int]] = set()
+        for edge in edges:
+            u, v = ids[edge["src"]], ids[edge["dst"]]
+            pairs.append((u, v))
+            if edge.get("variables"):
+                self.variables[u, v] = tuple(edge["variables"])
+            if edge.get("branch") is not None:
+                self.control.add((u, v))
+        self.offsets, self.targets = csr(n, pairs)
+        self.pred_offsets, self.pred_targets = csr(n, [(v, u) for u, v in pairs])
+        self.entry = next((i for i, node in enumerate(nodes) if node.get("type") == "entry"), -1)
+        self.returns = [i for i, node in enumerate(nodes) if node.get("ast") in RETURN_AST_TYPES]
+        self.parameter_uses = [v for (u, v) in self.variables if u == self.entry]
+
+    @classmethod
+    def from_flow_graph(cls, graph: Dict[str, Any], name: str) -> "DependenceIndex":
+        """From GraphDatabase.flow_graph(function, "pdg")."""
+        return cls(graph["function"], name, graph["nodes"], graph["edges"])
+
+    @classmethod
+    def from_networkx(cls, function: str, name: str, graph) -> "DependenceIndex":
+        return cls.from_rows(function, name, graph.nodes(data=True), graph.edges(data=True))
+
+    @classmethod
+    def from_rows(cls, function: str, name: str, nodes, edges) -> "DependenceIndex":
+        """From (key, attrs) nodes and (source, target, attrs) edges, see graph_db.flow_rows."""
+        nodes = [dict(attrs, key=key) for key, attrs in nodes]
+        edges = [dict(attrs, src=u, dst=v) for u, v, attrs in edges]
+        return cls(function, name, nodes, edges)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def successors(self, v: int) -> Iterable[int]:
+        return self.targets[self.offsets[v]:self.offsets[v + 1]]
+
+    def predecessors(self, v: int) -> Iterable[int]:
+        return self.pred_targets[self.pred_offsets[v]:self.pred_offsets[v + 1]]
+
+    def statements_at(self, line: int) -> List[int]:
+        """The innermost statements whose line range contains `line`."""
+        best, found = None, []
+        for i, node in enumerate(self.attrs):
+            start = node.get("line")
+            end = node.get("end_line") or start
+            if start is None or not start <= line <= end:
+                continue
+            span_lines = end - start
+            if best is None or span_lines < best:
+                best, found = span_lines, [i]
+            elif span_lines == best:
+                found.append(i)
+        return found
+
+    def calling(self, name: str) -> List[int]:
+        """Statements that call `name`."""
+        return [i for i, node in enumerate(self.attrs) if name in node.get("calls", ())]
+
+    def starts(self, criterion: Criterion) -> List[int]:
+        kind = criterion[0]
+        if kind == "node":
+            return [self.ids[criterion[1]]] if criterion[1] in self.ids else []
+        if kind == "line":
+            return self.statements_at(criterion[1])
+        if kind == "returns":
+            return self.returns
+        if kind == "parameters":
+            return self.parameter_uses
+        if kind == "calls":
+            return self.calling(criterion[1])
+        raise ValueError(f"Unknown slicing criterion: {criterion!r}")
+
+    def walk(self, starts: Iterable[int], direction: str,
+             variable: Optional[str] = None) -> Tuple[int, ...]:
+        """Nodes of the slice from `starts`, in node order."""
+        forward = direction == FORWARD
+        step = self.successors if forward else self.predecessors
+        seen = bytearray(len(self.keys))
+        stack = []
+        for s in starts:
+            seen[s] = 1
+            if variable is None:
+                stack.append(s)
+                continue
+            for t in step(s):
+                edge = (s, t) if forward else (t, s)
+                if variable in self.variables.get(edge, ()) or (not forward and edge in self.control):
+                    if not seen[t]:
+                        seen[t] = 1
+                        stack.append(t)
+        while stack:
+            v = stack.pop()
+            for t in step(v):
+                if not seen[t]:
+                    seen[t] = 1
+                    stack.append(t)
+        return tuple(i for i in range(len(seen)) if seen[i])
+
+    def statement(self, i: int) -> Dict[str, Any]:
+        node = self.attrs[i]
+        return {"node": self.keys[i], "type": node.get("type"), "label": node.get("label"),
+                "line": node.get("line"), "end_line": node.get("end_line")}
+
+
+class LRU(OrderedDict):
+    """Mapping that keeps its `maxsize` most recently used entries."""
+
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def lookup(self, key):
+        value = self.get(key, self)
+        if value is not self:
+            self.move_to_end(key)
+        return value
+
+    def store(self, key, value) -> None:
+        self[key] = value
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+class Slicer:
+    """
+    Slices over the PDGs `load` returns (a DependenceIndex, or None for a
+    function without one). `callers(function)` gives the keys of calling
+    functions and `callees(function)` (called name, key) pairs; both are
+    only used by interprocedural slices.
+    """
+
+    def __init__(self, load: Callable[[str], Optional[DependenceIndex]],
+                 callers: Callable[[str], Iterable[str]] = lambda function: (),
+                 callees: Callable[[str], Iterable[Tuple[str, str]]] = lambda function: (),
+                 max_slices: int = DEFAULT_MAX_SLICES, max_indexes: int = DEFAULT_MAX_INDEXES):
+        self._load = load
+        self._callers = callers
+        self._callees = callees
+        self._indexes = LRU(max_indexes)
+        self._slices = LRU(max_slices)
+        self._lock = threading.RLock()
+
+    def index(self, function: str) -> Optional[DependenceIndex]:
+        with self._lock:
+            index = self._indexes.lookup(function)
+            if index is self._indexes:
+                index = self._load(function)
+                self._indexes.store(function, index)
+            return index
+
+    def intraprocedural(self, function: str, criterion: Criterion,
+                        direction: str = BACKWARD) -> Tuple[int, ...]:
+        """Node ids of one function's slice (memoized)."""
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Unknown slice direction: {direction}")
+        key = (function, criterion, direction)
+        with self._lock:
+            found = self._slices.lookup(key)
+            if found is not self._slices:
+                count("slice_cache_total", result="hit")
+                return found
+            index = self.index(function)
+            if index is None:
+                found = ()
+            else:
+                variable = criterion[2] if criterion[0] in ("node", "line") else None
+                found = index.walk(index.starts(criterion), direction, variable)
+            self._slices.store(key, found)
+        count("slice_cache_total", result="miss")
+        return found
+
+    def slice(self, function: str, line: Optional[int] = None, node: Optional[str] = None,
+              variable: Optional[str] = None, direction: str = BACKWARD,
+              interprocedural: bool = False,
+              max_functions: int = DEFAULT_MAX_FUNCTIONS) -> Dict[str, Any]:
+        """
+        Slice of `function` from the statement `node` (a PDG node key) or
+        at `line`, optionally restricted to `variable`. Returns the
+        statements per function and whether `max_functions` cut an
+        interprocedural slice short.
+        """
+        index = self.index(function)
+        if index is None:
+            raise ValueError(f"No dependence graph for {function}")
+        if node is not None:
+            criterion: Criterion = ("node", node, variable)
+        elif line is not None:
+            criterion = ("line", line, variable)
+        else:
+            raise ValueError("A slice needs a statement node or a line")
+        if not index.starts(criterion):
+            raise ValueError(f"No statement matches {criterion[0]} {criterion[1]} in {function}")
+
+        with span("slice", direction=direction):
+            found: Dict[str, Set[int]] = {}
+            # (function, criterion, whether the slice may still climb out to callers)
+            queue = deque([(function, criterion, True)])
+            done = set()
+            while queue and len(found) < max_functions:
+                item = queue.popleft()
+                if item in done:
+                    continue
+                done.add(item)
+                current, crit, ascend = item
+                nodes = self.intraprocedural(current, crit, direction)
+                current_index = self.index(current)
+                if current_index is None:
+                    continue
+                found.setdefault(current, set()).update(nodes)
+                if interprocedural:
+                    queue.extend(self._crossings(current_index, nodes, direction, crit, ascend))
+            truncated = any(item not in done for item in queue)
+
+        results = []
+        for current, nodes in found.items():
+            current_index = self.index(current)
+            statements = [current_index.statement(i) for i in sorted(nodes)
+                          if i != current_index.entry]
+            results.append({"function": current, "statements": statements})
+        return {"direction": direction, "criterion": list(criterion),
+                "functions": results, "truncated": truncated}
+
+    def _crossings(self, index: DependenceIndex, nodes: Sequence[int], direction: str,
+                   criterion: Criterion, ascend: bool) -> List[Tuple[str, Criterion, bool]]:
+        """
+        Slices in other functions that the call edges of `nodes`, a slice
+        from `criterion`, lead to: callees (which may not ascend) and, if
+        `ascend`, callers.
+        """
+        crossings = []
+        # Call sites we climbed out to only need the callee we came from
+        # for their arguments (backward) or result (forward), already sliced
+        came_from = criterion[1] if criterion[0] == "calls" else None
+        sites = set(index.starts(criterion)) if came_from is not None else ()
+        called = set()
+        for i in nodes:
+            calls = index.attrs[i].get("calls", ())
+            called.update(c for c in calls if i not in sites or c != came_from)
+        if called:
+            into = ("returns",) if direction == BACKWARD else ("parameters",)
+            for name, callee in self._callees(index.function):
+                if name in called and callee:
+                    crossings.append((callee, into, False))
+        if ascend:
+            members = set(nodes)
+            boundary = index.parameter_uses if direction == BACKWARD else index.returns
+            if any(i in members for i in boundary):
+                crossings.extend((caller, ("calls", index.name), True)
+                                 for caller in self._callers(index.function))
+        return crossings
+
+
+@lru_cache(maxsize=8)
+def _cached_slicer(path: str, mtime_ns: int) -> Slicer:
+    from graph_db import GraphDatabase
+    db = GraphDatabase(path)
+    lock = threading.Lock()
+
+    def load(function: str) -> Optional[DependenceIndex]:
+        with lock:
+            symbol = db.symbol(function)
+            graph = db.flow_graph(function, "pdg") if symbol else None
+        return DependenceIndex.from_flow_graph(graph, symbol["name"]) if graph else None
+
+    def callers(function: str) -> List[str]:
+        with lock:
+            return [row["key"] for row in db.callers(function)]
+
+    def callees(function: str) -> List[Tuple[str, str]]:
+        with lock:
+            return [(row["callee"], row["key"]) for row in db.callees(function)]
+
+    return Slicer(load, callers, callees)
+
+
+def slicer_for_database(path: str) -> Slicer:
+    """Slicer over a snapshot database's PDGs, shared by all queries on that file."""
+    return _cached_slicer(path, os.stat(path).st_mtime_ns)
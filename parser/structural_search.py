@@ -0,0 +1,300 @@
+"""
+Structural code search: a tree-sitter query run over every file of a repo.
+
+Files are searched in chunks on one process pool of POOL_WORKERS that
+lives as long as the server and is shared by concurrent searches, so each
+worker keeps its parsed trees. They are cached by content hash in a
+per-process LRU bounded by source size, and a repeated search only
+re-reads and hashes the files. A search's `workers` only caps how many of
+its chunks are in flight (TASKS_PER_WORKER each). Matches are yielded as
+each chunk finishes, and a search that reaches its `limit` cancels the
+chunks not yet started.
+
+The workers are started by a forkserver rather than forked from the
+server, whose other threads may hold locks (the telemetry registry's,
+say) at fork time and leave them held in the child forever. Workers
+report their tree cache hits and misses with each chunk's results, and
+the searching process counts them.
+
+py-tree-sitter only exposes a query's captures, not its matches. A match
+is therefore rebuilt around each capture of a top-level pattern, such as
+@call in `(call function: (identifier) @fn) @call`, with the other
+captures attached to the innermost such capture that contains them. A
+pattern without a top-level capture yields one match per capture.
+"""
+
+import atexit
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Sequence, Tuple
+
+from ir_processor import collect_files
+from languages import SUPPORTED_LANGUAGES, detect_language, get_language, get_parser
+from sampler import WorkerChannel, release_channel, start_worker_sampler, worker_channel
+from telemetry import count, span
+
+# Processes in the shared search pool, and how they are started
+POOL_WORKERS = os.cpu_count() or 1
+POOL_START_METHOD = "forkserver"
+
+# Files per task sent to a worker
+CHUNK_FILES = 32
+
+# Tasks in flight per worker; bounds the work wasted once `limit` is reached
+TASKS_PER_WORKER = 2
+
+# Source bytes whose trees each process keeps
+TREE_CACHE_BYTES = 64 << 20
+
+# Longest captured text returned per capture
+MAX_CAPTURE_CHARS = 2000
+
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|;[^\n]*|[()\[\]]|@[\w.\-]+|#[\w?!\-]+|[^\s()\[\]@";]+')
+
+_queries: Dict[Tuple[str, str], Tuple[Any, FrozenSet[str]]] = {}
+_trees: "OrderedDict[Tuple[str, str], Tuple[Any, int]]" = OrderedDict()
+_tree_bytes = 0
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_channel: Optional[WorkerChannel] = None
+_pool_lock = threading.Lock()
+
+
+def root_captures(pattern: str) -> FrozenSet[str]:
+    """Names of the captures on top-level patterns (outside any node pattern)."""
+    roots = set()
+    frames: List[str] = []   # "group", "node" or "predicate" per open paren/bracket
+    tokens = [t for t in _TOKEN.findall(pattern) if not t.startswith(";")]
+    for i, token in enumerate(tokens):
+        if token in ("(", "["):
+            following = tokens[i + 1] if i + 1 < len(tokens) else ""
+            if token == "[" or following in ("(", "[") or following.startswith('"'):
+                frames.append("group")
+            else:
+                frames.append("predicate" if following.startswith("#") else "node")
+        elif token in (")", "]"):
+            if frames:
+                frames.pop()
+        elif token.startswith("@") and "node" not in frames and "predicate" not in frames:
+            roots.add(token[1:])
+    return frozenset(roots)
+
+
+def compile_query(language: str, pattern: str):
+    """(tree-sitter query, root capture names); ValueError if the language or pattern is invalid."""
+    if language not in SUPPORTED_LANGUAGES:
+        raise ValueError(f"Unsupported language: {language}")
+    key = (language, pattern)
+    found = _queries.get(key)
+    if found is None:
+        try:
+            query = get_language(language).query(pattern)
+        except (SyntaxError, NameError) as e:
+            raise ValueError(f"Invalid query: {e}") from None
+        found = _queries[key] = (query, root_captures(pattern))
+    return found
+
+
+def _tree(code: bytes, language: str) -> Tuple[Any, bool]:
+    """Parsed tree of `code`, reused while its content stays in the LRU; and whether it was."""
+    global _tree_bytes
+    key = (language, hashlib.blake2b(code, digest_size=16).hexdigest())
+    found = _trees.get(key)
+    if found is not None:
+        _trees.move_to_end(key)
+        return found[0], True
+    tree = get_parser(language).parse(code)
+    _trees[key] = (tree, len(code))
+    _tree_bytes += len(code)
+    while _tree_bytes > TREE_CACHE_BYTES and len(_trees) > 1:
+        _, (_, size) = _trees.popitem(last=False)
+        _tree_bytes -= size
+    return tree, False
+
+
+def _capture(name: str, node, code: bytes) -> Dict[str, Any]:
+    text = code[node.start_byte:node.end_byte][:MAX_CAPTURE_CHARS * 4]
+    return {
+        "name": name,
+        "text": text.decode("utf8", errors="replace")[:MAX_CAPTURE_CHARS],
+        "start_line": node.start_point[0] + 1,
+        "end_line": node.end_point[0] + 1,
+        "start_byte": node.start_byte,
+        "end_byte": node.end_byte,
+    }
+
+
+def _match(path: str, node) -> Dict[str, Any]:
+    return {"file": path, "start_line": node.start_point[0] + 1, "end_line": node.end_point[0] + 1,
+            "start_byte": node.start_byte, "end_byte": node.end_byte, "captures": []}
+
+
+def search_source(code: bytes, language: str, pattern: str, path: str = "",
+                  limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Matches of `pattern` in one file's source, in source order."""
+    tree, hit = _tree(code, language)
+    count("search_tree_cache_total", result="hit" if hit else "miss")
+    return _search_tree(tree, code, language, pattern, path, limit)
+
+
+def _search_tree(tree, code: bytes, language: str, pattern: str, path: str,
+                 limit: Optional[int]) -> List[Dict[str, Any]]:
+    query, roots = compile_query(language, pattern)
+    captures = query.captures(tree.root_node)
+    # Outer nodes first, and a root capture before others on the same node
+    captures.sort(key=lambda c: (c[0].start_byte, -c[0].end_byte, c[1] not in roots))
+    matches: Dict[Tuple[int, int, str], Dict[str, Any]] = {}
+    seen = set()
+    # Enclosing root captures, innermost last: (start, end, match or None past the limit)
+    open_roots: List[Tuple[int, int, Optional[Dict[str, Any]]]] = []
+    for node, name in captures:
+        while open_roots and not (open_roots[-1][0] <= node.start_byte
+                                  and node.end_byte <= open_roots[-1][1]):
+            open_roots.pop()
+        if name in roots or not roots:
+            key = (node.start_byte, node.end_byte, node.type)
+            match = matches.get(key)
+            if match is None and (limit is None or len(matches) < limit):
+                match = matches[key] = _match(path, node)
+            if match is None and all(m is None for _, _, m in open_roots):
+                break
+            if roots:
+                open_roots.append((node.start_byte, node.end_byte, match))
+        else:
+            match = open_roots[-1][2] if open_roots else None
+        if match is None:
+            continue
+        capture = (id(match), name, node.start_byte, node.end_byte)
+        if capture not in seen:
+            seen.add(capture)
+            match["captures"].append(_capture(name, node, code))
+    return sorted(matches.values(), key=lambda m: (m["start_byte"], -m["end_byte"]))
+
+
+def _search_files(files: Sequence[Tuple[str, str]], language: str, pattern: str,
+                  limit: Optional[int]) -> Tuple[List[Dict[str, Any]], int, int]:
+    """
+    Matches in (path, reported path) files, at most `limit`; also the number
+    of files read and how many of their trees were cached.
+    """
+    results: List[Dict[str, Any]] = []
+    searched = hits = 0
+    for path, rel_path in files:
+        remaining = None if limit is None else limit - len(results)
+        if remaining is not None and remaining <= 0:
+            break
+        try:
+            with open(path, "rb") as f:
+                code = f.read()
+        except OSError:
+            continue
+        searched += 1
+        tree, hit = _tree(code, language)
+        hits += hit
+        results.extend(_search_tree(tree, code, language, pattern, rel_path, remaining))
+    return results, searched, hits
+
+
+def _count_searched(searched: int, hits: int) -> None:
+    count("search_files_total", searched)
+    count("search_tree_cache_total", hits, result="hit")
+    count("search_tree_cache_total", searched - hits, result="miss")
+
+
+def _executor() -> ProcessPoolExecutor:
+    """The shared process pool of POOL_WORKERS, created on first use; profiles sample its workers."""
+    global _pool, _pool_channel
+    with _pool_lock:
+        if _pool is None:
+            context = multiprocessing.get_context(POOL_START_METHOD)
+            _pool_channel = worker_channel(context)
+            _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS, mp_context=context,
+                                        initializer=start_worker_sampler, initargs=(_pool_channel,))
+        return _pool
+
+
+@atexit.register
+def shutdown_pool() -> None:
+    global _pool, _pool_channel
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            release_channel(_pool_channel)
+            _pool = _pool_channel = None
+
+
+def search_repo(root: str, language: str, pattern: str, limit: Optional[int] = None,
+                workers: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield matches of `pattern` in the `language` files under `root`, with
+    paths relative to it, as soon as each chunk of files is searched.
+    Stops after `limit` matches. `workers` (at most POOL_WORKERS) caps the
+    pool workers this search keeps busy; `workers=1` searches in this
+    process.
+    """
+    compile_query(language, pattern)   # fail fast on a bad pattern
+    files = sorted(fp for fp in collect_files(root) if detect_language(fp) == language)
+    files = [(fp, os.path.relpath(fp, root).replace(os.sep, "/")) for fp in files]
+    chunks = [files[i:i + CHUNK_FILES] for i in range(0, len(files), CHUNK_FILES)]
+    workers = min(workers or POOL_WORKERS, POOL_WORKERS, max(1, len(chunks)))
+    found = 0
+    with span("structural_search", language=language):
+        if workers <= 1:
+            for chunk in chunks:
+                matches, searched, hits = _search_files(chunk, language, pattern,
+                                                        None if limit is None else limit - found)
+                _count_searched(searched, hits)
+                for match in matches:
+                    found += 1
+                    yield match
+                if limit is not None and found >= limit:
+                    return
+            return
+
+        pool = _executor()
+        pending = iter(chunks)
+        running = set()
+        try:
+            while True:
+                while len(running) < workers * TASKS_PER_WORKER:
+                    chunk = next(pending, None)
+                    if chunk is None:
+                        break
+                    running.add(pool.submit(_search_files, chunk, language, pattern,
+                                            None if limit is None else limit - found))
+                if not running:
+                    return
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    matches, searched, hits = future.result()
+                    _count_searched(searched, hits)
+                    for match in matches:
+                        if limit is not None and found >= limit:
+                            return
+                        found += 1
+                        yield match
+                if limit is not None and found >= limit:
+                    return
+        finally:
+            for future in running:
+                future.cancel()
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    ap = argparse.ArgumentParser(description="Search a repo with a tree-sitter query")
+    ap.add_argument("root", help="repository directory")
+    ap.add_argument("language", choices=SUPPORTED_LANGUAGES)
+    ap.add_argument("pattern", help="tree-sitter query, e.g. '(call function: (identifier) @fn) @call'")
+    ap.add_argument("-n", "--limit", type=int, default=None, help="stop after this many matches")
+    ap.add_argument("-j", "--jobs", type=int, default=None, help="worker processes")
+    args = ap.parse_args()
+    for match in search_repo(args.root, args.language, args.pattern, args.limit, args.jobs):
+        print(json.dumps(match))
@@ -0,0 +1,305 @@
+"""
+Bottom-up interprocedural function summaries.
+
+A summary says which parameters a function reads, which it modifies
+through (a store into the object a parameter refers to, made by the
+function itself or by a callee it passes the parameter to), which ones
+its return value depends on, and which functions it calls. Local facts
+come from the function's statement PDG alone (see
+PDGGenerator.build_statement_pdg). They are cached by a hash of the
+function's source, so an unchanged function is analysed once.
+
+Callee summaries are folded into their callers over the SCC condensation
+of the call graph, callees first, and mutually recursive functions iterate
+to a fixpoint inside their SCC. The SCCs run one after another: the work
+is pure Python (and `analyze` usually closes over syntax trees that cannot
+be sent to another process), so a thread pool would only add locking under
+the GIL. The ordering is what makes each function's analysis run once.
+
+Calls are resolved by name, as in the call graph. A modification
+therefore only propagates through plain calls, and through calls on
+self/cls into the same class. Through a receiver of unknown type, every
+`.get()` would bind to whatever `get` the repository defines.
+
+Interprocedural PDG edges then follow from the summaries without
+revisiting callee bodies: parameter_in (call site -> callee entry, for
+each parameter the callee reads), parameter_out (the callee statement
+that modifies a parameter -> the call site, labelled with the caller's
+variable) and return (callee return statement -> call site).
+"""
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from reachability import csr, strongly_connected_components
+from slicing import BACKWARD, DependenceIndex
+from telemetry import count, span
+
+# Bump when the local facts change shape or meaning, to invalidate caches
+FACTS_VERSION = 1
+
+# Local facts kept in the cache file, the most recently used first
+CACHE_ENTRIES = 20_000
+
+# Receivers bind to these when they are a method's first parameter
+SELF_NAMES = ("self", "cls")
+
+PARAMETER_IN = "parameter_in"
+PARAMETER_OUT = "parameter_out"
+RETURN = "return"
+
+# (kind, source function, source node, target function, target node, variable)
+InterproceduralEdge = Tuple[str, str, str, str, str, Optional[str]]
+Callees = Dict[str, Sequence[Tuple[str, str]]]   # function -> [(called name, callee key)]
+
+
+def content_hash(source, language: str) -> str:
+    """Cache key of a function's local facts: its source text and language."""
+    if isinstance(source, str):
+        source = source.encode("utf8")
+    digest = hashlib.sha256(f"{FACTS_VERSION}:{language}:".encode())
+    digest.update(source)
+    return digest.hexdigest()
+
+
+def local_facts(index: DependenceIndex, parameters: Sequence[str]) -> Dict[str, Any]:
+    """
+    JSON-ready local facts of one function: its parameters, the ones it
+    reads, modifies (with the statements that do) and returns, its return
+    statements and every call site with the variables passed to it.
+    """
+    entry = index.entry
+    live: Dict[int, Set[str]] = {}   # node -> parameters whose incoming value it uses
+    for (u, v), names in index.variables.items():
+        if u == entry:
+            live.setdefault(v, set()).update(names)
+    reads = set().union(*live.values()) if live else set()
+
+    returns: Set[str] = set()
+    if index.returns:
+        for v in index.walk(index.returns, BACKWARD):
+            returns.update(live.get(v, ()))
+
+    writes: Dict[str, List[str]] = {}
+    for v in sorted(live):
+        for name in index.attrs[v].get("may_defs", ()):
+            if name in live[v]:
+                writes.setdefault(name, []).append(index.keys[v])
+
+    call_sites = []
+    for i, attrs in enumerate(index.attrs):
+        for call in attrs.get("arguments", ()):
+            call_sites.append(dict(call, node=index.keys[i], live=sorted(live.get(i, ()))))
+    return {
+        "parameters": list(parameters),
+        "entry": index.keys[entry] if entry >= 0 else None,
+        "reads": sorted(reads),
+        "returns": sorted(returns),
+        "writes": writes,
+        "return_nodes": [index.keys[i] for i in index.returns],
+        "call_sites": call_sites,
+    }
+
+
+@dataclass
+class FunctionSummary:
+    function: str
+    hash: str
+    parameters: List[str]
+    reads: List[str]
+    writes: Dict[str, List[str]]     # parameter -> statements that modify it
+    returns: List[str]
+    calls: List[str]
+    facts: Dict[str, Any] = field(repr=False)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"parameters": self.parameters, "reads": self.reads, "writes": self.writes,
+                "returns": self.returns, "calls": self.calls}
+
+
+class SummaryCache:
+    """
+    Local facts by content hash, optionally kept in a JSON file between
+    runs. Entries are kept in least recently used order, and `save` writes
+    at most `max_entries` of them, so functions that only some branches
+    contain survive a run on another branch.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = CACHE_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._facts: Dict[str, Dict[str, Any]] = {}   # least recently used first
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._facts = json.load(f)
+            except (OSError, ValueError):
+                self._facts = {}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            facts = self._facts.pop(key, None)
+            if facts is not None:
+                self._facts[key] = facts
+        count("summary_cache_total", result="hit" if facts is not None else "miss")
+        return facts
+
+    def put(self, key: str, facts: Dict[str, Any]) -> None:
+        with self._lock:
+            self._facts.pop(key, None)
+            self._facts[key] = facts
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._facts
+
+    def save(self) -> Optional[str]:
+        """Write the `max_entries` most recently used entries."""
+        if not self.path:
+            return None
+        with self._lock:
+            keys = list(self._facts)[-self.max_entries:] if self.max_entries > 0 else []
+            facts = {key: self._facts[key] for key in keys}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(facts, f)
+        os.replace(tmp_path, self.path)
+        return self.path
+
+
+def _bind(parameters: Sequence[str], site: Dict[str, Any]) -> List[Tuple[str, Optional[str]]]:
+    """
+    (callee parameter, caller variable or None) for each argument of a call
+    site. A method call binds its receiver to self/cls; a plain call never
+    reaches a callee taking self, so it binds nothing there.
+    """
+    params = list(parameters)
+    pairs: List[Tuple[str, Optional[str]]] = []
+    if params and params[0] in SELF_NAMES:
+        if "receiver" not in site:
+            return []
+        pairs.append((params[0], site["receiver"]))
+        params = params[1:]
+    pairs.extend(zip(params, site.get("args", ())))
+    pairs.extend((name, var) for name, var in site.get("keywords", {}).items()
+                 if name in parameters)
+    return pairs
+
+
+def _resolve(callees: Callees, function: str, name: str) -> List[str]:
+    return [key for called, key in callees.get(function, ()) if called == name]
+
+
+def _same_class(function: str, other: str) -> bool:
+    """Whether two "<path>::<Class.method>::<line>" keys are methods of one class."""
+    path, qualname, _ = function.rsplit("::", 2)
+    other_path, other_qualname, _ = other.rsplit("::", 2)
+    return path == other_path and "." in qualname and \
+        qualname.rsplit(".", 1)[0] == other_qualname.rsplit(".", 1)[0]
+
+
+def _compose(summary: FunctionSummary, callees: Callees,
+             summaries: Dict[str, FunctionSummary]) -> Dict[str, List[str]]:
+    """Parameters `summary`'s function modifies, itself or through its callees."""
+    writes = {name: list(nodes) for name, nodes in summary.facts["writes"].items()}
+    own = set(summary.parameters)
+    for site in summary.facts["call_sites"]:
+        live = set(site["live"])
+        method = "receiver" in site
+        if method and site["receiver"] not in SELF_NAMES:
+            continue
+        for callee in _resolve(callees, summary.function, site["callee"]):
+            if method and not _same_class(summary.function, callee):
+                continue
+            callee_summary = summaries.get(callee)
+            if callee_summary is None:
+                continue
+            for param, var in _bind(callee_summary.parameters, site):
+                if var in live and var in own and param in callee_summary.writes:
+                    nodes = writes.setdefault(var, [])
+                    if site["node"] not in nodes:
+                        nodes.append(site["node"])
+    return writes
+
+
+def compute_summaries(hashes: Dict[str, str], callees: Callees,
+                      analyze: Callable[[str], Dict[str, Any]],
+                      cache: Optional[SummaryCache] = None) -> Dict[str, FunctionSummary]:
+    """
+    Summaries of the functions in `hashes` (function key -> content hash).
+    `analyze(function)` returns local facts (see local_facts) and is only
+    called on a cache miss; `callees` resolves each function's calls.
+    """
+    cache = cache if cache is not None else SummaryCache()
+    keys = list(hashes)
+    ids = {key: i for i, key in enumerate(keys)}
+    n = len(keys)
+    edges = sorted({(ids[f], ids[c]) for f, targets in callees.items() if f in ids
+                    for _, c in targets if c in ids})
+    offsets, targets = csr(n, edges)
+    comp, _ = strongly_connected_components(n, offsets, targets)
+    components = max(comp) + 1 if n else 0
+    members: List[List[str]] = [[] for _ in range(components)]
+    for v in range(n):
+        members[comp[v]].append(keys[v])
+
+    summaries: Dict[str, FunctionSummary] = {}
+
+    def facts_of(key: str) -> Dict[str, Any]:
+        facts = cache.get(hashes[key])
+        if facts is None:
+            facts = analyze(key)
+            cache.put(hashes[key], facts)
+        return facts
+
+    def run(c: int) -> None:
+        for key in members[c]:
+            facts = facts_of(key)
+            called = sorted({callee for site in facts["call_sites"]
+                             for callee in _resolve(callees, key, site["callee"])})
+            summaries[key] = FunctionSummary(key, hashes[key], facts["parameters"], facts["reads"],
+                                             facts["writes"], facts["returns"], called, facts)
+        # Members of a cycle see each other's partial summaries until nothing changes
+        changed = True
+        while changed:
+            changed = False
+            for key in members[c]:
+                writes = _compose(summaries[key], callees, summaries)
+                if writes != summaries[key].writes:
+                    summaries[key].writes = writes
+                    changed = True
+
+    with span("summaries"):
+        # Tarjan numbers components callees first
+        for c in range(components):
+            run(c)
+    count("summaries_total", len(summaries))
+    return summaries
+
+
+def interprocedural_edges(summaries: Dict[str, FunctionSummary],
+                          callees: Callees) -> List[InterproceduralEdge]:
+    """parameter_in, parameter_out and return edges between the summarised functions' PDGs."""
+    edges = set()
+    for key, summary in summaries.items():
+        for site in summary.facts["call_sites"]:
+            node = site["node"]
+            for callee in _resolve(callees, key, site["callee"]):
+                callee_summary = summaries.get(callee)
+                if callee_summary is None:
+                    continue
+                entry = callee_summary.facts["entry"]
+                for param, var in _bind(callee_summary.parameters, site):
+                    if entry is not None and param in callee_summary.reads:
+                        edges.add((PARAMETER_IN, key, node, callee, entry, param))
+                    if var is not None:
+                        for writer in callee_summary.writes.get(param, ()):
+                            edges.add((PARAMETER_OUT, callee, writer, key, node, var))
+                for returned in callee_summary.facts["return_nodes"]:
+                    edges.add((RETURN, callee, returned, key, node, None))
+    return sorted(edges, key=lambda e: (e[0], e[1], e[2], e[3], e[4], e[5] or ""))
@@ -0,0 +1,525 @@
+"""
+Extract per-file symbol summaries from source with tree-sitter.
+
+The summary is the format hpg.py, pdg.py and the graph database consume:
+imports, module-level variables, functions and classes (with their methods,
+superclasses and interfaces), and for every function its parameters,
+return type, called names and call sites (name plus receiver, which
+class_hierarchy.py resolves), body, line range, cyclomatic complexity and
+size metrics. The metrics come from the same walk over the function's
+syntax tree that finds its calls (see metrics.py for repo-wide aggregates),
+and so does its clone fingerprint (see clones.py).
+
+Function ids are "<path>::<qualified name>::<start line>" and class ids
+"<path>::<name>", where path is relative to the analysed root, so ids stay
+unique when two files share a basename.
+"""
+
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from clones import fingerprint, shape
+from languages import (
+    CALL_NODE_TYPES, CLASS_NODE_TYPES, FUNCTION_NODE_TYPES, detect_language, get_parser
+)
+from telemetry import count, span
+
+# Nodes that add a branch to the control flow (cyclomatic complexity)
+DECISION_NODE_TYPES = frozenset({
+    "if_statement", "elif_clause", "for_statement", "for_in_statement",
+    "enhanced_for_statement", "while_statement", "do_statement",
+    "case_statement", "switch_case", "switch_label", "catch_clause",
+    "except_clause", "conditional_expression", "ternary_expression",
+    "boolean_operator", "list_comprehension", "case_clause",
+})
+SHORT_CIRCUIT_OPERATORS = ("&&", "||")
+
+# Nodes that open a nesting level (an else-if chain stays at one level)
+NESTING_NODE_TYPES = frozenset({
+    "if_statement", "for_statement", "for_in_statement", "enhanced_for_statement",
+    "while_statement", "do_statement", "try_statement", "switch_statement",
+    "switch_expression", "with_statement", "match_statement",
+})
+
+# Halstead operands: names and literals; every other token is an operator
+OPERAND_TOKEN_TYPES = frozenset({
+    "integer", "float", "number", "string", "string_content", "string_fragment",
+    "true", "false", "none", "null", "undefined", "this", "super",
+})
+STRING_DELIMITER_TYPES = frozenset({'"', "'", "`", "string_start", "string_end"})
+
+# Line prefixes of comment-only lines, for per-file SLOC
+COMMENT_PREFIXES = {"python": (b"#",)}
+C_COMMENT_PREFIXES = (b"//", b"/*", b"*")
+
+# Nodes whose names are worth recording as imports
+IMPORT_NODE_TYPES = frozenset({
+    "import_statement", "import_from_statement", "import_declaration", "preproc_include",
+})
+
+MAX_VALUE_CHARS = 80    # variable values are truncated to this length
+
+_DECLARATOR_TYPES = ("function_declarator", "pointer_declarator", "init_declarator",
+                     "array_declarator", "parenthesized_declarator")
+
+
+def _text(node, code: bytes) -> str:
+    return code[node.start_byte:node.end_byte].decode("utf8", errors="replace")
+
+
+def _declarator_name(node, code: bytes) -> Optional[str]:
+    """Name of a C declarator, unwrapping pointers, arrays and function declarators."""
+    while node is not None and node.type in _DECLARATOR_TYPES:
+        node = node.child_by_field_name("declarator")
+    return _text(node, code) if node is not None else None
+
+
+def _definition_name(node, code: bytes) -> Optional[str]:
+    name = node.child_by_field_name("name")
+    if name is not None:
+        return _text(name, code)
+    return _declarator_name(node.child_by_field_name("declarator"), code)
+
+
+def _first_identifier(node, code: bytes) -> Optional[str]:
+    if node.type in ("identifier", "type_identifier", "property_identifier"):
+        return _text(node, code)
+    for child in node.children:
+        name = _first_identifier(child, code)
+        if name:
+            return name
+    return None
+
+
+def _param(node, code: bytes) -> Dict[str, Any]:
+    """{name, type, default} of one parameter node, for any supported language."""
+    name = None
+    for field in ("name", "pattern", "left"):
+        child = node.child_by_field_name(field)
+        if child is not None:
+            name = _text(child, code)
+            break
+    if name is None:
+        declarator = node.child_by_field_name("declarator")
+        if declarator is not None:
+            name = _declarator_name(declarator, code)
+    if name is None:
+        name = _first_identifier(node, code) or _text(node, code)
+    type_node = node.child_by_field_name("type")
+    default = node.child_by_field_name("value") or node.child_by_field_name("right")
+    return {
+        "name": name,
+        "type": _text(type_node, code).lstrip(":").strip() if type_node is not None else None,
+        "default": _text(default, code) if default is not None else None,
+    }
+
+
+def _parameters(func_node, code: bytes) -> List[Dict[str, Any]]:
+    params = func_node.child_by_field_name("parameters")
+    if params is None:
+        declarator = func_node.child_by_field_name("declarator")
+        while declarator is not None and declarator.type != "function_declarator":
+            declarator = declarator.child_by_field_name("declarator")
+        if declarator is not None:
+            params = declarator.child_by_field_name("parameters")
+    if params is None:
+        return []
+    return [_param(p, code) for p in params.named_children if p.type != "comment"]
+
+
+def _return_type(func_node, code: bytes) -> Optional[str]:
+    node = func_node.child_by_field_name("return_type") or func_node.child_by_field_name("type")
+    return _text(node, code).lstrip(":").strip() if node is not None else None
+
+
+def _type_name(node, code: bytes) -> Optional[str]:
+    """Class named by a base-class or type expression: `mod.Base[T]` -> 'Base'."""
+    if node.type in ("identifier", "type_identifier", "property_identifier"):
+        return _text(node, code)
+    for field in ("attribute", "property", "value"):
+        child = node.child_by_field_name(field)
+        if child is not None:
+            return _type_name(child, code)
+    names = [c for c in node.named_children if c.type != "type_arguments"]
+    return _type_name(names[-1], code) if names else None
+
+
+def callee_name(call, code: bytes) -> Optional[str]:
+    """Called name without receiver: `obj.run()` -> 'run'."""
+    target = call.child_by_field_name("name") or call.child_by_field_name("function")
+    if target is None:
+        return None
+    for field in ("attribute", "property", "field"):
+        member = target.child_by_field_name(field)
+        if member is not None:
+            return _text(member, code)
+    if target.type in ("identifier", "property_identifier"):
+        return _text(target, code)
+    return _first_identifier(target, code)
+
+
+def _receiver(call, code: bytes) -> Optional[str]:
+    """
+    Receiver of a method call: a plain name (self, this and class names
+    included), 'super', or '' for an expression; None for a plain call.
+    """
+    receiver = call.child_by_field_name("object")
+    if receiver is None:
+        target = call.child_by_field_name("function")
+        if target is None or target.type not in ("attribute", "member_expression",
+                                                 "field_expression"):
+            return None
+        receiver = target.child_by_field_name("object") or target.child_by_field_name("argument")
+        if receiver is None:
+            return ""
+    if receiver.type == "call":
+        # Python's super().method()
+        function = receiver.child_by_field_name("function")
+        return "super" if function is not None and _text(function, code) == "super" else ""
+    if receiver.type in ("identifier", "this", "super"):
+        return _text(receiver, code)
+    return ""
+
+
+def _is_operand(token_type: str) -> bool:
+    return token_type in OPERAND_TOKEN_TYPES or token_type.endswith(("identifier", "literal"))
+
+
+def _opens_nesting(node) -> bool:
+    if node.type not in NESTING_NODE_TYPES:
+        return False
+    parent = node.parent
+    if node.type == "if_statement" and parent is not None:
+        if parent.type == "else_clause" or (parent.type == "if_statement" and
+                                            parent.child_by_field_name("alternative") == node):
+            return False
+    return True
+
+
+def source_lines(code: bytes, language: str) -> int:
+    """Lines that are neither blank nor only a comment."""
+    prefixes = COMMENT_PREFIXES.get(language, C_COMMENT_PREFIXES)
+    return sum(1 for line in code.splitlines()
+               if line.strip() and not line.lstrip().startswith(prefixes))
+
+
+def _is_decision(node, code: bytes) -> bool:
+    if node.type in DECISION_NODE_TYPES:
+        return True
+    if node.type == "binary_expression":
+        op = node.child_by_field_name("operator")
+        return op is not None and _text(op, code) in SHORT_CIRCUIT_OPERATORS
+    return False
+
+
+class _FileExtractor:
+    def __init__(self, code: bytes, language: str, rel_path: str, nodes=None):
+        self.code = code
+        self.nodes = nodes
+        self.language = language
+        self.rel_path = rel_path
+        self.function_types = frozenset(FUNCTION_NODE_TYPES.get(language, ()))
+        self.class_types = frozenset(CLASS_NODE_TYPES.get(language, ()))
+        self.call_types = frozenset(CALL_NODE_TYPES.get(language, ()))
+
+    def function(self, node, class_name: Optional[str] = None) -> Dict[str, Any]:
+        code = self.code
+        name = _definition_name(node, code) or "<anonymous>"
+        qualname = f"{class_name}.{name}" if class_name else name
+        start = node.start_point[0] + 1
+        calls: List[str] = []
+        call_sites: List[Dict[str, Optional[str]]] = []
+        complexity = 1
+        depth = 0
+        rows = set()   # lines with a token on them
+        operators = operands = 0
+        operator_set, operand_set = set(), set()
+        # Walk the function without descending into nested definitions; those
+        # are summarised on their own. Calls and decisions only count in the body.
+        body = node.child_by_field_name("body")
+        skip = self.function_types | self.class_types
+        kids = [c for c in node.children if c.type not in skip and "comment" not in c.type]
+        shapes = [shape(node.type, len(kids))[0]]   # normalized nodes in pre-order, for clones
+        stack = [(c, 0, c == body, False) for c in reversed(kids)]
+        while stack:
+            current, level, in_body, collapsed = stack.pop()
+            children = current.children
+            kids = [c for c in children if c.type not in skip and "comment" not in c.type]
+            if not collapsed:
+                token, collapsed = shape(current.type, len(kids))
+                shapes.append(token)
+            if not children:
+                token = current.type
+                if "comment" in token:
+                    continue
+                rows.update(range(current.start_point[0], current.end_point[0] + 1))
+                if token in STRING_DELIMITER_TYPES:
+                    continue
+                if _is_operand(token):
+                    operands += 1
+                    operand_set.add(code[current.start_byte:current.end_byte])
+                else:
+                    operators += 1
+                    operator_set.add(token)
+                continue
+            if in_body:
+                if current.type in self.call_types:
+                    callee = callee_name(current, code)
+                    if callee and callee not in calls:
+                        calls.append(callee)
+                    site = {"name": callee, "receiver": _receiver(current, code)}
+                    if callee and site not in call_sites:
+                        call_sites.append(site)
+                elif _is_decision(current, code):
+                    complexity += 1
+                if _opens_nesting(current):
+                    level += 1
+                    depth = max(depth, level)
+            stack.extend((c, level, in_body, collapsed) for c in reversed(kids))
+        func_id = f"{self.rel_path}::{qualname}::{start}"
+        if self.nodes is not None:
+            self.nodes[func_id] = node
+        parameters = _parameters(node, code)
+        return {
+            "id": func_id,
+            "name": name,
+            "parameters": parameters,
+            "return_type": _return_type(node, code),
+            "calls": calls,
+            "call_sites": call_sites,
+            "body": _text(body, code) if body is not None else "",
+            "start_line": start,
+            "end_line": node.end_point[0] + 1,
+            "complexity": complexity,
+            "metrics": {
+                "loc": node.end_point[0] - node.start_point[0] + 1,
+                "sloc": len(rows),
+                "nesting_depth": depth,
+                "parameters": len(parameters),
+                "operators": operators,
+                "operands": operands,
+                "unique_operators": len(operator_set),
+                "unique_operands": len(operand_set),
+            },
+            "is_async": any(c.type == "async" for c in node.children),
+            "fingerprint": fingerprint(shapes),
+        }
+
+    def _bases(self, node) -> Tuple[List[str], List[str]]:
+        """Names of the superclasses and implemented interfaces of a class."""
+        superclasses: List[str] = []
+        interfaces: List[str] = []
+
+        def add(container, names):
+            for child in container.named_children:
+                if child.type in ("type_arguments", "keyword_argument", "comment"):
+                    continue
+                if child.type == "type_list":
+                    add(child, names)
+                    continue
+                name = _type_name(child, self.code)
+                if name and name not in names:
+                    names.append(name)
+
+        heritage = node.child_by_field_name("superclass") or node.child_by_field_name("superclasses")
+        if heritage is not None:
+            add(heritage, superclasses)
+        implements = node.child_by_field_name("interfaces")
+        if implements is not None:
+            add(implements, interfaces)
+        for child in node.children:
+            if child.type in ("extends_interfaces", "extends_type_clause"):
+                # An interface extending interfaces
+                add(child, superclasses)
+            if child.type != "class_heritage":
+                continue
+            # JavaScript: `extends <expression>`; TypeScript: extends/implements clauses
+            for clause in child.named_children:
+                if clause.type == "extends_clause":
+                    add(clause, superclasses)
+                elif clause.type == "implements_clause":
+                    add(clause, interfaces)
+                else:
+                    name = _type_name(clause, self.code)
+                    if name and name not in superclasses:
+                        superclasses.append(name)
+        return superclasses, interfaces
+
+    def _docstring(self, body) -> Optional[str]:
+        if self.language != "python" or body is None or not body.named_children:
+            return None
+        first = body.named_children[0]
+        if first.type == "expression_statement" and first.named_children \
+                and first.named_children[0].type == "string":
+            return _text(first.named_children[0], self.code).strip("\"' \n")
+        return None
+
+    def _attributes(self, body) -> List[str]:
+        """Field declarations, plus `self.x = ...` assignments for Python."""
+        code = self.code
+        attributes: List[str] = []
+        stack = [body]
+        while stack:
+            node = stack.pop()
+            name = None
+            if node.type in ("field_declaration", "public_field_definition", "field_definition"):
+                declarator = node.child_by_field_name("declarator")
+                target = node.child_by_field_name("name") or node.child_by_field_name("property")
+                if declarator is not None:
+                    name = _definition_name(declarator, code)
+                elif target is not None:
+                    name = _text(target, code)
+            elif node.type == "assignment" and self.language == "python":
+                left = node.child_by_field_name("left")
+                obj = left.child_by_field_name("object") if left is not None else None
+                if left is not None and left.type == "attribute" and obj is not None \
+                        and _text(obj, code) == "self":
+                    name = _text(left.child_by_field_name("attribute"), code)
+            if name and name not in attributes:
+                attributes.append(name)
+            if node.type not in self.class_types or node is body:
+                stack.extend(reversed(node.children))
+        return attributes
+
+    def klass(self, node) -> Dict[str, Any]:
+        name = _definition_name(node, self.code) or "<anonymous>"
+        body = node.child_by_field_name("body")
+        superclasses, interfaces = self._bases(node)
+        methods = []
+        stack = [body] if body is not None else []
+        while stack:
+            current = stack.pop()
+            if current.type in self.function_types:
+                methods.append(self.function(current, name))
+            elif current.type not in self.class_types:
+                stack.extend(reversed(current.children))
+        return {
+            "id": f"{self.rel_path}::{name}",
+            "name": name,
+            "methods": methods,
+            "attributes": self._attributes(body) if body is not None else [],
+            "superclass": superclasses[0] if superclasses else None,
+            "superclasses": superclasses,
+            "interfaces": interfaces,
+            "docstring": self._docstring(body),
+            "start_line": node.start_point[0] + 1,
+            "end_line": node.end_point[0] + 1,
+        }
+
+    def _import(self, node) -> Optional[str]:
+        code = self.code
+        if node.type == "import_from_statement":
+            target = node.child_by_field_name("module_name")
+        elif node.type == "import_statement" and self.language == "python":
+            target = node.child_by_field_name("name")
+        elif node.type == "import_statement":
+            target = node.child_by_field_name("source")
+        elif node.type == "preproc_include":
+            target = node.child_by_field_name("path")
+        else:
+            target = next((c for c in node.named_children if c.type != "asterisk"), None)
+        if target is None:
+            return None
+        return _text(target, code).strip("\"'<>")
+
+    def _variables(self, node) -> List[Dict[str, str]]:
+        """Module-level assignments and declarations."""
+        code = self.code
+        pairs = []
+        if node.type == "expression_statement" and node.named_children \
+                and node.named_children[0].type == "assignment":
+            assignment = node.named_children[0]
+            pairs.append((assignment.child_by_field_name("left"),
+                          assignment.child_by_field_name("right")))
+        elif node.type in ("lexical_declaration", "variable_declaration", "declaration"):
+            for child in node.named_children:
+                if child.type in ("variable_declarator", "init_declarator"):
+                    pairs.append((child.child_by_field_name("name")
+                                  or child.child_by_field_name("declarator"),
+                                  child.child_by_field_name("value")))
+        variables = []
+        for target, value in pairs:
+            if target is None or target.type not in ("identifier",):
+                continue
+            value_text = _text(value, code) if value is not None else ""
+            variables.append({"name": _text(target, code), "value": value_text[:MAX_VALUE_CHARS]})
+        return variables
+
+    def summary(self, root) -> Dict[str, Any]:
+        imports: List[str] = []
+        variables: List[Dict[str, str]] = []
+        functions: List[Dict[str, Any]] = []
+        classes: List[Dict[str, Any]] = []
+        stack = [(root, True)]
+        while stack:
+            node, top_level = stack.pop()
+            if node.type in self.class_types:
+                classes.append(self.klass(node))
+                continue
+            if node.type in self.function_types:
+                functions.append(self.function(node))
+                # Nested functions are listed as functions of their own
+                body = node.child_by_field_name("body")
+                if body is not None:
+                    stack.append((body, False))
+                continue
+            if node.type in IMPORT_NODE_TYPES:
+                name = self._import(node)
+                if name and name not in imports:
+                    imports.append(name)
+                continue
+            if top_level:
+                variables.extend(self._variables(node))
+            # Exports and decorators wrap top-level definitions
+            wrapper = node.type in ("export_statement", "decorated_definition")
+            stack.extend((c, top_level and (node is root or wrapper))
+                         for c in reversed(node.children))
+        functions.sort(key=lambda f: f["start_line"])
+        classes.sort(key=lambda c: c["start_line"])
+        return {"imports": imports, "variables": variables,
+                "functions": functions, "classes": classes}
+
+
+def extract_source_summary(code: bytes, language: str, rel_path: str, tree=None,
+                           nodes: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Summary of source `code`; `rel_path` names the file in ids.
+
+    Pass `tree` to reuse an existing parse, and a `nodes` dict to collect
+    the syntax node of every function by id (e.g. to build CFGs).
+    """
+    if tree is None:
+        tree = get_parser(language).parse(code)
+    summary = _FileExtractor(code, language, rel_path, nodes).summary(tree.root_node)
+    return {
+        "file_name": os.path.basename(rel_path),
+        "file_path": rel_path,
+        "language": language,
+        "total_lines": code.count(b"\n") + (0 if code.endswith(b"\n") or not code else 1),
+        "sloc": source_lines(code, language),
+        **summary,
+    }
+
+
+def extract_file_summary(file_path: str, root: Optional[str] = None,
+                         language: Optional[str] = None) -> Dict[str, Any]:
+    """Summary of one file; ids use its path relative to `root`."""
+    language = language or detect_language(file_path)
+    if not language:
+        raise ValueError(f"Unsupported file type: {file_path}")
+    rel_path = os.path.relpath(file_path, root) if root else file_path
+    with open(file_path, "rb") as f:
+        code = f.read()
+    with span("symbols", language=language):
+        return extract_source_summary(code, language, rel_path.replace(os.sep, "/"))
+
+
+def extract_summaries(files: Iterable[str], root: str) -> List[Dict[str, Any]]:
+    """Summaries of `files`; unreadable or unparsable files are counted and left out."""
+    summaries = []
+    for file_path in files:
+        try:
+            summaries.append(extract_file_summary(file_path, root))
+        except Exception as e:
+            print(f"⚠️ Could not extract symbols from {file_path}: {e}")
+            count("errors_total", stage="symbols")
+    return summaries
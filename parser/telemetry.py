@@ -0,0 +1,361 @@
+"""
+Run instrumentation: timing spans, counters and rate-limited progress logs.
+
+Spans and counters go into a process-wide registry, which the `/metrics`
+endpoint in main.py exports in Prometheus text format. While a `job()` is
+active they are also added to that job's breakdown, which is returned with
+the API response.
+
+Memory profiling is opt-in (`job(memory=True)` or CODEIQ_MEMORY_PROFILE=1):
+tracemalloc then records the peak and retained memory of every span of the
+job and its top allocation sites. It slows the run down, so timings taken
+with it on are not comparable to normal runs. tracemalloc is process-wide,
+so one job is profiled at a time and spans of other jobs take no readings;
+but allocations by other threads running meanwhile still count towards the
+profiled job's numbers.
+"""
+
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Dict, List, Optional, Tuple
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRIC_PREFIX = "codeiq_"
+
+# Minimum seconds between two progress lines from the same ProgressLog
+PROGRESS_INTERVAL = 2.0
+
+# Memory profiling mode
+MEMORY_PROFILE_ENV = "CODEIQ_MEMORY_PROFILE"
+MEMORY_TRACE_FRAMES = 1     # traceback depth kept per allocation
+TOP_ALLOCATIONS = 10        # allocation sites reported per job
+
+METRIC_HELP = {
+    "stage_seconds": "Wall time spent per pipeline stage",
+    "files_total": "Source files processed, by language and parse status",
+    "bytes_total": "Source bytes parsed, by language",
+    "nodes_total": "Syntax tree nodes produced, by language",
+    "errors_total": "Failures, by stage",
+    "graph_nodes_total": "Nodes in built graphs, by graph",
+    "stage_peak_bytes": "Largest traced memory peak of a single stage run (memory profiling only)",
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Optional[str]]) -> LabelKey:
+    return tuple((k, str(v)) for k, v in labels.items() if v is not None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in key) + "}"
+
+
+def _job_key(name: str, key: LabelKey) -> str:
+    """Flat key used in job breakdowns, e.g. 'parse[python]'."""
+    if not key:
+        return name
+    return f"{name}[{','.join(v for _, v in key)}]"
+
+
+class Registry:
+    """Process-wide counters and stage timings."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.stage_sum: Dict[LabelKey, float] = {}
+        self.stage_count: Dict[LabelKey, int] = {}
+        self.stage_peak_bytes: Dict[LabelKey, int] = {}
+
+    def inc(self, name: str, key: LabelKey, value: float = 1):
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, key: LabelKey, seconds: float):
+        with self._lock:
+            self.stage_sum[key] = self.stage_sum.get(key, 0.0) + seconds
+            self.stage_count[key] = self.stage_count.get(key, 0) + 1
+
+    def observe_memory(self, key: LabelKey, peak: int):
+        with self._lock:
+            self.stage_peak_bytes[key] = max(self.stage_peak_bytes.get(key, 0), peak)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.stage_sum.clear()
+            self.stage_count.clear()
+            self.stage_peak_bytes.clear()
+
+    def render(self) -> str:
+        """Prometheus text exposition of everything recorded so far."""
+        with self._lock:
+            counters = {name: dict(series) for name, series in self.counters.items()}
+            stage_sum = dict(self.stage_sum)
+            stage_count = dict(self.stage_count)
+            stage_peak = dict(self.stage_peak_bytes)
+
+        lines = []
+        name = METRIC_PREFIX + "stage_seconds"
+        lines.append(f"# HELP {name} {METRIC_HELP['stage_seconds']}")
+        lines.append(f"# TYPE {name} summary")
+        for key in sorted(stage_sum):
+            lines.append(f"{name}_sum{_format_labels(key)} {stage_sum[key]:.6f}")
+            lines.append(f"{name}_count{_format_labels(key)} {stage_count[key]}")
+
+        if stage_peak:
+            name = METRIC_PREFIX + "stage_peak_bytes"
+            lines.append(f"# HELP {name} {METRIC_HELP['stage_peak_bytes']}")
+            lines.append(f"# TYPE {name} gauge")
+            for key in sorted(stage_peak):
+                lines.append(f"{name}{_format_labels(key)} {stage_peak[key]}")
+
+        for short in sorted(counters):
+            name = METRIC_PREFIX + short
+            if short in METRIC_HELP:
+                lines.append(f"# HELP {name} {METRIC_HELP[short]}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(counters[short].items()):
+                lines.append(f"{name}{_format_labels(key)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+class MemoryProfilerBusy(RuntimeError):
+    """Raised when a memory-profiled job is started while another one runs."""
+
+
+class JobMetrics:
+    """Timings and counters of a single run, returned with its response."""
+
+    def __init__(self, memory: bool = False):
+        self._lock = threading.Lock()
+        self.memory_profiled = memory
+        self.timings: Dict[str, float] = {}
+        self.counters: Dict[str, float] = {}
+        self.memory: Dict[str, Dict[str, int]] = {}
+        self.top_allocations: List[Dict[str, Any]] = []
+
+    def add_time(self, key: str, seconds: float):
+        with self._lock:
+            self.timings[key] = self.timings.get(key, 0.0) + seconds
+
+    def add_count(self, key: str, value: float):
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def add_memory(self, key: str, peak: int, retained: int):
+        """Peak is the largest single run of the stage; retained adds up over runs."""
+        with self._lock:
+            entry = self.memory.setdefault(key, {"peak_bytes": 0, "retained_bytes": 0})
+            entry["peak_bytes"] = max(entry["peak_bytes"], peak)
+            entry["retained_bytes"] += retained
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            data = {
+                "timings": {k: round(v, 6) for k, v in self.timings.items()},
+                "counters": dict(self.counters),
+            }
+            if self.memory:
+                data["memory"] = {k: dict(v) for k, v in self.memory.items()}
+                data["top_allocations"] = list(self.top_allocations)
+            return data
+
+
+REGISTRY = Registry()
+_current_job: ContextVar[Optional[JobMetrics]] = ContextVar("codeiq_job", default=None)
+_memory_local = threading.local()
+_memory_job_lock = threading.Lock()
+
+
+def memory_profiling_requested() -> bool:
+    return os.environ.get(MEMORY_PROFILE_ENV, "") not in ("", "0")
+
+
+def _memory_stack() -> List[List[int]]:
+    stack = getattr(_memory_local, "stack", None)
+    if stack is None:
+        stack = _memory_local.stack = []
+    return stack
+
+
+def _memory_enter() -> Optional[List[int]]:
+    """
+    Start measuring a span: returns [current bytes at entry, peak seen so far].
+
+    tracemalloc has a single peak, so it is reset for every span and the
+    enclosing span's peak is carried on this thread's stack instead.
+    """
+    if not tracemalloc.is_tracing():
+        return None
+    current, peak = tracemalloc.get_traced_memory()
+    stack = _memory_stack()
+    if stack:
+        stack[-1][1] = max(stack[-1][1], peak)
+    tracemalloc.reset_peak()
+    frame = [current, current]
+    stack.append(frame)
+    return frame
+
+
+def _memory_exit(frame: List[int]) -> Optional[Tuple[int, int]]:
+    """Finish a span started by _memory_enter; returns (peak, retained) bytes."""
+    stack = _memory_stack()
+    if stack and stack[-1] is frame:
+        stack.pop()
+    if not tracemalloc.is_tracing():
+        return None
+    current, peak = tracemalloc.get_traced_memory()
+    peak = max(peak, frame[1])
+    if stack:
+        stack[-1][1] = max(stack[-1][1], peak)
+    return peak - frame[0], current - frame[0]
+
+
+def _site(frame) -> str:
+    parts = frame.filename.replace("\\", "/").split("/")
+    return f"{'/'.join(parts[-2:])}:{frame.lineno}"
+
+
+def top_allocations(before, after, limit: int = TOP_ALLOCATIONS) -> List[Dict[str, Any]]:
+    """Allocation sites that grew most between two tracemalloc snapshots."""
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    ]
+    stats = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+    return [
+        {"site": _site(stat.traceback[0]), "size_bytes": stat.size_diff, "count": stat.count_diff}
+        for stat in stats[:limit] if stat.size_diff > 0
+    ]
+
+
+def count(name: str, value: float = 1, **labels):
+    """Increment counter `name` (e.g. count("files_total", language="c"))."""
+    key = _label_key(labels)
+    REGISTRY.inc(name, key, value)
+    job_metrics = _current_job.get()
+    if job_metrics is not None:
+        job_metrics.add_count(_job_key(name, key), value)
+
+
+@contextmanager
+def span(stage: str, **labels):
+    """Time the enclosed block as `stage`; failures also count as errors."""
+    key = _label_key(dict(stage=stage, **labels))
+    job_metrics = _current_job.get()
+    memory_frame = (_memory_enter() if job_metrics is not None and job_metrics.memory_profiled
+                    else None)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        count("errors_total", stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        memory = _memory_exit(memory_frame) if memory_frame is not None else None
+        REGISTRY.observe(key, elapsed)
+        if memory:
+            REGISTRY.observe_memory(key, memory[0])
+        if job_metrics is not None:
+            job_key = _job_key(stage, _label_key(labels))
+            job_metrics.add_time(job_key, elapsed)
+            if memory:
+                job_metrics.add_memory(job_key, *memory)
+
+
+def timed(stage: str):
+    """Decorator form of span()."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def job(memory: Optional[bool] = None):
+    """
+    Collect the spans and counters of the enclosed run into a JobMetrics.
+
+    With `memory` (default: the CODEIQ_MEMORY_PROFILE env var) the run is
+    traced with tracemalloc and per-stage memory plus the top allocation
+    sites still alive at the end are added to the breakdown. Asking for it
+    while another job is profiled raises MemoryProfilerBusy; a job that
+    only has the env var runs unprofiled instead.
+    """
+    requested = memory
+    if memory is None:
+        memory = memory_profiling_requested()
+    if memory and not _memory_job_lock.acquire(blocking=False):
+        if requested:
+            raise MemoryProfilerBusy("Another job is being memory-profiled")
+        memory = False
+    job_metrics = JobMetrics(memory)
+    token = _current_job.set(job_metrics)
+    before = memory_frame = None
+    started_tracing = False
+    if memory:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(MEMORY_TRACE_FRAMES)
+            started_tracing = True
+        before = tracemalloc.take_snapshot()
+        memory_frame = _memory_enter()
+    start = time.perf_counter()
+    try:
+        yield job_metrics
+    finally:
+        job_metrics.add_time("total", time.perf_counter() - start)
+        if memory:
+            try:
+                result = _memory_exit(memory_frame) if memory_frame is not None else None
+                if result:
+                    job_metrics.add_memory("total", *result)
+                if tracemalloc.is_tracing():
+                    job_metrics.top_allocations = top_allocations(before, tracemalloc.take_snapshot())
+                if started_tracing:
+                    tracemalloc.stop()
+            finally:
+                _memory_job_lock.release()
+        _current_job.reset(token)
+
+
+def render_prometheus() -> str:
+    return REGISTRY.render()
+
+
+class ProgressLog:
+    """Prints progress lines at most once every `interval` seconds."""
+
+    def __init__(self, interval: float = PROGRESS_INTERVAL):
+        self.interval = interval
+        self._last = 0.0
+
+    def ready(self) -> bool:
+        """True if a line may be printed now; check before formatting the message."""
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            return True
+        return False
+
+    def log(self, message: str, force: bool = False):
+        if force or self.ready():
+            print(message)
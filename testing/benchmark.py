@@ -0,0 +1,372 @@
+"""
+Pipeline benchmark suite.
+
+Generates a deterministic synthetic repo (see synthetic_repo.py) and times
+each stage of the pipeline separately:
+
+  discovery      ir_processor.collect_files
+  parse          tree-sitter parse (also broken down per language)
+  ir_conversion  Tree-sitter tree -> IRNode -> dict
+  serialization  json.dumps of the IR, as save_ir writes it
+  hpg / pdg      hpg.HPGGenerator / pdg.PDGGenerator on the file summaries
+  cfg            cfg.MultiLanguageCFGGenerator over every function
+  hybrid         hybrid_graph HPG + CFG + PDG + hybrid builders
+  render         matplotlib rendering of the HPG (skipped for big graphs)
+  ranking_scale  ranking.CallGraphRanking.top on a random call graph of
+                 --ranking-nodes functions and 3x as many calls (opt-in),
+                 which must finish within --ranking-limit seconds
+
+For every stage it reports wall time, throughput and peak RSS, and it can
+compare against a stored baseline and fail on regressions. With --memory each
+stage also reports its tracemalloc peak and retained memory, and the top
+allocation sites are listed (timings are then inflated and not compared).
+Everything runs offline; only the compiled grammars are needed.
+
+Usage:
+    python benchmark.py [--files N] [--functions M] [--depth D] [--repeat R]
+                        [--baseline PATH] [--save-baseline] [--tolerance 0.25]
+                        [--memory] [--ranking-nodes N] [--ranking-limit S]
+"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from typing import Any, Dict, List
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.normpath(os.path.join(BASE_DIR, "..", "parser")))
+sys.path.insert(0, BASE_DIR)
+
+from synthetic_repo import LANGUAGES, generate_repo  # noqa: E402
+from telemetry import job, span  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(BASE_DIR, "benchmark_baseline.json")
+
+# Differences below this are treated as noise when comparing to a baseline
+NOISE_FLOOR_SECONDS = 0.005
+
+# Rendering is quadratic in the layout; skip it beyond this many HPG nodes
+MAX_RENDER_NODES = 2000
+
+# Calls per function in the ranking scale check, and its time limit
+RANKING_EDGES_PER_NODE = 3
+RANKING_LIMIT_SECONDS = 10.0
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MB (0 where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class StageTimer:
+    """
+    Records wall time, work done and peak RSS for each named stage, plus
+    traced memory when run inside a telemetry job(memory=True).
+    """
+
+    def __init__(self, job_metrics=None):
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.job_metrics = job_metrics
+
+    def record(self, name, seconds, items=0, nbytes=0):
+        entry = {"seconds": seconds, "items": items, "bytes": nbytes,
+                 "peak_rss_mb": round(peak_rss_mb(), 1)}
+        if seconds > 0:
+            entry["items_per_sec"] = items / seconds
+            entry["mb_per_sec"] = nbytes / seconds / (1024 * 1024)
+        self.stages[name] = entry
+
+    def run(self, name, fn, *args):
+        """Run fn(*args) quietly; fn returns (result, items, bytes)."""
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()), span(f"benchmark:{name}"):
+            result, items, nbytes = fn(*args)
+        self.record(name, time.perf_counter() - start, items, nbytes)
+        memory = self.job_metrics.memory.get(f"benchmark:{name}") if self.job_metrics else None
+        if memory:
+            self.stages[name]["traced_peak_mb"] = memory["peak_bytes"] / (1024 * 1024)
+            self.stages[name]["traced_retained_mb"] = memory["retained_bytes"] / (1024 * 1024)
+        return result
+
+
+# ---------- stages ----------
+
+def stage_discovery(repo_dir):
+    from ir_processor import collect_files
+
+    files = collect_files(repo_dir)
+    return files, len(files), 0
+
+
+def stage_parse(files, timer):
+    from languages import detect_language, get_parser
+
+    trees = []
+    per_lang: Dict[str, List[float]] = {}
+    total_bytes = 0
+    for fp in files:
+        lang = detect_language(fp)
+        with open(fp, "rb") as f:
+            code = f.read()
+        start = time.perf_counter()
+        tree = get_parser(lang).parse(code)
+        elapsed = time.perf_counter() - start
+        stats = per_lang.setdefault(lang, [0.0, 0, 0])
+        stats[0] += elapsed
+        stats[1] += 1
+        stats[2] += len(code)
+        total_bytes += len(code)
+        trees.append((fp, tree))
+    for lang, (seconds, count, nbytes) in sorted(per_lang.items()):
+        timer.record(f"parse[{lang}]", seconds, count, nbytes)
+    return trees, len(trees), total_bytes
+
+
+def stage_ir_conversion(trees):
+    from ir_builder import IRNode, _parse_children
+
+    ir = {}
+    for fp, tree in trees:
+        root = tree.root_node
+        ir[fp] = IRNode(root.type, root.start_point, root.end_point,
+                        _parse_children(root)).to_dict()
+    return ir, len(ir), 0
+
+
+def stage_serialization(ir):
+    data = json.dumps(ir, indent=2)
+    return data, len(ir), len(data)
+
+
+def stage_hpg(summaries):
+    from hpg import HPGGenerator
+
+    generator = HPGGenerator(summaries)
+    graph = generator.build_hpg()
+    return generator, graph.number_of_nodes(), 0
+
+
+def stage_cfg(files):
+    from cfg import MultiLanguageCFGGenerator
+
+    generator = MultiLanguageCFGGenerator()
+    count = 0
+    for fp in files:
+        ext = os.path.splitext(fp)[1][1:]
+        if not generator.set_language(ext):
+            continue
+        with open(fp, "rb") as f:
+            code = f.read()
+        tree = generator.parser.parse(code)
+        for _, name, node in generator.find_function_nodes(tree.root_node, code, ext):
+            generator.build_cfg_for_function(node, code, name, ext)
+            count += 1
+    return None, count, 0
+
+
+def stage_pdg(summaries):
+    from pdg import PDGGenerator
+
+    pdgs = PDGGenerator().build_pdg_from_ir(summaries)
+    return pdgs, len(pdgs), 0
+
+
+def stage_hybrid(summaries):
+    from hybrid_graph import CFGBuilder, HPGBuilder, HybridGraphBuilder, PDGBuilder
+
+    hpg = HPGBuilder().build(summaries)
+    cfgs = CFGBuilder().build(summaries)
+    pdgs = PDGBuilder().build(summaries, cfgs)
+    hybrid = HybridGraphBuilder().build(hpg, cfgs, pdgs)
+    return hybrid, hybrid.number_of_nodes(), 0
+
+
+def stage_render(hpg_generator, out_dir):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    nodes = hpg_generator.graph.number_of_nodes()
+    hpg_generator.visualize(output_file=os.path.join(out_dir, "hpg.png"))
+    plt.close("all")
+    return None, nodes, 0
+
+
+def stage_ranking_scale(n_nodes, seed):
+    import numpy as np
+    from ranking import CallGraphRanking
+
+    rng = np.random.default_rng(seed)
+    m = n_nodes * RANKING_EDGES_PER_NODE
+    edges = np.stack([rng.integers(0, n_nodes, m), rng.integers(0, n_nodes, m)], axis=1)
+    ranking = CallGraphRanking([f"f{i}" for i in range(n_nodes)], edges)
+    ranking.top(20)
+    return None, m, 0
+
+
+def run_pipeline(repo_dir: str, summaries: List[Dict], render: bool = True,
+                 job_metrics=None) -> Dict[str, Dict]:
+    """Run every stage once over `repo_dir` and return the per-stage measurements."""
+    timer = StageTimer(job_metrics)
+    files = timer.run("discovery", stage_discovery, repo_dir)
+    trees = timer.run("parse", stage_parse, files, timer)
+    ir = timer.run("ir_conversion", stage_ir_conversion, trees)
+    timer.run("serialization", stage_serialization, ir)
+    hpg_generator = timer.run("hpg", stage_hpg, summaries)
+    timer.run("cfg", stage_cfg, files)
+    timer.run("pdg", stage_pdg, summaries)
+    timer.run("hybrid", stage_hybrid, summaries)
+    if render and hpg_generator.graph.number_of_nodes() <= MAX_RENDER_NODES:
+        with tempfile.TemporaryDirectory(prefix="codeiq_bench_render_") as out_dir:
+            timer.run("render", stage_render, hpg_generator, out_dir)
+    return timer.stages
+
+
+def run_benchmark(n_files=50, n_functions=10, depth=3, languages=LANGUAGES, seed=0,
+                  repeat=3, render=True, memory=False, ranking_nodes=0) -> Dict[str, Any]:
+    """
+    Generate the synthetic repo and keep the fastest of `repeat` runs per stage.
+
+    With `memory` the pipeline runs once under tracemalloc instead. With
+    `ranking_nodes` the ranking scale check runs once after the pipeline.
+    """
+    params = {"files": n_files, "functions": n_functions, "depth": depth,
+              "languages": list(languages), "seed": seed}
+    best: Dict[str, Dict] = {}
+    results: Dict[str, Any] = {"params": params, "stages": best}
+    with tempfile.TemporaryDirectory(prefix="codeiq_bench_") as repo_dir:
+        summaries = generate_repo(repo_dir, n_files, n_functions, depth, languages, seed)
+        if memory:
+            # Warm-up run so module imports and caches don't count against the first stages
+            run_pipeline(repo_dir, summaries, render)
+            with job(memory=True) as metrics:
+                best.update(run_pipeline(repo_dir, summaries, render, metrics))
+            results["memory"] = True
+            results["top_allocations"] = metrics.top_allocations
+            return results
+        for _ in range(repeat):
+            for name, entry in run_pipeline(repo_dir, summaries, render).items():
+                if name not in best or entry["seconds"] < best[name]["seconds"]:
+                    best[name] = entry
+    if ranking_nodes:
+        params["ranking_nodes"] = ranking_nodes
+        timer = StageTimer()
+        timer.run("ranking_scale", stage_ranking_scale, ranking_nodes, seed)
+        best.update(timer.stages)
+    return results
+
+
+def compare_to_baseline(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Return a message for every stage slower than baseline * (1 + tolerance)."""
+    regressions = []
+    if baseline.get("params") != results["params"]:
+        print("⚠️  Baseline was recorded with different parameters; comparison is approximate")
+    for name, entry in results["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        if not old:
+            continue
+        limit = old["seconds"] * (1 + tolerance)
+        if entry["seconds"] > limit and entry["seconds"] - old["seconds"] > NOISE_FLOOR_SECONDS:
+            regressions.append(
+                f"{name}: {entry['seconds'] * 1000:.1f} ms vs baseline "
+                f"{old['seconds'] * 1000:.1f} ms (+{(entry['seconds'] / old['seconds'] - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def print_report(results: Dict, baseline: Dict = None):
+    print(f"\n📊 Benchmark {results['params']}")
+    print(f"{'stage':<20}{'ms':>10}{'base ms':>10}{'items/s':>12}{'MB/s':>10}{'peak MB':>10}")
+    for name, entry in results["stages"].items():
+        old = (baseline or {}).get("stages", {}).get(name)
+        base = f"{old['seconds'] * 1000:.1f}" if old else "-"
+        print(f"{name:<20}{entry['seconds'] * 1000:>10.1f}{base:>10}"
+              f"{entry.get('items_per_sec', 0):>12.0f}{entry.get('mb_per_sec', 0):>10.2f}"
+              f"{entry['peak_rss_mb']:>10.1f}")
+
+    if results.get("memory"):
+        print(f"\n🧠 Traced memory per stage")
+        print(f"{'stage':<20}{'peak MB':>10}{'retained MB':>14}")
+        for name, entry in results["stages"].items():
+            if "traced_peak_mb" in entry:
+                print(f"{name:<20}{entry['traced_peak_mb']:>10.2f}{entry['traced_retained_mb']:>14.2f}")
+        print("\n🔝 Top allocation sites still alive at the end")
+        for site in results["top_allocations"]:
+            print(f"   {site['size_bytes'] / 1024:>10.1f} KB  {site['count']:>8} blocks  {site['site']}")
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Benchmark the CodeIQ pipeline on a synthetic repo")
+    ap.add_argument("--files", type=int, default=50)
+    ap.add_argument("--functions", type=int, default=10)
+    ap.add_argument("--depth", type=int, default=3)
+    ap.add_argument("--languages", default=",".join(LANGUAGES))
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--no-render", action="store_true", help="skip the matplotlib stage")
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing")
+    ap.add_argument("--json", help="also write the results to this file")
+    ap.add_argument("--memory", action="store_true",
+                    help="trace per-stage memory with tracemalloc (single run, not compared)")
+    ap.add_argument("--ranking-nodes", type=int, default=0,
+                    help="also rank a random call graph of this many functions")
+    ap.add_argument("--ranking-limit", type=float, default=RANKING_LIMIT_SECONDS,
+                    help="seconds the ranking scale check may take")
+    args = ap.parse_args(argv)
+
+    results = run_benchmark(args.files, args.functions, args.depth, args.languages.split(","),
+                            args.seed, args.repeat, render=not args.no_render, memory=args.memory,
+                            ranking_nodes=args.ranking_nodes)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.memory:
+        return 0
+
+    ranking = results["stages"].get("ranking_scale")
+    if ranking and ranking["seconds"] > args.ranking_limit:
+        print(f"\n❌ Ranking {args.ranking_nodes} functions took {ranking['seconds']:.1f} s "
+              f"(limit {args.ranking_limit:.1f} s)")
+        return 1
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+        return 0
+
+    if baseline:
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ Regressions:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print("\n✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,11 @@
+"""
+Shared test setup: the pipeline modules live in parser/ and import each
+other by bare name, as they do when the server runs from that directory.
+"""
+
+import os
+import sys
+
+PARSER_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "parser"))
+if PARSER_DIR not in sys.path:
+    sys.path.insert(0, PARSER_DIR)
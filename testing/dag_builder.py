@@ -1,60 +1,31 @@
 # dag_generator.py
 import os
+import sys
 import json
-from collections import defaultdict
-from tree_sitter import Language, Parser
-import networkx as nx
+from tree_sitter import Parser
 
 # ---- CONFIG ----
 PROJECT_ROOT = os.path.dirname(__file__)              # parser/
-LIB_PATH = os.path.join(PROJECT_ROOT, "build", "my-languages.so")
 SOURCE_ROOT = os.path.normpath(os.path.join(PROJECT_ROOT, "..", "source_files/flask_app"))
 
-# Supported extensions -> tree-sitter language name
-EXT_TO_LANG = {
-    ".py": "python",
-    ".java": "java",
-    ".js": "javascript",
-    ".c": "c",
-    ".ts": "typescript"
-}
-
-# Node types for definitions and calls per language (heuristic set)
-FUNC_NODE_TYPES = {
-    "python": ("function_definition",),
-    "java": ("method_declaration", "function_declaration"),
-    "javascript": ("function_declaration", "method_definition"),
-    "c": ("function_definition",),
-    "typescript": ("function_declaration", "method_definition"),
-}
-
-CLASS_NODE_TYPES = {
-    "python": ("class_definition",),
-    "java": ("class_declaration",),
-    "javascript": ("class_declaration",),
-    "c": tuple(),   # C doesn't have class defs in this sense
-    "typescript": ("class_declaration",),
-}
-
-CALL_NODE_TYPES = {
-    "python": ("call",),
-    "java": ("method_invocation", "call_expression"),
-    "javascript": ("call_expression",),
-    "c": ("call_expression",),
-    "typescript": ("call_expression",),
-}
+# Grammars and node-type tables come from the shared registry in parser/
+sys.path.insert(0, os.path.normpath(os.path.join(PROJECT_ROOT, "..", "parser")))
+from class_hierarchy import ClassHierarchy  # noqa: E402
+from graph_core import CompactGraph  # noqa: E402
+from languages import (  # noqa: E402
+    EXT_LANG as EXT_TO_LANG,
+    FUNCTION_NODE_TYPES as FUNC_NODE_TYPES,
+    CLASS_NODE_TYPES,
+    get_language,
+)
+from lazy_imports import lazy_import  # noqa: E402
+from ranking import CallGraphRanking  # noqa: E402
+from reachability import ReachabilityIndex  # noqa: E402
+from symbols import extract_source_summary  # noqa: E402
+
+nx = lazy_import("networkx")
 
 # ---- helpers ----
-def load_languages(lib_path):
-    langs = {}
-    for ext, lang_name in EXT_TO_LANG.items():
-        try:
-            langs[ext] = Language(lib_path, lang_name)
-        except Exception as e:
-            print(f"ERROR loading language {lang_name} from {lib_path}: {e}")
-            raise
-    return langs
-
 def read_file_bytes(path):
     with open(path, "rb") as f:
         return f.read()
@@ -73,8 +44,8 @@ def find_first_identifier_descendant(node, code_bytes):
     return None
 
 # Find definitions (functions and classes) with ranges
-def collect_definitions(file_path, parser, code_bytes, lang_name):
-    root = parser.parse(code_bytes).root_node
+def collect_definitions(file_path, parser, code_bytes, lang_name, tree=None):
+    root = (tree or parser.parse(code_bytes)).root_node
     funcs = []
     classes = []
 
@@ -102,21 +73,6 @@ def collect_definitions(file_path, parser, code_bytes, lang_name):
     walk(root)
     return funcs, classes
 
-# Find calls inside a node (function body)
-def collect_calls_in_node(node, code_bytes, lang_name):
-    calls = []
-
-    def walk(n):
-        if n.type in CALL_NODE_TYPES.get(lang_name, ()):
-            # try to extract the called identifier
-            called = find_first_identifier_descendant(n, code_bytes)
-            if called:
-                calls.append(called)
-        for c in n.children:
-            walk(c)
-    walk(node)
-    return calls
-
 # map module name (python) to file path if exists in project
 def module_name_to_path(module_name):
     # e.g. pkg.sub -> pkg/sub.py or pkg/sub/__init__.py
@@ -145,12 +101,14 @@ def collect_source_files(root):
 
 # ---- main DAG building ----
 def build_dependency_graph():
-    langs = load_languages(LIB_PATH)
-    G = nx.DiGraph()
+    # Built in a CompactGraph; G is its networkx view for the nx algorithms and drawing
+    core = CompactGraph()
+    G = core.to_networkx()
 
     # global maps
-    func_index = defaultdict(list)   # name -> list of (id, file_path, start, end)
     file_nodes = set()
+    summaries = []   # symbol summaries, for the class hierarchy
+    dag_ids = {}     # symbol function id -> FUNC:: node id
 
     parser = Parser()
 
@@ -163,27 +121,33 @@ def build_dependency_graph():
     for fp in source_files:
         ext = os.path.splitext(fp)[1]
         lang = EXT_TO_LANG.get(ext)
-        parser.set_language(langs[ext])
+        parser.set_language(get_language(lang))
         code_bytes = read_file_bytes(fp)
-        funcs, classes = collect_definitions(fp, parser, code_bytes, lang)
+        tree = parser.parse(code_bytes)
+        funcs, classes = collect_definitions(fp, parser, code_bytes, lang, tree)
         file_key = os.path.relpath(fp, SOURCE_ROOT)
         file_nodes.add(file_key)
         file_defs[file_key] = {"functions": funcs, "classes": classes, "imports": []}
+        summary = extract_source_summary(code_bytes, lang, file_key, tree=tree)
+        summaries.append(summary)
+        starts = {f["start"]: f"FUNC::{file_key}::{f['name']}::{f['start']}" for f in funcs}
+        complexity = {}
+        for func in summary["functions"] + [m for c in summary["classes"] for m in c["methods"]]:
+            if func["start_line"] in starts:
+                dag_ids[func["id"]] = starts[func["start_line"]]
+                complexity[func["start_line"]] = func.get("complexity")
 
-        # index functions by name (for simple name matching)
         for f in funcs:
             fid = f"FUNC::{file_key}::{f['name']}::{f['start']}"
-            func_index[f['name']].append({
-                "id": fid, "file": file_key, "start": f["start"], "end": f["end"]
-            })
-            G.add_node(fid, type="function", file=file_key, name=f["name"])
+            core.add_node(fid, type="function", file=file_key, name=f["name"],
+                          complexity=complexity.get(f["start"]))
         for c in classes:
             cid = f"CLASS::{file_key}::{c['name']}"
-            G.add_node(cid, type="class", file=file_key, name=c["name"])
+            core.add_node(cid, type="class", file=file_key, name=c["name"])
 
         # Collect simple imports (python)
         if lang == "python":
-            root = parser.parse(code_bytes).root_node
+            root = tree.root_node
             for child in root.children:
                 if child.type in ("import_statement", "import_from_statement"):
                     txt = get_text(child, code_bytes).strip()
@@ -199,63 +163,48 @@ def build_dependency_graph():
                         mapped = module_name_to_path(mod)
                         if mapped:
                             mapped_key = os.path.relpath(mapped, SOURCE_ROOT)
+                            # One edge per imported file, as a DiGraph would keep
+                            if mapped_key in file_defs[file_key]["imports"]:
+                                continue
                             file_defs[file_key]["imports"].append(mapped_key)
-                            G.add_node(f"FILE::{mapped_key}", type="file")
-                            G.add_node(f"FILE::{file_key}", type="file")
-                            G.add_edge(f"FILE::{file_key}", f"FILE::{mapped_key}", type="import")
+                            core.add_node(f"FILE::{mapped_key}", type="file")
+                            core.add_node(f"FILE::{file_key}", type="file")
+                            core.add_edge(f"FILE::{file_key}", f"FILE::{mapped_key}", "import")
     # End first pass
 
-    # Second pass: collect calls and resolve to functions
-    for fp in source_files:
-        ext = os.path.splitext(fp)[1]
-        lang = EXT_TO_LANG.get(ext)
-        parser.set_language(langs[ext])
-        code_bytes = read_file_bytes(fp)
-        root = parser.parse(code_bytes).root_node
-        file_key = os.path.relpath(fp, SOURCE_ROOT)
-
-        # for each function node, collect calls inside and add edges
-        for f in file_defs[file_key]["functions"]:
-            # find the exact node for this function:
-            fnode = f["node"]
-            calls = collect_calls_in_node(fnode, code_bytes, lang)
-            src_id = f"FUNC::{file_key}::{f['name']}::{f['start']}"
-            for called_name in calls:
-                # attempt resolution:
-                targets = func_index.get(called_name, [])
-                if targets:
-                    # prefer same-file targets if any
-                    same_file_targets = [t for t in targets if t["file"] == file_key]
-                    chosen = same_file_targets if same_file_targets else targets
-                    for t in chosen:
-                        G.add_edge(src_id, t["id"], type="call")
-                else:
+    # Second pass: resolve calls, and `obj.method()` calls through the class hierarchy
+    hierarchy = ClassHierarchy(summaries)
+    for summary in summaries:
+        functions = summary["functions"] + [m for c in summary["classes"] for m in c["methods"]]
+        for func in functions:
+            src_id = dag_ids.get(func["id"])
+            if src_id is None:
+                continue
+            called = {}   # one edge per callee, as a DiGraph would keep
+            for called_name, targets in hierarchy.resolve_calls(func):
+                targets = [dag_ids[t] for t in targets if t in dag_ids]
+                for t in targets:
+                    called.setdefault(t, None)
+                if not targets:
                     # unknown target: add a placeholder node
                     unknown_id = f"UNK::{called_name}"
-                    if not G.has_node(unknown_id):
-                        G.add_node(unknown_id, type="unknown", name=called_name)
-                    G.add_edge(src_id, unknown_id, type="call")
-
-    # Optional: add class inheritance edges (heuristic: check class nodes text for parent name)
-    # Simple heuristic: scan class node text for "(" then identifier inside
-    for file_key, info in file_defs.items():
-        for c in info["classes"]:
-            node = c["node"]
-            code_bytes = read_file_bytes(os.path.join(SOURCE_ROOT, file_key))
-            text = get_text(node, code_bytes)
-            # find pattern like class Name(Base):
-            import re
-            m = re.search(r"class\s+\w+\s*\(\s*([A-Za-z_][A-Za-z0-9_]*)\s*\)", text)
-            if m:
-                base = m.group(1)
-                # try to resolve base in indexed classes
-                # find class nodes by name across files
-                for fk2, info2 in file_defs.items():
-                    for c2 in info2["classes"]:
-                        if c2["name"] == base:
-                            cid_child = f"CLASS::{file_key}::{c['name']}"
-                            cid_parent = f"CLASS::{fk2}::{c2['name']}"
-                            G.add_edge(cid_child, cid_parent, type="inherits")
+                    if unknown_id not in core:
+                        core.add_node(unknown_id, type="unknown", name=called_name)
+                    called.setdefault(unknown_id, None)
+            for t in called:
+                core.add_edge(src_id, t, "call")
+
+    # Class inheritance edges (superclasses and interfaces) from the hierarchy
+    # ("kind" is the edge kind in a CompactGraph, so extends/implements is "inheritance")
+    inherits = {}
+    for class_id, base_id, _, kind in hierarchy.inheritance():
+        if base_id is None:
+            continue
+        file_key, name = class_id.rsplit("::", 1)
+        base_file, base_name = base_id.rsplit("::", 1)
+        inherits.setdefault((f"CLASS::{file_key}::{name}", f"CLASS::{base_file}::{base_name}"), kind)
+    for (u, v), kind in inherits.items():
+        core.add_edge(u, v, "inherits", inheritance=kind)
 
     # Save graph to JSON (nodes and edges)
     nodes_out = []
@@ -263,6 +212,8 @@ def build_dependency_graph():
         nodes_out.append({"id": n, **data})
     edges_out = []
     for u, v, data in G.edges(data=True):
+        data = dict(data)
+        data.pop("kind", None)   # the same as the type
         edges_out.append({"src": u, "dst": v, **data})
 
     out = {"nodes": nodes_out, "edges": edges_out}
@@ -271,12 +222,24 @@ def build_dependency_graph():
         json.dump(out, f, indent=2)
 
     print(f"Wrote DAG to {out_path}")
-    print("Graph stats: nodes =", G.number_of_nodes(), "edges =", G.number_of_edges())
+    print("Graph stats: nodes =", core.number_of_nodes(), "edges =", core.number_of_edges())
     print("Is DAG?", nx.is_directed_acyclic_graph(G))
     if nx.is_directed_acyclic_graph(G):
         topo = list(nx.topological_sort(G))
         print("Topological order (partial):", topo[:40])
 
+    # Call-graph cycles and transitive reach, answered from the index
+    reach = ReachabilityIndex.from_compact(core)
+    stats = reach.stats()
+    print(f"Call graph: {stats['components']} components, "
+          f"{stats['cyclic_components']} recursive groups")
+    for cycle in reach.cycles()[:10]:
+        print("  cycle:", ", ".join(cycle))
+    functions = G.subgraph(n for n, data in G.nodes(data=True) if data.get("type") == "function")
+    for row in CallGraphRanking.from_networkx(functions).top(5):
+        print(f"  hotspot: {row['function']} (score {row['hotspot']:.2f}, "
+              f"pagerank {row['pagerank']:.4f}, complexity {row['complexity']})")
+
     # Optional visualization (requires matplotlib)
     try:
         import matplotlib.pyplot as plt
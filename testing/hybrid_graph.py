@@ -1,11 +1,31 @@
+from __future__ import annotations
+
+import os
+import sys
 import json
-import networkx as nx
 from typing import Dict, List, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
-import matplotlib.pyplot as plt
-with open("ir_output.json", "r") as f:
-    ir_data = json.load(f)
+
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "parser")))
+from agent_context import DEFAULT_BUDGET, DEFAULT_HOPS, ContextPacker, ContextSource, signature  # noqa: E402
+from class_hierarchy import ClassHierarchy  # noqa: E402
+from control_flow import ENTRY, EXIT, ControlFlowGraph, build_cfg, build_cfg_from_body  # noqa: E402
+from dataflow import def_use_sets, graph_data_dependences  # noqa: E402
+from dominators import graph_control_dependences  # noqa: E402
+from graph_core import CompactGraph, EdgeKind  # noqa: E402
+from graph_store import STORE_EXTENSION, GraphStore, save_graphs  # noqa: E402
+from languages import SUPPORTED_LANGUAGES  # noqa: E402
+from lazy_imports import lazy_import  # noqa: E402
+from slicing import BACKWARD, DependenceIndex, Slicer  # noqa: E402
+from summaries import (  # noqa: E402
+    SummaryCache, compute_summaries, content_hash, interprocedural_edges, local_facts
+)
+from symbols import extract_source_summary  # noqa: E402
+from telemetry import timed  # noqa: E402
+
+nx = lazy_import("networkx")
+plt = lazy_import("matplotlib.pyplot")
 
 # ============================================================================
 # DATA STRUCTURES
@@ -40,11 +60,17 @@ class EdgeType(Enum):
     CONDITIONAL_TRUE = "conditional_true"
     CONDITIONAL_FALSE = "conditional_false"
     LOOP_BACK = "loop_back"
+    EXCEPTION = "exception"
     
     # PDG Edges
     DATA_DEPENDENCY = "data_dependency"
     CONTROL_DEPENDENCY = "control_dependency"
     CALL = "call"
+    
+    # Interprocedural PDG Edges (from function summaries)
+    PARAMETER_IN = "parameter_in"
+    PARAMETER_OUT = "parameter_out"
+    RETURN = "return"
 
 @dataclass
 class GraphNode:
@@ -59,12 +85,17 @@ class GraphNode:
 # ============================================================================
 
 class HPGBuilder:
-    """Builds Hierarchical Program Graph showing code structure"""
+    """
+    Builds Hierarchical Program Graph showing code structure, in a
+    CompactGraph (`self.core`); `self.graph` is its networkx view.
+    """
     
     def __init__(self):
-        self.graph = nx.DiGraph()
+        self.core = CompactGraph()
+        self.graph = self.core.to_networkx()
         self.node_counter = 0
     
+    @timed("hybrid_hpg")
     def build(self, ir_data: List[Dict]) -> nx.DiGraph:
         """Build HPG from IR data"""
         print("🔨 Building Hierarchical Program Graph (HPG)...")
@@ -93,7 +124,7 @@ class HPGBuilder:
                         'end_line': class_info['end_line']
                     }
                 )
-                self.graph.add_edge(module_id, class_id, type=EdgeType.CONTAINS.value)
+                self.core.add_edge(module_id, class_id, EdgeType.CONTAINS.value)
                 
                 # Add methods to class
                 for method in class_info['methods']:
@@ -101,6 +132,7 @@ class HPGBuilder:
                         NodeType.METHOD,
                         method['name'],
                         {
+                            'function_id': method['id'],
                             'parameters': method['parameters'],
                             'return_type': method['return_type'],
                             'complexity': method['complexity'],
@@ -109,7 +141,7 @@ class HPGBuilder:
                             'is_async': method['is_async']
                         }
                     )
-                    self.graph.add_edge(class_id, method_id, type=EdgeType.CONTAINS.value)
+                    self.core.add_edge(class_id, method_id, EdgeType.CONTAINS.value)
             
             # Add standalone functions
             for func_info in file_ir['functions']:
@@ -121,6 +153,7 @@ class HPGBuilder:
                         NodeType.FUNCTION,
                         func_info['name'],
                         {
+                            'function_id': func_info['id'],
                             'parameters': func_info['parameters'],
                             'return_type': func_info['return_type'],
                             'complexity': func_info['complexity'],
@@ -130,9 +163,9 @@ class HPGBuilder:
                             'is_async': func_info['is_async']
                         }
                     )
-                    self.graph.add_edge(module_id, func_id, type=EdgeType.CONTAINS.value)
+                    self.core.add_edge(module_id, func_id, EdgeType.CONTAINS.value)
         
-        print(f"✅ HPG built: {self.graph.number_of_nodes()} nodes, {self.graph.number_of_edges()} edges")
+        print(f"✅ HPG built: {self.core.number_of_nodes()} nodes, {self.core.number_of_edges()} edges")
         return self.graph
     
     def _create_node(self, node_type: NodeType, name: str, metadata: Dict) -> str:
@@ -140,7 +173,7 @@ class HPGBuilder:
         node_id = f"{node_type.value}_{self.node_counter}"
         self.node_counter += 1
         
-        self.graph.add_node(
+        self.core.add_node(
             node_id,
             type=node_type.value,
             name=name,
@@ -149,8 +182,9 @@ class HPGBuilder:
         return node_id
     
     def get_hierarchy(self, node_id: str) -> List[str]:
-        """Get hierarchical path to a node"""
-        ancestors = list(nx.ancestors(self.graph, node_id))
+        """Get hierarchical path to a node, outermost container first"""
+        ancestors = self.core.names(self.core.ancestors(self.core.index(node_id)))
+        ancestors.reverse()
         ancestors.append(node_id)
         return ancestors
     
@@ -171,111 +205,77 @@ class CFGBuilder:
     def __init__(self):
         self.graphs = {}  # function_id -> CFG
     
+    @timed("hybrid_cfg")
     def build(self, ir_data: List[Dict]) -> Dict[str, nx.DiGraph]:
         """Build CFG for all functions"""
         print("🔨 Building Control Flow Graphs (CFG)...")
         
         for file_ir in ir_data:
+            syntax_nodes = self._function_nodes(file_ir)
+            
             # Build CFG for standalone functions
             for func_info in file_ir['functions']:
                 func_id = func_info['id']
-                cfg = self._build_function_cfg(func_info)
+                cfg = self._build_function_cfg(func_info, file_ir, syntax_nodes)
                 self.graphs[func_id] = cfg
             
             # Build CFG for class methods
             for class_info in file_ir['classes']:
                 for method in class_info['methods']:
                     method_id = method['id']
-                    cfg = self._build_function_cfg(method)
+                    cfg = self._build_function_cfg(method, file_ir, syntax_nodes)
                     self.graphs[method_id] = cfg
         
         print(f"✅ CFG built for {len(self.graphs)} functions")
         return self.graphs
     
-    def _build_function_cfg(self, func_info: Dict) -> nx.DiGraph:
-        """Build CFG for a single function"""
-        cfg = nx.DiGraph()
-        body = func_info['body']
-        
-        # Create entry and exit nodes
-        entry_id = f"{func_info['id']}_entry"
-        exit_id = f"{func_info['id']}_exit"
-        
-        cfg.add_node(entry_id, type=NodeType.ENTRY.value, label="ENTRY")
-        cfg.add_node(exit_id, type=NodeType.EXIT.value, label="EXIT")
-        
-        # Parse function body to build control flow
-        # This is simplified - you'd need proper AST traversal for accuracy
-        statements = self._extract_statements(body)
-        
-        if not statements:
-            cfg.add_edge(entry_id, exit_id, type=EdgeType.SEQUENTIAL.value)
-            return cfg
-        
-        prev_node = entry_id
-        
-        for i, stmt in enumerate(statements):
-            stmt_id = f"{func_info['id']}_stmt_{i}"
-            stmt_type = self._classify_statement(stmt)
-            
-            cfg.add_node(
-                stmt_id,
-                type=stmt_type.value,
-                label=stmt['text'][:50],  # Truncate long statements
-                line=stmt['line']
-            )
-            
-            # Handle different statement types
-            if stmt_type == NodeType.CONDITION:
-                # Conditional branching
-                true_branch = f"{func_info['id']}_stmt_{i+1}"
-                false_branch = f"{func_info['id']}_stmt_{i+2}"
-                
-                cfg.add_edge(prev_node, stmt_id, type=EdgeType.SEQUENTIAL.value)
-                # In reality, you'd parse the actual branches
-                prev_node = stmt_id
-                
-            elif stmt_type == NodeType.LOOP:
-                # Loop back edge
-                cfg.add_edge(prev_node, stmt_id, type=EdgeType.SEQUENTIAL.value)
-                # Loop body would create a back edge
-                prev_node = stmt_id
-                
-            else:
-                # Regular sequential flow
-                cfg.add_edge(prev_node, stmt_id, type=EdgeType.SEQUENTIAL.value)
-                prev_node = stmt_id
-        
-        # Connect last statement to exit
-        cfg.add_edge(prev_node, exit_id, type=EdgeType.SEQUENTIAL.value)
-        
-        return cfg
-    
-    def _extract_statements(self, body: str) -> List[Dict]:
-        """Extract statements from function body (simplified)"""
-        statements = []
-        lines = body.split('\n')
-        
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if line and not line.startswith('#'):
-                statements.append({
-                    'text': line,
-                    'line': i + 1
-                })
-        
-        return statements
-    
-    def _classify_statement(self, stmt: Dict) -> NodeType:
-        """Classify statement type"""
-        text = stmt['text'].lower()
-        
-        if any(kw in text for kw in ['if ', 'elif ', 'else:', 'switch', 'case']):
-            return NodeType.CONDITION
-        elif any(kw in text for kw in ['for ', 'while ', 'do ']):
-            return NodeType.LOOP
+    def _function_nodes(self, file_ir: Dict) -> Dict[Tuple[str, int], Tuple[Any, bytes]]:
+        """Syntax nodes of the file's functions by (name, start line), if its source is readable"""
+        file_path = file_ir.get('file_path')
+        language = file_ir.get('language')
+        if not file_path or language not in SUPPORTED_LANGUAGES or not os.path.isfile(file_path):
+            return {}
+        with open(file_path, 'rb') as f:
+            code = f.read()
+        nodes = {}
+        summary = extract_source_summary(code, language, file_path, nodes=nodes)
+        functions = summary['functions'] + [m for c in summary['classes'] for m in c['methods']]
+        return {(f['name'], f['start_line']): (nodes[f['id']], code) for f in functions}
+    
+    def _build_function_cfg(self, func_info: Dict, file_ir: Dict,
+                            syntax_nodes: Dict[Tuple[str, int], Tuple[Any, bytes]]) -> nx.DiGraph:
+        """Build CFG for a single function from its syntax tree (re-parsing the body if the file is gone)"""
+        language = file_ir.get('language')
+        located = syntax_nodes.get((func_info['name'], func_info['start_line']))
+        if located is not None:
+            node, code = located
+            flow = build_cfg(node, code, language, func_info['name'])
+        elif language in SUPPORTED_LANGUAGES:
+            # The body ends with the function, whatever the signature's length
+            first_line = func_info['end_line'] - func_info['body'].count('\n')
+            flow = build_cfg_from_body(func_info['body'], language, func_info['name'], first_line)
         else:
-            return NodeType.STATEMENT
+            flow = ControlFlowGraph(func_info['name'])
+            flow.add_edge(ENTRY, EXIT)
+        cfg = flow.to_networkx(prefix=f"{func_info['id']}_")
+        
+        # Definitions, uses and calls per statement, for the PDG's data
+        # dependencies and interprocedural slicing
+        calls, arguments = [], []
+        defs, may_defs, uses = def_use_sets(flow, calls, arguments)
+        if located is None:
+            # The stub the body was parsed under has no parameters
+            defs[ENTRY] = {p['name'] for p in func_info['parameters'] if p.get('name')}
+        for i in range(len(flow)):
+            attrs = cfg.nodes[flow.node_id(i, f"{func_info['id']}_")]
+            attrs['defs'] = sorted(defs[i])
+            attrs['uses'] = sorted(uses[i])
+            if may_defs[i]:
+                attrs['may_defs'] = sorted(may_defs[i])
+            if calls[i]:
+                attrs['calls'] = sorted(calls[i])
+                attrs['arguments'] = arguments[i]
+        return cfg
     
     def get_cfg(self, function_id: str) -> nx.DiGraph:
         """Get CFG for a specific function"""
@@ -301,6 +301,7 @@ class PDGBuilder:
     def __init__(self):
         self.graphs = {}  # function_id -> PDG
     
+    @timed("hybrid_pdg")
     def build(self, ir_data: List[Dict], cfg_graphs: Dict[str, nx.DiGraph]) -> Dict[str, nx.DiGraph]:
         """Build PDG for all functions"""
         print("🔨 Building Program Dependency Graphs (PDG)...")
@@ -334,77 +335,26 @@ class PDGBuilder:
         for node in cfg.nodes():
             pdg.add_node(node, **cfg.nodes[node])
         
-        # Add control dependencies (from CFG)
-        for u, v in cfg.edges():
-            edge_type = cfg.edges[u, v].get('type')
-            if edge_type in [EdgeType.CONDITIONAL_TRUE.value, 
-                           EdgeType.CONDITIONAL_FALSE.value]:
-                pdg.add_edge(u, v, type=EdgeType.CONTROL_DEPENDENCY.value)
-        
-        # Add data dependencies (simplified - analyze variable usage)
-        variables = self._extract_variables(func_info)
-        self._add_data_dependencies(pdg, cfg, variables)
-        
-        # Add function call dependencies
-        for call in func_info.get('calls', []):
-            # Find nodes that make this call
-            for node in pdg.nodes():
-                label = pdg.nodes[node].get('label', '')
-                if call in label:
-                    pdg.nodes[node]['calls'] = call
+        # Add control dependencies (post-dominator based, from the CFG)
+        entry = next(n for n, t in cfg.nodes(data='type') if t == NodeType.ENTRY.value)
+        exit_node = next(n for n, t in cfg.nodes(data='type') if t == NodeType.EXIT.value)
+        for u, v, branch in graph_control_dependences(cfg, entry, exit_node):
+            pdg.add_edge(u, v, type=EdgeType.CONTROL_DEPENDENCY.value, branch=branch)
+        
+        # Add data dependencies (reaching definitions over the CFG's def/use sets)
+        data_deps = {}
+        for u, v, variable in graph_data_dependences(cfg):
+            data_deps.setdefault((u, v), []).append(variable)
+        for (u, v), variables in data_deps.items():
+            variables.sort()
+            if pdg.has_edge(u, v):
+                # Also control dependent: one edge carries both
+                pdg.edges[u, v]['variables'] = variables
+            else:
+                pdg.add_edge(u, v, type=EdgeType.DATA_DEPENDENCY.value, variables=variables)
         
         return pdg
     
-    def _extract_variables(self, func_info: Dict) -> Dict[str, List[int]]:
-        """Extract variable definitions and uses"""
-        variables = {}  # var_name -> [line_numbers where used]
-        
-        # Get parameters
-        for param in func_info['parameters']:
-            param_name = param['name']
-            variables[param_name] = [func_info['start_line']]
-        
-        # Parse body for variable usage (simplified)
-        body = func_info['body']
-        for i, line in enumerate(body.split('\n')):
-            # Simple pattern matching for assignments
-            if '=' in line:
-                parts = line.split('=')
-                var_name = parts[0].strip().split()[-1]
-                if var_name and var_name.isidentifier():
-                    if var_name not in variables:
-                        variables[var_name] = []
-                    variables[var_name].append(func_info['start_line'] + i)
-        
-        return variables
-    
-    def _add_data_dependencies(self, pdg: nx.DiGraph, cfg: nx.DiGraph, 
-                               variables: Dict[str, List[int]]):
-        """Add data dependency edges"""
-        # For each variable, connect its definition to its uses
-        for var_name, lines in variables.items():
-            if len(lines) < 2:
-                continue
-            
-            def_line = lines[0]
-            use_lines = lines[1:]
-            
-            # Find nodes at these lines
-            def_nodes = [n for n in pdg.nodes() 
-                        if pdg.nodes[n].get('line') == def_line]
-            use_nodes = [n for n in pdg.nodes() 
-                        if pdg.nodes[n].get('line') in use_lines]
-            
-            # Add edges from definition to uses
-            for def_node in def_nodes:
-                for use_node in use_nodes:
-                    pdg.add_edge(
-                        def_node, 
-                        use_node,
-                        type=EdgeType.DATA_DEPENDENCY.value,
-                        variable=var_name
-                    )
-    
     def get_pdg(self, function_id: str) -> nx.DiGraph:
         """Get PDG for a specific function"""
         return self.graphs.get(function_id)
@@ -424,41 +374,57 @@ class PDGBuilder:
 # ============================================================================
 
 class HybridGraphBuilder:
-    """Combines HPG, CFG, and PDG into a unified graph"""
+    """
+    Combines HPG, CFG, and PDG into a unified graph.
+
+    The merged graph is stored in a CompactGraph (`self.core`); `build()`
+    returns its networkx view.
+    """
     
     def __init__(self):
-        self.graph = nx.DiGraph()
+        self.core = CompactGraph()
+        self.graph = None
     
+    @timed("hybrid")
     def build(self, hpg: nx.DiGraph, cfg_graphs: Dict[str, nx.DiGraph], 
-              pdg_graphs: Dict[str, nx.DiGraph]) -> nx.DiGraph:
-        """Build hybrid graph by merging HPG, CFG, and PDG"""
+              pdg_graphs: Dict[str, nx.DiGraph],
+              interprocedural: List[Tuple] = ()) -> nx.DiGraph:
+        """
+        Build hybrid graph by merging HPG, CFG, and PDG, plus the
+        interprocedural edges between PDG statements (see summaries.py)
+        """
         print("🔨 Building Hybrid Graph (HPG + CFG + PDG)...")
+        core = self.core
         
         # Add all HPG nodes and edges
-        self.graph.add_nodes_from(hpg.nodes(data=True))
-        self.graph.add_edges_from(hpg.edges(data=True))
+        for node, data in hpg.nodes(data=True):
+            data = dict(data)
+            core.add_node(node, type=data.pop('type', None), **data)
+        for u, v, data in hpg.edges(data=True):
+            data = dict(data)
+            data.pop('kind', None)   # set again from the type
+            core.add_edge(u, v, data.pop('type', EdgeType.CONTAINS.value), **data)
+        
+        # Function-like HPG nodes, looked up for every CFG below
+        hpg_func_nodes = [n for n, d in hpg.nodes(data=True)
+                          if 'function' in d.get('type', '')]
         
         # For each function, add its CFG and PDG
         for func_id, cfg in cfg_graphs.items():
             # Add CFG nodes with prefix
             for node, data in cfg.nodes(data=True):
-                cfg_node_id = f"cfg_{node}"
-                self.graph.add_node(cfg_node_id, graph_type="cfg", **data)
+                data = dict(data)
+                core.add_node(f"cfg_{node}", type=data.pop('type', None), graph_type="cfg", **data)
             
             # Add CFG edges
             for u, v, data in cfg.edges(data=True):
-                self.graph.add_edge(f"cfg_{u}", f"cfg_{v}", graph_type="cfg", **data)
+                data = dict(data)
+                core.add_edge(f"cfg_{u}", f"cfg_{v}", data.pop('type', EdgeType.SEQUENTIAL.value), **data)
             
             # Link HPG function node to its CFG
-            hpg_func_nodes = [n for n, d in self.graph.nodes(data=True) 
-                             if 'function' in d.get('type', '') 
-                             and func_id in n]
-            if hpg_func_nodes:
-                self.graph.add_edge(
-                    hpg_func_nodes[0],
-                    f"cfg_{func_id}_entry",
-                    type="has_cfg"
-                )
+            func_node = next((n for n in hpg_func_nodes if func_id in n), None)
+            if func_node is not None:
+                core.add_edge(func_node, f"cfg_{func_id}_entry", EdgeKind.HAS_CFG, "has_cfg")
         
         # Add PDG information as edge attributes
         for func_id, pdg in pdg_graphs.items():
@@ -466,12 +432,20 @@ class HybridGraphBuilder:
                 edge_type = data.get('type')
                 if edge_type == EdgeType.DATA_DEPENDENCY.value:
                     # Add data dependency info to corresponding CFG edges
-                    cfg_u = f"cfg_{u}"
-                    cfg_v = f"cfg_{v}"
-                    if self.graph.has_edge(cfg_u, cfg_v):
-                        self.graph.edges[cfg_u, cfg_v]['data_dep'] = data.get('variable')
-        
-        print(f"✅ Hybrid Graph built: {self.graph.number_of_nodes()} nodes, {self.graph.number_of_edges()} edges")
+                    cfg_u = core.get_index(f"cfg_{u}")
+                    cfg_v = core.get_index(f"cfg_{v}")
+                    if cfg_u is None or cfg_v is None:
+                        continue
+                    edge = core.find_edge(cfg_u, cfg_v)
+                    if edge is not None:
+                        core.set_edge_attr(edge, 'data_dep', ", ".join(data['variables']))
+        
+        for kind, _, src, _, dst, variable in interprocedural:
+            if core.get_index(f"cfg_{src}") is not None and core.get_index(f"cfg_{dst}") is not None:
+                core.add_edge(f"cfg_{src}", f"cfg_{dst}", kind, variable=variable)
+        
+        self.graph = core.to_networkx()
+        print(f"✅ Hybrid Graph built: {core.number_of_nodes()} nodes, {core.number_of_edges()} edges")
         return self.graph
     
     def export_to_json(self, filename: str = "hybrid_graph.json"):
@@ -485,6 +459,84 @@ class HybridGraphBuilder:
 # MAIN GRAPH NAVIGATOR
 # ============================================================================
 
+class NavigatorContextSource(ContextSource):
+    """Agent-context facts from a GraphNavigator's IR, call index, summaries and slicer"""
+
+    def __init__(self, navigator: "GraphNavigator"):
+        self.navigator = navigator
+        self.functions = {}
+        self.classes = {}
+        self.modules = {}
+        for file_ir in navigator.ir_data:
+            path = file_ir.get('file_path') or file_ir['file_name']
+            self.modules[path] = file_ir
+            for func in file_ir.get('functions', []):
+                self.functions[func['id']] = (func, path, None)
+            for class_info in file_ir.get('classes', []):
+                self.classes[class_info['id']] = (class_info, path)
+                for method in class_info.get('methods', []):
+                    self.functions[method['id']] = (method, path, class_info)
+
+    def _function(self, func: Dict, path: str, class_info: Dict = None) -> Dict:
+        return {
+            'key': func['id'], 'name': func['name'],
+            'qualname': f"{class_info['name']}.{func['name']}" if class_info else func['name'],
+            'kind': 'method' if class_info else 'function', 'file': path,
+            'start_line': func.get('start_line'), 'end_line': func.get('end_line'),
+            'complexity': func.get('complexity'),
+            'parameters': [p.get('name') for p in func.get('parameters', [])],
+            'return_type': func.get('return_type'),
+            'parent': class_info['id'] if class_info else None,
+        }
+
+    def function(self, key):
+        found = self.functions.get(key)
+        return self._function(*found) if found else None
+
+    def source(self, key):
+        found = self.functions.get(key)
+        if not found:
+            return None
+        # The IR keeps the body without its declaration line
+        return f"{signature(self._function(*found))}\n{found[0].get('body', '')}"
+
+    def callers(self, key):
+        return list(dict.fromkeys(self.navigator._call_index()[2].get(key, [])))
+
+    def callees(self, key):
+        return list(dict.fromkeys(target for _, target in self.navigator._call_index()[1].get(key, [])))
+
+    def class_info(self, key):
+        found = self.classes.get(key)
+        if not found:
+            return None
+        class_info, path = found
+        return {
+            'key': key, 'name': class_info['name'], 'file': path,
+            'start_line': class_info.get('start_line'), 'end_line': class_info.get('end_line'),
+            'attributes': class_info.get('attributes'), 'docstring': class_info.get('docstring'),
+            'bases': class_info.get('superclasses') or
+                     ([class_info['superclass']] if class_info.get('superclass') else []),
+            'methods': [self._function(m, path, class_info) for m in class_info.get('methods', [])],
+        }
+
+    def module_info(self, file):
+        file_ir = self.modules.get(file)
+        if file_ir is None:
+            return None
+        symbols = [('class', c['name']) for c in file_ir.get('classes', [])]
+        symbols += [('function', f['name']) for f in file_ir.get('functions', [])]
+        symbols += [('variable', v['name']) for v in file_ir.get('variables', [])]
+        return {'file': file, 'imports': file_ir.get('imports', []), 'symbols': symbols}
+
+    def summary(self, key):
+        summary = (self.navigator.summaries or {}).get(key)
+        return summary.as_dict() if summary else None
+
+    def slice(self, key, line, variable, direction):
+        return self.navigator.get_slicer().slice(key, line=line, variable=variable, direction=direction)
+
+
 class GraphNavigator:
     """Main class to build and navigate all graphs"""
     
@@ -501,6 +553,11 @@ class GraphNavigator:
         self.cfg_graphs = None
         self.pdg_graphs = None
         self.hybrid_graph = None
+        self.slicer = None
+        self.summaries = None
+        self.summary_cache = SummaryCache()
+        self._calls = None
+        self.context_packer = None
     
     def build_all_graphs(self):
         """Build all graphs in order"""
@@ -517,31 +574,119 @@ class GraphNavigator:
         # Build PDG (dependencies per function)
         self.pdg_graphs = self.pdg_builder.build(self.ir_data, self.cfg_graphs)
         
+        # Summarize functions bottom-up and link their PDGs
+        interprocedural = self.build_summaries()
+        
         # Build Hybrid Graph (combined)
         self.hybrid_graph = self.hybrid_builder.build(
             self.hpg,
             self.cfg_graphs,
-            self.pdg_graphs
+            self.pdg_graphs,
+            interprocedural
         )
         
         print("\n" + "="*60)
         print("✅ ALL GRAPHS BUILT SUCCESSFULLY")
         print("="*60 + "\n")
     
-    def export_all(self, prefix: str = ""):
-        """Export all graphs to JSON files"""
-        self.hpg_builder.export_to_json(f"{prefix}hpg.json")
-        self.cfg_builder.export_to_json(f"{prefix}cfg.json")
-        self.pdg_builder.export_to_json(f"{prefix}pdg.json")
-        self.hybrid_builder.export_to_json(f"{prefix}hybrid_graph.json")
-    
-    def get_function_context(self, function_name: str) -> Dict:
-        """Get complete context for a function (for agents)"""
+    def export_all(self, prefix: str = "", json_export: bool = False) -> str:
+        """
+        Save all graphs to one graph store: subgraphs 'hpg', 'hybrid',
+        'cfg/<function id>' and 'pdg/<function id>'. JSON files are only
+        written with `json_export`.
+        """
+        graphs = {"hpg": self.hpg_builder.core, "hybrid": self.hybrid_builder.core}
+        graphs.update((f"cfg/{func_id}", cfg) for func_id, cfg in self.cfg_graphs.items())
+        graphs.update((f"pdg/{func_id}", pdg) for func_id, pdg in self.pdg_graphs.items())
+        store_file = save_graphs(f"{prefix}graphs{STORE_EXTENSION}", graphs)
+        print(f"💾 Graphs saved to {store_file}")
+        
+        if json_export:
+            self.hpg_builder.export_to_json(f"{prefix}hpg.json")
+            self.cfg_builder.export_to_json(f"{prefix}cfg.json")
+            self.pdg_builder.export_to_json(f"{prefix}pdg.json")
+            self.hybrid_builder.export_to_json(f"{prefix}hybrid_graph.json")
+        return store_file
+    
+    def _functions(self) -> List[Tuple[Dict, Dict]]:
+        """(function or method, its file IR) for every function"""
+        functions = []
+        for file_ir in self.ir_data:
+            functions.extend((func, file_ir) for func in file_ir.get('functions', []))
+            for class_info in file_ir.get('classes', []):
+                functions.extend((method, file_ir) for method in class_info.get('methods', []))
+        return functions
+    
+    def _call_index(self) -> Tuple[Dict, Dict, Dict]:
+        """Function names, (called name, callee id) pairs and callers, resolved through the class hierarchy"""
+        if self._calls is None:
+            hierarchy = ClassHierarchy(self.ir_data)
+            names, callees, callers = {}, {}, {}
+            for func, _ in self._functions():
+                names[func['id']] = func['name']
+                callees[func['id']] = list(dict.fromkeys(
+                    (call, target) for call, targets in hierarchy.resolve_calls(func)
+                    for target in targets))
+            for func_id, targets in callees.items():
+                for _, target in targets:
+                    callers.setdefault(target, []).append(func_id)
+            self._calls = (names, callees, callers)
+        return self._calls
+    
+    def build_summaries(self) -> List[Tuple]:
+        """
+        Summarize every function with a PDG (see summaries.py) and return the
+        interprocedural edges between their statements. Local facts are
+        cached by the function's source in `self.summary_cache`.
+        """
+        print("🔨 Building function summaries...")
+        names, callees, _ = self._call_index()
+        hashes, parameters = {}, {}
+        for func, file_ir in self._functions():
+            if func['id'] in self.pdg_graphs:
+                parameters[func['id']] = [p['name'] for p in func.get('parameters', [])]
+                hashes[func['id']] = content_hash(
+                    json.dumps([parameters[func['id']], func.get('body', '')]),
+                    file_ir.get('language', ''))
+        
+        def analyze(func_id):
+            # Node keys relative to the function, so cached facts fit any copy of it
+            prefix = f"{func_id}_"
+            pdg = nx.relabel_nodes(self.pdg_graphs[func_id], lambda key: key[len(prefix):])
+            return local_facts(DependenceIndex.from_networkx(func_id, names[func_id], pdg),
+                               parameters[func_id])
+        
+        self.summaries = compute_summaries(hashes, callees, analyze, self.summary_cache)
+        edges = [(kind, src_fn, f"{src_fn}_{src}", dst_fn, f"{dst_fn}_{dst}", variable)
+                 for kind, src_fn, src, dst_fn, dst, variable
+                 in interprocedural_edges(self.summaries, callees)]
+        print(f"✅ Summaries built for {len(self.summaries)} functions, {len(edges)} interprocedural edges")
+        return edges
+    
+    def get_slicer(self) -> Slicer:
+        """Slicer over the built PDGs, with call edges resolved through the class hierarchy"""
+        if self.slicer is None:
+            names, callees, callers = self._call_index()
+
+            def load(func_id):
+                pdg = self.pdg_builder.get_pdg(func_id)
+                return DependenceIndex.from_networkx(func_id, names[func_id], pdg) if pdg else None
+
+            self.slicer = Slicer(load, lambda f: callers.get(f, []), lambda f: callees.get(f, []))
+        return self.slicer
+    
+    def get_function_context(self, function_name: str, line: int = None, variable: str = None,
+                             direction: str = BACKWARD, interprocedural: bool = False) -> Dict:
+        """
+        Get context for a function (for agents). With a `line` the context
+        holds the slice from that statement instead of the whole CFG and PDG.
+        """
         context = {
             'function_name': function_name,
             'hierarchy': [],
             'cfg': None,
             'pdg': None,
+            'slice': None,
             'dependencies': [],
             'complexity': 0
         }
@@ -561,15 +706,104 @@ class GraphNavigator:
         context['hierarchy'] = self.hpg_builder.get_hierarchy(func_node)
         context['complexity'] = func_data.get('complexity', 0)
         
-        # Get CFG and PDG
-        func_id = func_node.split('_', 1)[1]  # Extract ID from node name
-        context['cfg'] = self.cfg_builder.get_cfg(func_id)
-        context['pdg'] = self.pdg_builder.get_pdg(func_id)
+        # Get the slice, or the whole CFG and PDG
+        func_id = func_data['function_id']
+        if line is not None:
+            context['slice'] = self.get_slicer().slice(
+                func_id, line=line, variable=variable, direction=direction,
+                interprocedural=interprocedural)
+        else:
+            context['cfg'] = self.cfg_builder.get_cfg(func_id)
+            context['pdg'] = self.pdg_builder.get_pdg(func_id)
         
         # Get dependencies (functions this calls)
         context['dependencies'] = func_data.get('calls', [])
         
         return context
+    
+    def get_agent_context(self, function_name: str, budget: int = DEFAULT_BUDGET, unit: str = "tokens",
+                          hops: int = DEFAULT_HOPS, line: int = None, variable: str = None,
+                          direction: str = BACKWARD) -> Dict:
+        """
+        JSON context of a function (name or id) for agents: source, summary,
+        class, module, callers and callees up to `hops` away and, with a
+        `line`, a slice, ranked and packed into `budget` tokens or chars.
+        """
+        if self.context_packer is None:
+            self.context_packer = ContextPacker(NavigatorContextSource(self))
+        source = self.context_packer.source
+        if function_name in source.functions:
+            func_id = function_name
+        else:
+            func_id = next((key for key, (func, _, _) in source.functions.items()
+                            if func['name'] == function_name), None)
+        if func_id is None:
+            raise KeyError(function_name)
+        return self.context_packer.context(func_id, budget, unit, hops, line, variable, direction)
+
+def load_function_graphs(store_file: str, function_id: str) -> Tuple[nx.DiGraph, nx.DiGraph]:
+    """Load one function's CFG and PDG from a saved graph store (None if missing)."""
+    with GraphStore(store_file) as store:
+        cfg_name, pdg_name = f"cfg/{function_id}", f"pdg/{function_id}"
+        cfg = store.load(cfg_name) if cfg_name in store else None
+        pdg = store.load(pdg_name) if pdg_name in store else None
+    return cfg, pdg
+
+def visualize_graph(graph: nx.DiGraph, title="Graph"):
+    plt.figure(figsize=(12, 8))
+    pos = nx.spring_layout(graph, seed=42)
+    nx.draw_networkx_nodes(graph, pos, node_color='skyblue', node_size=800)
+    nx.draw_networkx_edges(graph, pos, arrowstyle='->', arrowsize=20)
+    labels = {n: graph.nodes[n].get('name', n) for n in graph.nodes()}
+    nx.draw_networkx_labels(graph, pos, labels, font_size=10)
+    plt.title(title)
+    plt.axis('off')
+    plt.show()
+
+def show_examples(ir_data: List[Dict]):
+    """Draw a simple HPG and a call-based CFG for the first function."""
+    # Example: Build simple HPG
+    HPG = nx.DiGraph()
+    for file_ir in ir_data:
+        # File node
+        HPG.add_node(file_ir['file_name'], name=file_ir['file_name'])
+
+        # Function nodes
+        for func in file_ir.get('functions', []):
+            HPG.add_node(func['id'], name=func['name'])
+            HPG.add_edge(file_ir['file_name'], func['id'])
+
+        # Class nodes
+        for cls in file_ir.get('classes', []):
+            HPG.add_node(cls['id'], name=cls['name'])
+            HPG.add_edge(file_ir['file_name'], cls['id'])
+            # Methods inside class
+            for method in cls.get('methods', []):
+                HPG.add_node(method['id'], name=method['name'])
+                HPG.add_edge(cls['id'], method['id'])
+
+    visualize_graph(HPG, "Hierarchical Program Graph (HPG)")
+
+    # Example: Visualize CFG for first available function
+    CFG_example = nx.DiGraph()
+    # Pick first function with non-empty id
+    first_func = None
+    for file_ir in ir_data:
+        if file_ir.get('functions'):
+            for f in file_ir['functions']:
+                if f['id'] != 'anonymous':
+                    first_func = f
+                    break
+        if first_func:
+            break
+
+    if first_func:
+        # Dummy CFG edges (just for visualization)
+        CFG_example.add_node(first_func['id'], name=first_func['name'])
+        for i, call in enumerate(first_func.get('calls', [])):
+            CFG_example.add_node(call, name=call)
+            CFG_example.add_edge(first_func['id'], call)
+        visualize_graph(CFG_example, f"CFG for {first_func['name']}")
 
 # ============================================================================
 # USAGE EXAMPLE
@@ -593,57 +827,7 @@ if __name__ == "__main__":
     # You can test with any function name from your code
     # context = navigator.get_function_context("your_function_name")
     # print(json.dumps(context, indent=2, default=str))
+    # Or a ranked, token-budgeted JSON context:
+    # print(json.dumps(navigator.get_agent_context("your_function_name", budget=2000), indent=2))
 
-def visualize_graph(graph: nx.DiGraph, title="Graph"):
-    plt.figure(figsize=(12, 8))
-    pos = nx.spring_layout(graph, seed=42)
-    nx.draw_networkx_nodes(graph, pos, node_color='skyblue', node_size=800)
-    nx.draw_networkx_edges(graph, pos, arrowstyle='->', arrowsize=20)
-    labels = {n: graph.nodes[n].get('name', n) for n in graph.nodes()}
-    nx.draw_networkx_labels(graph, pos, labels, font_size=10)
-    plt.title(title)
-    plt.axis('off')
-    plt.show()
-
-# Example: Build simple HPG
-HPG = nx.DiGraph()
-for file_ir in ir_data:
-    # File node
-    HPG.add_node(file_ir['file_name'], name=file_ir['file_name'])
-    
-    # Function nodes
-    for func in file_ir.get('functions', []):
-        HPG.add_node(func['id'], name=func['name'])
-        HPG.add_edge(file_ir['file_name'], func['id'])
-    
-    # Class nodes
-    for cls in file_ir.get('classes', []):
-        HPG.add_node(cls['id'], name=cls['name'])
-        HPG.add_edge(file_ir['file_name'], cls['id'])
-        # Methods inside class
-        for method in cls.get('methods', []):
-            HPG.add_node(method['id'], name=method['name'])
-            HPG.add_edge(cls['id'], method['id'])
-
-visualize_graph(HPG, "Hierarchical Program Graph (HPG)")
-
-# Example: Visualize CFG for first available function
-CFG_example = nx.DiGraph()
-# Pick first function with non-empty id
-first_func = None
-for file_ir in ir_data:
-    if file_ir.get('functions'):
-        for f in file_ir['functions']:
-            if f['id'] != 'anonymous':
-                first_func = f
-                break
-    if first_func:
-        break
-
-if first_func:
-    # Dummy CFG edges (just for visualization)
-    CFG_example.add_node(first_func['id'], name=first_func['name'])
-    for i, call in enumerate(first_func.get('calls', [])):
-        CFG_example.add_node(call, name=call)
-        CFG_example.add_edge(first_func['id'], call)
-    visualize_graph(CFG_example, f"CFG for {first_func['name']}")
\ No newline at end of file
+    show_examples(navigator.ir_data)
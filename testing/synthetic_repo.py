@@ -0,0 +1,370 @@
+"""
+Deterministic synthetic multi-language repository generator.
+
+Writes N files x M functions with control flow nested up to a given depth,
+spread round-robin over Python/Java/JavaScript/C/TypeScript, with calls
+between functions (within and across files) and classes with methods for
+the languages that have them. The same parameters and seed always produce
+byte-identical output.
+
+Alongside the sources it returns (and writes as summary.json) the per-file
+summary the graph builders consume (file_name, functions, classes, ...),
+so HPG/PDG/hybrid benchmarks do not depend on a separate extractor.
+
+Usage: python synthetic_repo.py OUT_DIR [--files N] [--functions M] [--depth D]
+"""
+
+import json
+import os
+import random
+from typing import Dict, List, Any
+
+LANGUAGES = ("python", "java", "javascript", "c", "typescript")
+
+EXTENSIONS = {
+    "python": ".py",
+    "java": ".java",
+    "javascript": ".js",
+    "c": ".c",
+    "typescript": ".ts",
+}
+
+INDENT = "    "
+
+
+class _Dialect:
+    """Syntax of one target language, as line-producing helpers."""
+
+    def __init__(self, lang):
+        self.lang = lang
+
+    # -- declarations -------------------------------------------------
+    def param(self, name):
+        return {"python": name, "java": f"int {name}", "c": f"int {name}",
+                "javascript": name, "typescript": f"{name}: number"}[self.lang]
+
+    def return_type(self):
+        return {"java": "int", "c": "int", "typescript": "number"}.get(self.lang)
+
+    def func_open(self, name, params, static=False):
+        ps = ", ".join(self.param(p) for p in params)
+        if self.lang == "python":
+            return f"def {name}({ps}):"
+        if self.lang == "java":
+            return f"{'static ' if static else ''}int {name}({ps}) {{"
+        if self.lang == "c":
+            return f"int {name}({ps}) {{"
+        if self.lang == "typescript":
+            return f"function {name}({ps}): number {{"
+        return f"function {name}({ps}) {{"
+
+    def method_open(self, name, params):
+        if self.lang == "python":
+            return f"def {name}(self{''.join(', ' + p for p in params)}):"
+        if self.lang == "java":
+            return self.func_open(name, params)
+        ps = ", ".join(self.param(p) for p in params)
+        suffix = ": number" if self.lang == "typescript" else ""
+        return f"{name}({ps}){suffix} {{"
+
+    def class_open(self, name, base):
+        if self.lang == "python":
+            return f"class {name}({base}):" if base else f"class {name}:"
+        ext = f" extends {base}" if base else ""
+        return f"class {name}{ext} {{"
+
+    def close(self):
+        return None if self.lang == "python" else "}"
+
+    # -- statements ---------------------------------------------------
+    def declare(self, var, expr):
+        if self.lang == "python":
+            return f"{var} = {expr}"
+        if self.lang in ("java", "c"):
+            return f"int {var} = {expr};"
+        if self.lang == "typescript":
+            return f"let {var}: number = {expr};"
+        return f"let {var} = {expr};"
+
+    def assign(self, var, expr):
+        return f"{var} = {expr}" if self.lang == "python" else f"{var} = {expr};"
+
+    def aug_assign(self, var, expr):
+        return f"{var} += {expr}" if self.lang == "python" else f"{var} += {expr};"
+
+    def if_open(self, cond):
+        return f"if {cond}:" if self.lang == "python" else f"if ({cond}) {{"
+
+    def else_open(self):
+        return "else:" if self.lang == "python" else "} else {"
+
+    def loop_open(self, var, bound):
+        if self.lang == "python":
+            return f"for {var} in range({bound}):"
+        if self.lang in ("java", "c"):
+            return f"for (int {var} = 0; {var} < {bound}; {var}++) {{"
+        return f"for (let {var} = 0; {var} < {bound}; {var}++) {{"
+
+    def ret(self, expr):
+        return f"return {expr}" if self.lang == "python" else f"return {expr};"
+
+    def self_attr(self, attr):
+        return {"python": f"self.{attr}", "java": f"this.{attr}",
+                "javascript": f"this.{attr}", "typescript": f"this.{attr}"}[self.lang]
+
+
+class _Writer:
+    """Collects indented lines and tracks line numbers."""
+
+    def __init__(self):
+        self.lines: List[str] = []
+        self.level = 0
+
+    @property
+    def line_no(self):
+        return len(self.lines) + 1
+
+    def emit(self, text):
+        if text is not None:
+            self.lines.append(INDENT * self.level + text if text else "")
+
+    def open(self, text):
+        self.emit(text)
+        self.level += 1
+
+    def close(self, text):
+        self.level -= 1
+        self.emit(text)
+
+
+def _plan(n_files, n_functions, languages, rng):
+    """Decide every file, function name and arity up front so calls can target anything."""
+    files = []
+    for f in range(n_files):
+        lang = languages[f % len(languages)]
+        funcs = [{"name": f"func_{f}_{j}", "arity": rng.randint(1, 3)} for j in range(n_functions)]
+        files.append({
+            "index": f,
+            "lang": lang,
+            "module": f"mod_{f}",
+            "class_name": f"File{f}",
+            "functions": funcs,
+        })
+    return files
+
+
+def _call_expr(dialect, target, target_file, args):
+    name = target["name"]
+    if dialect.lang == "java":
+        name = f"{target_file['class_name']}.{name}"
+    return f"{name}({', '.join(args)})"
+
+
+def _emit_body(w, dialect, rng, depth, params, call_targets, stats):
+    """Emit a function body with nested control flow; return the names it calls."""
+    calls = []
+    variables = ["v0"]
+    w.emit(dialect.declare("v0", params[0] if params else "0"))
+
+    def block(level):
+        for _ in range(rng.randint(2, 3)):
+            kind = rng.random()
+            if level < depth and kind < 0.3:
+                stats["branches"] += 1
+                w.open(dialect.if_open(f"{rng.choice(variables)} > {rng.randint(0, 9)}"))
+                block(level + 1)
+                if rng.random() < 0.5:
+                    w.level -= 1
+                    w.open(dialect.else_open())
+                    block(level + 1)
+                w.close(dialect.close())
+            elif level < depth and kind < 0.5:
+                stats["branches"] += 1
+                var = f"i{level}"
+                w.open(dialect.loop_open(var, rng.randint(2, 10)))
+                w.emit(dialect.aug_assign(rng.choice(variables), var))
+                block(level + 1)
+                w.close(dialect.close())
+            elif kind < 0.75 and call_targets:
+                target, target_file = rng.choice(call_targets)
+                args = [rng.choice(variables) for _ in range(target["arity"])]
+                w.emit(dialect.aug_assign(rng.choice(variables),
+                                          _call_expr(dialect, target, target_file, args)))
+                calls.append(target["name"])
+            elif level == 0 and len(variables) < 6:
+                var = f"v{len(variables)}"
+                w.emit(dialect.declare(var, f"{rng.choice(variables)} * {rng.randint(2, 5)}"))
+                variables.append(var)
+            else:
+                var = rng.choice(variables)
+                w.emit(dialect.assign(var, f"{var} + {rng.choice(params or ['1'])}"))
+
+    block(0)
+    w.emit(dialect.ret(" + ".join(variables[:3])))
+    return calls
+
+
+def _function_summary(file_name, name, params, return_type, calls, w, start, body_start, complexity):
+    return {
+        "id": f"{file_name}::{name}::{start}",
+        "name": name,
+        "parameters": [{"name": p, "type": return_type, "default": None} for p in params],
+        "return_type": return_type,
+        "calls": calls,
+        "body": "\n".join(w.lines[body_start - 1:]),
+        "start_line": start,
+        "end_line": w.line_no - 1,
+        "complexity": complexity,
+        "is_async": False,
+    }
+
+
+def _generate_file(plan_file, all_files, depth, rng):
+    dialect = _Dialect(plan_file["lang"])
+    lang = plan_file["lang"]
+    file_name = plan_file["module"] + EXTENSIONS[lang]
+    w = _Writer()
+    summary = {
+        "file_name": file_name,
+        "language": lang,
+        "imports": [],
+        "functions": [],
+        "classes": [],
+        "variables": [],
+    }
+
+    # Calls go to functions of this file and of up to two earlier files of the same language
+    earlier = [f for f in all_files[:plan_file["index"]] if f["lang"] == lang]
+    sources = [plan_file] + earlier[-2:]
+    call_targets = [(fn, f) for f in sources for fn in f["functions"]]
+
+    # Imports / prototypes for cross-file calls
+    for other in sources[1:]:
+        if lang == "python":
+            names = ", ".join(fn["name"] for fn in other["functions"])
+            w.emit(f"from {other['module']} import {names}")
+            summary["imports"].append(other["module"])
+        elif lang in ("javascript", "typescript"):
+            names = ", ".join(fn["name"] for fn in other["functions"])
+            w.emit(f"import {{ {names} }} from './{other['module']}';")
+            summary["imports"].append(other["module"])
+    if lang == "c":
+        w.emit("#include <stdio.h>")
+        summary["imports"].append("stdio.h")
+        for fn, _ in call_targets:
+            w.emit(f"int {fn['name']}({', '.join('int' for _ in range(fn['arity']))});")
+    if w.lines:
+        w.emit("")
+
+    global_name = f"LIMIT_{plan_file['index']}"
+    if lang == "python":
+        w.emit(f"{global_name} = {rng.randint(10, 99)}")
+        summary["variables"].append({"name": global_name, "value": "int"})
+        w.emit("")
+
+    if lang == "java":
+        w.open(dialect.class_open(plan_file["class_name"], None))
+
+    for fn in plan_file["functions"]:
+        params = [f"p{k}" for k in range(fn["arity"])]
+        start = w.line_no
+        stats = {"branches": 0}
+        w.open(dialect.func_open(fn["name"], params, static=True))
+        body_start = w.line_no
+        calls = _emit_body(w, dialect, rng, depth, params, call_targets, stats)
+        w.close(dialect.close())
+        summary["functions"].append(_function_summary(
+            file_name, fn["name"], params, dialect.return_type(), calls, w, start,
+            body_start, 1 + stats["branches"]))
+        w.emit("")
+
+    if lang == "java":
+        w.close("}")
+        w.emit("")
+
+    # One base class and one subclass per file for the languages that have classes
+    if lang != "c":
+        base_name = None
+        for c in range(2):
+            cls_name = f"Class{plan_file['index']}_{c}"
+            cls_start = w.line_no
+            w.open(dialect.class_open(cls_name, base_name))
+            cls = {
+                "id": f"{file_name}::{cls_name}",
+                "name": cls_name,
+                "methods": [],
+                "attributes": ["attr"],
+                "superclass": base_name,
+                "docstring": None,
+                "start_line": cls_start,
+            }
+            if lang == "java":
+                w.emit("int attr;")
+            elif lang == "typescript":
+                w.emit("attr: number = 0;")
+            for m in range(2):
+                m_name = f"method_{m}"
+                params = [f"p{k}" for k in range(m + 1)]
+                start = w.line_no
+                stats = {"branches": 0}
+                w.open(dialect.method_open(m_name, params))
+                body_start = w.line_no
+                w.emit(dialect.assign(dialect.self_attr("attr"), params[0]))
+                calls = _emit_body(w, dialect, rng, max(1, depth - 1), params, call_targets, stats)
+                w.close(dialect.close())
+                method = _function_summary(
+                    file_name, m_name, params, dialect.return_type(), calls, w, start,
+                    body_start, 1 + stats["branches"])
+                method["id"] = f"{file_name}::{cls_name}.{m_name}::{start}"
+                cls["methods"].append(method)
+            w.close(dialect.close())
+            cls["end_line"] = w.line_no - 1
+            summary["classes"].append(cls)
+            w.emit("")
+            base_name = cls_name
+
+    source = "\n".join(w.lines) + "\n"
+    summary["total_lines"] = len(w.lines)
+    return file_name, source, summary
+
+
+def generate_repo(out_dir: str, n_files: int = 20, n_functions: int = 10, depth: int = 3,
+                  languages=LANGUAGES, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Write a synthetic repository to `out_dir` and return its per-file summaries.
+
+    Files are spread over one sub-directory per language.
+    """
+    rng = random.Random(seed)
+    languages = tuple(languages)
+    plan = _plan(n_files, n_functions, languages, rng)
+    summaries = []
+    for plan_file in plan:
+        file_name, source, summary = _generate_file(plan_file, plan, depth, rng)
+        lang_dir = os.path.join(out_dir, plan_file["lang"])
+        os.makedirs(lang_dir, exist_ok=True)
+        path = os.path.join(lang_dir, file_name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(source)
+        summary["file_path"] = path
+        summaries.append(summary)
+
+    with open(os.path.join(out_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summaries, f)
+    return summaries
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Generate a synthetic multi-language repo")
+    ap.add_argument("out_dir")
+    ap.add_argument("--files", type=int, default=20)
+    ap.add_argument("--functions", type=int, default=10)
+    ap.add_argument("--depth", type=int, default=3)
+    ap.add_argument("--languages", default=",".join(LANGUAGES))
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    result = generate_repo(args.out_dir, args.files, args.functions, args.depth,
+                           args.languages.split(","), args.seed)
+    print(f"✅ Generated {len(result)} files in {args.out_dir}")
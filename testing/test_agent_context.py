@@ -0,0 +1,157 @@
+"""Agent context: greedy packing into a budget and candidates cached by content hash."""
+
+import pytest
+
+from agent_context import (HOP_DECAY, TRUNCATION_MARK, WEIGHTS, ContextPacker, ContextSource,
+                           cost, signature)
+
+
+class MemorySource(ContextSource):
+    """Functions, call edges and source text held in dicts; counts neighbourhood walks."""
+
+    def __init__(self):
+        self.functions = {}
+        self.texts = {}
+        self.calls = {}
+        self.walks = 0
+
+    def add(self, name, text, calls=(), parent=None):
+        key = f"m.py::{name}::1"
+        self.functions[key] = {"key": key, "name": name, "qualname": name, "kind": "function",
+                               "file": "m.py", "start_line": 1, "end_line": 2, "complexity": 1,
+                               "parameters": ["x"], "return_type": None, "parent": parent}
+        self.texts[key] = text
+        self.calls[key] = [f"m.py::{c}::1" for c in calls]
+        return key
+
+    def function(self, key):
+        return self.functions.get(key)
+
+    def source(self, key):
+        return self.texts.get(key)
+
+    def callees(self, key):
+        self.walks += 1
+        return self.calls.get(key, [])
+
+    def callers(self, key):
+        return [k for k, called in self.calls.items() if key in called]
+
+    def class_info(self, key):
+        return {"key": key, "name": "Box", "file": "m.py", "start_line": 1, "end_line": 9,
+                "bases": ["Base"], "attributes": ["size"], "methods": [self.functions["m.py::f::1"]]}
+
+    def module_info(self, file):
+        return {"file": file, "imports": ["os"], "symbols": [("function", "f"), ("class", "Box")]}
+
+
+@pytest.fixture
+def source():
+    source = MemorySource()
+    source.add("f", "def f(x):\n    return g(x)\n", calls=["g"], parent="m.py::Box")
+    source.add("g", "def g(x):\n    return h(x)\n", calls=["h"])
+    source.add("h", "def h(x):\n    return x\n")
+    source.add("main", "def main():\n    f(1)\n", calls=["f"])
+    return source
+
+
+def candidate(kind, text, score, brief=None):
+    return {"kind": kind, "key": kind, "text": text, "brief": brief, "score": score}
+
+
+CANDIDATES = [
+    candidate("source", "s" * 400, 1.0, brief="f(x)"),
+    candidate("summary", "r" * 100, 0.8),
+    candidate("callee", "c" * 200, 0.5, brief="g(x) -> int"),
+    candidate("caller", "k" * 60, 0.45, brief="main()"),
+]
+
+
+def forms(result):
+    return [(item["kind"], item["form"]) for item in result["items"]]
+
+
+def test_pack_steps_down_from_full_to_signature_to_omitted():
+    result = ContextPacker.pack(CANDIDATES, 800, unit="chars")
+    assert forms(result) == [("source", "full"), ("summary", "full"), ("callee", "full"), ("caller", "full")]
+
+    result = ContextPacker.pack(CANDIDATES, 520, unit="chars")
+    assert forms(result) == [("source", "full"), ("summary", "full"), ("callee", "signature"),
+                             ("caller", "signature")]
+    assert result["items"][2]["text"] == "g(x) -> int"
+
+    # The summary has no signature to fall back to
+    result = ContextPacker.pack(CANDIDATES, 410, unit="chars")
+    assert forms(result) == [("source", "full"), ("caller", "signature")]
+    assert result["omitted"] == [{"kind": "summary", "key": "summary"}, {"kind": "callee", "key": "callee"}]
+
+
+def test_pack_truncates_only_the_top_item():
+    # A top item with a signature is given that rather than cut
+    result = ContextPacker.pack(CANDIDATES, 50, unit="tokens")
+    assert forms(result) == [("source", "signature"), ("summary", "full"), ("callee", "signature"),
+                             ("caller", "full")]
+
+    result = ContextPacker.pack([candidate("source", "s" * 400, 1.0), candidate("summary", "r" * 400, 0.8)],
+                                30, unit="tokens")
+    [item] = result["items"]
+    assert item["form"] == "truncated" and item["text"].endswith(TRUNCATION_MARK)
+    assert result["budget"] == {"limit": 30, "unit": "tokens", "used": 30}
+    assert result["omitted"] == [{"kind": "summary", "key": "summary"}]
+
+    # Nothing fits, not even the truncation mark
+    result = ContextPacker.pack([candidate("source", "s" * 400, 1.0)], 1, unit="tokens")
+    assert result["items"] == [] and len(result["omitted"]) == 1
+
+
+@pytest.mark.parametrize("unit", ["chars", "tokens"])
+def test_pack_never_exceeds_the_budget(unit):
+    for budget in range(0, 900, 7):
+        result = ContextPacker.pack(CANDIDATES, budget, unit)
+        used = sum(cost(item["text"], unit) for item in result["items"])
+        assert used == result["budget"]["used"] <= budget
+        assert len(result["items"]) + len(result["omitted"]) == len(CANDIDATES)
+
+
+def test_context_ranks_neighbours_by_hops(source):
+    context = ContextPacker(source).context("m.py::f::1", budget=10_000, unit="chars")
+    scores = {(item["kind"], item["key"]): (item["hops"], item["score"]) for item in context["items"]}
+    assert scores == {
+        ("source", "m.py::f::1"): (0, WEIGHTS["source"]),
+        ("class", "m.py::Box"): (0, WEIGHTS["class"]),
+        ("module", "m.py"): (0, WEIGHTS["module"]),
+        ("callee", "m.py::g::1"): (1, WEIGHTS["callee"]),
+        ("callee", "m.py::h::1"): (2, WEIGHTS["callee"] * HOP_DECAY),
+        ("caller", "m.py::main::1"): (1, WEIGHTS["caller"]),
+    }
+    assert [item["kind"] for item in context["items"]][0] == "source"
+    assert "f(x)" in next(item["text"] for item in context["items"] if item["kind"] == "class")
+    near = ContextPacker(source).context("m.py::f::1", budget=10_000, unit="chars", hops=1)
+    assert "m.py::h::1" not in {item["key"] for item in near["items"]}
+    with pytest.raises(KeyError):
+        ContextPacker(source).context("m.py::nothing::1")
+    with pytest.raises(ValueError):
+        ContextPacker(source).context("m.py::f::1", unit="lines")
+
+
+def test_candidates_are_cached_until_the_function_changes(source):
+    packer = ContextPacker(source)
+    first = packer.context("m.py::f::1", budget=200)
+    walks = source.walks
+    assert packer.context("m.py::f::1", budget=200) is first
+    # Another budget packs again from the cached candidates
+    assert packer.context("m.py::f::1", budget=20)["hash"] == first["hash"]
+    assert source.walks == walks
+
+    source.texts["m.py::f::1"] = "def f(x):\n    return h(x)\n"
+    source.calls["m.py::f::1"] = ["m.py::h::1"]
+    edited = packer.context("m.py::f::1", budget=200)
+    assert source.walks > walks
+    assert edited["hash"] != first["hash"]
+    assert {item["key"] for item in edited["items"] if item["kind"] == "callee"} == {"m.py::h::1"}
+
+
+def test_functions_without_text_fall_back_to_their_signature(source):
+    del source.texts["m.py::h::1"]
+    context = ContextPacker(source).context("m.py::h::1", budget=100, unit="chars")
+    assert context["items"][0]["text"] == signature(source.functions["m.py::h::1"]) == "h(x)"
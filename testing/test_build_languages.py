@@ -0,0 +1,129 @@
+"""Grammar builds: hash-keyed libraries, the stat fingerprint shortcut and the manifest."""
+
+import json
+import os
+
+import pytest
+
+import build_languages
+
+
+@pytest.fixture
+def grammars(tmp_path, monkeypatch):
+    """Two fake grammars; compiling one writes its library and is recorded in `grammars.built`."""
+    root = tmp_path / "grammars"
+    for name in ("alpha", "beta"):
+        (root / f"tree-sitter-{name}" / "src").mkdir(parents=True)
+        (root / f"tree-sitter-{name}" / "src" / "parser.c").write_text(f"/* {name} */\n")
+    build_dir = tmp_path / "build"
+    monkeypatch.setattr(build_languages, "GRAMMAR_ROOT", str(root))
+    monkeypatch.setattr(build_languages, "GRAMMARS", {"alpha": "tree-sitter-alpha", "beta": "tree-sitter-beta"})
+    monkeypatch.setattr(build_languages, "GRAMMAR_BUILD_DIR", str(build_dir))
+    monkeypatch.setattr(build_languages, "MANIFEST_PATH", str(build_dir / "manifest.json"))
+    monkeypatch.setattr(build_languages, "compiler_signature", lambda: f"cc {os.environ.get('CFLAGS', '')}")
+    monkeypatch.delenv("CFLAGS", raising=False)
+
+    built = []
+
+    def compile(name, digest):
+        built.append(name)
+        output = build_languages.library_path(name, digest)
+        with open(output, "wb") as f:
+            f.write(b"library")
+        return output
+    monkeypatch.setattr(build_languages, "_compile", compile)
+    hashed = []
+    grammar_hash = build_languages.grammar_hash
+
+    def counted_hash(name, signature=None):
+        hashed.append(name)
+        return grammar_hash(name, signature)
+    monkeypatch.setattr(build_languages, "grammar_hash", counted_hash)
+
+    class Grammars:
+        def source(self, name):
+            return root / f"tree-sitter-{name}" / "src" / "parser.c"
+
+        def libraries(self):
+            return sorted(f for f in os.listdir(build_dir) if f.endswith(".so"))
+    grammars = Grammars()
+    grammars.built, grammars.hashed = built, hashed
+    return grammars
+
+
+def test_first_build_compiles_everything_and_writes_the_manifest(grammars):
+    manifest = build_languages.build_all()
+    assert sorted(grammars.built) == ["alpha", "beta"]
+    assert manifest == build_languages.load_manifest()
+    languages = manifest["languages"]
+    for name, entry in languages.items():
+        assert entry["library"] == f"{name}-{entry['hash'][:16]}.so"
+        assert entry["hash"] == build_languages.grammar_hash(name, "cc ")
+    assert manifest["build_hash"] == build_languages.build_hash(languages)
+    assert grammars.libraries() == sorted(entry["library"] for entry in languages.values())
+
+
+def test_unchanged_grammars_are_neither_hashed_nor_built(grammars):
+    first = build_languages.build_all()
+    grammars.built.clear()
+    grammars.hashed.clear()
+    assert build_languages.build_all() == first
+    assert grammars.built == [] and grammars.hashed == []
+
+
+def test_a_touched_but_unchanged_source_is_hashed_but_not_built(grammars):
+    first = build_languages.build_all()
+    grammars.built.clear()
+    source = grammars.source("alpha")
+    os.utime(source, ns=(source.stat().st_atime_ns, source.stat().st_mtime_ns + 10**9))
+    second = build_languages.build_all()
+    assert grammars.built == []
+    assert second["build_hash"] == first["build_hash"]
+    assert second["languages"]["alpha"]["fingerprint"] != first["languages"]["alpha"]["fingerprint"]
+
+
+def test_a_changed_grammar_is_rebuilt_and_its_old_library_pruned(grammars):
+    first = build_languages.build_all()
+    grammars.built.clear()
+    grammars.source("alpha").write_text("/* alpha, edited */\n")
+    second = build_languages.build_all()
+    assert grammars.built == ["alpha"]
+    assert second["languages"]["beta"] == first["languages"]["beta"]
+    assert second["languages"]["alpha"]["hash"] != first["languages"]["alpha"]["hash"]
+    assert second["build_hash"] != first["build_hash"]
+    assert grammars.libraries() == sorted(entry["library"] for entry in second["languages"].values())
+
+
+def test_compiler_flags_and_force_rebuild(grammars, monkeypatch):
+    first = build_languages.build_all()
+    grammars.built.clear()
+    monkeypatch.setenv("CFLAGS", "-O3")
+    assert build_languages.build_all()["build_hash"] != first["build_hash"]
+    assert sorted(grammars.built) == ["alpha", "beta"]
+    grammars.built.clear()
+    build_languages.build_all(["beta"], force=True)
+    assert grammars.built == ["beta"]
+
+
+def test_building_some_languages_keeps_the_others_in_the_manifest(grammars):
+    build_languages.build_all(["alpha"])
+    manifest = build_languages.build_all(["beta"])
+    assert sorted(manifest["languages"]) == ["alpha", "beta"]
+    assert len(grammars.libraries()) == 2
+
+
+def test_missing_or_corrupt_manifest_reads_as_empty(grammars):
+    assert build_languages.load_manifest() == {}
+    os.makedirs(build_languages.GRAMMAR_BUILD_DIR)
+    with open(build_languages.MANIFEST_PATH, "w") as f:
+        f.write("{not json")
+    assert build_languages.load_manifest() == {}
+    manifest = build_languages.build_all()
+    with open(build_languages.MANIFEST_PATH) as f:
+        assert json.load(f) == manifest
+
+
+def test_grammars_without_sources_are_an_error(grammars):
+    os.remove(grammars.source("beta"))
+    with pytest.raises(FileNotFoundError):
+        build_languages.build_all(["beta"])
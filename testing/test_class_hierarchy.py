@@ -0,0 +1,130 @@
+"""Class hierarchy: call resolution by receiver, Java's implicit this and external bases."""
+
+from class_hierarchy import ClassHierarchy
+from symbols import extract_source_summary
+
+SHAPES = b'''class Shape:
+    def area(self):
+        return 0
+
+    def describe(self):
+        return self.area()
+
+    @classmethod
+    def make(cls):
+        return cls.default()
+
+    @classmethod
+    def default(cls):
+        return Square(1)
+
+
+class Square(Shape):
+    def __init__(self, side):
+        self.side = side
+
+    def area(self):
+        return super().area() + self.side ** 2
+
+
+class Cube(Square):
+    def area(self):
+        return 6 * Square.area(self)
+
+
+def total(shape: Shape, other):
+    return shape.area() + other.area()
+
+
+def describe():
+    pass
+'''
+
+POOL = b'''interface Task extends java.io.Serializable { void run(); }
+class Job implements Runnable {
+    public void run() { step(); }
+    void step() {}
+}
+class FastJob extends Job {
+    void step() { describe(); }
+    void describe() {}
+}
+class Pool {
+    void start(Runnable r, Job j, Task t) { r.run(); j.step(); t.run(); }
+}
+'''
+
+AREAS = ["shapes.py::Shape.area::2", "shapes.py::Square.area::21", "shapes.py::Cube.area::26"]
+
+
+def resolved(hierarchy, summary):
+    """{function id: [(called name, targets)]} for every function and method of `summary`."""
+    functions = summary["functions"] + [m for c in summary["classes"] for m in c["methods"]]
+    return {f["id"]: hierarchy.resolve_calls(f) for f in functions}
+
+
+def python():
+    summary = extract_source_summary(SHAPES, "python", "shapes.py")
+    hierarchy = ClassHierarchy([summary])
+    return hierarchy, resolved(hierarchy, summary)
+
+
+def test_self_and_cls_receivers_dispatch_to_overrides():
+    _, calls = python()
+    assert calls["shapes.py::Shape.describe::5"] == [("area", AREAS)]
+    assert calls["shapes.py::Shape.make::9"] == [("default", ["shapes.py::Shape.default::13"])]
+
+
+def test_super_reaches_only_the_inherited_method():
+    _, calls = python()
+    assert calls["shapes.py::Square.area::21"][0] == ("area", ["shapes.py::Shape.area::2"])
+
+
+def test_class_name_receiver_calls_that_class_method():
+    _, calls = python()
+    assert calls["shapes.py::Cube.area::26"] == [("area", ["shapes.py::Square.area::21"])]
+
+
+def test_typed_parameter_dispatches_from_its_class():
+    hierarchy, calls = python()
+    shape, other = calls["shapes.py::total::30"]
+    assert shape == ("area", AREAS)
+    # An untyped receiver may be anything with that method
+    assert other == ("area", AREAS)
+    assert hierarchy.resolve("shapes.py::Cube.area::26", "area", "side") == AREAS
+
+
+def test_plain_calls_prefer_functions_then_constructors():
+    hierarchy, calls = python()
+    assert calls["shapes.py::Shape.default::13"] == [("Square", ["shapes.py::Square.__init__::18"])]
+    # In Python a plain call inside a method is a function, not a method of self
+    assert hierarchy.resolve("shapes.py::Shape.make::9", "describe") == ["shapes.py::describe::34"]
+    assert hierarchy.resolve("shapes.py::Shape.make::9", "missing") == []
+
+
+def test_java_plain_calls_have_an_implicit_this():
+    java = extract_source_summary(POOL, "java", "Pool.java")
+    # A same-named Python function must not win over the enclosing class's method
+    hierarchy = ClassHierarchy([java, extract_source_summary(SHAPES, "python", "shapes.py")])
+    calls = resolved(hierarchy, java)
+    assert calls["Pool.java::Job.run::3"] == [("step", ["Pool.java::Job.step::4", "Pool.java::FastJob.step::7"])]
+    assert calls["Pool.java::FastJob.step::7"] == [("describe", ["Pool.java::FastJob.describe::8"])]
+
+
+def test_interfaces_outside_the_index_dispatch_to_their_implementations():
+    java = extract_source_summary(POOL, "java", "Pool.java")
+    hierarchy = ClassHierarchy([java])
+    assert hierarchy.external_children == {"Serializable": ["Pool.java::Task"], "Runnable": ["Pool.java::Job"]}
+    assert hierarchy.bases_of("Pool.java::Job") == [(None, "Runnable", "implements")]
+    assert resolved(hierarchy, java)["Pool.java::Pool.start::11"] == [
+        ("run", ["Pool.java::Job.run::3"]),
+        ("step", ["Pool.java::Job.step::4", "Pool.java::FastJob.step::7"]),
+        ("run", ["Pool.java::Task.run::1"]),
+    ]
+
+
+def test_summaries_without_call_sites_resolve_by_name():
+    summary = {"file_path": "a.py", "functions": [{"name": "f", "id": "a.py::f::1", "calls": ["g"]},
+                                                  {"name": "g", "id": "a.py::g::2"}]}
+    hierarchy = ClassHierarchy([summary])
+    assert hierarchy.resolve_calls(summary["functions"][0]) == [("g", ["a.py::g::2"])]
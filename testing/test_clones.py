@@ -0,0 +1,86 @@
+"""Clone detection on real functions, and MinHash estimates against exact Jaccard similarity."""
+
+import base64
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+from clones import MIN_NODES, NUM_PERM, SHINGLE_SIZE, clone_groups, fingerprint  # noqa: E402
+from symbols import extract_source_summary  # noqa: E402
+
+TEMPLATE = '''
+def {name}(rows, limit):
+    total = 0
+    seen = set()
+    for row in rows:
+        if row.key in seen:
+            continue
+        seen.add(row.key)
+        if row.value > limit:
+            total += row.value * 2
+        else:
+            total -= 1
+        log("row", row.key, total)
+    result = {{"total": total, "count": len(seen)}}
+    return result
+'''
+
+RENAMED = TEMPLATE.format(name="second").replace("total", "acc").replace("rows", "items")
+
+EDITED = TEMPLATE.format(name="third").replace('        log("row", row.key, total)\n',
+                                               '        log("row", row.key, total)\n        check(total)\n')
+
+UNRELATED = '''
+def unrelated(path):
+    with open(path) as f:
+        data = json.load(f)
+    names = [d["name"] for d in data if d.get("active")]
+    while names:
+        name = names.pop()
+        try:
+            handle(name, retries=3)
+        except KeyError as e:
+            print(e)
+    return names
+'''
+
+
+def groups(*sources):
+    summary = extract_source_summary("".join(sources).encode(), "python", "m.py")
+    return [(g["kind"], [key.split("::")[1] for key in g["functions"]]) for g in clone_groups([summary])]
+
+
+def test_renamed_copy_is_an_exact_clone():
+    assert groups(TEMPLATE.format(name="first"), RENAMED, UNRELATED) == [("exact", ["first", "second"])]
+
+
+def test_edited_copy_is_a_near_clone():
+    assert groups(TEMPLATE.format(name="first"), RENAMED, EDITED, UNRELATED) == \
+        [("near", ["first", "second", "third"])]
+
+
+def test_unrelated_and_small_functions_are_not_grouped():
+    small = "def tiny(a):\n    return a + 1\n\ndef tinier(b):\n    return b + 2\n"
+    assert groups(TEMPLATE.format(name="first"), UNRELATED, small) == []
+    assert fingerprint([1] * (MIN_NODES - 1)) is None
+
+
+def shingles(tokens):
+    return {tuple(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_minhash_agreement_estimates_jaccard_similarity(seed):
+    rng = random.Random(seed)
+    base = [rng.randrange(40) for _ in range(400)]
+    edited = list(base)
+    for i in rng.sample(range(len(base)), 15 * (seed + 1)):
+        edited[i] = rng.randrange(40)
+    signatures = [np.frombuffer(base64.b64decode(fingerprint(t)["minhash"]), dtype="<u4")
+                  for t in (base, edited)]
+    estimate = (signatures[0] == signatures[1]).sum() / NUM_PERM
+    a, b = shingles(base), shingles(edited)
+    assert abs(estimate - len(a & b) / len(a | b)) < 0.2
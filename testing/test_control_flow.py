@@ -0,0 +1,130 @@
+"""Dominators checked against networkx, and CFG shapes of branches, loops and finally blocks."""
+
+import pytest
+
+nx = pytest.importorskip("networkx")
+
+from control_flow import ENTRY, EXIT, FINALLY, build_cfg_from_body  # noqa: E402
+from dominators import (control_dependences, immediate_dominators,  # noqa: E402
+                        immediate_post_dominators)
+
+
+def random_flow_graph(n, m, seed):
+    graph = nx.gnm_random_graph(n, m, seed=seed, directed=True)
+    graph.add_edges_from((v, v + 1) for v in range(0, n - 1, 3))
+    return graph
+
+
+def networkx_idom(graph, root):
+    # Newer networkx releases leave the root out of the mapping
+    return {**nx.immediate_dominators(graph, root), root: root}
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_immediate_dominators_match_networkx(seed):
+    graph = random_flow_graph(60, 90, seed)
+    idom = immediate_dominators(60, list(graph.edges()), 0)
+    expected = networkx_idom(graph, 0)
+    assert {v: idom[v] for v in range(60) if idom[v] >= 0} == {v: expected[v] for v in expected}
+    assert all(idom[v] == -1 for v in range(60) if v not in expected)
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_post_dominators_are_dominators_of_the_reversed_graph(seed):
+    graph = random_flow_graph(60, 90, seed)
+    exit = 59
+    # Keep to graphs where everything reaches the exit, so no virtual edges are added
+    graph.add_edges_from((v, exit) for v in range(exit) if not nx.has_path(graph, v, exit))
+    ipdom = immediate_post_dominators(60, list(graph.edges()), exit)
+    expected = networkx_idom(graph.reverse(), exit)
+    assert {v: ipdom[v] for v in range(60)} == expected
+
+
+def test_nodes_that_never_reach_the_exit_still_get_a_post_dominator():
+    # 0 -> 1 -> 2 -> 1 is an infinite loop; 3 is the exit
+    ipdom = immediate_post_dominators(4, [(0, 1), (1, 2), (2, 1), (0, 3)], 3)
+    assert list(ipdom) == [3, 3, 1, 3]
+
+
+def test_control_dependences_of_a_diamond():
+    # 0 entry, 1 if, 2 then, 3 else, 4 join, 5 exit
+    edges = [(0, 1), (1, 2), (1, 3), (2, 4), (3, 4), (4, 5)]
+    dependences = {(a, b) for a, b, _ in control_dependences(6, edges, 0, 5)}
+    assert dependences == {(0, 1), (0, 4), (1, 2), (1, 3)}
+
+
+# -- CFGs ---------------------------------------------------------------
+
+def node(graph, label):
+    matches = [i for i, text in enumerate(graph.labels) if text == label]
+    assert len(matches) == 1, f"{label!r} in {graph.labels}"
+    return matches[0]
+
+
+def successors(graph, u):
+    return {v for a, v, _ in graph.edges if a == u}
+
+
+def controllers(graph, v):
+    return {a for a, b, _ in graph.control_dependences() if b == v and a != ENTRY}
+
+
+def test_if_else_joins_and_depends_on_the_condition():
+    graph = build_cfg_from_body("if a:\n    b()\nelse:\n    c()\nd()", "python")
+    cond, b, c, d = (node(graph, text) for text in ("if a:", "b()", "c()", "d()"))
+    assert successors(graph, cond) == {b, c}
+    assert successors(graph, b) == successors(graph, c) == {d}
+    assert controllers(graph, b) == controllers(graph, c) == {cond}
+    assert controllers(graph, d) == set()
+
+
+def test_loop_has_a_back_edge_and_an_exit():
+    graph = build_cfg_from_body("while x:\n    x = f(x)\ndone()", "python")
+    loop, body, done = (node(graph, text) for text in ("while x:", "x = f(x)", "done()"))
+    assert successors(graph, loop) == {body, done}
+    assert successors(graph, body) == {loop}
+    assert controllers(graph, body) == {loop}
+    assert nx.has_path(graph.to_networkx(), graph.node_id(ENTRY), graph.node_id(EXIT))
+
+
+def test_return_inside_try_runs_the_finally_block():
+    graph = build_cfg_from_body("try:\n    a = g(x)\n    if a:\n        return 1\n"
+                                "finally:\n    cleanup()\nafter()", "python")
+    ret, cleanup, after = (node(graph, text) for text in ("return 1", "cleanup()", "after()"))
+    dispatch = node(graph, "end of finally")
+    assert graph.types[dispatch] == FINALLY
+    assert successors(graph, ret) == {cleanup}
+    assert EXIT not in successors(graph, ret)
+    assert successors(graph, dispatch) == {EXIT, after}
+    # The finalizer runs either way; what follows it depends on how it was entered
+    assert controllers(graph, cleanup) == set()
+    assert controllers(graph, after) == {dispatch}
+
+
+def test_break_and_continue_inside_try_run_the_finally_block():
+    graph = build_cfg_from_body("for i in xs:\n    try:\n        if i: break\n"
+                                "        if i > 2: continue\n        work(i)\n"
+                                "    finally:\n        done(i)\nend()", "python")
+    loop, brk, cont, done, end = (node(graph, text) for text in
+                                  ("for i in xs:", "break", "continue", "done(i)", "end()"))
+    dispatch = node(graph, "end of finally")
+    assert successors(graph, brk) == successors(graph, cont) == {done}
+    assert successors(graph, dispatch) == {loop, end}
+
+
+def test_nested_finally_blocks_run_inner_then_outer():
+    graph = build_cfg_from_body("try:\n    try:\n        return f()\n    finally:\n"
+                                "        inner()\nfinally:\n    outer()", "python")
+    ret, inner, outer = (node(graph, text) for text in ("return f()", "inner()", "outer()"))
+    assert successors(graph, ret) == {inner}
+    paths = list(nx.all_simple_paths(graph.to_networkx(), graph.node_id(ret), graph.node_id(EXIT)))
+    assert len(paths) == 1
+    assert paths[0].index(graph.node_id(inner)) < paths[0].index(graph.node_id(outer))
+
+
+def test_java_return_through_catch_and_finally():
+    graph = build_cfg_from_body("{ try { return f(); } catch (E e) { g(); } finally { h(); } k(); }", "java")
+    ret, g, h, k = (node(graph, text) for text in ("return f();", "g();", "h();", "k();"))
+    assert successors(graph, ret) == {h}
+    assert successors(graph, g) == {h}
+    assert successors(graph, node(graph, "end of finally")) == {EXIT, k}
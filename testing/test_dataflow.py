@@ -0,0 +1,86 @@
+"""Reaching definitions checked against a path search, and def/use sets of statements."""
+
+import random
+
+import pytest
+
+nx = pytest.importorskip("networkx")
+
+from control_flow import build_cfg_from_body  # noqa: E402
+from dataflow import data_dependences, flow_data_dependences  # noqa: E402
+
+NAMES = "xyz"
+
+
+def random_program(n, m, seed):
+    rng = random.Random(seed)
+    graph = nx.gnm_random_graph(n, m, seed=seed, directed=True)
+    graph.add_edges_from((v, v + 1) for v in range(n - 1) if rng.random() < 0.5)
+    defs = [set(rng.sample(NAMES, rng.randint(0, 1))) for _ in range(n)]
+    weak = [set(rng.sample(NAMES, 1)) if rng.random() < 0.15 else set() for _ in range(n)]
+    uses = [set(rng.sample(NAMES, rng.randint(0, 2))) for _ in range(n)]
+    return graph, defs, weak, uses
+
+
+def reference(graph, defs, weak, uses):
+    """A definition reaches every node after it on a path no strong definition of its variable cuts."""
+    found = set()
+    for d in graph.nodes:
+        for name in defs[d] | weak[d]:
+            seen = set()
+            stack = list(graph.successors(d))
+            while stack:
+                v = stack.pop()
+                if v in seen:
+                    continue
+                seen.add(v)
+                if name in uses[v]:
+                    found.add((d, v, name))
+                if name not in defs[v]:
+                    stack.extend(graph.successors(v))
+    return found
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_reaching_definitions_match_path_search(seed):
+    graph, defs, weak, uses = random_program(40, 55, seed)
+    found = data_dependences(40, list(graph.edges()), defs, weak, uses)
+    assert len(found) == len(set(found))
+    assert set(found) == reference(graph, defs, weak, uses)
+
+
+def dependences(body, language="python"):
+    graph = build_cfg_from_body(body, language)
+    return {(graph.labels[d], graph.labels[u], name) for d, u, name in flow_data_dependences(graph)
+            if not name.startswith("<")}
+
+
+def test_redefinition_kills_and_branches_merge():
+    found = dependences("x = 1\nif c:\n    x = 2\nprint(x)")
+    assert ("x = 1", "print(x)", "x") in found
+    assert ("x = 2", "print(x)", "x") in found
+    found = dependences("x = 1\nx = 2\nprint(x)")
+    assert ("x = 1", "print(x)", "x") not in found
+
+
+def test_loop_carries_definitions_around_the_back_edge():
+    found = dependences("total = 0\nfor v in xs:\n    total = total + v\nreturn total")
+    assert ("total = total + v", "total = total + v", "total") in found
+    assert ("total = 0", "total = total + v", "total") in found
+    assert ("for v in xs:", "total = total + v", "v") in found
+    assert ("total = total + v", "return total", "total") in found
+
+
+def test_attribute_stores_are_weak_definitions():
+    found = dependences("o = make()\no.f = 1\nuse(o)")
+    assert ("o = make()", "use(o)", "o") in found
+    assert ("o.f = 1", "use(o)", "o") in found
+    # A statement that both stores through and rebinds a name defines it once
+    assert sorted(flow_data_dependences(build_cfg_from_body("x.f = x = make()\nuse(x)", "python"))) \
+        == [(2, 3, "x")]
+
+
+def test_java_declarations_and_updates():
+    found = dependences("{ int i = 0; i++; return i; }", "java")
+    assert ("i++;", "return i;", "i") in found
+    assert ("int i = 0;", "return i;", "i") not in found
@@ -0,0 +1,59 @@
+"""CompactGraph and its networkx view: attribute write-through and derived graphs."""
+
+import pytest
+
+nx = pytest.importorskip("networkx")
+
+from graph_core import CompactGraph  # noqa: E402
+
+
+@pytest.fixture
+def core():
+    core = CompactGraph()
+    core.add_node("a", type="file", label="a.py")
+    core.add_node("b", type="function", label="f")
+    core.add_node("c", type="function", label="g")
+    core.add_edge("a", "b", "contains")
+    core.add_edge("b", "c", "calls", inheritance=None, weight=2)
+    return core
+
+
+def test_view_node_writes_go_through_to_the_core(core):
+    view = core.to_networkx()
+    view.nodes["b"]["label"] = "renamed"
+    view.nodes["b"]["type"] = "method"
+    nx.set_node_attributes(view, {"c": 7}, "complexity")
+    assert core.node_attrs(core.index("b"))["label"] == "renamed"
+    assert core.node_attrs(core.index("b"))["type"] == "method"
+    assert core.node_attrs(core.index("c"))["complexity"] == 7
+    del view.nodes["b"]["label"]
+    assert "label" not in core.node_attrs(core.index("b"))
+
+
+def test_view_edge_writes_go_through_to_the_core(core):
+    view = core.to_networkx()
+    view["b"]["c"]["weight"] = 5
+    view.edges["a", "b"]["note"] = "x"
+    assert view["b"]["c"]["weight"] == 5
+    assert view.edges["a", "b"]["note"] == "x"
+    with pytest.raises(TypeError):
+        del view["a"]["b"]["type"]
+
+
+def test_view_structure_is_frozen(core):
+    view = core.to_networkx()
+    with pytest.raises(nx.NetworkXError):
+        view.add_node("d")
+
+
+def test_derived_graphs_are_ordinary_digraphs(core):
+    view = core.to_networkx()
+    for derived in (view.subgraph(["a", "b"]), view.copy(), view.reverse()):
+        assert set(derived.nodes) <= {"a", "b", "c"}
+        assert derived.nodes["a"]["label"] == "a.py"
+    copy = view.copy()
+    copy.add_edge("c", "a")
+    copy.nodes["a"]["label"] = "changed"
+    assert core.number_of_edges() == 2
+    assert core.node_attrs(core.index("a"))["label"] == "a.py"
+    assert view.reverse().has_edge("b", "a")
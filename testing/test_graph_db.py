@@ -0,0 +1,165 @@
+"""Snapshot graph database: writing through build_snapshot_db and the queries over it."""
+
+import os
+import sqlite3
+
+import pytest
+
+pytest.importorskip("networkx")
+
+import ir_processor  # noqa: E402
+from graph_db import GraphDatabase  # noqa: E402
+from ir_store import IRStore  # noqa: E402
+
+SHAPES = '''class Base:
+    def area(self):
+        return 0
+
+
+class Square(Base):
+    def __init__(self, side):
+        self.side = side
+
+    def area(self):
+        return self.side * self.side
+
+
+class Cube(Square):
+    def volume(self):
+        return self.area() * self.side
+
+
+def classify(n):
+    if n < 0:
+        return "negative"
+    elif n == 0:
+        return "zero"
+    for i in range(n):
+        if i % 2:
+            return "odd"
+    return "even"
+'''
+
+MAIN = '''from shapes import Square, classify
+
+
+def describe(side):
+    square = Square(side)
+    label = classify(side)
+    print(label)
+    return square.area()
+'''
+
+TABLES = ("files", "symbols", "edges", "flow_nodes", "flow_edges", "function_summaries",
+          "interprocedural_edges", "clones")
+
+
+@pytest.fixture
+def build(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "shapes.py").write_text(SHAPES)
+    (repo / "main.py").write_text(MAIN)
+    monkeypatch.setattr(ir_processor, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    monkeypatch.setattr(ir_processor, "SUMMARY_CACHE_PATH", str(tmp_path / "summaries.json"))
+    monkeypatch.setattr(ir_processor, "SEARCH_INDEX_PATH", str(tmp_path / "search.sqlite"))
+    store = IRStore(str(tmp_path / "store"))
+
+    def build(snapshot, manifest=None):
+        return ir_processor.build_snapshot_db(str(repo), snapshot, store=store,
+                                              manifest={} if manifest is None else manifest)
+    build.store = store
+    return build
+
+
+@pytest.fixture
+def db(build):
+    with GraphDatabase(build("snap-1")) as db:
+        yield db
+
+
+def keys(rows):
+    return [row["key"] for row in rows]
+
+
+def test_callers_by_name_and_key(db):
+    assert keys(db.callers("classify")) == ["main.py::describe::4"]
+    assert keys(db.callers("shapes.py::classify::19")) == ["main.py::describe::4"]
+    assert db.callers("describe") == []
+
+
+def test_callees_resolve_inside_the_repository(db):
+    callees = {(row["callee"], row["key"]) for row in db.callees("describe")}
+    assert callees == {("Square", "shapes.py::Square.__init__::7"),
+                       ("classify", "shapes.py::classify::19"),
+                       ("area", "shapes.py::Base.area::2"),
+                       ("area", "shapes.py::Square.area::10"),
+                       ("print", None)}
+
+
+def test_subclasses(db):
+    assert keys(db.subclasses("Base")) == ["shapes.py::Square"]
+    assert [(row["key"], row["depth"]) for row in db.subclasses("Base", transitive=True)] == \
+        [("shapes.py::Square", 1), ("shapes.py::Cube", 2)]
+
+
+def test_most_complex_functions(db):
+    ranked = db.most_complex(limit=2)
+    assert [(row["key"], row["complexity"]) for row in ranked] == \
+        [("shapes.py::classify::19", 5), ("main.py::describe::4", 1)]
+    assert keys(db.most_complex(file="main.py")) == ["main.py::describe::4"]
+
+
+def test_flow_graphs(db):
+    cfg = db.flow_graph("main.py::describe::4", "cfg")
+    assert cfg["nodes"][0]["type"] == "entry"
+    assert "square = Square(side)" in [node["label"] for node in cfg["nodes"]]
+    pdg = db.flow_graph("main.py::describe::4", "pdg")
+    statements = {node["key"]: node["label"] for node in pdg["nodes"]}
+    data = {(statements[e["src"]], statements[e["dst"]]) for e in pdg["edges"]
+            if "label" in e.get("variables", [])}
+    assert data == {("label = classify(side)", "print(label)")}
+    assert db.flow_graph("main.py::nothing::1") is None
+    assert db.function_summary("main.py::describe::4")["parameters"] == ["side"]
+
+
+def dump(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {table: sorted(map(repr, conn.execute(f"SELECT * FROM {table}"))) for table in TABLES}
+    finally:
+        conn.close()
+
+
+def test_unchanged_files_are_not_parsed_again(build, monkeypatch):
+    first = build("snap-1")
+
+    def no_parse(*args):
+        raise AssertionError("parsed an unchanged file")
+    monkeypatch.setattr(ir_processor, "parse_source", no_parse)
+    manifest = {}
+    second = build("snap-2", manifest)
+    assert dump(second) == dump(first)
+    assert all(entry.get("flow") and entry.get("summary") for entry in manifest.values())
+
+    build.store.save_manifest("snap-2", manifest)
+    assert build.store.gc() == 0
+
+
+def test_a_deleted_database_is_rebuilt_from_the_manifest(build, tmp_path, monkeypatch):
+    pytest.importorskip("fastapi")
+    import main
+    manifest = {}
+    path = build("snap-1", manifest)
+    build.store.save_manifest("snap-1", manifest)
+    expected = dump(path)
+    os.remove(path)
+    monkeypatch.setattr(main, "SNAPSHOT_DIR", ir_processor.SNAPSHOT_DIR)
+    monkeypatch.setattr(main, "IR_STORE_DIR", build.store.root)
+    monkeypatch.setattr(ir_processor, "parse_source", None)   # the repository is not needed
+    with main.open_snapshot("snap-1") as db:
+        assert keys(db.callers("classify")) == ["main.py::describe::4"]
+    assert dump(path) == expected
+    with pytest.raises(main.HTTPException) as error:
+        main.open_snapshot("never-stored")
+    assert error.value.status_code == 404
@@ -0,0 +1,86 @@
+"""Graph store: `.ciqg` round trips of named subgraphs and CSR successor lookups."""
+
+import pytest
+
+nx = pytest.importorskip("networkx")
+
+from graph_core import CompactGraph, EdgeKind  # noqa: E402
+from graph_store import (  # noqa: E402
+    STORE_EXTENSION, GraphStore, GraphStoreWriter, iter_subgraphs, save_graphs
+)
+
+
+def function_cfg():
+    cfg = nx.DiGraph()
+    cfg.add_node("entry", type="entry", label=None)
+    cfg.add_node("naïve = 'ünïcode ✓'", type="statement", lines=[3, 4], nested={"depth": 2})
+    cfg.add_node("exit", type=7)   # a non-string type is kept as an attribute
+    cfg.add_edge("entry", "naïve = 'ünïcode ✓'", kind="control_flow", branch=None)
+    cfg.add_edge("naïve = 'ünïcode ✓'", "exit", type="calls", variables=["x", "y"])
+    cfg.add_edge("entry", "exit")
+    return cfg
+
+
+@pytest.fixture
+def path(tmp_path):
+    core = CompactGraph()
+    core.add_node("file", type="file")
+    core.add_node("f", type="function", complexity=3)
+    core.add_edge("file", "f", "contains")
+    graphs = {"cfg/naïve.py::f": function_cfg(), "empty": nx.DiGraph(), "core": core}
+    return save_graphs(str(tmp_path / f"graphs{STORE_EXTENSION}"), graphs)
+
+
+def test_subgraphs_round_trip(path):
+    with GraphStore(path) as store:
+        assert sorted(store.names()) == ["cfg/naïve.py::f", "core", "empty"]
+        assert len(store) == 3 and "core" in store and "missing" not in store
+
+        cfg = store.load("cfg/naïve.py::f")
+        expected = function_cfg()
+        assert list(cfg.nodes(data=True)) == list(expected.nodes(data=True))
+        # "kind" is kept as the edge kind, not as an attribute
+        assert dict(cfg.edges["entry", "naïve = 'ünïcode ✓'"]) == {"branch": None}
+        assert dict(cfg.edges["naïve = 'ünïcode ✓'", "exit"]) == {"type": "calls", "variables": ["x", "y"]}
+        assert dict(cfg.edges["entry", "exit"]) == {}
+
+        empty = store.load("empty")
+        assert (empty.number_of_nodes(), empty.number_of_edges()) == (0, 0)
+        assert store.stats("empty") == {"nodes": 0, "edges": 0}
+        assert store.stats("cfg/naïve.py::f") == {"nodes": 3, "edges": 3}
+
+        core = store.load_compact("core")
+        assert core.node_attrs(core.index("f")) == {"type": "function", "complexity": 3}
+        assert core.edge(0) == (core.index("file"), core.index("f"), EdgeKind.CONTAINS)
+
+
+def test_unknown_names_raise_key_error(path):
+    with GraphStore(path) as store:
+        for read in (store.load, store.load_compact, store.stats):
+            with pytest.raises(KeyError):
+                read("cfg/missing")
+        with pytest.raises(KeyError):
+            store.successors("core", "no-such-node")
+
+
+def test_successors(path):
+    with GraphStore(path) as store:
+        assert sorted(store.successors("cfg/naïve.py::f", "entry")) == ["exit", "naïve = 'ünïcode ✓'"]
+        assert store.successors("cfg/naïve.py::f", "naïve = 'ünïcode ✓'") == ["exit"]
+        assert store.successors("cfg/naïve.py::f", "exit") == []
+        assert store.successors("core", "file") == ["f"]
+
+
+def test_iter_subgraphs_by_prefix(path):
+    assert [name for name, _ in iter_subgraphs(path, "cfg/")] == ["cfg/naïve.py::f"]
+
+
+def test_duplicate_names_and_foreign_files_are_rejected(tmp_path):
+    writer = GraphStoreWriter()
+    writer.add("g", nx.DiGraph())
+    with pytest.raises(ValueError):
+        writer.add("g", nx.DiGraph())
+    other = tmp_path / "other.ciqg"
+    other.write_bytes(b"\0" * 128)
+    with pytest.raises(ValueError):
+        GraphStore(str(other))
@@ -0,0 +1,92 @@
+"""
+Import-time benchmark for the pipeline modules.
+
+Each module is imported in a fresh interpreter under `-X importtime` so the
+FastAPI cold start and process-pool worker spawn stay cheap: importing must
+not pull in matplotlib/networkx, must not touch the working directory, and
+must stay under a fixed time budget.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("tree_sitter")
+
+REPO_ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), ".."))
+PARSER_DIR = os.path.join(REPO_ROOT, "parser")
+TESTING_DIR = os.path.join(REPO_ROOT, "testing")
+
+MODULES = [
+    "languages",
+    "telemetry",
+    "sampler",
+    "graph_core",
+    "graph_store",
+    "clones",
+    "symbols",
+    "class_hierarchy",
+    "metrics",
+    "graph_db",
+    "reachability",
+    "ranking",
+    "structural_search",
+    "search_index",
+    "ir_store",
+    "incremental_graph",
+    "dominators",
+    "control_flow",
+    "dataflow",
+    "slicing",
+    "agent_context",
+    "summaries",
+    "run_ir",
+    "ir_builder",
+    "ir_processor",
+    "tree_sitter_parsers",
+    "cfg",
+    "hpg",
+    "pdg",
+    "ir_graphs",
+    "hybrid_graph",
+    "dag_builder",
+]
+
+# Modules that must only load when graphs are built or drawn
+HEAVY_MODULES = ("matplotlib", "networkx", "git", "numpy", "scipy")
+
+# Cumulative import time allowed per module, in microseconds
+IMPORT_BUDGET_US = 300_000
+
+
+def import_times(module, cwd):
+    """Import `module` under -X importtime and return {module name: cumulative us}."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([PARSER_DIR, TESTING_DIR, env.get("PYTHONPATH", "")])
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize("module", MODULES)
+def test_import_is_cheap_and_side_effect_free(module, tmp_path):
+    times = import_times(module, str(tmp_path))
+
+    loaded_heavy = [name for name in times if name.split(".")[0] in HEAVY_MODULES]
+    assert not loaded_heavy, f"{module} imports {loaded_heavy} at import time"
+    assert list(tmp_path.iterdir()) == [], f"{module} wrote files on import"
+    assert times[module] < IMPORT_BUDGET_US, (
+        f"{module} took {times[module] / 1000:.1f} ms to import"
+    )
@@ -0,0 +1,103 @@
+"""Incremental call graph kept in step with networkx under random edits."""
+
+import random
+
+import pytest
+
+nx = pytest.importorskip("networkx")
+
+from incremental_graph import IncrementalCallGraph  # noqa: E402
+
+
+def reachable(graph, u):
+    """Nodes at the end of a non-empty path from `u` (so `u` itself only on a cycle)."""
+    found = set()
+    for w in graph.successors(u):
+        found |= nx.descendants(graph, w) | {w}
+    return found
+
+
+def check(incremental, graph):
+    assert set(incremental.edges()) == set(graph.edges())
+    expected = {frozenset(c) for c in nx.strongly_connected_components(graph)
+                if len(c) > 1 or graph.has_edge(next(iter(c)), next(iter(c)))}
+    assert {frozenset(c) for c in incremental.cycles()} == expected
+    assert incremental.components() == nx.number_strongly_connected_components(graph)
+
+    position = {k: i for i, component in enumerate(incremental.topological_order())
+                for k in component}
+    assert set(position) == set(graph.nodes)
+    for u, v in graph.edges():
+        assert position[u] <= position[v], "callers must come before their callees"
+
+    reverse = graph.reverse(copy=False)
+    for u in graph.nodes:
+        descendants = reachable(graph, u)
+        assert incremental.descendants(u) == sorted(descendants)
+        assert incremental.ancestors(u) == sorted(reachable(reverse, u))
+        for v in list(graph.nodes)[::5]:
+            assert incremental.reaches(u, v) == (v in descendants)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_edits_match_networkx(seed):
+    rng = random.Random(seed)
+    keys = [f"f{i:02d}" for i in range(30)]
+    incremental = IncrementalCallGraph()
+    graph = nx.DiGraph()
+    for key in keys:
+        incremental.add_node(key)
+        graph.add_node(key)
+    for step in range(300):
+        u, v = rng.choice(keys), rng.choice(keys)
+        if graph.has_edge(u, v) or (graph.number_of_edges() > 60 and rng.random() < 0.6):
+            if graph.number_of_edges():
+                u, v = rng.choice(sorted(graph.edges()))
+                incremental.remove_edge(u, v)
+                graph.remove_edge(u, v)
+        else:
+            incremental.add_edge(u, v)
+            graph.add_edge(u, v)
+        # Queries fill the caches, so later edits must invalidate them correctly
+        if step % 25 == 0:
+            check(incremental, graph)
+    check(incremental, graph)
+
+
+def test_removing_a_node_splits_its_cycle():
+    incremental = IncrementalCallGraph()
+    for u, v in [("a", "b"), ("b", "c"), ("c", "a"), ("c", "d")]:
+        incremental.add_edge(u, v)
+    assert incremental.cycles() == [["a", "b", "c"]]
+    assert incremental.reaches("d", "d") is False
+    incremental.remove_node("b")
+    assert incremental.cycles() == []
+    assert incremental.descendants("c") == ["a", "d"]
+    order = incremental.topological_order()
+    assert order.index(["c"]) < min(order.index(["a"]), order.index(["d"]))
+
+
+def summary(path, functions):
+    return {"file_path": path,
+            "functions": [{"id": f"{path}::{name}", "name": name, "calls": calls}
+                          for name, calls in functions.items()]}
+
+
+def test_update_files_re_resolves_callers_of_changed_names():
+    graph = IncrementalCallGraph.from_summaries([
+        summary("a.py", {"main": ["helper"]}),
+        summary("b.py", {"helper": ["log"], "log": []}),
+    ])
+    assert graph.descendants("a.py::main") == ["b.py::helper", "b.py::log"]
+
+    # A local definition shadows the one in b.py
+    graph.update_files([summary("a.py", {"main": ["helper"], "helper": []})])
+    assert graph.descendants("a.py::main") == ["a.py::helper"]
+
+    # Dropping the local definition falls back to b.py again
+    graph.update_files([summary("a.py", {"main": ["helper"]})])
+    assert graph.descendants("a.py::main") == ["b.py::helper", "b.py::log"]
+
+    graph.update_files([], removed_files=["b.py"])
+    assert graph.descendants("a.py::main") == []
+    assert sorted(graph.succ) == ["a.py::main"]
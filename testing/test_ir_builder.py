@@ -0,0 +1,94 @@
+"""Parse budgets: byte and node limits, timeouts, hard skips and the whole-run time budget."""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import ir_processor
+from ir_builder import (STATUS_DECLARATIONS_ONLY, STATUS_OK, STATUS_SKIPPED, ParseBudget,
+                        ParseBudgetExceeded, parse_file)
+
+FUNCTION = "def f{0}(a):\n    if a:\n        return [a + {0} for _ in range(3)]\n    return None\n\n"
+
+
+def write(tmp_path, name, content):
+    path = tmp_path / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content.encode() if isinstance(content, str) else content)
+    return str(path)
+
+
+def depth(node):
+    return 1 + max((depth(c) for c in node.children), default=0)
+
+
+def test_within_budget_parses_everything(tmp_path):
+    ir = parse_file(write(tmp_path, "m.py", FUNCTION.format(0)), "python")
+    assert ir.status == STATUS_OK
+    assert depth(ir) > 4
+
+
+def test_byte_limit_parses_the_head_declarations_only(tmp_path):
+    source = "".join(FUNCTION.format(i) for i in range(50))
+    budget = ParseBudget(max_bytes=len(source) // 2)
+    ir = parse_file(write(tmp_path, "m.py", source), "python", budget)
+    assert ir.status == STATUS_DECLARATIONS_ONLY
+    assert 0 < len(ir.children) < 50
+    assert ir.end[0] < source.count("\n")
+
+
+def test_byte_limit_without_line_breaks_cuts_at_a_character(tmp_path):
+    source = "var s = '" + "é" * 100 + "';"
+    budget = ParseBudget(max_bytes=len("var s = 'é".encode()) + 1)   # inside the second "é"
+    ir = parse_file(write(tmp_path, "bundle.js", source), "javascript", budget)
+    assert ir.status == STATUS_DECLARATIONS_ONLY
+
+
+def test_node_limit_converts_declarations_only(tmp_path):
+    source = "".join(FUNCTION.format(i) for i in range(10))
+    ir = parse_file(write(tmp_path, "m.py", source), "python", ParseBudget(max_nodes=50))
+    assert ir.status == STATUS_DECLARATIONS_ONLY
+    assert len(ir.children) == 10
+    assert depth(ir) <= 4
+
+
+def test_files_over_the_hard_limit_are_skipped(tmp_path):
+    path = write(tmp_path, "m.py", FUNCTION.format(0))
+    with pytest.raises(ParseBudgetExceeded):
+        parse_file(path, "python", ParseBudget(max_bytes=10, max_declaration_bytes=20))
+
+
+def test_parse_timeout_skips_the_file(tmp_path):
+    path = write(tmp_path, "m.py", "".join(FUNCTION.format(i) for i in range(5000)))
+    with pytest.raises(ParseBudgetExceeded):
+        parse_file(path, "python", ParseBudget(timeout_micros=1))
+    # The shared parser is usable again afterwards
+    assert parse_file(path, "python").status == STATUS_OK
+
+
+def test_run_time_budget_returns_partial_ir(tmp_path, monkeypatch):
+    for i in range(4):
+        write(tmp_path, f"m{i}.py", FUNCTION.format(i) * (i + 1))
+    clock = [0.0]
+    real_parse = ir_processor.parse_file
+
+    def slow_parse(*args):
+        clock[0] += 1.0
+        return real_parse(*args)
+
+    monkeypatch.setattr(ir_processor, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    monkeypatch.setattr(ir_processor, "parse_file", slow_parse)
+    ir = ir_processor.build_ir_for_repo_path(str(tmp_path), time_budget=1.5)
+    statuses = {os.path.basename(fp): file_ir["status"] for fp, file_ir in ir.items()}
+    assert statuses == {"m0.py": STATUS_OK, "m1.py": STATUS_OK,
+                        "m2.py": STATUS_SKIPPED, "m3.py": STATUS_SKIPPED}
+    assert ir_processor.summarize_status(ir) == {STATUS_OK: 2, STATUS_SKIPPED: 2}
+
+
+def test_small_and_imported_files_come_first(tmp_path):
+    util = write(tmp_path, "util.py", FUNCTION.format(0) * 4)
+    big = write(tmp_path, "big.py", FUNCTION.format(0) * 3)
+    users = [write(tmp_path, f"use{i}.py", "import util\n" + FUNCTION.format(i) * 2) for i in range(3)]
+    assert ir_processor.reference_counts([util, big, *users])[util] == 3
+    assert ir_processor.prioritize_files([big, *users, util])[0] == util
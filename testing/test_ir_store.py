@@ -0,0 +1,82 @@
+"""IR store: object and manifest round trips, snapshot diffs, stale formats and gc."""
+
+import pytest
+
+import ir_store
+from ir_store import IRStore, object_key
+
+TREE = {"type": "module", "start": [0, 0], "end": [2, 0], "status": "ok",
+        "children": [{"type": "function_definition", "start": [0, 0], "end": [1, 12], "children": []}]}
+SUMMARY = {"file_path": "a.py", "language": "python", "functions": [{"name": "ünïcode", "id": "a.py::f::1"}]}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return IRStore(str(tmp_path / "store"))
+
+
+def stored(store, path, blob, tree=TREE, summary=SUMMARY):
+    """Manifest entry of a file whose IR and summary are put in `store`."""
+    ir_key, summary_key = object_key("ir", blob, "python"), object_key("summary", blob, "python", path)
+    store.put(ir_key, tree)
+    store.put(summary_key, dict(summary, file_path=path))
+    return {"language": "python", "blob": blob, "ir": ir_key, "summary": summary_key}
+
+
+def test_objects_round_trip_and_are_written_once(store):
+    key = object_key("ir", "blob-1", "python")
+    assert not store.has(key)
+    assert store.put(key, TREE)
+    assert not store.put(key, {"other": True})
+    assert store.get(key) == TREE
+    with pytest.raises(KeyError):
+        store.get(object_key("ir", "blob-2", "python"))
+
+
+def test_snapshot_round_trip(store):
+    files = {"a.py": stored(store, "a.py", "blob-a"),
+             "big.py": {"language": "python", "blob": "blob-big", "status": "skipped", "reason": "too big"},
+             "bad.py": {"language": "python", "blob": "blob-bad", "error": "unreadable"}}
+    store.save_manifest("repo-1", files, {"repo": "https://example.com/repo"})
+    manifest = store.manifest("repo-1")
+    assert manifest["files"] == files
+    assert manifest["meta"]["repo"] == "https://example.com/repo"
+    assert store.load_ir("repo-1") == {"a.py": TREE, "big.py": {"status": "skipped", "reason": "too big"},
+                                       "bad.py": {"error": "unreadable"}}
+    assert store.load_ir("repo-1", ["a.py", "missing.py"]) == {"a.py": TREE}
+    assert store.load_summaries("repo-1") == [dict(SUMMARY, file_path="a.py")]
+    assert store.snapshots() == ["repo-1"]
+    with pytest.raises(KeyError):
+        store.manifest("repo-2")
+    with pytest.raises(ValueError):
+        store.save_manifest("../escape", files)
+
+
+def test_diff_and_sharing_between_snapshots(store):
+    store.save_manifest("repo-1", {"a.py": stored(store, "a.py", "a1"), "b.py": stored(store, "b.py", "b1"),
+                                   "c.py": stored(store, "c.py", "c1")})
+    store.save_manifest("repo-2", {"a.py": stored(store, "a.py", "a1"), "b.py": stored(store, "b.py", "b2"),
+                                   "d.py": stored(store, "d.py", "d1")})
+    assert store.diff("repo-1", "repo-2") == {"added": ["d.py"], "removed": ["c.py"], "changed": ["b.py"]}
+    stats = store.stats()
+    # a.py's IR and summary are shared by both snapshots
+    assert (stats["snapshots"], stats["references"], stats["objects"]) == (2, 12, 10)
+
+
+def test_objects_of_an_older_format_are_not_reused(store, monkeypatch):
+    key = object_key("ir", "blob-1", "python")
+    store.put(key, TREE)
+    monkeypatch.setattr(ir_store, "FORMAT", ir_store.FORMAT + 1)
+    assert object_key("ir", "blob-1", "python") != key
+    assert not store.has(object_key("ir", "blob-1", "python"))
+
+
+def test_gc_keeps_only_objects_a_manifest_names(store):
+    store.save_manifest("repo-1", {"a.py": dict(stored(store, "a.py", "a1"), flow=object_key("flow", "a1"))})
+    store.put(object_key("flow", "a1"), {})
+    store.save_manifest("repo-2", {"b.py": stored(store, "b.py", "b1")})
+    assert store.gc() == 0
+    store.remove("repo-2")
+    assert store.gc() == 2    # b.py's IR and summary
+    assert store.load_summaries("repo-1") == [dict(SUMMARY, file_path="a.py")]
+    assert store.has(object_key("flow", "a1"))
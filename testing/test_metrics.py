@@ -0,0 +1,112 @@
+"""Code metrics: the walk in symbols.py on fixed snippets and MetricsTable aggregates."""
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from metrics import MetricsTable, value_counts  # noqa: E402
+from symbols import extract_source_summary  # noqa: E402
+
+SCALE = b'''def scale(x, k=2):
+    # doubled
+    if x > 0 and k:
+        return x * k
+
+    return 0
+'''
+
+CLAMP = b'''class A {
+    int f(int a, int b) {
+        if (a > 0 && b > 0) {
+            for (int i = 0; i < a; i++) {
+                while (b > i) { b--; }
+            }
+        } else if (a < 0) {
+            if (b < 0) { return 1; }
+            return -1;
+        }
+        return a > b ? a : b;
+    }
+}
+'''
+
+
+def test_python_function_metrics():
+    summary = extract_source_summary(SCALE, "python", "m.py")
+    [func] = summary["functions"]
+    # if and `and`
+    assert func["complexity"] == 3
+    # Operators: def ( , = ) : | if > and : | return * | return
+    # Operands:  scale x k 2   | x 0 k      | x k      | 0
+    assert func["metrics"] == {"loc": 6, "sloc": 4, "nesting_depth": 1, "parameters": 2,
+                               "operators": 13, "operands": 10,
+                               "unique_operators": 11, "unique_operands": 5}
+    assert (summary["total_lines"], summary["sloc"]) == (6, 4)
+
+
+def test_java_method_metrics():
+    [cls] = extract_source_summary(CLAMP, "java", "A.java")["classes"]
+    [method] = cls["methods"]
+    # if, &&, for, while, else if, inner if and ?:
+    assert method["complexity"] == 8
+    # if > for > while; the else-if chain stays on the if's level
+    assert method["metrics"]["nesting_depth"] == 3
+    assert (method["metrics"]["loc"], method["metrics"]["parameters"]) == (11, 2)
+
+
+def test_halstead_measures():
+    [func] = extract_source_summary(SCALE, "python", "m.py")["functions"]
+    table = MetricsTable.from_summaries([{"file_path": "m.py", "functions": [func]}])
+    # n = 11 + 5, N = 13 + 10
+    assert table.column("vocabulary")[0] == 16 and table.column("length")[0] == 23
+    assert table.column("volume")[0] == pytest.approx(23 * 4)
+    assert table.column("difficulty")[0] == pytest.approx(11 / 2 * 10 / 5)
+    assert table.column("effort")[0] == pytest.approx(11 * 92)
+
+
+@pytest.fixture
+def table():
+    rows = [(f"{path}::f{i}::1", path, {"complexity": complexity, "metrics": {"sloc": sloc}})
+            for i, (path, complexity, sloc) in enumerate(
+                [("a.py", 1, 5), ("a.py", 4, 20), ("b.py", 2, 8), ("b.py", 10, 40), ("c.py", 4, 1)])]
+    return MetricsTable.from_rows(rows)
+
+
+def test_percentiles(table):
+    # complexity sorted: 1 2 4 4 10, linearly interpolated
+    assert table.percentiles("complexity") == {"p50": 4.0, "p90": 7.6, "p95": 8.8, "p99": 9.76}
+    assert table.percentiles("sloc", (0, 100)) == {"p0": 1.0, "p100": 40.0}
+    assert MetricsTable([], [], []).percentiles("complexity") == {}
+
+
+def test_top_n(table):
+    assert [(row["function"], row["complexity"]) for row in table.top("complexity", 3)] == [
+        ("b.py::f3::1", 10.0), ("a.py::f1::1", 4.0), ("c.py::f4::1", 4.0)]
+    assert len(table.top("sloc", 50)) == 5
+    assert table.top("sloc", 0) == []
+    with pytest.raises(ValueError):
+        table.top("coverage")
+
+
+def test_totals_histograms_and_report(table):
+    assert table.by_file("complexity") == {"a.py": 5.0, "b.py": 12.0, "c.py": 4.0}
+    histogram = table.histogram("complexity", bins=3)
+    assert sum(histogram["counts"]) == 5 and len(histogram["edges"]) == 4
+    # Few distinct integers: one bin per value
+    assert table.histogram("complexity", bins=20)["counts"] == [1, 1, 0, 2] + [0] * 5 + [1]
+    report = table.report(top=1, columns=("complexity",))
+    assert report["functions"] == 5
+    assert report["metrics"]["complexity"]["total"] == 21.0
+    assert report["metrics"]["complexity"]["top"][0]["function"] == "b.py::f3::1"
+
+
+def test_summaries_without_metrics_fall_back_to_lines_and_parameters():
+    legacy = {"file_path": "old.py", "functions": [
+        {"id": "old.py::f::3", "start_line": 3, "end_line": 7, "parameters": ["a", "b"], "complexity": 2}]}
+    table = MetricsTable.from_summaries([legacy])
+    assert (table.column("loc")[0], table.column("parameters")[0], table.column("sloc")[0]) == (5, 2, 0)
+
+
+def test_value_counts():
+    assert value_counts(["py", "js", "py", None]) == {"py": 2, "None": 1, "js": 1}
+    assert value_counts([]) == {}
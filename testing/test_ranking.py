@@ -0,0 +1,99 @@
+"""Call-graph ranking: PageRank and betweenness against networkx, top() and the sample budget."""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+nx = pytest.importorskip("networkx")
+
+from ranking import CallGraphRanking  # noqa: E402
+
+
+def random_graphs():
+    for seed, n, p in ((1, 30, 0.08), (2, 60, 0.05), (3, 12, 0.3), (4, 40, 0.02)):
+        yield nx.gnp_random_graph(n, p, seed=seed, directed=True)
+
+
+def ranking_of(graph, complexity=None):
+    return CallGraphRanking([str(n) for n in graph.nodes], list(graph.edges), complexity)
+
+
+@pytest.mark.parametrize("graph", list(random_graphs()))
+def test_pagerank_matches_networkx(graph):
+    expected = nx.pagerank(graph, alpha=0.85, tol=1e-12, max_iter=500)
+    found = ranking_of(graph).pagerank(tol=1e-12, max_iter=500)
+    assert found.sum() == pytest.approx(1.0)
+    assert found == pytest.approx([expected[n] for n in graph.nodes], abs=1e-9)
+
+
+@pytest.mark.parametrize("graph", list(random_graphs()))
+def test_exact_betweenness_matches_networkx(graph):
+    expected = nx.betweenness_centrality(graph, normalized=False)
+    # As many samples as nodes: every node is a source
+    found = ranking_of(graph).betweenness(samples=len(graph))
+    assert found == pytest.approx([expected[n] for n in graph.nodes], abs=1e-9)
+
+
+def test_duplicate_edges_and_self_calls_are_ignored():
+    ranking = CallGraphRanking(["a", "b", "c"], [(0, 1), (0, 1), (1, 1), (1, 2)])
+    in_degree, out_degree = ranking.degrees()
+    assert list(in_degree) == [0, 1, 1]
+    assert list(out_degree) == [1, 1, 0]
+    assert list(ranking.betweenness(samples=3)) == [0, 1, 0]
+
+
+def test_top_orders_by_score_then_node():
+    # A star into "hub", which calls "d"; the import edge is not a call
+    graph = nx.DiGraph()
+    for name, complexity in (("a", 1), ("b", 3), ("c", 2), ("hub", 5), ("d", 5)):
+        graph.add_node(name, complexity=complexity)
+    graph.add_edges_from([("a", "hub"), ("b", "hub"), ("c", "hub"), ("hub", "d")], type="calls")
+    graph.add_edge("d", "a", type="imports")
+    ranking = CallGraphRanking.from_networkx(graph)
+    by_pagerank = [row["function"] for row in ranking.top(by="pagerank")]
+    assert by_pagerank[:2] == ["d", "hub"]
+    # Equal scores keep node order
+    assert [row["function"] for row in ranking.top(2, by="complexity")] == ["hub", "d"]
+    assert [row["function"] for row in ranking.top(by="in_degree")][:2] == ["hub", "d"]
+    top = ranking.top(1, by="betweenness")[0]
+    assert top["function"] == "hub" and top["betweenness"] == 3.0
+    assert set(top) == {"function", "hotspot", "pagerank", "betweenness", "in_degree",
+                        "out_degree", "complexity"}
+    hotspots = [row["hotspot"] for row in ranking.top(100)]
+    assert len(hotspots) == 5 and hotspots == sorted(hotspots, reverse=True)
+    assert ranking.top(0) == []
+    with pytest.raises(ValueError):
+        ranking.top(by="loc")
+
+
+def test_edge_budget_caps_the_sampled_sources(monkeypatch):
+    graph = nx.gnp_random_graph(50, 0.1, seed=5, directed=True)
+    ranking = ranking_of(graph)
+    edges = ranking.adjacency.nnz
+    sources = []
+    dependencies = CallGraphRanking._dependencies
+
+    def counted(source, *args):
+        sources.append(source)
+        return dependencies(source, *args)
+    monkeypatch.setattr(CallGraphRanking, "_dependencies", staticmethod(counted))
+
+    ranking.betweenness(samples=20, edge_budget=edges * 3)
+    assert len(sources) == 3
+    sources.clear()
+    # At least one source however small the budget
+    ranking.betweenness(samples=20, edge_budget=1)
+    assert len(sources) == 1
+    sources.clear()
+    ranking.betweenness(samples=20, edge_budget=edges * 1000)
+    assert len(sources) == 20 == len(set(sources))
+
+
+def test_sampled_betweenness_is_seeded_and_scaled():
+    graph = nx.gnp_random_graph(80, 0.05, seed=6, directed=True)
+    ranking = ranking_of(graph)
+    first = ranking.betweenness(samples=10, seed=1)
+    assert list(first) == list(ranking.betweenness(samples=10, seed=1))
+    exact = ranking.betweenness(samples=80)
+    # The estimate is scaled to the whole graph
+    assert first.sum() == pytest.approx(exact.sum(), rel=0.5)
@@ -0,0 +1,64 @@
+"""Reachability index queries checked against networkx on random call graphs."""
+
+import pytest
+
+nx = pytest.importorskip("networkx")
+
+from reachability import ReachabilityIndex  # noqa: E402
+
+
+def random_graph(n, m, seed):
+    graph = nx.gnm_random_graph(n, m, seed=seed, directed=True)
+    # A few self-calls, which make a single function recursive
+    graph.add_edges_from((v, v) for v in range(0, n, 17))
+    return graph
+
+
+def index_of(graph, budget=None):
+    keys = [f"f{v}" for v in graph.nodes]
+    edges = list(graph.edges())
+    return ReachabilityIndex(keys, edges) if budget is None else ReachabilityIndex(keys, edges, budget)
+
+
+def reachable(graph, u):
+    """Nodes at the end of a non-empty path from `u` (so `u` itself only on a cycle)."""
+    found = set()
+    for w in graph.successors(u):
+        found |= nx.descendants(graph, w) | {w}
+    return found
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("budget", [None, 1])
+def test_reaches_descendants_and_ancestors_match_networkx(seed, budget):
+    graph = random_graph(80, 160 + 20 * seed, seed)
+    index = index_of(graph, budget)
+    reverse = graph.reverse(copy=False)
+    for u in graph.nodes:
+        descendants = reachable(graph, u)
+        assert index.descendants(f"f{u}") == [f"f{v}" for v in sorted(descendants)]
+        assert index.ancestors(f"f{u}") == [f"f{v}" for v in sorted(reachable(reverse, u))]
+        for v in range(0, 80, 7):
+            assert index.reaches(f"f{u}", f"f{v}") == (v in descendants)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_cycles_and_topological_order(seed):
+    graph = random_graph(60, 120, seed)
+    index = index_of(graph)
+    expected = {frozenset(c) for c in nx.strongly_connected_components(graph)
+                if len(c) > 1 or any(graph.has_edge(v, v) for v in c)}
+    assert {frozenset(int(k[1:]) for k in c) for c in index.cycles()} == expected
+
+    position = {int(k[1:]): i for i, component in enumerate(index.topological_order())
+                for k in component}
+    assert len(position) == graph.number_of_nodes()
+    for u, v in graph.edges():
+        assert position[u] <= position[v], "callers must come before their callees"
+
+
+def test_unknown_node_raises_key_error():
+    index = ReachabilityIndex(["a", "b"], [(0, 1)])
+    assert index.reaches("a", "b") and not index.reaches("b", "a")
+    with pytest.raises(KeyError):
+        index.reaches("a", "missing")
@@ -0,0 +1,67 @@
+"""Stack sampler: threads of this process and the search pool's worker processes."""
+
+import threading
+import time
+
+import pytest
+
+import sampler
+import structural_search
+
+
+def busy(seconds, started=None):
+    if started:
+        open(started, "w").close()
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_profile_samples_other_threads():
+    worker = threading.Thread(target=busy, args=(0.5,), name="busy-thread")
+    worker.start()
+    result = sampler.profile(0.2, 0.005)
+    worker.join()
+    assert result.samples > 0
+    assert any(stack.startswith("busy-thread;") and "busy (test_sampler.py" in stack
+               for stack in result.stacks)
+
+
+def test_profile_merges_the_search_pool_workers(monkeypatch, tmp_path):
+    monkeypatch.setattr(structural_search, "POOL_WORKERS", 2)
+    structural_search.shutdown_pool()
+    try:
+        pool = structural_search._executor()
+        markers = [tmp_path / f"started-{i}" for i in range(2)]
+        tasks = [pool.submit(busy, 1.0, str(marker)) for marker in markers]
+        # Wait until both workers are running their task
+        deadline = time.monotonic() + 10
+        while not all(m.exists() for m in markers) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        result = sampler.profile(0.3, 0.005)
+        for task in tasks:
+            task.result()
+    finally:
+        structural_search.shutdown_pool()
+    assert result.workers == 2
+    worker_stacks = [stack for stack in result.stacks if stack.startswith("worker-")]
+    assert len({stack.split(":", 1)[0] for stack in worker_stacks}) == 2
+    assert any("busy (test_sampler.py" in stack for stack in worker_stacks)
+
+
+def test_a_released_channel_is_not_waited_for():
+    channel = sampler.worker_channel()
+    channel.workers.value = 1    # a worker that will never answer
+    sampler.release_channel(channel)
+    started = time.monotonic()
+    sampler.profile(0.01)
+    assert time.monotonic() - started < sampler.WORKER_REPLY_TIMEOUT
+
+
+def test_concurrent_profiles_are_rejected():
+    thread = threading.Thread(target=sampler.profile, args=(0.3,))
+    thread.start()
+    time.sleep(0.05)
+    with pytest.raises(sampler.ProfilerBusy):
+        sampler.profile(0.01)
+    thread.join()
@@ -0,0 +1,107 @@
+"""Search index: incremental snapshots, pruning, text search lines and symbol ranking."""
+
+import pytest
+
+from search_index import SearchIndex
+
+
+def summary(path, *functions, classes=()):
+    """A file summary with top-level `functions` and (name, [methods]) `classes`."""
+    line = iter(range(1, 1000))
+    return {
+        "functions": [{"name": f, "id": f"{path}::{f}::{next(line)}", "start_line": 0} for f in functions],
+        "classes": [{"name": c, "id": f"{path}::{c}", "start_line": 0,
+                     "methods": [{"name": m, "id": f"{path}::{c}.{m}::0", "start_line": 0} for m in methods]}
+                    for c, methods in classes],
+    }
+
+
+@pytest.fixture
+def index(tmp_path):
+    with SearchIndex(str(tmp_path / "index.sqlite")) as index:
+        yield index
+
+
+def blobs(index):
+    return index.conn.execute("SELECT count(*) FROM blobs").fetchone()[0]
+
+
+def test_only_changed_files_are_indexed_again(index):
+    first = index.add_snapshot("s1", [("a.py", b"alpha = 1\n", "python", None),
+                                      ("b.py", b"beta = 1\n", "python", None)])
+    assert first == {"files": 2, "indexed": 2, "removed": 0}
+    second = index.add_snapshot("s2", [("a.py", b"alpha = 1\n", "python", None),
+                                       ("b.py", b"beta = 2\n", "python", None),
+                                       ("c.py", b"gamma = 3\n", "python", None)])
+    assert second == {"files": 3, "indexed": 2, "removed": 0}
+    assert blobs(index) == 4
+    assert index.file_text("s1", "b.py") == "beta = 1\n"
+    assert index.file_text("s2", "b.py") == "beta = 2\n"
+
+    update = index.update_files("s2", [("d.py", b"alpha = 1\n", "python", None)], removed=["c.py"])
+    assert update == {"files": 1, "indexed": 0, "removed": 1}
+    assert index.file_text("s2", "c.py") is None
+    assert index.file_text("s2", "d.py") == "alpha = 1\n"
+
+
+def test_unreferenced_blobs_are_pruned(index):
+    index.add_snapshot("s1", [("a.py", b"alpha = 1\n", "python", summary("a.py", "alpha"))])
+    index.add_snapshot("s2", [("a.py", b"alpha = 2\n", "python", summary("a.py", "alpha"))])
+    index.remove_snapshot("s1")
+    assert blobs(index) == 1
+    assert index.snapshots() == ["s2"]
+    assert index.conn.execute("SELECT count(*) FROM symbols").fetchone()[0] == 1
+    assert index.conn.execute("SELECT count(*) FROM blob_text").fetchone()[0] == 1
+    index.add_snapshot("s2", [])
+    assert blobs(index) == 0
+
+
+def test_text_search_reports_matching_lines(index):
+    code = b"import os\n\ndef Load(path):\n    # load once\n    return open(path).read()  # LOAD\nx = 1\n"
+    index.add_snapshot("s1", [("a.py", code, "python", None), ("b.py", b"nothing here\n", "python", None)])
+    [result] = index.text_search("s1", "load")
+    assert result["file"] == "a.py"
+    assert [(m["line"], m["text"]) for m in result["matches"]] == [
+        (3, "def Load(path):"), (4, "    # load once"), (5, "    return open(path).read()  # LOAD")]
+    # A query may span lines
+    [result] = index.text_search("s1", "once\n    return")
+    assert [m["line"] for m in result["matches"]] == [4]
+    assert index.text_search("s1", "absent") == []
+    assert index.text_search("s2", "load") == []
+    with pytest.raises(ValueError):
+        index.text_search("s1", "lo")
+
+
+def test_symbol_ranking(index):
+    names = ("parse", "parser", "parse_file", "sparse", "prase", "render")
+    index.add_snapshot("s1", [("a.py", b"a\n", "python", summary("a.py", *names))])
+    found = [r["name"] for r in index.symbol_search("s1", "parse")]
+    # exact, then prefixes (shorter first), then substrings, then similar names
+    assert found == ["parse", "parser", "parse_file", "sparse", "prase"]
+    assert index.symbol_search("s1", "PARSE_F")[0]["name"] == "parse_file"
+    fuzzy = index.symbol_search("s1", "pasre_file")
+    assert fuzzy[0]["name"] == "parse_file" and fuzzy[0]["score"] < 1
+    assert index.symbol_search("s1", "xyzzy") == []
+
+
+def test_symbol_kinds_and_keys(index):
+    index.add_snapshot("s1", [("pkg/m.py", b"m\n", "python",
+                               summary("pkg/m.py", "load", classes=[("Loader", ["load"])]))])
+    results = index.symbol_search("s1", "load")
+    assert {(r["kind"], r["key"]) for r in results} == {
+        ("function", "pkg/m.py::load::1"), ("method", "pkg/m.py::Loader.load::0"),
+        ("class", "pkg/m.py::Loader")}
+    assert [r["kind"] for r in index.symbol_search("s1", "load", kind="method")] == ["method"]
+    with pytest.raises(ValueError):
+        index.symbol_search("s1", "load", kind="variable")
+
+
+def test_a_blob_indexed_without_symbols_gets_them_later(index):
+    code = b"def late():\n    pass\n"
+    index.add_snapshot("s1", [("a.py", code, "python", None)])
+    assert index.symbol_search("s1", "late") == []
+    index.add_snapshot("s2", [("a.py", code, "python", summary("a.py", "late"))])
+    assert [r["key"] for r in index.symbol_search("s1", "late")] == ["a.py::late::1"]
+    # and does not get them twice
+    index.add_snapshot("s3", [("a.py", code, "python", summary("a.py", "late"))])
+    assert len(index.symbol_search("s3", "late")) == 1
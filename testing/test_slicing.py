@@ -0,0 +1,81 @@
+"""Intra- and interprocedural slices of a small call chain."""
+
+import pytest
+
+pytest.importorskip("networkx")
+
+from control_flow import build_cfg  # noqa: E402
+from languages import get_parser  # noqa: E402
+from pdg import PDGGenerator  # noqa: E402
+from slicing import DependenceIndex, Slicer  # noqa: E402
+
+SOURCE = b"""def helper(a):
+    b = a * 2
+    return b
+
+def main(x, y):
+    w = y + 1
+    z = helper(x)
+    print(z)
+    v = x - 1
+    u = v * 3
+    return w
+
+def top():
+    return main(1, 2)
+
+def other(q):
+    r = helper(q)
+    return r
+"""
+
+CALLEES = {"main": [("helper", "helper")], "top": [("main", "main")], "other": [("helper", "helper")]}
+CALLERS = {"helper": ["main", "other"], "main": ["top"]}
+
+
+@pytest.fixture(scope="module")
+def slicer():
+    tree = get_parser("python").parse(SOURCE)
+    indexes = {}
+    for function in tree.root_node.children:
+        name = function.child_by_field_name("name").text.decode()
+        flow = build_cfg(function, SOURCE, "python", name)
+        indexes[name] = DependenceIndex.from_networkx(name, name, PDGGenerator().build_statement_pdg(flow))
+    return Slicer(indexes.get, lambda f: CALLERS.get(f, ()), lambda f: CALLEES.get(f, ()))
+
+
+def lines(result):
+    return {f["function"]: [s["line"] for s in f["statements"]] for f in result["functions"]}
+
+
+def test_intraprocedural_backward_slice(slicer):
+    result = slicer.slice("main", line=10, direction="backward", interprocedural=False)
+    assert lines(result) == {"main": [9, 10]}
+
+
+def test_forward_slice_leaves_through_the_return(slicer):
+    result = slicer.slice("helper", line=2, direction="forward", interprocedural=True)
+    assert lines(result)["helper"] == [2, 3]
+    assert lines(result)["main"] == [7, 8]
+
+
+def test_backward_slice_climbs_to_callers_through_parameters(slicer):
+    result = slicer.slice("main", line=10, direction="backward", interprocedural=True)
+    assert lines(result) == {"main": [9, 10], "top": [14]}
+
+
+def test_descending_into_a_callee_does_not_climb_to_its_other_callers(slicer):
+    result = slicer.slice("main", line=8, direction="backward", interprocedural=True)
+    found = lines(result)
+    assert found["helper"] == [2, 3]
+    assert found["main"] == [7, 8]
+    assert "other" not in found
+
+
+def test_unknown_function_and_line_are_rejected(slicer):
+    with pytest.raises(ValueError):
+        slicer.slice("missing", line=1)
+    with pytest.raises(ValueError):
+        slicer.slice("main", line=99)
+    with pytest.raises(ValueError):
+        slicer.slice("main", line=10, direction="sideways")
@@ -0,0 +1,100 @@
+"""Structural search: root captures, match grouping, limits and the /search endpoint."""
+
+import pytest
+
+import structural_search
+from structural_search import root_captures, search_repo, search_source
+from telemetry import REGISTRY
+
+CALLS = b"""def f(x):
+    return outer(inner(x), 1)
+
+print(f(2))
+"""
+
+CALL_PATTERN = "(call function: (identifier) @fn) @call"
+
+
+def captures(match):
+    return [(c["name"], c["text"]) for c in match["captures"]]
+
+
+def cache_count(result):
+    return REGISTRY.counters.get("search_tree_cache_total", {}).get((("result", result),), 0)
+
+
+def test_root_captures():
+    assert root_captures(CALL_PATTERN) == {"call"}
+    assert root_captures("(identifier) @id") == {"id"}
+    assert root_captures("[(call) @a (attribute) @b]") == {"a", "b"}
+    assert root_captures('((identifier) @x (#eq? @x "y"))') == {"x"}
+    assert root_captures("(call function: (identifier) @fn)") == frozenset()
+    assert root_captures("; a comment with @fake\n(string) @s") == {"s"}
+
+
+def test_captures_are_grouped_under_their_innermost_match():
+    matches = search_source(CALLS, "python", CALL_PATTERN, "m.py")
+    assert [captures(m) for m in matches] == [
+        [("call", "outer(inner(x), 1)"), ("fn", "outer")],
+        [("call", "inner(x)"), ("fn", "inner")],
+        [("call", "print(f(2))"), ("fn", "print")],
+        [("call", "f(2)"), ("fn", "f")],
+    ]
+    assert matches[0]["file"] == "m.py"
+    assert (matches[0]["start_line"], matches[2]["start_line"]) == (2, 4)
+
+
+def test_pattern_without_a_root_capture_yields_one_match_per_capture():
+    matches = search_source(CALLS, "python", "(call function: (identifier) @fn)")
+    assert [captures(m) for m in matches] == [[("fn", name)] for name in ("outer", "inner", "print", "f")]
+
+
+def test_search_source_stops_at_the_limit():
+    matches = search_source(CALLS, "python", CALL_PATTERN, limit=2)
+    assert [m["captures"][0]["text"] for m in matches] == ["outer(inner(x), 1)", "inner(x)"]
+
+
+@pytest.fixture
+def repo(tmp_path):
+    for i in range(6):
+        (tmp_path / f"m{i}.py").write_bytes(CALLS)
+    (tmp_path / "skip.js").write_text("f(1);\n")
+    return str(tmp_path)
+
+
+def test_search_repo_in_process(repo):
+    matches = list(search_repo(repo, "python", CALL_PATTERN, workers=1))
+    assert len(matches) == 24
+    assert sorted({m["file"] for m in matches}) == [f"m{i}.py" for i in range(6)]
+    assert len(list(search_repo(repo, "python", CALL_PATTERN, limit=5, workers=1))) == 5
+
+
+def test_search_repo_on_the_pool_stops_at_the_limit_and_counts_cache_use(repo, monkeypatch):
+    monkeypatch.setattr(structural_search, "POOL_WORKERS", 2)
+    monkeypatch.setattr(structural_search, "CHUNK_FILES", 1)
+    structural_search.shutdown_pool()
+    try:
+        lookups = cache_count("hit") + cache_count("miss")
+        assert len(list(search_repo(repo, "python", CALL_PATTERN))) == 24
+        # Counted here, in the searching process, not in the workers
+        assert cache_count("hit") + cache_count("miss") == lookups + 6
+        assert len(list(search_repo(repo, "python", CALL_PATTERN, limit=3))) == 3
+    finally:
+        structural_search.shutdown_pool()
+
+
+def test_bad_pattern_is_rejected():
+    with pytest.raises(ValueError):
+        structural_search.compile_query("python", "(call")
+    with pytest.raises(ValueError):
+        structural_search.compile_query("cobol", "(call) @c")
+
+
+def test_bad_pattern_is_a_400():
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+    import main
+    response = TestClient(main.app).post("/search", params={
+        "repo_url": "https://example.invalid/repo.git", "language": "python", "pattern": "(nosuchnode) @x"})
+    assert response.status_code == 400
+    assert "Invalid query" in response.json()["detail"]
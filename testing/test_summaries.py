@@ -0,0 +1,117 @@
+"""Function summaries: local facts, propagation through callees and cycles, and the cache."""
+
+import pytest
+
+pytest.importorskip("networkx")
+
+from control_flow import build_cfg  # noqa: E402
+from languages import get_parser  # noqa: E402
+from pdg import PDGGenerator  # noqa: E402
+from slicing import DependenceIndex  # noqa: E402
+from summaries import (PARAMETER_IN, PARAMETER_OUT, SummaryCache, compute_summaries,  # noqa: E402
+                       content_hash, interprocedural_edges, local_facts)
+
+SOURCE = b"""def fill(items, v):
+    items[0] = v
+
+def relay(xs, v):
+    fill(xs, v)
+    return len(xs)
+
+def double(a, b):
+    return a * 2
+
+def ping(p, n):
+    if n:
+        pong(p, n - 1)
+
+def pong(q, n):
+    q.count += 1
+    ping(q, n)
+"""
+
+
+class Program:
+    def __init__(self):
+        tree = get_parser("python").parse(SOURCE)
+        self.pdgs, self.hashes, self.parameters, self.keys = {}, {}, {}, {}
+        for function in tree.root_node.children:
+            name = function.child_by_field_name("name").text.decode()
+            key = self.keys[name] = f"m.py::{name}::{function.start_point[0] + 1}"
+            flow = build_cfg(function, SOURCE, "python", key)
+            self.pdgs[key] = PDGGenerator().build_statement_pdg(flow)
+            self.hashes[key] = content_hash(SOURCE[function.start_byte:function.end_byte], "python")
+            self.parameters[key] = [p.text.decode() for p in
+                                    function.child_by_field_name("parameters").named_children]
+        k = self.keys
+        self.callees = {k["relay"]: [("fill", k["fill"])], k["ping"]: [("pong", k["pong"])],
+                        k["pong"]: [("ping", k["ping"])]}
+        self.analyzed = []
+
+    def analyze(self, key):
+        self.analyzed.append(key)
+        return local_facts(DependenceIndex.from_networkx(key, key, self.pdgs[key]), self.parameters[key])
+
+    def summaries(self, cache=None):
+        return compute_summaries(self.hashes, self.callees, self.analyze, cache)
+
+
+@pytest.fixture
+def program():
+    return Program()
+
+
+def test_local_reads_and_returns(program):
+    double = program.summaries()[program.keys["double"]]
+    assert double.reads == ["a"]
+    assert double.returns == ["a"]
+    assert double.writes == {}
+    assert double.calls == []
+
+
+def test_modifications_propagate_to_callers(program):
+    summaries = program.summaries()
+    assert set(summaries[program.keys["fill"]].writes) == {"items"}
+    relay = summaries[program.keys["relay"]]
+    assert set(relay.writes) == {"xs"}
+    assert relay.calls == [program.keys["fill"]]
+
+
+def test_mutual_recursion_reaches_a_fixpoint(program):
+    summaries = program.summaries()
+    # pong modifies q itself; ping only through pong
+    assert set(summaries[program.keys["pong"]].writes) == {"q"}
+    assert set(summaries[program.keys["ping"]].writes) == {"p"}
+
+
+def test_interprocedural_edges(program):
+    summaries = program.summaries()
+    edges = interprocedural_edges(summaries, program.callees)
+    relay, fill = program.keys["relay"], program.keys["fill"]
+    assert {e[5] for e in edges if e[0] == PARAMETER_IN and e[1] == relay and e[3] == fill} == {"items", "v"}
+    assert [e for e in edges if e[0] == PARAMETER_OUT and e[3] == relay] == \
+        [(PARAMETER_OUT, fill, summaries[fill].writes["items"][0], relay, "stmt_0", "xs")]
+
+
+def test_cache_skips_analysis_of_unchanged_functions(program, tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = SummaryCache(path)
+    first = program.summaries(cache)
+    assert len(program.analyzed) == len(program.hashes)
+    cache.save()
+
+    program.analyzed.clear()
+    second = program.summaries(SummaryCache(path))
+    assert program.analyzed == []
+    assert {k: s.as_dict() for k, s in second.items()} == {k: s.as_dict() for k, s in first.items()}
+
+
+def test_cache_keeps_the_most_recently_used_entries(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = SummaryCache(path, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, {"key": key})
+    assert cache.get("a") == {"key": "a"}
+    cache.save()
+    reloaded = SummaryCache(path, max_entries=2)
+    assert "a" in reloaded and "c" in reloaded and "b" not in reloaded
@@ -0,0 +1,122 @@
+"""Telemetry: counters, spans, Prometheus rendering and memory-profiled jobs."""
+
+import threading
+
+import pytest
+
+import telemetry
+from telemetry import MemoryProfilerBusy, Registry, count, job, render_prometheus, span, timed
+
+MB = 1 << 20
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = Registry()
+    monkeypatch.setattr(telemetry, "REGISTRY", registry)
+    return registry
+
+
+def test_counts_go_to_the_registry_and_the_current_job(registry):
+    count("files_total", language="python", status="ok")
+    with job(memory=False) as metrics:
+        count("files_total", language="python", status="ok")
+        count("bytes_total", 120, language="c", status=None)
+    assert registry.counters["files_total"] == {(("language", "python"), ("status", "ok")): 2}
+    assert registry.counters["bytes_total"] == {(("language", "c"),): 120}
+    # Only what happened inside the job, flattened
+    assert metrics.counters == {"files_total[python,ok]": 1, "bytes_total[c]": 120}
+
+
+def test_spans_time_stages_and_count_failures(registry):
+    @timed("parse")
+    def parse():
+        return "tree"
+
+    with job(memory=False) as metrics:
+        with span("build", graph="cfg"):
+            assert parse() == "tree"
+        with pytest.raises(KeyError):
+            with span("build", graph="pdg"):
+                raise KeyError("pdg")
+    assert registry.stage_count == {(("stage", "parse"),): 1, (("stage", "build"), ("graph", "cfg")): 1,
+                                    (("stage", "build"), ("graph", "pdg")): 1}
+    assert registry.counters["errors_total"] == {(("stage", "build"),): 1}
+    assert set(metrics.timings) == {"parse", "build[cfg]", "build[pdg]", "total"}
+    # The nested stage's time is part of the enclosing one's
+    assert metrics.timings["parse"] <= metrics.timings["build[cfg]"] <= metrics.timings["total"]
+    data = metrics.as_dict()
+    assert set(data) == {"timings", "counters"} and data["counters"] == {"errors_total[build]": 1}
+
+
+def test_prometheus_rendering(registry):
+    registry.observe((("stage", "parse"), ("language", "python")), 0.25)
+    registry.observe((("stage", "parse"), ("language", "python")), 0.5)
+    count("files_total", 3, language="python", status="ok")
+    count("search_files_total", 2.5, repo='a "quoted"\\path\nline')
+    assert render_prometheus() == (
+        "# HELP codeiq_stage_seconds Wall time spent per pipeline stage\n"
+        "# TYPE codeiq_stage_seconds summary\n"
+        'codeiq_stage_seconds_sum{stage="parse",language="python"} 0.750000\n'
+        'codeiq_stage_seconds_count{stage="parse",language="python"} 2\n'
+        "# HELP codeiq_files_total Source files processed, by language and parse status\n"
+        "# TYPE codeiq_files_total counter\n"
+        'codeiq_files_total{language="python",status="ok"} 3\n'
+        "# TYPE codeiq_search_files_total counter\n"
+        'codeiq_search_files_total{repo="a \\"quoted\\"\\\\path\\nline"} 2.5\n'
+    )
+    registry.observe_memory((("stage", "parse"),), 2048)
+    registry.observe_memory((("stage", "parse"),), 1024)
+    assert "# TYPE codeiq_stage_peak_bytes gauge\ncodeiq_stage_peak_bytes{stage=\"parse\"} 2048\n" \
+        in render_prometheus()
+    registry.reset()
+    assert render_prometheus() == ("# HELP codeiq_stage_seconds Wall time spent per pipeline stage\n"
+                                   "# TYPE codeiq_stage_seconds summary\n")
+
+
+def test_nested_span_peak_and_retained_memory():
+    with job(memory=True) as metrics:
+        with span("outer"):
+            kept = bytearray(MB)
+            with span("inner"):
+                scratch = bytearray(4 * MB)
+                del scratch
+    del kept
+    outer, inner = metrics.memory["outer"], metrics.memory["inner"]
+    assert 4 * MB <= inner["peak_bytes"] < 4.5 * MB
+    assert abs(inner["retained_bytes"]) < MB // 4
+    # The outer span's peak includes the inner one's, on top of what it kept
+    assert 5 * MB <= outer["peak_bytes"] < 5.5 * MB
+    assert MB <= outer["retained_bytes"] < 1.25 * MB
+    assert metrics.memory["total"]["peak_bytes"] >= outer["peak_bytes"]
+
+
+def test_one_memory_profiled_job_at_a_time(monkeypatch):
+    entered, release = threading.Event(), threading.Event()
+    other = {}
+
+    def profiled():
+        with job(memory=True):
+            entered.set()
+            release.wait(10)
+
+    thread = threading.Thread(target=profiled)
+    thread.start()
+    try:
+        entered.wait(10)
+        with pytest.raises(MemoryProfilerBusy):
+            with job(memory=True):
+                pass
+        # A job that only has the env var runs unprofiled, and takes no readings
+        monkeypatch.setenv(telemetry.MEMORY_PROFILE_ENV, "1")
+        with job() as other["metrics"]:
+            with span("unprofiled"):
+                bytearray(MB)
+    finally:
+        release.set()
+        thread.join()
+    assert other["metrics"].memory == {}
+    assert not other["metrics"].memory_profiled
+    with job(memory=True) as metrics:
+        pass
+    assert "total" in metrics.memory
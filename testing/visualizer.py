@@ -1,8 +1,9 @@
 # visualize_graphs.py
-import networkx as nx
-import matplotlib.pyplot as plt
 
 def visualize_graph(graph_path, title):
+    import networkx as nx
+    import matplotlib.pyplot as plt
+
     G = nx.read_gexf(graph_path)
     plt.figure(figsize=(10, 8))
     pos = nx.spring_layout(G, seed=42)